@@ -0,0 +1,63 @@
+"""Shared setup for the scripts in benchmarks/.
+
+Each benchmark runs against a throwaway test database (created from the
+configured PostgreSQL connection, exactly like `manage.py test`) so seeding
+thousands of rows never touches real data. Run from the repo root, e.g.:
+
+    python benchmarks/bench_home.py
+"""
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+
+# Same swap the test suite makes: the manifest storage needs collectstatic.
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@contextmanager
+def bench_database():
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with override_settings(STORAGES=PLAIN_STORAGES):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timed(fn, repeat=30, warmup=3):
+    """Call `fn` repeatedly; return (median_ms, p95_ms)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def report(label, median_ms, p95_ms):
+    print(f'{label:<48} median {median_ms:8.2f} ms   p95 {p95_ms:8.2f} ms')
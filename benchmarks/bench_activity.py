@@ -0,0 +1,95 @@
+"""Heatmap and leaderboard: grouping the LessonView log vs the daily rollup.
+
+    python benchmarks/bench_activity.py [--users 3000] [--days 120]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Sum
+
+from learning import activity
+from learning.models import Course, Lesson, LessonView, Module, UserDailyActivity
+from learning.views import _today_uzt
+
+
+def seed(n_users, days, per_day=4):
+    """~n_users × days/2 active days × per_day views, inserted server-side."""
+    course = Course.objects.create(title='K', slug='k', status='published')
+    module = Module.objects.create(title='M', slug='m', course=course)
+    Lesson.objects.bulk_create(
+        Lesson(title=f'L{i}', slug=f'l{i}', module=module, order=i, duration_seconds=600)
+        for i in range(200)
+    )
+    User.objects.bulk_create(User(username=f'u{i}') for i in range(n_users))
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO learning_lessonview (user_id, lesson_id, viewed_on, first_seen_at)
+            SELECT u.id, l.id, d.day, now()
+            FROM auth_user u
+            CROSS JOIN generate_series(0, %s) AS g(n)
+            CROSS JOIN LATERAL (SELECT (%s::date - g.n) AS day) d
+            CROSS JOIN LATERAL (
+                SELECT id FROM learning_lesson
+                WHERE id %% 50 = (u.id + g.n) %% 50 ORDER BY id LIMIT %s
+            ) l
+            WHERE (u.id + g.n) %% 2 = 0
+        """, [days - 1, _today_uzt(), per_day])
+        cursor.execute('ANALYZE learning_lessonview')
+
+
+def old_heatmap(user, since):
+    return {
+        row['viewed_on']: row['lessons']
+        for row in LessonView.objects.filter(user=user, viewed_on__gte=since)
+        .values('viewed_on').annotate(lessons=Count('lesson', distinct=True))
+    }
+
+
+def old_leaderboard(since):
+    qs = LessonView.objects.all()
+    if since:
+        qs = qs.filter(viewed_on__gte=since)
+    return list(qs.values('user_id').annotate(views=Count('id')).order_by('-views')[:50])
+
+
+def new_leaderboard(since):
+    qs = UserDailyActivity.objects.all()
+    if since:
+        qs = qs.filter(day__gte=since)
+    return list(qs.values('user_id').annotate(views=Sum('lessons_viewed'))
+                .filter(views__gt=0).order_by('-views', 'user_id')[:50])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=120)
+    args = parser.parse_args()
+    with bench_database():
+        seed(args.users, args.days)
+        t0 = time.perf_counter()
+        rows = activity.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE learning_userdailyactivity')
+        print(f'--- {LessonView.objects.count()} lesson views -> {rows} rollup rows '
+              f'(backfill {time.perf_counter() - t0:.1f} s) ---')
+
+        today = _today_uzt()
+        since = today - timedelta(days=364)
+        users = list(User.objects.values_list('id', flat=True))
+        rng = random.Random(1)
+        report('heatmap: LessonView group by day', *timed(lambda: old_heatmap(rng.choice(users), since)))
+        report('heatmap: rollup range', *timed(lambda: activity.lessons_per_day(rng.choice(users), since)))
+        for label, window in (('week', today - timedelta(days=7)), ('all-time', None)):
+            report(f'leaderboard {label}: LessonView', *timed(lambda: old_leaderboard(window), repeat=10))
+            report(f'leaderboard {label}: rollup', *timed(lambda: new_leaderboard(window), repeat=10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Certificate images: drawing one from scratch vs serving it from the
+on-disk card cache, a 304 revalidation, and the public verification page.
+
+    python benchmarks/bench_cards.py
+"""
+import tempfile
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from learning import cards
+from learning.models import Certificate, Course
+
+
+def main():
+    with bench_database(), tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+        user = User.objects.create_user('bench', first_name='Aziza', last_name='Karimova')
+        course = Course.objects.create(title="Python dasturlash: boshlang'ichlar uchun", slug='k', status='published')
+        cert = Certificate.objects.create(user=user, course=course)
+        card = cards.course_certificate(cert)
+
+        for fmt in cards.FORMATS:
+            def draw(fmt=fmt):
+                card.path(fmt).unlink(missing_ok=True)
+                cards.ensure(card, fmt)
+            report(f'draw certificate ({fmt})', *timed(draw, repeat=10, warmup=1))
+
+        client = Client()
+        url = reverse('learning:certificate_image', args=[cert.code, 'png'])
+
+        def cached_hit():
+            b''.join(client.get(url).streaming_content)
+
+        report('GET image (cached on disk)', *timed(cached_hit, repeat=50, warmup=5))
+        etag = f'"{card.digest}"'
+        report('GET image (If-None-Match -> 304)',
+               *timed(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), repeat=50, warmup=5))
+        verify = reverse('learning:public_certificate_verify', args=[cert.code])
+        report('verification page', *timed(lambda: client.get(verify), repeat=50, warmup=5))
+
+
+if __name__ == '__main__':
+    main()
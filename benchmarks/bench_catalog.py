@@ -0,0 +1,65 @@
+"""Lesson URL resolution + navigation: ORM walk vs the mmap'd catalog.
+
+    python benchmarks/bench_catalog.py [--courses 1000]
+"""
+import argparse
+import random
+
+from _bootstrap import bench_database, report, timed
+
+from django.shortcuts import get_object_or_404
+
+from learning.catalog import catalog_path, get_catalog, rebuild_catalog
+from learning.models import Course, Lesson, Module
+
+
+def seed(n_courses, modules=6, lessons=8):
+    courses = Course.objects.bulk_create(
+        Course(title=f'Kurs {i}', slug=f'kurs-{i}', status='published') for i in range(n_courses)
+    )
+    mods = Module.objects.bulk_create(
+        Module(title=f'Modul {j}', slug=f'modul-{j}', course=c, order=j)
+        for c in courses for j in range(modules)
+    )
+    Lesson.objects.bulk_create(
+        Lesson(title=f'Dars {k}', slug=f'dars-{k}', module=m, order=k, youtube_video_id='x')
+        for m in mods for k in range(lessons)
+    )
+    return [(f'kurs-{i}', f'modul-{j}', f'dars-{k}')
+            for i in range(n_courses) for j in range(modules) for k in range(lessons)]
+
+
+def orm_walk(course_slug, module_slug, lesson_slug):
+    course = get_object_or_404(Course, slug=course_slug)
+    module = get_object_or_404(Module, slug=module_slug, course=course)
+    lesson = get_object_or_404(Lesson, slug=lesson_slug, module=module)
+    siblings = list(module.lessons.order_by('order'))
+    idx = next(i for i, l in enumerate(siblings) if l.id == lesson.id)
+    if idx == len(siblings) - 1:
+        nxt = course.modules.filter(order__gt=module.order).order_by('order').first()
+        if nxt:
+            nxt.lessons.order_by('order').first()
+
+
+def catalog_walk(course_slug, module_slug, lesson_slug):
+    catalog = get_catalog()
+    _, _, lesson = catalog.resolve(course_slug, module_slug, lesson_slug)
+    catalog.next(lesson)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=1000)
+    n = parser.parse_args().courses
+    with bench_database():
+        urls = seed(n)
+        size = rebuild_catalog()
+        print(f'--- {n} courses, {len(urls)} lessons; catalog {size / 1024:.0f} KiB '
+              f'at {catalog_path()} ---')
+        rng = random.Random(1)
+        report('ORM walk (3 lookups + siblings)', *timed(lambda: orm_walk(*rng.choice(urls)), repeat=200))
+        report('catalog resolve + next', *timed(lambda: catalog_walk(*rng.choice(urls)), repeat=200))
+
+
+if __name__ == '__main__':
+    main()
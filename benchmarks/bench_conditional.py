@@ -0,0 +1,51 @@
+"""Public pages for anonymous visitors: a full render vs a revalidation that
+ends in 304 Not Modified (ETag from the page's version stamps).
+
+    python benchmarks/bench_conditional.py
+"""
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+
+from learning.models import Category, Course, CourseReview, Lesson, Module
+
+
+def seed():
+    teacher = User.objects.create_user('ustoz', first_name='Aziz')
+    category = Category.objects.create(name='Bench', slug='bench')
+    courses = [
+        Course.objects.create(title=f'Kurs {i}', slug=f'kurs-{i}', status='published',
+                              category=category, instructor=teacher, description='Matn ' * 200)
+        for i in range(24)
+    ]
+    for j in range(8):
+        module = Module.objects.create(title=f'Modul {j}', slug=f'modul-{j}', course=courses[0], order=j)
+        Lesson.objects.bulk_create(
+            Lesson(title=f'Dars {k}', slug=f'dars-{k}', module=module, order=k, duration_seconds=600)
+            for k in range(10)
+        )
+    for i in range(20):
+        CourseReview.objects.create(user=User.objects.create_user(f'u{i}'), course=courses[0],
+                                    rating=i % 5 + 1, comment='Zo\'r kurs ' * 10)
+
+
+def main():
+    with bench_database():
+        seed()
+        client = Client()
+        pages = {
+            'course page': reverse('learning:course_detail', args=['kurs-0']),
+            'category page': reverse('learning:category_detail', args=['bench']),
+            'instructor page': reverse('learning:instructor_detail', args=['ustoz']),
+        }
+        for label, url in pages.items():
+            etag = client.get(url)['ETag']
+            report(f'{label}: full render', *timed(lambda: client.get(url), repeat=50, warmup=5))
+            report(f'{label}: If-None-Match -> 304',
+                   *timed(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), repeat=200, warmup=10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Course-card grids: 24 cards rendered include by include (the old way)
+vs `{% course_cards %}` from the shared cache and from this process, plus the
+signed-in catalog page (never page-cached) with cold and warm cards.
+
+    python benchmarks/bench_course_cards.py
+"""
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.template import engines
+from django.test import Client
+from django.urls import reverse
+
+from learning import course_cards
+from learning.models import Category, Course, Wishlist
+from learning.views import _course_card_annotations
+
+
+def seed():
+    category = Category.objects.create(name='Bench', slug='bench')
+    for i in range(60):
+        Course.objects.create(title=f'Kurs {i}', slug=f'kurs-{i}', status='published', category=category,
+                              is_featured=i < 6, instructor_name=f'Ustoz {i}')
+    user = User.objects.create_user('talaba', password='pw')
+    for course in Course.objects.all()[:10]:
+        Wishlist.objects.create(user=user, course=course)
+    return user
+
+
+def main():
+    with bench_database():
+        user = seed()
+        courses = list(_course_card_annotations(
+            Course.objects.select_related('category').order_by('id')[:24]
+        ))
+        engine = engines['django']
+        included = engine.from_string(
+            '{% for course in courses %}{% include "learning/_course_card.html" %}{% endfor %}'
+        )
+        cached = engine.from_string('{% load learning_extras %}{% course_cards courses %}')
+        context = {'courses': courses}
+
+        report('24 cards: include each', *timed(lambda: included.render(context), repeat=100, warmup=5))
+
+        def shared_cache():
+            course_cards._fragments.clear()
+            return cached.render(context)
+        cached.render(context)
+        report('24 cards: shared cache', *timed(shared_cache, repeat=100, warmup=5))
+        report('24 cards: process copy', *timed(lambda: cached.render(context), repeat=200, warmup=10))
+
+        client = Client()
+        client.force_login(user)
+        url = reverse('learning:course_list')
+
+        def cold_page():
+            # New keys for every card, and only for the cards.
+            course_cards.CARD_FORMAT += 1
+            course_cards._fragments.clear()
+            return client.get(url)
+        report('signed-in catalog: cold cards', *timed(cold_page, repeat=30, warmup=3))
+        report('signed-in catalog: warm cards', *timed(lambda: client.get(url), repeat=50, warmup=5))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Home page TTFB at 1k / 10k published courses.
+
+Compares an anonymous hit served from a warm home snapshot, a signed-in hit
+(snapshot + personalized layer), and the cold path that rebuilds the snapshot.
+
+    python benchmarks/bench_home.py [--sizes 1000 10000]
+"""
+import argparse
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.test import Client
+
+from learning import course_stats, site_stats
+from learning.models import Category, Course, Enrollment, Lesson, Module
+from learning.snapshots import build_home_snapshot, invalidate_home_snapshot
+
+
+def seed(n_courses, lessons_per_course=10):
+    cats = Category.objects.bulk_create(
+        Category(name=f'Kategoriya {i}', slug=f'kat-{i}', order=i) for i in range(8)
+    )
+    courses = Course.objects.bulk_create(
+        Course(title=f'Kurs {i}', slug=f'kurs-{i}', status='published',
+               category=cats[i % len(cats)], is_featured=(i % 50 == 0), order=i)
+        for i in range(n_courses)
+    )
+    modules = Module.objects.bulk_create(
+        Module(title='Modul', slug='modul', course=c, order=0) for c in courses
+    )
+    Lesson.objects.bulk_create(
+        Lesson(title=f'Dars {j}', slug=f'dars-{j}', module=m, order=j,
+               youtube_video_id='dQw4w9WgXcQ', duration_seconds=600)
+        for m in modules for j in range(lessons_per_course)
+    )
+    user = User.objects.create_user('bench', password='bench-pw-123')
+    Enrollment.objects.bulk_create(Enrollment(user=user, course=c) for c in courses[:20])
+    # bulk_create skips the signals that maintain the denormalized counters.
+    course_stats.rebuild()
+    site_stats.reconcile()
+    return user
+
+
+def run(size):
+    with bench_database():
+        user = seed(size)
+        anon = Client()
+        signed_in = Client()
+        signed_in.force_login(user)
+        print(f'--- {size} published courses ---')
+
+        def cold():
+            invalidate_home_snapshot()
+            anon.get('/')
+
+        report('snapshot rebuild only', *timed(build_home_snapshot, repeat=10, warmup=1))
+        report('anonymous, cold snapshot (rebuild + render)', *timed(cold, repeat=10, warmup=1))
+        report('anonymous, warm snapshot', *timed(lambda: anon.get('/')))
+        report('signed-in, warm snapshot + personal layer', *timed(lambda: signed_in.get('/')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    for n in parser.parse_args().sizes:
+        run(n)
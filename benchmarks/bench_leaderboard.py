@@ -0,0 +1,76 @@
+"""Leaderboard page data: aggregating the rollup per request vs reading the
+materialized board, plus the cost of a refresh.
+
+    python benchmarks/bench_leaderboard.py [--users 20000] [--days 120]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+
+from learning import leaderboards
+from learning.models import UserDailyActivity
+from learning.views import _today_uzt
+
+
+def seed(n_users, days):
+    User.objects.bulk_create(User(username=f'u{i}') for i in range(n_users))
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO learning_userdailyactivity (user_id, day, lessons_viewed, lessons_completed, seconds_watched)
+            SELECT u.id, %s::date - g.n, 1 + (u.id * 7 + g.n) %% 9, (u.id + g.n) %% 3, 600
+            FROM auth_user u CROSS JOIN generate_series(0, %s) AS g(n)
+            WHERE (u.id + g.n) %% 3 = 0
+        """, [_today_uzt(), days - 1])
+        cursor.execute('ANALYZE learning_userdailyactivity')
+
+
+def live(since, user_id):
+    """What the page did before: aggregate, fetch the top 50, then find my rank."""
+    qs = UserDailyActivity.objects.all()
+    if since:
+        qs = qs.filter(day__gte=since)
+    totals = qs.values('user_id').annotate(views=Sum('lessons_viewed')).filter(views__gt=0)
+    top = list(totals.order_by('-views', 'user_id')[:50])
+    mine = next(iter(totals.filter(user_id=user_id)), None)
+    if mine:
+        totals.filter(views__gt=mine['views']).count()
+    return top
+
+
+def materialized(board, user):
+    top = leaderboards.top(board)
+    leaderboards.entry_for(user, board)
+    return top
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=120)
+    args = parser.parse_args()
+    with bench_database():
+        seed(args.users, args.days)
+        t0 = time.perf_counter()
+        written = leaderboards.refresh()
+        print(f'--- {UserDailyActivity.objects.count()} rollup rows, boards {written} '
+              f'(refresh {time.perf_counter() - t0:.2f} s) ---')
+
+        today = _today_uzt()
+        users = list(User.objects.all())
+        rng = random.Random(1)
+        for board, days in leaderboards.WINDOWS.items():
+            since = today - timedelta(days=days) if days else None
+            report(f'{board}: aggregate rollup', *timed(lambda: live(since, rng.choice(users).id), repeat=10))
+            report(f'{board}: materialized board', *timed(lambda: materialized(board, rng.choice(users))))
+        report('refresh all boards', *timed(leaderboards.refresh, repeat=3, warmup=0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Markdown on the lesson page: building a pipeline per call (the old
+render_markdown) vs the thread-local renderer vs reading the stored HTML.
+
+    python benchmarks/bench_markdown.py
+"""
+import bleach
+import markdown
+from _bootstrap import report, timed
+
+from learning.models import Lesson
+from learning.utils import (
+    _ALLOWED_ATTRS, _ALLOWED_PROTOCOLS, _ALLOWED_TAGS, refresh_rendered, render_markdown,
+    rendered_html,
+)
+
+SECTION = """## Bo'lim {n}
+
+Bu **maqola** darsining matni: [havola](https://example.com/{n}) va `kod` bilan.
+
+- birinchi band
+- ikkinchi band
+
+```python
+def f(x):
+    return x * {n}
+```
+
+| ustun | qiymat |
+|-------|--------|
+| a     | {n}    |
+"""
+
+
+def old_render(text):
+    """The previous implementation, verbatim."""
+    html = markdown.markdown(text, extensions=['fenced_code', 'tables', 'nl2br'])
+    return bleach.clean(html, tags=_ALLOWED_TAGS, attributes=_ALLOWED_ATTRS,
+                        protocols=_ALLOWED_PROTOCOLS, strip=True)
+
+
+def main():
+    short = 'Kurs haqida **qisqa** tavsif.'
+    article = '\n'.join(SECTION.format(n=n) for n in range(60))
+    print(f'--- article: {len(article) / 1024:.0f} KiB of Markdown ---')
+    for label, text in (('short description', short), ('article', article)):
+        report(f'{label}: new pipeline per call', *timed(lambda: old_render(text), repeat=50))
+        report(f'{label}: thread-local renderer', *timed(lambda: render_markdown(text), repeat=50))
+        lesson = Lesson(description='', content=text)
+        refresh_rendered(lesson)
+        report(f'{label}: stored HTML (key check)',
+               *timed(lambda: rendered_html(lesson, 'content'), repeat=500))
+
+
+if __name__ == '__main__':
+    main()
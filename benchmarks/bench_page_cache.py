@@ -0,0 +1,51 @@
+"""Anonymous page cache: the full view (cache off) vs a cached copy, for the
+home page, the catalog and a course page.
+
+    python benchmarks/bench_page_cache.py
+"""
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from learning.models import Category, Course, CourseReview, Lesson, Module
+
+
+def seed():
+    category = Category.objects.create(name='Bench', slug='bench')
+    courses = [
+        Course.objects.create(title=f'Kurs {i}', slug=f'kurs-{i}', status='published', category=category,
+                              is_featured=i < 6, description='Matn ' * 200)
+        for i in range(60)
+    ]
+    for j in range(8):
+        module = Module.objects.create(title=f'Modul {j}', slug=f'modul-{j}', course=courses[0], order=j)
+        Lesson.objects.bulk_create(
+            Lesson(title=f'Dars {k}', slug=f'dars-{k}', module=module, order=k, duration_seconds=600)
+            for k in range(10)
+        )
+    for i in range(20):
+        CourseReview.objects.create(user=User.objects.create_user(f'u{i}'), course=courses[0],
+                                    rating=i % 5 + 1, comment="Zo'r kurs " * 10)
+
+
+def main():
+    with bench_database():
+        seed()
+        client = Client()
+        pages = {
+            'home': reverse('home'),
+            'catalog page 2': reverse('learning:course_list') + '?sahifa=2&saralash=new',
+            'course page': reverse('learning:course_detail', args=['kurs-0']),
+        }
+        for label, url in pages.items():
+            with override_settings(PAGE_CACHE_TTL=0):
+                report(f'{label}: rendered', *timed(lambda: client.get(url), repeat=50, warmup=5))
+            client.get(url)
+            report(f'{label}: page cache hit', *timed(lambda: client.get(url), repeat=200, warmup=10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Storing multi_select answers: the old join table (`selected_choices.set()`:
+read the current rows, delete the dropped ones, insert the new ones) vs the
+integer array written with the answer upsert. Also compares on-disk size.
+
+    python benchmarks/bench_quiz_array.py [--answers 20000]
+"""
+import argparse
+import random
+
+from _bootstrap import bench_database, report, timed
+from bench_quiz_grading import seed
+
+from django.db import connection, transaction
+
+from learning.models import QuizAnswer, QuizAttempt
+
+SCRATCH = 'bench_answer_choices'
+
+
+def upsert(attempt, question, ids, with_array):
+    answer, = QuizAnswer.objects.bulk_create(
+        [QuizAnswer(attempt=attempt, question_id=question.id, is_correct=False,
+                    selected_choice_ids=sorted(ids) if with_array else [])],
+        update_conflicts=True, unique_fields=['attempt', 'question'],
+        update_fields=['selected_choice_ids', 'is_correct'],
+    )
+    return answer
+
+
+def join_table_set(answer_id, ids):
+    """What ManyRelatedManager.set() issued against the through table."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT choice_id FROM {SCRATCH} WHERE answer_id = %s', [answer_id])
+        current = {row[0] for row in cursor.fetchall()}
+        if current - ids:
+            cursor.execute(f'DELETE FROM {SCRATCH} WHERE answer_id = %s AND choice_id = ANY(%s)',
+                           [answer_id, list(current - ids)])
+        if ids - current:
+            cursor.execute(f'INSERT INTO {SCRATCH} (answer_id, choice_id) SELECT %s, unnest(%s::int[])',
+                           [answer_id, list(ids - current)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--answers', type=int, default=20000)
+    args = parser.parse_args()
+    with bench_database():
+        user, quiz, _, questions = seed(20, 6)
+        multi = [q for q in questions if q.question_type == 'multi_select']
+        choices = {q.id: list(q.choices.values_list('id', flat=True)) for q in multi}
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE {SCRATCH} (
+                    id bigserial PRIMARY KEY, answer_id bigint NOT NULL, choice_id integer NOT NULL,
+                    UNIQUE (answer_id, choice_id)
+                )""")
+            cursor.execute(f'CREATE INDEX ON {SCRATCH} (choice_id)')
+        rng = random.Random(1)
+        attempts = QuizAttempt.objects.bulk_create(
+            QuizAttempt(user=user, quiz=quiz) for _ in range(args.answers // len(multi) + 1)
+        )
+
+        def pick(q):
+            return set(rng.sample(choices[q.id], rng.randint(1, 3)))
+
+        def via_join_table():
+            q = rng.choice(multi)
+            with transaction.atomic():
+                answer = upsert(rng.choice(attempts), q, set(), with_array=False)
+                join_table_set(answer.id, pick(q))
+
+        def via_array():
+            q = rng.choice(multi)
+            with transaction.atomic():
+                upsert(rng.choice(attempts), q, pick(q), with_array=True)
+
+        report('answer + join table set()', *timed(via_join_table, repeat=300))
+        report('answer with array column', *timed(via_array, repeat=300))
+
+        # Storage once every attempt answered every multi_select question.
+        QuizAnswer.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {SCRATCH}')
+        rows = [QuizAnswer(attempt=a, question_id=q.id, selected_choice_ids=sorted(pick(q)))
+                for a in attempts for q in multi][:args.answers]
+        QuizAnswer.objects.bulk_create(rows, batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {SCRATCH} (answer_id, choice_id)
+                SELECT id, unnest(selected_choice_ids) FROM learning_quizanswer
+            """)
+            cursor.execute(f"VACUUM ANALYZE {SCRATCH}")
+            cursor.execute('VACUUM ANALYZE learning_quizanswer')
+            cursor.execute(f"SELECT pg_total_relation_size('{SCRATCH}')")
+            join_bytes = cursor.fetchone()[0]
+            cursor.execute('SELECT sum(pg_column_size(selected_choice_ids)) FROM learning_quizanswer')
+            array_bytes = cursor.fetchone()[0]
+        print(f'--- {len(rows)} multi_select answers: join table {join_bytes / 1024:.0f} KiB '
+              f'(with indexes) vs arrays {array_bytes / 1024:.0f} KiB in the answer rows ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Grading one quiz question (check_quiz_answer): with the answer key warm in
+the process, fetched from the shared cache, and compiled from scratch.
+
+    python benchmarks/bench_quiz_grading.py [--questions 20] [--choices 4]
+"""
+import argparse
+import json
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from learning import quiz_keys
+from learning.models import Course, Lesson, Module, Quiz, QuizAttempt, QuizChoice, QuizQuestion
+
+
+def seed(n_questions, n_choices):
+    course = Course.objects.create(title='K', slug='k', status='published')
+    module = Module.objects.create(title='M', slug='m', course=course)
+    lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz')
+    quiz = Quiz.objects.create(lesson=lesson, title='T')
+    questions = QuizQuestion.objects.bulk_create(
+        QuizQuestion(quiz=quiz, text=f'Savol {i}', order=i, explanation='Izoh',
+                     question_type='multi_select' if i % 2 else 'multiple_choice')
+        for i in range(n_questions)
+    )
+    QuizChoice.objects.bulk_create(
+        QuizChoice(question=q, text=f'Javob {j}', order=j, is_correct=j in (0, 1 if q.question_type == 'multi_select' else 0))
+        for q in questions for j in range(n_choices)
+    )
+    user = User.objects.create_user('bench', password='bench-pw-123')
+    attempt = QuizAttempt.objects.create(user=user, quiz=quiz, max_score=n_questions)
+    return user, quiz, attempt, questions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--choices', type=int, default=4)
+    args = parser.parse_args()
+    with bench_database():
+        user, quiz, attempt, questions = seed(args.questions, args.choices)
+        client = Client()
+        client.force_login(user)
+        url = reverse('learning:check_quiz_answer', args=['k', 'm', 't', quiz.id, attempt.id])
+        choices = {q.id: list(q.choices.values_list('id', flat=True)) for q in questions}
+        # Answer all but the last question so no request finalizes the attempt.
+        bodies = {
+            'single choice': json.dumps({'question_id': questions[0].id, 'choice_id': choices[questions[0].id][1]}),
+            'multi_select': json.dumps({'question_id': questions[1].id, 'choice_ids': choices[questions[1].id][:2]}),
+        }
+
+        for label, body in bodies.items():
+            def post():
+                return client.post(url, body, content_type='application/json')
+
+            def shared_cache():
+                quiz_keys._keys.clear()
+                post()
+
+            def cold():
+                quiz_keys._keys.clear()
+                quiz_keys.cache.clear()
+                post()
+
+            post()
+            with CaptureQueriesContext(connection) as queries:
+                post()
+            print(f'--- {label}: {len(queries)} queries with a warm key ---')
+            report(f'{label}: key warm in process', *timed(post))
+            report(f'{label}: key from shared (DB) cache', *timed(shared_cache))
+            report(f'{label}: key compiled', *timed(cold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""A quiz-type lesson page for a user with a long attempt history, and
+rebuilding the per-user quiz summaries from QuizAttempt.
+
+    python benchmarks/bench_quiz_stats.py [--quizzes 5] [--attempts 200] [--users 2000]
+"""
+import argparse
+from datetime import timedelta
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from learning import quiz_stats
+from learning.models import Course, Lesson, Module, Quiz, QuizAttempt, QuizChoice, QuizQuestion
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quizzes', type=int, default=5)
+    parser.add_argument('--attempts', type=int, default=200, help='finished attempts per quiz for the page user')
+    parser.add_argument('--users', type=int, default=2000, help='other users with attempts, for the rebuild')
+    args = parser.parse_args()
+    with bench_database():
+        course = Course.objects.create(title='K', slug='k', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course)
+        lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz')
+        quizzes = []
+        for i in range(args.quizzes):
+            quiz = Quiz.objects.create(lesson=lesson, title=f'Test {i}', max_attempts=args.attempts + 10)
+            questions = QuizQuestion.objects.bulk_create(
+                QuizQuestion(quiz=quiz, text=f'Savol {j}', order=j) for j in range(10)
+            )
+            QuizChoice.objects.bulk_create(
+                QuizChoice(question=q, text=f'Javob {k}', order=k, is_correct=k == 0)
+                for q in questions for k in range(4)
+            )
+            quizzes.append(quiz)
+        user = User.objects.create_user('bench', password='bench-pw-123')
+        others = User.objects.bulk_create(User(username=f'u{i}') for i in range(args.users))
+        now = timezone.now()
+        attempts = [
+            QuizAttempt(user=user, quiz=quiz, score=n % 11, max_score=10,
+                        started_at=now - timedelta(minutes=n), completed_at=now - timedelta(minutes=n))
+            for quiz in quizzes for n in range(args.attempts)
+        ]
+        attempts += [
+            QuizAttempt(user=other, quiz=quiz, score=(other.id + n) % 11, max_score=10,
+                        completed_at=now if n else None)
+            for other in others for quiz in quizzes[:2] for n in range(3)
+        ]
+        QuizAttempt.objects.bulk_create(attempts, batch_size=5000)
+        print(f'--- {len(attempts)} attempts ---')
+        report('rebuild_quiz_stats (all users)', *timed(quiz_stats.rebuild, repeat=5, warmup=1))
+
+        client = Client()
+        client.force_login(user)
+        url = reverse('learning:lesson_detail', args=['k', 'm', 't'])
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        print(f'--- lesson page, {args.quizzes} quizzes x {args.attempts} attempts: {len(queries)} queries ---')
+        report('lesson_detail (quiz lesson)', *timed(lambda: client.get(url), repeat=30, warmup=3))
+
+
+if __name__ == '__main__':
+    main()
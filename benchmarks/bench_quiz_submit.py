@@ -0,0 +1,59 @@
+"""Taking a whole quiz: one check_quiz_answer POST per question vs a single
+submit_quiz POST with the answer sheet.
+
+    python benchmarks/bench_quiz_submit.py [--questions 30]
+"""
+import argparse
+import json
+
+from _bootstrap import bench_database, report, timed
+from bench_quiz_grading import seed
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from learning.models import LessonProgress, QuizAttempt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=30)
+    args = parser.parse_args()
+    with bench_database():
+        user, quiz, _, questions = seed(args.questions, 4)
+        client = Client()
+        client.force_login(user)
+        sheet = []
+        for q in questions:
+            ids = list(q.choices.values_list('id', flat=True))
+            sheet.append({'question_id': q.id, 'choice_ids': ids[:2]} if q.question_type == 'multi_select'
+                         else {'question_id': q.id, 'choice_id': ids[0]})
+
+        def fresh_attempt():
+            QuizAttempt.objects.all().delete()
+            LessonProgress.objects.all().delete()
+            return QuizAttempt.objects.create(user=user, quiz=quiz, max_score=len(questions)).id
+
+        def per_question():
+            attempt_id = fresh_attempt()
+            url = reverse('learning:check_quiz_answer', args=['k', 'm', 't', quiz.id, attempt_id])
+            for entry in sheet:
+                client.post(url, json.dumps(entry), content_type='application/json')
+
+        def submit_all():
+            attempt_id = fresh_attempt()
+            url = reverse('learning:submit_quiz', args=['k', 'm', 't', quiz.id, attempt_id])
+            client.post(url, json.dumps({'answers': sheet}), content_type='application/json')
+
+        for label, fn in ((f'{len(sheet)} x check_quiz_answer', per_question), ('1 x submit_quiz', submit_all)):
+            fn()
+            with CaptureQueriesContext(connection) as queries:
+                fn()
+            print(f'--- {label}: {len(queries)} queries (incl. resetting the attempt) ---')
+            report(label, *timed(fn, repeat=10, warmup=1))
+
+
+if __name__ == '__main__':
+    main()
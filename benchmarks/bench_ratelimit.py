@@ -0,0 +1,81 @@
+"""Per-check cost of the rate limiter: the old DatabaseCache fixed window vs
+the shared-memory backend (single process, then N processes on one key).
+
+    python benchmarks/bench_ratelimit.py [--workers 4]
+"""
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+
+from _bootstrap import bench_database, report, timed
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test.utils import override_settings
+
+from users.ratelimit import ALGORITHMS, RateLimiter, SharedMemoryBackend
+
+DB_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'cache_table',
+}}
+
+
+def db_cache_check(ip, max_requests=60, window=60, prefix='check'):
+    """The previous implementation, verbatim."""
+    cache = caches['default']
+    key = f'rl:{prefix}:{ip}'
+    cache.add(key, 0, window)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, window)
+        count = 1
+    return count > max_requests
+
+
+def _worker(path, checks, out):
+    limiter = RateLimiter(SharedMemoryBackend(path))
+    t0 = time.perf_counter()
+    allowed = sum(limiter.hit('rl:check:10.0.0.1', 1000, 3600) for _ in range(checks))
+    out.put((allowed, (time.perf_counter() - t0) / checks * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    workers = parser.parse_args().workers
+    rng = random.Random(1)
+    ips = [f'10.0.{i // 256}.{i % 256}' for i in range(5000)]
+
+    with bench_database(), override_settings(CACHES=DB_CACHE):
+        call_command('createcachetable', verbosity=0)
+        report('DatabaseCache fixed window', *timed(lambda: db_cache_check(rng.choice(ips)), repeat=500))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f'{tmp}/ratelimit.bin'
+        for name in ALGORITHMS:
+            limiter = RateLimiter(SharedMemoryBackend(path), name)
+            report(f'shared memory, {name}',
+                   *timed(lambda: limiter.hit(f'rl:check:{rng.choice(ips)}', 60, 60), repeat=5000))
+
+        # Contention: every process hammers the same key (same bucket lock).
+        checks = 2000
+        out = multiprocessing.get_context('fork').Queue()
+        procs = [multiprocessing.get_context('fork').Process(target=_worker, args=(path, checks, out))
+                 for _ in range(workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        results = [out.get() for _ in procs]
+        allowed = sum(a for a, _ in results)
+        mean_ms = sum(ms for _, ms in results) / len(results)
+        print(f'{workers} processes x {checks} checks on one key (limit 1000): '
+              f'{allowed} allowed, {mean_ms:.4f} ms/check')
+
+
+if __name__ == '__main__':
+    main()
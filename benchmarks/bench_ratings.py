@@ -0,0 +1,54 @@
+"""Course ratings on a course with many reviews: editing one review (signal
+deltas vs the old full re-aggregate), the course page, and reconcile_ratings.
+
+    python benchmarks/bench_ratings.py [--reviews 50000]
+"""
+import argparse
+from itertools import cycle
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.auth.models import User
+from django.db.models import Avg, Count
+from django.test import Client
+from django.urls import reverse
+
+from learning import ratings
+from learning.models import Course, CourseReview
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reviews', type=int, default=50000)
+    args = parser.parse_args()
+    with bench_database():
+        course = Course.objects.create(title='K', slug='k', status='published')
+        users = User.objects.bulk_create(User(username=f'u{i}') for i in range(args.reviews))
+        CourseReview.objects.bulk_create(
+            (CourseReview(user=u, course=course, rating=r) for u, r in zip(users, cycle((5, 4, 4, 3, 5, 1, 2)))),
+            batch_size=5000,
+        )
+        report('reconcile_ratings', *timed(ratings.rebuild, repeat=5, warmup=1))
+
+        review = CourseReview.objects.filter(course=course).first()
+        stars = cycle((1, 2, 3, 4, 5))
+
+        def edit():
+            review.rating = next(stars)
+            review.save()
+
+        def old_aggregate():
+            # What each review save used to add, twice via submit_review.
+            course.reviews.aggregate(avg=Avg('rating'), c=Count('id'))
+            course.reviews.values('rating').annotate(c=Count('id'))
+
+        report(f'edit a review ({args.reviews} reviews)', *timed(edit, repeat=50, warmup=5))
+        report('  old per-save aggregate + histogram', *timed(old_aggregate, repeat=20, warmup=2))
+
+        client = Client()
+        url = reverse('learning:course_detail', args=['k'])
+        report('course_detail (anonymous)', *timed(lambda: client.get(url), repeat=30, warmup=3))
+
+
+if __name__ == '__main__':
+    main()
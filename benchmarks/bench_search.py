@@ -0,0 +1,80 @@
+"""Lesson search: the old `icontains` scan vs the GIN-indexed search vectors.
+
+    python benchmarks/bench_search.py [--courses 1000]
+"""
+import argparse
+import random
+
+from _bootstrap import bench_database, report, timed
+
+from django.db import connection
+from django.db.models import Q
+
+from learning.models import Course, Lesson, Module
+from learning.search import search
+
+WORDS = ['python', 'dasturlash', "o'zbek", 'tili', 'matematika', 'algebra', 'fizika',
+         'kimyo', 'tarix', 'ingliz', 'grammatika', 'funksiya', 'massiv', 'tenglama',
+         'maʼlumotlar', 'bazasi', 'veb', 'sahifa', 'dizayn', 'loyiha']
+QUERIES = ['python', 'oʻzbek tili', 'tenglama', 'maʼlumot', 'grammatika ingliz']
+
+
+def seed(n_courses, modules=10, lessons=10):
+    rng = random.Random(1)
+    # Filler vocabulary so each topic word appears in a few percent of lessons.
+    syllables = ['ka', 'lo', 'mi', 'ra', 'tu', 'se', 'bo', 'na', 'zi', 'qo', 'ya', 'sh']
+    filler = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(5000)})
+
+    def text(n):
+        return ' '.join(rng.choice(WORDS) if rng.random() < 0.03 else rng.choice(filler)
+                        for _ in range(n))
+
+    courses = Course.objects.bulk_create(
+        Course(title=text(3), slug=f'kurs-{i}', description=text(40), status='published')
+        for i in range(n_courses)
+    )
+    mods = Module.objects.bulk_create(
+        Module(title=f'Modul {j}', slug=f'modul-{j}', course=c, order=j)
+        for c in courses for j in range(modules)
+    )
+    Lesson.objects.bulk_create(
+        (Lesson(title=text(4), slug=f'dars-{k}', module=m, order=k, youtube_video_id='x',
+                description=text(30))
+         for m in mods for k in range(lessons)),
+        batch_size=5000,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE learning_lesson')
+
+
+def icontains(q):
+    return list(
+        Lesson.objects.filter(
+            Q(title__icontains=q) | Q(description__icontains=q),
+            module__course__status='published',
+        ).select_related('module__course')[:20]
+    )
+
+
+def full_text(q):
+    return list(
+        search(Lesson.objects.filter(module__course__status='published'), q)
+        .select_related('module__course')
+        .order_by('-rank', 'module__course__order', 'module__order', 'order')[:20]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=1000)
+    n = parser.parse_args().courses
+    with bench_database():
+        seed(n)
+        print(f'--- {Lesson.objects.count()} lessons ---')
+        for q in QUERIES:
+            report(f'icontains    {q!r}', *timed(lambda: icontains(q), repeat=20))
+            report(f'full text    {q!r}', *timed(lambda: full_text(q), repeat=20))
+
+
+if __name__ == '__main__':
+    main()
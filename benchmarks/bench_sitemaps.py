@@ -0,0 +1,64 @@
+"""Sitemaps: rendering django.contrib.sitemaps' view per crawler hit (the old
+/sitemap.xml) vs serving the pre-generated files, a 304 revalidation, and the
+cost of one full regeneration.
+
+    python benchmarks/bench_sitemaps.py [--courses 300]
+"""
+import argparse
+import tempfile
+
+from _bootstrap import bench_database, report, timed
+
+from django.contrib.sitemaps.views import sitemap
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+
+from learning import sitemaps
+from learning.models import Course, Lesson, Module
+
+
+def seed(n_courses, modules=6, lessons=8):
+    courses = Course.objects.bulk_create(
+        Course(title=f'Kurs {i}', slug=f'kurs-{i}', status='published') for i in range(n_courses)
+    )
+    mods = Module.objects.bulk_create(
+        Module(title=f'Modul {j}', slug=f'modul-{j}', course=c, order=j)
+        for c in courses for j in range(modules)
+    )
+    Lesson.objects.bulk_create(
+        Lesson(title=f'Dars {k}', slug=f'dars-{k}', module=m, order=k, youtube_video_id=f'v{m.id}x{k}',
+               duration_seconds=600)
+        for m in mods for k in range(lessons)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=300)
+    n = parser.parse_args().courses
+    with bench_database(), tempfile.TemporaryDirectory() as out, override_settings(SITEMAP_DIR=out):
+        seed(n)
+        totals = sitemaps.build()
+        print(f"--- {n} courses: {totals['urls']} URLs in {totals['files']} files ---")
+
+        # The old view knew no lessons; courses alone were rendered per hit.
+        old = {name: sitemaps.SITEMAPS[name] for name in ('static', 'courses', 'categories', 'paths', 'instructors')}
+        factory = RequestFactory()
+        report('old: contrib view, every hit', *timed(
+            lambda: sitemap(factory.get('/sitemap.xml'), sitemaps=old).render(), repeat=20, warmup=2))
+
+        client = Client()
+
+        def serve(url):
+            b''.join(client.get(url).streaming_content)
+
+        report('new: index file', *timed(lambda: serve('/sitemap.xml'), repeat=200, warmup=10))
+        report('new: lessons page file', *timed(lambda: serve('/sitemap-lessons-1.xml'), repeat=50, warmup=5))
+        etag = client.get('/sitemap-lessons-1.xml')['ETag']
+        report('new: If-None-Match -> 304', *timed(
+            lambda: client.get('/sitemap-lessons-1.xml', HTTP_IF_NONE_MATCH=etag), repeat=200, warmup=10))
+        report('regenerate everything (unchanged)', *timed(sitemaps.build, repeat=3, warmup=1))
+
+
+if __name__ == '__main__':
+    main()
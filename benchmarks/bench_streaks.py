@@ -0,0 +1,80 @@
+"""Streak recomputation: replaying `_update_streak` per activity day vs the
+bulk run-length pass over streamed LessonView days.
+
+    python benchmarks/bench_streaks.py [--users 20000] [--days 90] [--replay-users 200]
+"""
+import argparse
+import time
+from unittest import mock
+
+from _bootstrap import bench_database, report
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from learning import streaks
+from learning.models import Course, Lesson, LessonView, Module
+from learning.views import _today_uzt, _update_streak
+from users.models import UserProfile
+
+
+def seed(n_users, days):
+    """Each user is active on roughly two days in three, two lessons a day."""
+    course = Course.objects.create(title='K', slug='k', status='published')
+    module = Module.objects.create(title='M', slug='m', course=course)
+    Lesson.objects.bulk_create(Lesson(title=f'L{i}', slug=f'l{i}', module=module, order=i) for i in range(2))
+    User.objects.bulk_create(User(username=f'u{i}') for i in range(n_users))
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO learning_lessonview (user_id, lesson_id, viewed_on, first_seen_at)
+            SELECT u.id, l.id, %s::date - g.n, now()
+            FROM auth_user u
+            CROSS JOIN generate_series(0, %s) AS g(n)
+            CROSS JOIN learning_lesson l
+            WHERE (u.id * 7 + g.n * g.n) %% 3 <> 0
+        """, [_today_uzt(), days - 1])
+        cursor.execute('ANALYZE learning_lessonview')
+
+
+def replay(user_ids):
+    """The row-by-row alternative: one locked profile update per active day."""
+    for user_id in user_ids:
+        user = User(id=user_id)
+        days = LessonView.objects.filter(user_id=user_id).values_list('viewed_on', flat=True).distinct()
+        for day in sorted(days):
+            with mock.patch('learning.views._today_uzt', return_value=day):
+                _update_streak(user)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--replay-users', type=int, default=200)
+    args = parser.parse_args()
+    with bench_database():
+        seed(args.users, args.days)
+        print(f'--- {LessonView.objects.count()} lesson views, {args.users} users ---')
+
+        sample = list(User.objects.order_by('id').values_list('id', flat=True)[:args.replay_users])
+        t0 = time.perf_counter()
+        replay(sample)
+        per_user = (time.perf_counter() - t0) / len(sample) * 1000
+        report(f'replay _update_streak, per user (x{len(sample)})', per_user, per_user)
+        print(f'    → {args.users} users ≈ {per_user * args.users / 1000:.0f} s')
+        UserProfile.objects.all().delete()
+
+        def bulk(label, **kwargs):
+            t0 = time.perf_counter()
+            totals = streaks.recompute(**kwargs)
+            elapsed = time.perf_counter() - t0
+            print(f'{label:<48} {elapsed:8.2f} s   {totals["users"] / elapsed:8.0f} users/s   {totals}')
+
+        bulk('bulk recompute (creates every profile)')
+        bulk('bulk recompute dry run (nothing differs)', dry_run=True)
+        UserProfile.objects.update(current_streak=0)
+        bulk('bulk recompute (every profile drifted)')
+
+
+if __name__ == '__main__':
+    main()
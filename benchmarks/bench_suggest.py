@@ -0,0 +1,93 @@
+"""Navbar suggestions: SearchView `format=json` vs the mapped index file.
+
+    python benchmarks/bench_suggest.py [--courses 1000]
+"""
+import argparse
+import random
+import time
+
+from _bootstrap import bench_database, report, timed
+
+from django.test import Client
+
+from learning.catalog import get_catalog, rebuild_catalog
+from learning.models import Course, Lesson, Module
+from learning.suggest import build_index_bytes, get_index
+
+WORDS = ['python', 'dasturlash', "o'zbek", 'tili', 'matematika', 'algebra', 'fizika',
+         'kimyo', 'tarix', 'ingliz', 'grammatika', 'funksiya', 'massiv', 'tenglama',
+         'maʼlumotlar', 'bazasi', 'veb', 'sahifa', 'dizayn', 'loyiha']
+
+
+def seed(n_courses, modules=10, lessons=10):
+    rng = random.Random(1)
+    syllables = ['ka', 'lo', 'mi', 'ra', 'tu', 'se', 'bo', 'na', 'zi', 'qo', 'ya', 'sh']
+    filler = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(5000)})
+
+    def title(n):
+        return ' '.join(rng.choice(WORDS) if rng.random() < 0.2 else rng.choice(filler)
+                        for _ in range(n)).capitalize()
+
+    courses = Course.objects.bulk_create(
+        Course(title=title(3), slug=f'kurs-{i}', status='published') for i in range(n_courses)
+    )
+    mods = Module.objects.bulk_create(
+        Module(title=f'Modul {j}', slug=f'modul-{j}', course=c, order=j)
+        for c in courses for j in range(modules)
+    )
+    Lesson.objects.bulk_create(
+        (Lesson(title=title(4), slug=f'dars-{k}', module=m, order=k, youtube_video_id='x')
+         for m in mods for k in range(lessons)),
+        batch_size=5000,
+    )
+    return filler
+
+
+def queries(filler, n=2000):
+    """What a debounced search box sends: 2+ character prefixes, a few with a typo."""
+    rng = random.Random(2)
+    out = []
+    for _ in range(n):
+        word = rng.choice(WORDS + filler).replace("'", '')
+        q = word[:rng.randint(2, len(word))]
+        if len(q) > 4 and rng.random() < 0.2:
+            i = rng.randrange(1, len(q) - 1)
+            q = q[:i] + q[i + 1:]  # dropped letter
+        out.append(q)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=1000)
+    n = parser.parse_args().courses
+    with bench_database():
+        filler = seed(n)
+        rebuild_catalog()
+        t0 = time.perf_counter()
+        size = len(build_index_bytes(get_catalog()))
+        print(f'--- {Lesson.objects.count()} lessons; index build '
+              f'{(time.perf_counter() - t0) * 1000:.0f} ms, {size} bytes ---')
+
+        rng = random.Random(3)
+        qs = queries(filler)
+        client = Client()
+        report('SearchView ?format=json',
+               *timed(lambda: client.get('/malaka/qidiruv/', {'q': rng.choice(qs), 'format': 'json'}),
+                      repeat=50))
+
+        index = get_index()
+        samples = []
+        for q in qs:
+            t0 = time.perf_counter()
+            index.suggest(q)
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        print(f'{"index.suggest":<48} median {samples[len(samples) // 2]:8.3f} ms   '
+              f'p99 {samples[int(len(samples) * 0.99) - 1]:8.3f} ms   max {samples[-1]:8.3f} ms')
+        report('suggest endpoint (full request)',
+               *timed(lambda: client.get('/malaka/qidiruv/taklif/', {'q': rng.choice(qs)}), repeat=500))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Course thumbnails: get_thumbnail_url before (first-lesson lookup) and after
+(stored source), building the variants of an upload, and the bytes a card
+downloads for the original vs the 320px / 480px WebP variants.
+
+    python benchmarks/bench_thumbnails.py
+"""
+import tempfile
+from io import BytesIO
+
+from _bootstrap import bench_database, report, timed
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.test.utils import override_settings
+from PIL import Image, ImageDraw
+
+from learning import thumbnails
+from learning.models import Course, Lesson, Module
+
+
+def _photo(width, height):
+    # Something with detail, so encoders can't cheat on a flat fill.
+    image = Image.new('RGB', (width, height), '#065F46')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, width, 24):
+        draw.line((i, 0, width - i, height), fill=(i % 255, (i * 3) % 255, 180), width=9)
+    out = BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+
+def main():
+    with bench_database(), tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+        course = Course.objects.create(title='Kurs', slug='k', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=1)
+        for i in range(20):
+            Lesson.objects.create(title=f'L{i}', slug=f'l{i}', module=module, order=i, youtube_video_id=f'v{i}')
+
+        def first_lesson_lookup():
+            # What get_thumbnail_url did per call before the source was stored.
+            lesson = Lesson.objects.filter(module__course=course).order_by('module__order', 'order').first()
+            return thumbnails.youtube_url(lesson.youtube_video_id)
+
+        report('thumbnail url: first-lesson query', *timed(first_lesson_lookup, repeat=200, warmup=10))
+        course.refresh_from_db()
+        report('thumbnail url: stored source', *timed(course.get_thumbnail_url, repeat=200, warmup=10))
+
+        course.thumbnail = SimpleUploadedFile('cover.png', _photo(1920, 1080), content_type='image/png')
+        course.save()
+
+        def rebuild():
+            Course.objects.filter(pk=course.pk).update(thumbnail_key='')
+            thumbnails.build([course.pk])
+
+        report('build variants (1920x1080 upload)', *timed(rebuild, repeat=5, warmup=1))
+
+        course.refresh_from_db()
+        original = course.thumbnail.size
+        print(f'{"bytes: original upload":<44} {original:>9,}')
+        for width in thumbnails.WIDTHS[:2]:
+            for fmt in thumbnails.FORMATS:
+                name = thumbnails._variant(course.thumbnail_key, width, fmt)
+                size = default_storage.size(name)
+                print(f'{f"bytes: {width}w {fmt}":<44} {size:>9,}  ({size / original:.1%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Serving through this entry point (e.g. ``gunicorn -k uvicorn.workers.UvicornWorker
+config.asgi``) lets the login page long-poll ``/api/auth/wait/<token>/`` on the
+event loop; set LOGIN_PUSH=True in the environment to switch it on.
 """
 
 import os
@@ -17,6 +17,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sitemaps',
+    'django.contrib.postgres',
     # local
     'users.apps.UsersConfig',
     'learning.apps.LearningConfig',
@@ -27,7 +28,8 @@ if DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.WhiteNoiseMiddleware',
+    'learning.page_cache.PageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,12 +68,15 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Full-text search normalization (learning/search.py) needs a UTF8
+        # database; don't inherit whatever template1 of a dev cluster uses.
+        'TEST': {'CHARSET': 'UTF8', 'TEMPLATE': 'template0'},
     }
 }
 
 # --- Cache ---
-# DB-backed cache so the rate limiter is shared across Gunicorn workers and
-# survives restarts (the default LocMemCache is per-process). Requires the
+# DB-backed cache so cached pages/snapshots are shared across Gunicorn workers
+# and survive restarts (the default LocMemCache is per-process). Requires the
 # cache table to exist: `python manage.py createcachetable` (run on deploy).
 CACHES = {
     'default': {
@@ -80,6 +85,34 @@ CACHES = {
     }
 }
 
+# --- Catalog snapshot ---
+# Directory for the memory-mapped course outline (learning/catalog.py). Must be
+# writable by, and shared between, all Gunicorn workers on the host.
+CATALOG_SNAPSHOT_DIR = config('CATALOG_SNAPSHOT_DIR', default=str(BASE_DIR / 'var'))
+
+# --- Sitemaps ---
+# Pre-generated sitemap files (learning/sitemaps.py), one subdirectory per
+# database. Shared by all workers; nginx may also serve them directly.
+SITEMAP_DIR = config('SITEMAP_DIR', default=str(BASE_DIR / 'var' / 'sitemaps'))
+
+# --- Anonymous page cache ---
+# learning/page_cache.py: seconds a cookie-free visitor's page is kept at most
+# (content edits purge it sooner); 0 turns the cache off.
+PAGE_CACHE_TTL = config('PAGE_CACHE_TTL', default=600, cast=int)
+
+# --- Rate limiting ---
+# users/ratelimit.py. The shared-memory backend keeps counters in an mmap'd
+# file that all Gunicorn workers on the host share; switch BACKEND to
+# 'users.ratelimit.CacheBackend' (pointed at Redis/Memcached) to share limits
+# across hosts. ALGORITHM is 'sliding_window' or 'token_bucket'.
+RATE_LIMIT = {
+    'BACKEND': 'users.ratelimit.SharedMemoryBackend',
+    'ALGORITHM': config('RATE_LIMIT_ALGORITHM', default='sliding_window'),
+    'OPTIONS': {
+        'path': config('RATE_LIMIT_FILE', default=str(BASE_DIR / 'var' / 'ratelimit.bin')),
+    },
+}
+
 # --- Password validators ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -110,6 +143,10 @@ STORAGES = {
 # --- Media files ---
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Certificate / social card images (learning/cards.py) are cached under
+# MEDIA_ROOT/cards. CARDS_FONT: a TrueType font with Uzbek Latin glyphs; empty
+# uses the font bundled with Pillow.
+CARDS_FONT = config('CARDS_FONT', default='')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -147,7 +184,16 @@ LOGOUT_REDIRECT_URL = '/users/login/'
 
 # --- YouTube API ---
 YOUTUBE_API_KEY = config('YOUTUBE_API_KEY', default='')
+# Frame used as a course's thumbnail when none is uploaded (learning/thumbnails.py).
+YOUTUBE_THUMBNAIL_URL = config(
+    'YOUTUBE_THUMBNAIL_URL', default='https://img.youtube.com/vi/{video_id}/hqdefault.jpg',
+)
 
 # --- Telegram Bot ---
 BOT_SECRET = config('BOT_SECRET')
 TELEGRAM_BOT_USERNAME = config('TELEGRAM_BOT_USERNAME', default='ochiqkurs_bot')
+# Long-poll login confirmation (users/login_push.py). Only enable when served
+# through config/asgi.py (e.g. gunicorn -k uvicorn.workers.UvicornWorker): under
+# WSGI every waiting browser would hold a whole sync worker.
+LOGIN_PUSH = config('LOGIN_PUSH', default=False, cast=bool)
+LOGIN_WAIT_TIMEOUT = 25  # seconds; below typical proxy read timeouts
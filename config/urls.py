@@ -1,13 +1,11 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
 from django.http import HttpResponse
 from django.urls import path, include
-from learning.sitemaps import SITEMAPS
-from learning.views import HomeView
+from learning.views import HomeView, sitemap_file
 from users.views import (
-    TelegramConfirmView, CheckTokenView, IssueCodeView, BotStartView,
+    TelegramConfirmView, CheckTokenView, WaitTokenView, IssueCodeView, BotStartView,
     ContactsListView, MarkBlockedView,
 )
 
@@ -39,10 +37,12 @@ urlpatterns = [
     path('api/auth/confirm/', TelegramConfirmView.as_view()),
     path('api/auth/issue-code/', IssueCodeView.as_view(), name='issue_code'),
     path('api/auth/check/<str:token>/', CheckTokenView.as_view()),
+    path('api/auth/wait/<str:token>/', WaitTokenView.as_view()),
     path('api/telemetry/bot-start/', BotStartView.as_view(), name='bot_start'),
     path('api/telemetry/contacts/', ContactsListView.as_view(), name='bot_contacts'),
     path('api/telemetry/mark-blocked/', MarkBlockedView.as_view(), name='bot_mark_blocked'),
-    path('sitemap.xml', sitemap, {'sitemaps': SITEMAPS}, name='sitemap'),
+    path('sitemap.xml', sitemap_file, name='sitemap'),
+    path('sitemap-<slug:section>-<int:page>.xml', sitemap_file, name='sitemap_section'),
     path('robots.txt', robots_txt, name='robots'),
     path('', HomeView.as_view(), name='home'),
 ]
@@ -0,0 +1,92 @@
+"""Per-user daily activity rollup (`UserDailyActivity`).
+
+The profile heatmap grouped a user's LessonView rows over a year on every
+render, and the leaderboard grouped the whole LessonView table by user. Both
+now read `UserDailyActivity` — one row per user per active day — which the
+progress endpoints (record_view, mark_lesson_complete, quiz pass, batched
+events) bump as they write:
+
+* lessons_viewed — new (user, lesson, day) LessonView rows, i.e. distinct
+  lessons watched that day;
+* lessons_completed — lessons that went from not completed to completed;
+* seconds_watched — the duration of each newly viewed lesson, the same
+  measure as the site-wide watch-time counter.
+
+Days are Asia/Tashkent dates, like LessonView.viewed_on. Writes that bypass
+the endpoints (admin edits, deletes, raw SQL) let rows drift; `rebuild()` —
+the `rebuild_daily_activity` command — recomputes them from LessonView and
+LessonProgress. LessonProgress keeps no completion date, so rebuilt
+completions are dated by the row's last_watched_at.
+"""
+import pytz
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+REBUILD_CHUNK = 1000
+
+
+def record(user_id, day, viewed=0, completed=0, seconds=0):
+    """Add to the user's row for `day`, creating it on first activity."""
+    from .models import UserDailyActivity
+
+    deltas = {'lessons_viewed': viewed, 'lessons_completed': completed, 'seconds_watched': seconds}
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    rows = UserDailyActivity.objects.filter(user_id=user_id, day=day)
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**changes):
+        return
+    # Same dance as site_stats.incr: a concurrent first write may win the insert.
+    try:
+        with transaction.atomic():
+            UserDailyActivity.objects.create(user_id=user_id, day=day, **deltas)
+    except IntegrityError:
+        rows.update(**changes)
+
+
+def lessons_per_day(user, since):
+    """{date: distinct lessons viewed} for the user's active days from `since`."""
+    from .models import UserDailyActivity
+
+    return dict(
+        UserDailyActivity.objects
+        .filter(user=user, day__gte=since, lessons_viewed__gt=0)
+        .values_list('day', 'lessons_viewed')
+    )
+
+
+def rebuild(user_ids=None):
+    """Recompute the rollup for the given users (all when None) from the raw
+    tables. Returns the number of rows written."""
+    from .models import LessonProgress, LessonView, UserDailyActivity
+
+    tz = pytz.timezone(settings.TIME_ZONE)
+    views = LessonView.objects.order_by()
+    completions = LessonProgress.objects.filter(is_completed=True).order_by()
+    existing = UserDailyActivity.objects.all()
+    if user_ids is not None:
+        views = views.filter(user_id__in=user_ids)
+        completions = completions.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    days = {}
+    for row in views.values('user_id', 'viewed_on').annotate(
+        n=Count('id'), s=Coalesce(Sum('lesson__duration_seconds'), 0),
+    ):
+        days[(row['user_id'], row['viewed_on'])] = [row['n'], 0, row['s']]
+    for row in completions.annotate(day=TruncDate('last_watched_at', tzinfo=tz)).values(
+        'user_id', 'day',
+    ).annotate(n=Count('id')):
+        days.setdefault((row['user_id'], row['day']), [0, 0, 0])[1] = row['n']
+
+    rows = [
+        UserDailyActivity(user_id=user_id, day=day, lessons_viewed=v, lessons_completed=c, seconds_watched=s)
+        for (user_id, day), (v, c, s) in sorted(days.items())
+    ]
+    with transaction.atomic():
+        existing.delete()
+        UserDailyActivity.objects.bulk_create(rows, batch_size=REBUILD_CHUNK)
+    return len(rows)
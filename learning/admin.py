@@ -8,6 +8,9 @@ from .models import (
     LearningPath, LearningPathCourse, LearningPathEnrollment,
     LearningPathCertificate, VideoBookmark,
 )
+from . import progress
+from .catalog import invalidate_catalog
+from .snapshots import invalidate_home_snapshot
 
 
 @admin.register(Category)
@@ -28,14 +31,20 @@ class CourseAdmin(admin.ModelAdmin):
 
     def make_published(self, request, queryset):
         queryset.update(status='published', published_at=timezone.now())
+        invalidate_home_snapshot()
+        invalidate_catalog()
     make_published.short_description = "Tanlangan kurslarni nashr qilish"
 
     def make_draft(self, request, queryset):
         queryset.update(status='draft')
+        invalidate_home_snapshot()
+        invalidate_catalog()
     make_draft.short_description = "Tanlangan kurslarni qoralama holatiga o'tkazish"
 
     def make_archived(self, request, queryset):
         queryset.update(status='archived')
+        invalidate_home_snapshot()
+        invalidate_catalog()
     make_archived.short_description = "Tanlangan kurslarni arxivlash"
 
 
@@ -64,6 +73,19 @@ class LessonProgressAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'lesson__title']
     readonly_fields = ['last_watched_at']
 
+    # Deletes don't go through the LessonProgress signal; recount the
+    # affected course summaries afterwards.
+    def delete_model(self, request, obj):
+        course_id = obj.lesson.module.course_id
+        super().delete_model(request, obj)
+        progress.rebuild([course_id], [obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        affected = list(queryset.values_list('lesson__module__course_id', 'user_id').distinct())
+        super().delete_queryset(request, queryset)
+        for course_id, user_id in affected:
+            progress.rebuild([course_id], [user_id])
+
 
 @admin.register(LessonView)
 class LessonViewAdmin(admin.ModelAdmin):
@@ -0,0 +1,227 @@
+"""Rendered certificate and social-card images.
+
+Certificates only existed as HTML pages, and a shared course or lesson link
+previewed as a YouTube thumbnail. This module draws both with Pillow:
+
+* certificates (course and learning path), 1600×1131, PNG or WebP;
+* Open Graph cards for courses and learning paths, 1200×630.
+
+An image is described by a `Card` — its kind plus the text it shows — and the
+SHA-1 of that description (and LAYOUT) names its file,
+MEDIA_ROOT/cards/<kind>/ab/cd/<digest>.<fmt>. The file is drawn on first use
+and written atomically (temp file + rename), so every later hit in any worker
+is a file read; editing what an image shows gives it a new name instead of
+invalidating anything. The digest is also the ETag, and pages link with
+``?v=<digest>`` so those URLs can be cached for a year. `render_cards`
+pre-generates everything.
+
+Bump LAYOUT whenever the drawing changes. Files nothing points at any more
+can be deleted at any time.
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import Truncator
+
+LAYOUT = 1
+# {format: (Pillow format, content type)}
+FORMATS = {'png': ('PNG', 'image/png'), 'webp': ('WEBP', 'image/webp')}
+CERTIFICATE, COURSE, PATH = 'certificate', 'course', 'path'
+# Versioned URLs never change content; bare ones are revalidated daily.
+MAX_AGE = 24 * 60 * 60
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Palette (static/css/style.css).
+BRAND_50, BRAND_200, BRAND_600, BRAND_700, BRAND_800 = '#ECFDF5', '#A7F3D0', '#059669', '#047857', '#065F46'
+ACCENT_300 = '#FCD34D'
+GRAY_25, GRAY_200, GRAY_500, GRAY_900 = '#FCFCFD', '#E5E7EB', '#6B7280', '#111827'
+
+
+class Card(NamedTuple):
+    kind: str
+    fields: dict
+
+    @property
+    def digest(self):
+        payload = json.dumps([LAYOUT, self.kind, self.fields], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def path(self, fmt):
+        digest = self.digest
+        return Path(settings.MEDIA_ROOT) / 'cards' / self.kind / digest[:2] / digest[2:4] / f'{digest}.{fmt}'
+
+
+def course_certificate(cert):
+    """Card for a course Certificate (with user and course loaded)."""
+    return _certificate(cert, cert.course.title, "kursini to'liq tamomlagani uchun.")
+
+
+def path_certificate(cert):
+    """Card for a LearningPathCertificate (with user and path loaded)."""
+    return _certificate(cert, cert.path.title, "yo'nalishidagi barcha kurslarni tamomlagani uchun.")
+
+
+def _certificate(cert, title, reason):
+    from .context_processors import absolute_url
+    from .templatetags.learning_extras import uz_date
+
+    user = cert.user
+    return Card(CERTIFICATE, {
+        'name': (user.first_name + ' ' + user.last_name).strip() or user.username,
+        'title': title,
+        'reason': reason,
+        'code': cert.code,
+        'date': uz_date(cert.issued_at),
+        'verify': absolute_url(reverse('learning:public_certificate_verify', args=[cert.code])),
+    })
+
+
+def course_card(course):
+    meta = [course.get_level_display()]
+    if course.rating_count:
+        meta.append(f'Reyting {course.avg_rating:.1f} ({course.rating_count})')
+    return Card(COURSE, {
+        'title': course.title,
+        'subtitle': Truncator(course.subtitle or course.description).chars(160, truncate='...'),
+        'meta': ' · '.join(meta),
+    })
+
+
+def path_card(path_obj):
+    return Card(PATH, {
+        'title': path_obj.title,
+        'subtitle': Truncator(path_obj.description).chars(160, truncate='...'),
+        'meta': "O'quv yo'nalishi",
+    })
+
+
+def ensure(card, fmt):
+    """The card's file in `fmt`, drawn and stored first if it isn't yet."""
+    path = card.path(fmt)
+    if not path.exists():
+        image = _DRAW[card.kind](card.fields)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        if fmt == 'webp':
+            image.save(tmp, FORMATS[fmt][0], quality=90, method=4)
+        else:
+            image.save(tmp, FORMATS[fmt][0], optimize=True)
+        os.replace(tmp, path)
+    return path
+
+
+def every_card(kinds=None):
+    """Every card the site links to, for `render_cards`: all certificates, and
+    the social cards of published courses and paths without an uploaded
+    thumbnail (those are shared as-is)."""
+    from django.db.models import Q
+    from .models import Certificate, Course, LearningPath, LearningPathCertificate
+
+    kinds = kinds or [CERTIFICATE, COURSE, PATH]
+    no_thumbnail = Q(thumbnail='') | Q(thumbnail__isnull=True)
+    if CERTIFICATE in kinds:
+        for cert in Certificate.objects.select_related('user', 'course').iterator(chunk_size=2000):
+            yield course_certificate(cert)
+        for cert in LearningPathCertificate.objects.select_related('user', 'path').iterator(chunk_size=2000):
+            yield path_certificate(cert)
+    if COURSE in kinds:
+        for course in Course.objects.filter(no_thumbnail, status='published').iterator():
+            yield course_card(course)
+    if PATH in kinds:
+        for path_obj in LearningPath.objects.filter(no_thumbnail).iterator():
+            yield path_card(path_obj)
+
+
+# ── Drawing ──────────────────────────────────────────────────────
+
+@lru_cache(maxsize=32)
+def _font(size):
+    from PIL import ImageFont
+    if settings.CARDS_FONT:
+        return ImageFont.truetype(settings.CARDS_FONT, size)
+    return ImageFont.load_default(size)
+
+
+def _wrap(draw, text, font, width, max_lines):
+    """Greedy word wrap to `width` pixels; the last line is ellipsized (with
+    dots: Pillow's bundled font has no '…')."""
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}'.strip()
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    if len(lines) > max_lines:
+        last = lines[max_lines - 1]
+        while last and draw.textlength(last + '...', font=font) > width:
+            last = last[:-1].rstrip()
+        lines = lines[:max_lines - 1] + [last + '...']
+    return lines
+
+
+def _centered(draw, y, text, size, fill, width):
+    draw.text((width / 2, y), text, font=_font(size), fill=fill, anchor='mt')
+
+
+def _draw_certificate(fields):
+    from PIL import Image, ImageDraw
+
+    width, height = 1600, 1131
+    image = Image.new('RGB', (width, height), GRAY_25)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((36, 36, width - 37, height - 37), outline=BRAND_600, width=8)
+    draw.rectangle((62, 62, width - 63, height - 63), outline=BRAND_200, width=2)
+
+    _centered(draw, 150, 'OCHIQ KURS · TUGATISH SERTIFIKATI', 28, BRAND_700, width)
+    _centered(draw, 210, 'Tugatish guvohnomasi', 76, GRAY_900, width)
+    draw.line((width / 2 - 160, 330, width / 2 + 160, 330), fill=BRAND_600, width=3)
+    _centered(draw, 380, 'Ushbu sertifikat quyidagi shaxsga taqdim etiladi:', 30, GRAY_500, width)
+    name = _wrap(draw, fields['name'], _font(84), width - 300, 1)[0]
+    _centered(draw, 450, name, 84, BRAND_800, width)
+
+    y = 610
+    for line in _wrap(draw, fields['title'], _font(46), width - 360, 2):
+        _centered(draw, y, line, 46, GRAY_900, width)
+        y += 60
+    _centered(draw, y + 10, fields['reason'], 30, GRAY_500, width)
+
+    draw.line((200, 900, 560, 900), fill=GRAY_200, width=2)
+    draw.text((380, 915), 'Ochiq Kurs jamoasi', font=_font(28), fill=GRAY_900, anchor='mt')
+    draw.text((width - 380, 880), f"#{fields['code']}", font=_font(30), fill=BRAND_700, anchor='mt')
+    draw.text((width - 380, 925), fields['date'], font=_font(26), fill=GRAY_500, anchor='mt')
+    _centered(draw, height - 130, f"Tekshirish: {fields['verify']}", 22, GRAY_500, width)
+    return image
+
+
+def _draw_social(fields):
+    from PIL import Image, ImageDraw
+
+    width, height = 1200, 630
+    image = Image.new('RGB', (width, height), BRAND_800)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 16, height), fill=ACCENT_300)
+    draw.text((80, 70), 'Ochiq Kurs', font=_font(34), fill=BRAND_200)
+
+    y = 150
+    for line in _wrap(draw, fields['title'], _font(64), width - 160, 3):
+        draw.text((80, y), line, font=_font(64), fill='#FFFFFF')
+        y += 78
+    for line in _wrap(draw, fields['subtitle'], _font(30), width - 160, 2):
+        draw.text((80, y + 16), line, font=_font(30), fill=BRAND_50)
+        y += 42
+    draw.text((80, height - 90), fields['meta'], font=_font(28), fill=ACCENT_300)
+    return image
+
+
+_DRAW = {CERTIFICATE: _draw_certificate, COURSE: _draw_social, PATH: _draw_social}
@@ -0,0 +1,429 @@
+"""Read-only, memory-mapped snapshot of the course outline.
+
+Nearly every lesson endpoint used to walk Course → Module → Lesson with a query
+per level, and navigation (prev/next, sidebar, "next lesson") re-queried the
+siblings and neighbouring modules. The outline only changes when staff edit
+content, so it is compiled into one compact binary file that every Gunicorn
+worker mmaps: the pages are shared through the OS page cache, so memory stays
+flat however many workers there are, and lookups run no SQL.
+
+File layout (little-endian)::
+
+    header    magic, format version, build time, section offsets and counts
+    courses   fixed-size records, sorted by slug bytes (binary search)
+    modules   fixed-size records, grouped by course in outline order
+    lessons   fixed-size records, grouped by module in outline order, with
+              precomputed prev/next indexes across module boundaries
+    id index  (course id, record) and (lesson id, record) pairs sorted by id
+    strings   u16 length-prefixed UTF-8; records hold u32 offsets into it
+
+Freshness: content signals (learning/models.py) unlink the file; the next
+reader in any worker rebuilds it under an flock and the others pick up the new
+inode on their next `os.stat`. `rebuild_catalog` warms it eagerly on deploy,
+and also writes the navbar's suggestion index (learning/suggest.py) next to it.
+Database ids are never reused, so id lookups on a stale file can only miss,
+never return a different lesson; slug lookups are confirmed by the caller when
+it loads the row it resolved to.
+"""
+import fcntl
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+MAGIC = b'OKCATLG\x00'
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct('<8sIQ' + 'II' * 6)
+COURSE = struct.Struct('<IB3xIIIIIIIII')
+MODULE = struct.Struct('<7I')
+LESSON = struct.Struct('<4IBB2x4I2i')
+ID_PAIR = struct.Struct('<II')
+STR_LEN = struct.Struct('<H')
+
+STATUSES = ('draft', 'published', 'archived')
+LESSON_TYPES = ('video', 'article', 'quiz')
+NONE = -1
+
+
+def catalog_path():
+    """One file per database, so a test run never reads the dev server's
+    catalog (or the other way round)."""
+    name = connection.settings_dict['NAME']
+    return Path(settings.CATALOG_SNAPSHOT_DIR) / f'catalog-{name}.bin'
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+
+class _Strings:
+    def __init__(self):
+        self.buf = bytearray()
+        self.offsets = {}
+
+    def add(self, text):
+        raw = (text or '').encode()[:0xFFFF]
+        if raw not in self.offsets:
+            self.offsets[raw] = len(self.buf)
+            self.buf += STR_LEN.pack(len(raw)) + raw
+        return self.offsets[raw]
+
+
+def build_catalog_bytes():
+    """Compile the current outline into the binary format (three queries)."""
+    from .models import Course, Lesson, Module
+
+    courses = sorted(
+        Course.objects.select_related('category')
+        .only('id', 'slug', 'title', 'status', 'thumbnail_source', 'thumbnail_key', 'category__name'),
+        key=lambda c: c.slug.encode(),
+    )
+    modules_by_course = {}
+    for m in Module.objects.order_by('course_id', 'order', 'id').values(
+        'id', 'course_id', 'order', 'slug', 'title',
+    ):
+        modules_by_course.setdefault(m['course_id'], []).append(m)
+    lessons_by_module = {}
+    for lesson in Lesson.objects.order_by('module_id', 'order', 'id').values(
+        'id', 'module_id', 'order', 'duration_seconds', 'lesson_type', 'is_preview',
+        'slug', 'title', 'youtube_video_id',
+    ):
+        lessons_by_module.setdefault(lesson['module_id'], []).append(lesson)
+
+    strings = _Strings()
+    course_rows, module_rows, lesson_rows = [], [], []
+    for course_idx, course in enumerate(courses):
+        first_module, first_lesson = len(module_rows), len(lesson_rows)
+        course_lessons = []
+        for m in modules_by_course.get(course.id, []):
+            module_idx = len(module_rows)
+            module_lessons = lessons_by_module.get(m['id'], [])
+            module_rows.append([
+                m['id'], course_idx, m['order'], strings.add(m['slug']), strings.add(m['title']),
+                len(lesson_rows) + len(course_lessons), len(module_lessons),
+            ])
+            for lesson in module_lessons:
+                url = reverse('learning:lesson_detail', args=[course.slug, m['slug'], lesson['slug']])
+                course_lessons.append([
+                    lesson['id'], module_idx, lesson['order'], lesson['duration_seconds'] or 0,
+                    LESSON_TYPES.index(lesson['lesson_type']) if lesson['lesson_type'] in LESSON_TYPES else 0,
+                    int(lesson['is_preview']),
+                    strings.add(lesson['slug']), strings.add(lesson['title']),
+                    strings.add(lesson['youtube_video_id']), strings.add(url),
+                    NONE, NONE,
+                ])
+        # prev/next run through the whole course, crossing module boundaries.
+        for i, row in enumerate(course_lessons):
+            row[10] = first_lesson + i - 1 if i > 0 else NONE
+            row[11] = first_lesson + i + 1 if i < len(course_lessons) - 1 else NONE
+        lesson_rows.extend(course_lessons)
+
+        thumbnail = course.get_thumbnail_url() or ''
+        course_rows.append([
+            course.id, STATUSES.index(course.status) if course.status in STATUSES else 0,
+            strings.add(course.slug), strings.add(course.title), strings.add(thumbnail),
+            first_module, len(module_rows) - first_module,
+            first_lesson, len(course_lessons),
+            sum(r[3] for r in course_lessons),
+            strings.add(course.category.name if course.category else ''),
+        ])
+
+    course_ids = sorted((row[0], i) for i, row in enumerate(course_rows))
+    lesson_ids = sorted((row[0], i) for i, row in enumerate(lesson_rows))
+
+    sections = [
+        b''.join(COURSE.pack(*row) for row in course_rows),
+        b''.join(MODULE.pack(*row) for row in module_rows),
+        b''.join(LESSON.pack(*row) for row in lesson_rows),
+        b''.join(ID_PAIR.pack(*pair) for pair in course_ids),
+        b''.join(ID_PAIR.pack(*pair) for pair in lesson_ids),
+        bytes(strings.buf),
+    ]
+    counts = [len(course_rows), len(module_rows), len(lesson_rows),
+              len(course_ids), len(lesson_ids), len(strings.buf)]
+    offset = HEADER.size
+    layout = []
+    for section, count in zip(sections, counts):
+        layout += [offset, count]
+        offset += len(section)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, time.time_ns(), *layout)
+    return header + b''.join(sections)
+
+
+def rebuild_catalog():
+    """Write a fresh catalog file atomically (temp file + rename)."""
+    path = catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = build_catalog_bytes()
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    # The suggestion index is derived from the catalog, so it is built here,
+    # once per file, and renamed into place first: it is never older than
+    # the catalog next to it.
+    from .suggest import write_index
+    write_index(Catalog(tmp))
+    os.replace(tmp, path)
+    return len(data)
+
+
+def invalidate_catalog():
+    try:
+        os.unlink(catalog_path())
+    except FileNotFoundError:
+        pass
+
+
+def ensure_built(path):
+    """Rebuild the catalog if `path` (it, or a file built along with it) is
+    missing. Serialized across workers with an flock so a content change
+    doesn't make every worker rebuild at once."""
+    catalog = catalog_path()
+    catalog.parent.mkdir(parents=True, exist_ok=True)
+    with open(catalog.with_name(catalog.name + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not path.exists():
+                rebuild_catalog()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+class CourseEntry:
+    __slots__ = ('catalog', 'index', 'id', 'status', 'slug', 'title', 'thumbnail_url',
+                 'first_module', 'module_count', 'first_lesson', 'lesson_count',
+                 'total_duration', 'category_name')
+
+    @property
+    def is_published(self):
+        return self.status == 'published'
+
+    def __repr__(self):
+        return f'<CourseEntry {self.slug}>'
+
+
+class ModuleEntry:
+    __slots__ = ('catalog', 'index', 'id', 'course_index', 'order', 'slug', 'title',
+                 'first_lesson', 'lesson_count')
+
+    @property
+    def course(self):
+        return self.catalog._course_at(self.course_index)
+
+    @property
+    def lessons(self):
+        return [self.catalog._lesson_at(i)
+                for i in range(self.first_lesson, self.first_lesson + self.lesson_count)]
+
+    def __repr__(self):
+        return f'<ModuleEntry {self.slug}>'
+
+
+class LessonEntry:
+    __slots__ = ('catalog', 'index', 'id', 'module_index', 'order', 'duration_seconds',
+                 'lesson_type', 'is_preview', 'slug', 'title', 'youtube_video_id', 'url',
+                 'prev_index', 'next_index')
+
+    @property
+    def module(self):
+        return self.catalog._module_at(self.module_index)
+
+    def get_absolute_url(self):
+        return self.url
+
+    def __repr__(self):
+        return f'<LessonEntry {self.slug}>'
+
+
+class _CourseSlugs:
+    """Lazy sequence over the sorted course slugs, so bisect decodes only the
+    ~log2(n) records it probes."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __len__(self):
+        return self.catalog.course_count
+
+    def __getitem__(self, i):
+        c = self.catalog
+        return c._raw_str(COURSE.unpack_from(c._buf, c._courses + i * COURSE.size)[2])
+
+
+class Catalog:
+    """Accessor over one mapped catalog file. Entries are decoded on demand."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self._buf = mmap(fh.fileno(), 0, access=ACCESS_READ)
+        fields = HEADER.unpack_from(self._buf, 0)
+        if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a v{FORMAT_VERSION} catalog')
+        self.built_at_ns = fields[2]
+        (self._courses, self.course_count, self._modules, self.module_count,
+         self._lessons, self.lesson_count, self._course_ids, _,
+         self._lesson_ids, _, self._strings, _) = fields[3:]
+
+    def _str(self, offset):
+        start = self._strings + offset
+        (length,) = STR_LEN.unpack_from(self._buf, start)
+        return self._buf[start + 2:start + 2 + length].decode()
+
+    def _raw_str(self, offset):
+        start = self._strings + offset
+        (length,) = STR_LEN.unpack_from(self._buf, start)
+        return self._buf[start + 2:start + 2 + length]
+
+    def _course_at(self, i):
+        row = COURSE.unpack_from(self._buf, self._courses + i * COURSE.size)
+        e = CourseEntry()
+        e.catalog, e.index, e.id = self, i, row[0]
+        e.status = STATUSES[row[1]]
+        e.slug, e.title, e.thumbnail_url = self._str(row[2]), self._str(row[3]), self._str(row[4])
+        (e.first_module, e.module_count, e.first_lesson,
+         e.lesson_count, e.total_duration) = row[5:10]
+        e.category_name = self._str(row[10])
+        return e
+
+    def _module_at(self, i):
+        row = MODULE.unpack_from(self._buf, self._modules + i * MODULE.size)
+        e = ModuleEntry()
+        e.catalog, e.index, e.id, e.course_index, e.order = self, i, row[0], row[1], row[2]
+        e.slug, e.title = self._str(row[3]), self._str(row[4])
+        e.first_lesson, e.lesson_count = row[5], row[6]
+        return e
+
+    def _lesson_at(self, i):
+        row = LESSON.unpack_from(self._buf, self._lessons + i * LESSON.size)
+        e = LessonEntry()
+        e.catalog, e.index = self, i
+        e.id, e.module_index, e.order, e.duration_seconds = row[0:4]
+        e.lesson_type = LESSON_TYPES[row[4]]
+        e.is_preview = bool(row[5])
+        e.slug, e.title = self._str(row[6]), self._str(row[7])
+        e.youtube_video_id, e.url = self._str(row[8]), self._str(row[9])
+        e.prev_index, e.next_index = row[10], row[11]
+        return e
+
+    def _find_id(self, section, count, wanted):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, idx = ID_PAIR.unpack_from(self._buf, section + mid * ID_PAIR.size)
+            if key == wanted:
+                return idx
+            if key < wanted:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    # Public lookups ---------------------------------------------------------
+
+    def course(self, slug):
+        wanted = slug.encode()
+        slugs = _CourseSlugs(self)
+        i = bisect_left(slugs, wanted)
+        if i < self.course_count and slugs[i] == wanted:
+            return self._course_at(i)
+        return None
+
+    def course_by_id(self, course_id):
+        i = self._find_id(self._course_ids, self.course_count, course_id)
+        return None if i is None else self._course_at(i)
+
+    def lesson_by_id(self, lesson_id):
+        i = self._find_id(self._lesson_ids, self.lesson_count, lesson_id)
+        return None if i is None else self._lesson_at(i)
+
+    def courses(self):
+        """Every course, in slug order."""
+        return [self._course_at(i) for i in range(self.course_count)]
+
+    def lessons(self, course):
+        """A course's lessons in outline order."""
+        return [self._lesson_at(i)
+                for i in range(course.first_lesson, course.first_lesson + course.lesson_count)]
+
+    def modules(self, course):
+        return [self._module_at(i)
+                for i in range(course.first_module, course.first_module + course.module_count)]
+
+    def module(self, course, slug):
+        return next((m for m in self.modules(course) if m.slug == slug), None)
+
+    def lesson_ids(self, course):
+        return [
+            LESSON.unpack_from(self._buf, self._lessons + i * LESSON.size)[0]
+            for i in range(course.first_lesson, course.first_lesson + course.lesson_count)
+        ]
+
+    def resolve(self, course_slug, module_slug, lesson_slug):
+        """(course, module, lesson) entries for a lesson URL, or None."""
+        course = self.course(course_slug)
+        if course is None:
+            return None
+        module = self.module(course, module_slug)
+        if module is None:
+            return None
+        lesson = next((l for l in module.lessons if l.slug == lesson_slug), None)
+        if lesson is None:
+            return None
+        return course, module, lesson
+
+    def prev(self, lesson):
+        return None if lesson.prev_index == NONE else self._lesson_at(lesson.prev_index)
+
+    def next(self, lesson):
+        return None if lesson.next_index == NONE else self._lesson_at(lesson.next_index)
+
+
+_lock = threading.Lock()
+_mapped = {}  # path → (stat key, Catalog)
+
+
+def get_catalog():
+    """The current catalog for this database, (re)mapping it when the file on
+    disk has been replaced and building it when it is missing."""
+    path = catalog_path()
+    for _ in range(3):
+        # Retried: an invalidation can unlink the file between stat and open.
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            ensure_built(path)
+            continue
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        current = _mapped.get(path)
+        if current is not None and current[0] == key:
+            return current[1]
+        with _lock:
+            current = _mapped.get(path)
+            if current is None or current[0] != key:
+                try:
+                    catalog = Catalog(path)
+                except FileNotFoundError:
+                    continue
+                # The replaced mapping is simply dropped; requests still holding
+                # entries from it keep a valid view until they finish.
+                current = (key, catalog)
+                _mapped[path] = current
+            return current[1]
+    raise RuntimeError(f'catalog at {path} keeps disappearing')
+
+
+def lesson_entry(lesson_id):
+    """Catalog entry for a lesson id, rebuilding once if the file predates it."""
+    entry = get_catalog().lesson_by_id(lesson_id)
+    if entry is None:
+        invalidate_catalog()
+        entry = get_catalog().lesson_by_id(lesson_id)
+    return entry
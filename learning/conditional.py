@@ -0,0 +1,164 @@
+"""Conditional GET (ETag / Last-Modified) for the public catalog pages.
+
+The course, category, learning path, instructor and certificate pages were
+rendered in full for every anonymous visitor and crawler, however rarely their
+content changes. Each now has a stamp function that reads, in one to three
+small queries, the version stamps of everything the page shows:
+
+* Course.updated_at — the course row itself;
+* Course.content_changed_at — its outline, reviews and announcements, moved
+  by the signals in learning/models.py (and by `thumbnails.build` and
+  `ratings.rebuild`, which write without signals);
+* Category.updated_at and LearningPath.updated_at (the latter also moved when
+  its course list changes), and the per-course student counts;
+* for instructor and certificate pages, the displayed names themselves.
+
+`page(stamp)` wraps a view with Django's `condition`: the stamp is hashed into
+the ETag, its newest timestamp is the Last-Modified, and a request whose
+validators match gets a 304 before the view runs a single query of its own.
+
+Only anonymous requests take part. Logged-in pages are personalized, so for
+them the stamp is never computed; anonymous responses are sent with
+``Cache-Control: private, no-cache`` so browsers revalidate them rather than
+show a cached logged-out page after a login.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import NamedTuple
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# Bump when the templates of these pages change in a way the stamps can't see.
+PAGE_FORMAT = 1
+
+
+class Stamp(NamedTuple):
+    values: tuple
+
+    @property
+    def etag(self):
+        # A deploy with new static files changes every page's asset URLs.
+        release = getattr(staticfiles_storage, 'manifest_hash', '')
+        payload = repr((PAGE_FORMAT, release, self.values))
+        return '"%s"' % hashlib.sha1(payload.encode()).hexdigest()
+
+    @property
+    def last_modified(self):
+        dates = [value for value in self.values if isinstance(value, datetime)]
+        return max(dates) if dates else None
+
+
+def touch(course_ids=None):
+    """Mark the public pages of the given courses (all when None) changed."""
+    from .models import Course
+
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+    courses.update(content_changed_at=timezone.now())
+
+
+def _cards(courses):
+    # Everything a course card shows moves one of these.
+    return tuple(courses.aggregate(
+        Max('updated_at'), Max('content_changed_at'), Count('id'), Sum('stats__student_count'),
+    ).values())
+
+
+def _categories():
+    # The category bar shown on the catalog pages.
+    from .models import Category
+
+    return tuple(Category.objects.aggregate(Max('updated_at'), Count('id')).values())
+
+
+def course_page(course_slug):
+    from .models import Course
+
+    row = (
+        Course.objects.filter(slug=course_slug, status='published')
+        .values_list('id', 'updated_at', 'content_changed_at', 'stats__student_count', 'category__updated_at')
+        .first()
+    )
+    return Stamp(row) if row else None
+
+
+def category_page(slug):
+    from .models import Category, Course
+
+    row = Category.objects.filter(slug=slug).values_list('id', 'updated_at').first()
+    if row is None:
+        return None
+    return Stamp(row + _categories() + _cards(Course.objects.filter(category_id=row[0], status='published')))
+
+
+def learning_path_page(path_slug):
+    from .models import Course, LearningPath
+
+    row = LearningPath.objects.filter(slug=path_slug).values_list('id', 'updated_at').first()
+    if row is None:
+        return None
+    return Stamp(row + _cards(Course.objects.filter(learning_paths__path_id=row[0])))
+
+
+def instructor_page(username):
+    from django.contrib.auth import get_user_model
+    from .models import Course
+
+    row = (
+        get_user_model().objects.filter(username=username)
+        .values_list('id', 'first_name', 'last_name', 'telegram_profile__photo_url')
+        .first()
+    )
+    if row is None:
+        return None
+    return Stamp(row + _cards(Course.objects.filter(instructor_id=row[0], status='published')))
+
+
+def certificate_page(code):
+    from .models import Certificate
+
+    row = (
+        Certificate.objects.filter(code=code)
+        .values_list('issued_at', 'user__username', 'user__first_name', 'user__last_name',
+                     'course__title', 'course__slug')
+        .first()
+    )
+    return Stamp(row) if row else None
+
+
+def page(stamp):
+    """Decorate a public page view with ETag/Last-Modified handling driven by
+    `stamp(**view kwargs)`, which returns a Stamp or None (no object: the view
+    raises its 404)."""
+    def stamp_for(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        if not hasattr(request, '_page_stamp'):
+            request._page_stamp = stamp(*args, **kwargs)
+        return request._page_stamp
+
+    def etag(request, *args, **kwargs):
+        found = stamp_for(request, *args, **kwargs)
+        return found.etag if found else None
+
+    def last_modified(request, *args, **kwargs):
+        found = stamp_for(request, *args, **kwargs)
+        return found.last_modified if found else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if getattr(request, '_page_stamp', None) is not None:
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
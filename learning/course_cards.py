@@ -0,0 +1,104 @@
+"""Cached course-card HTML.
+
+The home page renders around fifty `_course_card.html` includes and every
+catalog page two dozen, and since each card read the request's
+`wishlist_ids` for its heart, none of that markup could be shared. A card is
+now the same for every visitor — the heart is rendered hidden and the script
+in base.html shows it and marks it from the page's single `wishlist-ids`
+payload — so `render(courses)`, behind the `{% course_cards %}` tag, serves
+whole grids from cached fragments:
+
+* A card is stored under its course's version: Course.updated_at and
+  Course.content_changed_at (outline, reviews, ratings and thumbnails move it,
+  see learning/conditional.py), the student count and the category name —
+  all read off the Course or home-snapshot dict the page already loaded.
+* Cards are looked up in this process, then with one `get_many` on the shared
+  cache; the rest are rendered and stored with one `set_many`.
+
+A version is never rewritten in place, so, as with quiz keys, a per-process
+copy is safe. The instructor's name is not in the version (reading it can
+cost a query per card); a renamed instructor reaches the cards within
+CARD_TTL.
+"""
+import hashlib
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+# Bump when _course_card.html changes so old fragments are never served.
+CARD_FORMAT = 1
+CARD_TTL = 60 * 60
+# Fragments held per process; the dict is dropped wholesale when it fills up.
+LOCAL_MAX = 2048
+TEMPLATE = 'learning/_course_card.html'
+
+_fragments = {}
+
+
+def _field(course, name):
+    if isinstance(course, dict):
+        return course.get(name)
+    return getattr(course, name, None)
+
+
+def _stamp(value):
+    # Snapshot cards hold ISO strings, so a Course and its snapshot card
+    # share one fragment.
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def version(course):
+    """What a card's HTML depends on, for a Course annotated by
+    `_course_card_annotations` or a home-snapshot card dict."""
+    category = _field(course, 'category')
+    if isinstance(category, dict):
+        category = category['name']
+    elif category is not None:
+        category = category.name
+    return (
+        _field(course, 'id'),
+        _stamp(_field(course, 'updated_at')),
+        _stamp(_field(course, 'content_changed_at')),
+        _field(course, 'student_count') or 0,
+        category,
+    )
+
+
+def _cache_key(card_version):
+    digest = hashlib.sha1(repr((CARD_FORMAT, card_version)).encode()).hexdigest()
+    return f'card:v{CARD_FORMAT}:{card_version[0]}:{digest}'
+
+
+def _remember(card_version, entry):
+    if len(_fragments) >= LOCAL_MAX:
+        _fragments.clear()
+    _fragments[card_version] = entry
+
+
+def render(courses):
+    """The cards of `courses`, in order, as one safe string."""
+    courses = list(courses)
+    versions = [version(course) for course in courses]
+    now = time.time()
+    html, missing = {}, {}
+    for card_version, course in zip(versions, courses):
+        entry = _fragments.get(card_version)
+        if entry is not None and entry[0] > now:
+            html[card_version] = entry[1]
+        else:
+            missing[_cache_key(card_version)] = (card_version, course)
+    if missing:
+        found = cache.get_many(list(missing))
+        template, fresh = get_template(TEMPLATE), {}
+        for key, (card_version, course) in missing.items():
+            entry = found.get(key)
+            if entry is None or entry[0] <= now:
+                entry = fresh[key] = (now + CARD_TTL, template.render({'course': course}))
+            _remember(card_version, entry)
+            html[card_version] = entry[1]
+        if fresh:
+            cache.set_many(fresh, CARD_TTL)
+    return mark_safe(''.join(html[card_version] for card_version in versions))
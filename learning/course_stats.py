@@ -0,0 +1,78 @@
+"""Maintenance of the denormalized `CourseStats` rows.
+
+Every course card shows a lesson count, total duration and student count.
+Those used to be aggregated per request (correlated Lesson subqueries plus an
+enrollment COUNT for each card); they now live in `CourseStats`, adjusted by
+the model signals in learning/models.py with atomic `F()` deltas.
+
+Writes that bypass signals (queryset.update, bulk_create, raw SQL) leave the
+rows stale; `rebuild()` — run by the `rebuild_course_stats` management command
+— recomputes them exactly from Lesson and Enrollment.
+"""
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+REBUILD_CHUNK = 500
+
+
+def bump(course_id, touch=True, **deltas):
+    """Apply counter deltas to a course's stats row; with `touch`, also mark
+    its content as changed now.
+
+    A missing row (course created via bulk_create, or deleted mid-cascade) is
+    left alone — the rebuild command creates it with exact values.
+    """
+    from .models import CourseStats
+
+    if course_id is None:
+        return
+    # Clamped at zero: a row that had drifted low must not trip the
+    # unsigned-column CHECK and abort the delete that triggered it.
+    changes = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if touch:
+        changes['last_content_change'] = timezone.now()
+    if changes:
+        CourseStats.objects.filter(course_id=course_id).update(**changes)
+
+
+def rebuild(course_ids=None):
+    """Recompute stats for the given courses (all when None), creating rows
+    that are missing. Returns the number of courses processed."""
+    from .models import Course, CourseStats, Enrollment, Lesson
+
+    courses = Course.objects.order_by('id')
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+    ids = list(courses.values_list('id', flat=True))
+
+    for start in range(0, len(ids), REBUILD_CHUNK):
+        chunk = ids[start:start + REBUILD_CHUNK]
+        lessons = {
+            row['module__course_id']: row
+            for row in Lesson.objects.filter(module__course_id__in=chunk)
+            .order_by().values('module__course_id')
+            .annotate(n=Count('id'), s=Sum('duration_seconds'))
+        }
+        students = dict(
+            Enrollment.objects.filter(course_id__in=chunk)
+            .order_by().values_list('course_id').annotate(n=Count('id'))
+        )
+        CourseStats.objects.bulk_create(
+            [
+                CourseStats(
+                    course_id=cid,
+                    lesson_count=lessons.get(cid, {}).get('n', 0),
+                    total_duration=lessons.get(cid, {}).get('s') or 0,
+                    student_count=students.get(cid, 0),
+                )
+                for cid in chunk
+            ],
+            update_conflicts=True,
+            unique_fields=['course'],
+            update_fields=['lesson_count', 'total_duration', 'student_count'],
+        )
+    return len(ids)
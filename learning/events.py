@@ -0,0 +1,222 @@
+"""Batched learning-event ingestion.
+
+The lesson page queues what the learner does — a view, a completion, an
+unsaved note — and sends the queue in one request (`sendBeacon` when the page
+is hidden or closed, `fetch` when the UI needs an answer). `ingest` dedupes the
+batch and applies it in one transaction with set-based writes; the streak,
+course summaries and certificate checks then run once per batch instead of
+once per event.
+
+Event shape: ``{"type": "view" | "complete" | "note" | "bookmark",
+"lesson": <lesson id>, "id": <optional client id>, ...}`` plus ``content``
+for notes and ``timestamp``/``note`` for bookmarks. Events for unknown lessons
+or unpublished courses are skipped and counted as rejected; an id the
+catalog doesn't know only triggers a rebuild if it exists in the database.
+
+bulk_create bypasses model signals, so the side effects the per-event views
+got from signals are applied here in bulk: Enrollment and LessonView counters
+(course_stats, site_stats) and the daily activity rollup for the rows that
+were missing, the UserCourseProgress rows of the touched courses, and the rendered HTML of
+upserted notes.
+"""
+from django.db import transaction
+
+from . import activity, course_stats, progress, site_stats
+from .catalog import get_catalog, invalidate_catalog
+from .utils import markdown_key, render_markdown_many
+
+MAX_EVENTS = 100
+EVENT_TYPES = ('view', 'complete', 'note', 'bookmark')
+
+
+class EventError(ValueError):
+    """The batch as a whole is malformed."""
+
+
+def _entries(lesson_ids):
+    """{lesson id: catalog entry or None} for the ids a batch names. They
+    come from the client, so a miss alone never rebuilds the catalog: only
+    when one query shows a missing id is a real lesson (the file predates
+    it) is the catalog invalidated, once."""
+    from .models import Lesson
+
+    catalog = get_catalog()
+    entries = {lesson_id: catalog.lesson_by_id(lesson_id) for lesson_id in lesson_ids}
+    unknown = [lesson_id for lesson_id, entry in entries.items() if entry is None]
+    if unknown and Lesson.objects.filter(id__in=unknown).exists():
+        invalidate_catalog()
+        catalog = get_catalog()
+        entries.update({lesson_id: catalog.lesson_by_id(lesson_id) for lesson_id in unknown})
+    return entries
+
+
+def _parse(events, user):
+    """Dedupe a batch into the rows it implies. Returns (views, completes,
+    notes, bookmarks, entries, rejected)."""
+    if not isinstance(events, list):
+        raise EventError('events must be a list')
+    if len(events) > MAX_EVENTS:
+        raise EventError(f'at most {MAX_EVENTS} events per batch')
+
+    seen_ids = set()
+    accepted = []  # (lesson id, event)
+    rejected = 0
+    for event in events:
+        if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES:
+            rejected += 1
+            continue
+        client_id = event.get('id')
+        if isinstance(client_id, (str, int)):
+            if client_id in seen_ids:
+                continue
+            seen_ids.add(client_id)
+        try:
+            accepted.append((int(event.get('lesson')), event))
+        except (TypeError, ValueError):
+            rejected += 1
+
+    staff = user.is_staff or user.is_superuser
+    entries = {
+        lesson_id: entry
+        for lesson_id, entry in _entries({lesson_id for lesson_id, _ in accepted}).items()
+        if entry is not None and (staff or entry.module.course.is_published)
+    }
+    views, completes = set(), set()
+    notes = {}  # lesson id -> content; the last edit wins
+    bookmarks = {}  # (lesson id, seconds, note) -> None, in order
+
+    for lesson_id, event in accepted:
+        if lesson_id not in entries:
+            rejected += 1
+            continue
+
+        kind = event['type']
+        if kind == 'view':
+            views.add(lesson_id)
+        elif kind == 'complete':
+            completes.add(lesson_id)
+        elif kind == 'note':
+            notes[lesson_id] = str(event.get('content', ''))
+        else:
+            try:
+                seconds = int(event.get('timestamp', 0))
+            except (TypeError, ValueError):
+                rejected += 1
+                continue
+            if seconds < 0:
+                rejected += 1
+                continue
+            bookmarks[(lesson_id, seconds, str(event.get('note', '')).strip())] = None
+
+    return views, completes, notes, list(bookmarks), entries, rejected
+
+
+def ingest(user, events):
+    """Apply a batch of learning events for `user`. Returns a summary dict."""
+    from .models import Enrollment, LessonProgress, LessonView, Note, VideoBookmark
+    from .views import _issue_certificates, _today_uzt, _update_streak
+
+    views, completes, notes, bookmarks, entries, rejected = _parse(events, user)
+    watched = views | completes
+
+    def course_of(lesson_id):
+        return entries[lesson_id].module.course.id
+
+    today = _today_uzt()
+    with transaction.atomic():
+        if watched:
+            # Enroll on first play or completion, like record_view / mark_lesson_complete.
+            course_ids = {course_of(lid) for lid in watched}
+            enrolled = set(
+                Enrollment.objects.filter(user=user, course_id__in=course_ids)
+                .values_list('course_id', flat=True)
+            )
+            new_courses = sorted(course_ids - enrolled)
+            Enrollment.objects.bulk_create(
+                [Enrollment(user=user, course_id=cid) for cid in new_courses],
+                ignore_conflicts=True,
+            )
+            for cid in new_courses:
+                course_stats.bump(cid, touch=False, student_count=1)
+
+        new_views, watch_seconds = [], 0
+        if views:
+            seen_today = set(
+                LessonView.objects.filter(user=user, viewed_on=today, lesson_id__in=views)
+                .values_list('lesson_id', flat=True)
+            )
+            new_views = sorted(views - seen_today)
+            LessonView.objects.bulk_create(
+                [LessonView(user=user, lesson_id=lid, viewed_on=today) for lid in new_views],
+                ignore_conflicts=True,
+            )
+            watch_seconds = sum(max(entries[lid].duration_seconds, 0) for lid in new_views)
+            site_stats.incr(site_stats.WATCH_SECONDS, watch_seconds)
+
+        newly_completed = set()
+        if completes:
+            newly_completed = completes - set(
+                LessonProgress.objects.filter(user=user, lesson_id__in=completes, is_completed=True)
+                .values_list('lesson_id', flat=True)
+            )
+        activity.record(
+            user.id, today,
+            viewed=len(new_views),
+            completed=len(newly_completed),
+            seconds=watch_seconds,
+        )
+
+        # A view touches last_watched_at and leaves is_completed alone; a
+        # completion sets both. auto_now fills last_watched_at on insert and
+        # the upsert copies it over.
+        if views - completes:
+            LessonProgress.objects.bulk_create(
+                [LessonProgress(user=user, lesson_id=lid) for lid in sorted(views - completes)],
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['last_watched_at'],
+            )
+        if completes:
+            LessonProgress.objects.bulk_create(
+                [LessonProgress(user=user, lesson_id=lid, is_completed=True) for lid in sorted(completes)],
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['is_completed', 'last_watched_at'],
+            )
+
+        if notes:
+            # bulk_create skips the pre_save render, so render the batch here.
+            rendered = render_markdown_many(notes.values())
+            Note.objects.bulk_create(
+                [Note(user=user, lesson_id=lid, content=content, content_html=html,
+                      markdown_key=markdown_key(content))
+                 for (lid, content), html in zip(notes.items(), rendered)],
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['content', 'content_html', 'markdown_key', 'updated_at'],
+            )
+
+        if bookmarks:
+            # A beacon may be retried; never store the same bookmark twice.
+            existing = set(
+                VideoBookmark.objects.filter(user=user, lesson_id__in={b[0] for b in bookmarks})
+                .values_list('lesson_id', 'timestamp_seconds', 'note')
+            )
+            VideoBookmark.objects.bulk_create(
+                VideoBookmark(user=user, lesson_id=lid, timestamp_seconds=seconds, note=note)
+                for lid, seconds, note in bookmarks if (lid, seconds, note) not in existing
+            )
+
+        if watched:
+            touched_courses = sorted({course_of(lid) for lid in watched})
+            progress.rebuild(course_ids=touched_courses, user_ids=[user.id])
+            _update_streak(user)
+            if completes:
+                _issue_certificates(user, sorted({course_of(lid) for lid in completes}))
+
+    return {
+        'status': 'ok',
+        'applied': len(views) + len(completes) + len(notes) + len(bookmarks),
+        'rejected': rejected,
+        'completed': sorted(completes),
+    }
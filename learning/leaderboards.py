@@ -0,0 +1,127 @@
+"""Materialized leaderboards (`LeaderboardEntry`).
+
+The leaderboard page used to aggregate activity per request and then fetch
+users, profiles and completion counts for the top 50. The boards are now
+computed by `refresh()` — the `refresh_leaderboards` command, run from cron —
+into one row per (board, user) carrying the rank and the numbers shown, so a
+page is one indexed range read plus one row for "my rank", however large the
+activity log grows.
+
+Boards:
+
+* ``all`` / ``month`` / ``week`` — site-wide, ranked by lessons viewed in the
+  window (from the daily activity rollup, learning/activity.py), with the
+  lessons completed in the same window;
+* ``course`` (one per published course) — ranked by lessons completed in that
+  course, from the per-course progress summaries.
+
+Ranks are unique (ties broken by user id) and each board is replaced in one
+transaction, so readers see either the old board or the new one. The streak
+is the live streak at refresh time.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+ALL, MONTH, WEEK, COURSE = 'all', 'month', 'week', 'course'
+# Site-wide boards and how many days back they reach (None: everything).
+WINDOWS = {ALL: None, MONTH: 30, WEEK: 7}
+TOP = 50
+
+
+def _tables():
+    from users.models import UserProfile
+    from .models import Course, LeaderboardEntry, UserCourseProgress, UserDailyActivity
+
+    q = connection.ops.quote_name
+    return {
+        'entry': q(LeaderboardEntry._meta.db_table),
+        'activity': q(UserDailyActivity._meta.db_table),
+        'progress': q(UserCourseProgress._meta.db_table),
+        'course': q(Course._meta.db_table),
+        'profile': q(UserProfile._meta.db_table),
+    }
+
+
+# Columns: board, course_id, user_id, rank, views, completed, streak, refreshed_at.
+_SITE_BOARD = """
+INSERT INTO {entry} (board, course_id, user_id, rank, views, completed, streak, refreshed_at)
+SELECT %(board)s, NULL, a.user_id,
+       ROW_NUMBER() OVER (ORDER BY a.views DESC, a.user_id),
+       a.views, a.completed,
+       CASE WHEN p.last_activity_date >= %(streak_since)s THEN p.current_streak ELSE 0 END,
+       %(now)s
+FROM (
+    SELECT user_id, SUM(lessons_viewed) AS views, SUM(lessons_completed) AS completed
+    FROM {activity}
+    WHERE %(since)s::date IS NULL OR day >= %(since)s::date
+    GROUP BY user_id
+    HAVING SUM(lessons_viewed) > 0
+) a
+LEFT JOIN {profile} p ON p.user_id = a.user_id
+"""
+
+_COURSE_BOARDS = """
+INSERT INTO {entry} (board, course_id, user_id, rank, views, completed, streak, refreshed_at)
+SELECT %(board)s, ucp.course_id, ucp.user_id,
+       ROW_NUMBER() OVER (PARTITION BY ucp.course_id ORDER BY ucp.completed_count DESC, ucp.user_id),
+       0, ucp.completed_count,
+       CASE WHEN p.last_activity_date >= %(streak_since)s THEN p.current_streak ELSE 0 END,
+       %(now)s
+FROM {progress} ucp
+JOIN {course} c ON c.id = ucp.course_id AND c.status = 'published'
+LEFT JOIN {profile} p ON p.user_id = ucp.user_id
+WHERE ucp.completed_count > 0
+"""
+
+
+def refresh(boards=None):
+    """Recompute the given boards (default: all of them). Returns
+    {board: rows written}."""
+    from .models import LeaderboardEntry
+    from .views import _today_uzt
+
+    boards = list(boards or [*WINDOWS, COURSE])
+    today = _today_uzt()
+    params = {'now': timezone.now(), 'streak_since': today - timedelta(days=1)}
+    tables = _tables()
+    written = {}
+    for board in boards:
+        if board == COURSE:
+            sql, extra = _COURSE_BOARDS, {}
+        else:
+            days = WINDOWS[board]
+            sql, extra = _SITE_BOARD, {'since': today - timedelta(days=days) if days else None}
+        with transaction.atomic(), connection.cursor() as cursor:
+            LeaderboardEntry.objects.filter(board=board).delete()
+            cursor.execute(sql.format(**tables), {**params, **extra, 'board': board})
+            written[board] = cursor.rowcount
+    # Every row was just replaced; without fresh statistics the planner reads
+    # a board through the wrong index until autovacuum gets around to it.
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {tables['entry']}")
+    return written
+
+
+def top(board, course=None, limit=TOP):
+    """The board's first `limit` entries, with users and avatars loaded."""
+    from .models import LeaderboardEntry
+
+    # Ranks run 1..n without gaps, so the rank bound keeps the join to `limit`
+    # rows even when the planner's statistics predate the last refresh.
+    return list(
+        LeaderboardEntry.objects.filter(board=board, course=course, rank__lte=limit)
+        .select_related('user__telegram_profile')
+        .order_by('rank')
+    )
+
+
+def entry_for(user, board, course=None):
+    """The user's row on the board, or None if they aren't ranked on it."""
+    from .models import LeaderboardEntry
+
+    entry = LeaderboardEntry.objects.filter(board=board, course=course, user=user).first()
+    if entry is not None:
+        entry.user = user  # reuse the (request) user and its cached profile
+    return entry
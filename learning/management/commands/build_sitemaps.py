@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from learning import sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenerate the sitemap files. Run it on deploy, and from cron with "
+        "--if-changed: content edits only mark the files dirty."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--if-changed', action='store_true',
+            help="Only rebuild when content changed since the last build.",
+        )
+
+    def handle(self, *args, **options):
+        totals = sitemaps.refresh(only_if_dirty=options['if_changed'])
+        if totals is None:
+            self.stdout.write(f"Sitemaps in {sitemaps.sitemap_dir()} are up to date.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Sitemaps in {sitemaps.sitemap_dir()}: {totals['files']} file(s), "
+            f"{totals['urls']} URL(s), {totals['written']} changed."
+        ))
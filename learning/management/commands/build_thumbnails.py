@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from learning import thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve course thumbnail sources and build the resized WebP/JPEG card "
+        "variants for every course whose variants are missing or out of date. "
+        "YouTube frames are downloaded once into the media cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Only build these courses (by slug). Defaults to all courses.',
+        )
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['slugs']:
+            from learning.models import Course
+            course_ids = list(
+                Course.objects.filter(slug__in=options['slugs']).values_list('id', flat=True)
+            )
+
+        def on_error(course, exc):
+            self.stderr.write(f'{course.thumbnail_source}: {exc}')
+
+        totals = thumbnails.build(course_ids, on_error=on_error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built thumbnails for {totals['built']} course(s); {totals['failed']} failed."
+        ))
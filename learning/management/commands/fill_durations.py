@@ -4,6 +4,7 @@ import requests
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
+from learning import site_stats
 from learning.models import Lesson
 
 YOUTUBE_API_URL = 'https://www.googleapis.com/youtube/v3/videos'
@@ -125,6 +126,8 @@ class Command(BaseCommand):
 
         if to_update:
             Lesson.objects.bulk_update(to_update, ['duration_seconds'])
+            # bulk_update skips the signals that keep total watch time current.
+            site_stats.reconcile([site_stats.WATCH_SECONDS])
 
         self.stdout.write(
             self.style.SUCCESS(
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from learning.catalog import catalog_path, get_catalog, rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = "Rebuild the memory-mapped course outline snapshot (run on deploy to warm it)."
+
+    def handle(self, *args, **options):
+        size = rebuild_catalog()
+        catalog = get_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f'Catalog written to {catalog_path()} ({size} bytes): '
+            f'{catalog.course_count} course(s), {catalog.module_count} module(s), '
+            f'{catalog.lesson_count} lesson(s).'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from learning import progress
+from learning.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the per-user course progress summaries (completion bitmaps, "
+        "next-lesson pointers) from LessonProgress — e.g. after lessons were "
+        "reordered or progress was edited in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Only rebuild these courses (by slug). Defaults to all courses.',
+        )
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['slugs']:
+            course_ids = list(
+                Course.objects.filter(slug__in=options['slugs']).values_list('id', flat=True)
+            )
+        written = progress.rebuild(course_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} course progress row(s).'))
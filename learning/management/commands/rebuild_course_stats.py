@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from learning import course_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized per-course card stats (lesson count, total "
+        "duration, student count) from Lesson and Enrollment."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Only rebuild these courses (by slug). Defaults to all courses.',
+        )
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['slugs']:
+            from learning.models import Course
+            course_ids = list(
+                Course.objects.filter(slug__in=options['slugs']).values_list('id', flat=True)
+            )
+        count = course_stats.rebuild(course_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} course(s).'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from learning import activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-user daily activity rollup (heatmap, leaderboard) "
+        "from LessonView and LessonProgress — to backfill it, or after views "
+        "were deleted or edited in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Only rebuild these users. Defaults to everyone.',
+        )
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                get_user_model().objects.filter(username__in=options['usernames'])
+                .values_list('id', flat=True)
+            )
+        written = activity.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily activity row(s).'))
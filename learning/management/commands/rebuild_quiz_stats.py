@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from learning import quiz_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-user quiz summaries (attempts used, best score, "
+        "unfinished attempt) from QuizAttempt — after attempts were deleted or "
+        "edited outside the quiz views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Only rebuild these users. Defaults to everyone.',
+        )
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                get_user_model().objects.filter(username__in=options['usernames'])
+                .values_list('id', flat=True)
+            )
+        written = quiz_stats.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} quiz summary row(s).'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from learning import streaks
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's current and longest streak from LessonView — "
+        "after imported history, timezone fixes, or views deleted in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Only recompute these users. Defaults to everyone with views.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the profiles that would change without writing them.',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=50,
+            help='How many differing profiles to list in a dry run (default 50).',
+        )
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                get_user_model().objects.filter(username__in=options['usernames'])
+                .values_list('id', flat=True)
+            )
+
+        shown = 0
+
+        def on_change(user_id, before, after):
+            nonlocal shown
+            if shown >= options['show']:
+                return
+            shown += 1
+            was = 'no profile' if before is None else '{} / {} (last {})'.format(*before)
+            self.stdout.write(f'user {user_id}: {was} → {after[0]} / {after[1]} (last {after[2]})')
+
+        totals = streaks.recompute(
+            user_ids,
+            dry_run=options['dry_run'],
+            on_change=on_change if options['dry_run'] else None,
+        )
+        summary = (
+            f"{totals['users']} user(s) checked, {totals['changed']} profile(s) differ, "
+            f"{totals['created']} missing"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run — {summary}; nothing written.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed streaks: {summary}.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from learning import ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored course ratings (average, count, sum, star "
+        "histogram) from CourseReview — after reviews were written around the "
+        "model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Only reconcile these courses (by slug). Defaults to all courses.',
+        )
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['slugs']:
+            from learning.models import Course
+            course_ids = list(
+                Course.objects.filter(slug__in=options['slugs']).values_list('id', flat=True)
+            )
+        fixed = ratings.rebuild(course_ids)
+        self.stdout.write(self.style.SUCCESS(f'Corrected the ratings of {fixed} course(s).'))
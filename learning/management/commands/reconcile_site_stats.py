@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from learning import site_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the site-wide counters (watch time, active users, lessons) "
+        "exactly from the source tables and collapse their shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing the exact values.',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            current = site_stats.totals()
+            changes = {
+                name: (current[name], exact)
+                for name, exact in site_stats.compute_exact().items()
+            }
+        else:
+            changes = site_stats.reconcile()
+
+        for name, (previous, exact) in changes.items():
+            drift = exact - previous
+            self.stdout.write(f'{name}: {previous} → {exact} (drift {drift:+d})')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run — counters left unchanged.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Site counters reconciled.'))
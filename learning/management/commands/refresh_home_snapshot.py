@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from learning.snapshots import HOME_SNAPSHOT_VERSION, refresh_home_snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached home-page snapshot (run from cron to keep trending counts fresh)."
+
+    def handle(self, *args, **options):
+        snapshot = refresh_home_snapshot()
+        cards = sum(len(snapshot[k]) for k in ('featured', 'trending', 'newest', 'top_rated'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Home snapshot v{HOME_SNAPSHOT_VERSION} rebuilt: {cards} row card(s), "
+            f"{len(snapshot['category_strips'])} category strip(s)."
+        ))
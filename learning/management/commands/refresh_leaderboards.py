@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning import leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the materialized leaderboards (site-wide all/month/week and "
+        "per-course). Run from cron, e.g. every 10 minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'boards',
+            nargs='*',
+            help='Only refresh these boards (all, month, week, course). Defaults to all of them.',
+        )
+
+    def handle(self, *args, **options):
+        known = [*leaderboards.WINDOWS, leaderboards.COURSE]
+        unknown = sorted(set(options['boards']) - set(known))
+        if unknown:
+            raise CommandError(f"Unknown board(s): {', '.join(unknown)}. Choose from {', '.join(known)}.")
+        written = leaderboards.refresh(options['boards'])
+        summary = ', '.join(f'{board}: {n}' for board, n in written.items())
+        self.stdout.write(self.style.SUCCESS(f'Refreshed leaderboards ({summary}).'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from learning import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored full-text search vectors of every course and "
+        "lesson. Needed after uz_normalize or the vector definition changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows rewritten per transaction (default 5000).',
+        )
+
+    def handle(self, *args, **options):
+        counts = search.reindex(options['batch_size'])
+        summary = ', '.join(f'{n} {label}' for label, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {summary}.'))
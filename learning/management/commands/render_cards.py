@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning import cards
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render the certificate images and course/path social cards into "
+        "the on-disk card cache, so no visitor waits for a drawing (deploy, or "
+        "after changing cards.LAYOUT)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds',
+            nargs='*',
+            help='Only render these kinds (certificate, course, path). Defaults to all of them.',
+        )
+        parser.add_argument(
+            '--formats',
+            nargs='+',
+            choices=list(cards.FORMATS),
+            default=['png'],
+            help='Image formats to render (default: png, which og:image links use).',
+        )
+
+    def handle(self, *args, **options):
+        known = [cards.CERTIFICATE, cards.COURSE, cards.PATH]
+        unknown = sorted(set(options['kinds']) - set(known))
+        if unknown:
+            raise CommandError(f"Unknown kind(s): {', '.join(unknown)}. Choose from {', '.join(known)}.")
+        drawn = present = 0
+        for card in cards.every_card(options['kinds']):
+            for fmt in options['formats']:
+                if card.path(fmt).exists():
+                    present += 1
+                else:
+                    cards.ensure(card, fmt)
+                    drawn += 1
+        self.stdout.write(self.style.SUCCESS(f'Rendered {drawn} image(s); {present} were already cached.'))
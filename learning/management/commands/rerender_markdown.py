@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from learning.utils import rerender_stale
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render the stored HTML of course, module, lesson and note Markdown "
+        "where it is missing or stale — after deploying a RENDERER_VERSION bump "
+        "or bulk edits that bypassed save()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows rendered per bulk update (default 500).',
+        )
+
+    def handle(self, *args, **options):
+        counts = rerender_stale(options['batch_size'])
+        summary = ', '.join(f'{n} {label}' for label, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Re-rendered {summary}.'))
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.6 on 2026-10-16 23:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_counters(apps, schema_editor):
+    SiteCounter = apps.get_model('learning', 'SiteCounter')
+    Lesson = apps.get_model('learning', 'Lesson')
+    LessonView = apps.get_model('learning', 'LessonView')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    exact = {
+        'watch_seconds': LessonView.objects.aggregate(
+            s=Sum('lesson__duration_seconds'))['s'] or 0,
+        'active_users': User.objects.filter(is_active=True).count(),
+        'lessons': Lesson.objects.count(),
+    }
+    SiteCounter.objects.bulk_create(
+        SiteCounter(name=name, shard=0, value=value) for name, value in exact.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0016_quizanswer_selected_choices_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('name', 'shard')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.6 on 2026-10-16 23:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_course_stats(apps, schema_editor):
+    Course = apps.get_model('learning', 'Course')
+    CourseStats = apps.get_model('learning', 'CourseStats')
+    Enrollment = apps.get_model('learning', 'Enrollment')
+    Lesson = apps.get_model('learning', 'Lesson')
+    lessons = {
+        row['module__course_id']: row
+        for row in Lesson.objects.order_by().values('module__course_id')
+        .annotate(n=Count('id'), s=Sum('duration_seconds'))
+    }
+    students = dict(
+        Enrollment.objects.order_by().values_list('course_id').annotate(n=Count('id'))
+    )
+    CourseStats.objects.bulk_create(
+        CourseStats(
+            course_id=cid,
+            lesson_count=lessons.get(cid, {}).get('n', 0),
+            total_duration=lessons.get(cid, {}).get('s') or 0,
+            student_count=students.get(cid, 0),
+        )
+        for cid in Course.objects.values_list('id', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0017_sitecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='learning.course')),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('last_content_change', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Course stats',
+            },
+        ),
+        migrations.RunPython(populate_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.6 on 2026-10-16 23:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def seed_course_progress(apps, schema_editor):
+    # Counts and last watch only; outline_version stays NULL so the bitmap and
+    # next-lesson pointer are rebuilt on first access (the outline order lives
+    # in the catalog snapshot, not here).
+    LessonProgress = apps.get_model('learning', 'LessonProgress')
+    UserCourseProgress = apps.get_model('learning', 'UserCourseProgress')
+    rows = (
+        LessonProgress.objects.order_by()
+        .values('user_id', 'lesson__module__course_id')
+        .annotate(done=Count('id', filter=Q(is_completed=True)), last=Max('last_watched_at'))
+    )
+    UserCourseProgress.objects.bulk_create(
+        (
+            UserCourseProgress(
+                user_id=row['user_id'], course_id=row['lesson__module__course_id'],
+                completed_count=row['done'], last_watched_at=row['last'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0018_coursestats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('completed_bitmap', models.BinaryField(default=b'')),
+                ('last_watched_at', models.DateTimeField(blank=True, null=True)),
+                ('outline_version', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress', to='learning.course')),
+                ('next_lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='learning.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_watched_at'], name='learning_us_user_id_56b3cd_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(seed_course_progress, migrations.RunPython.noop),
+    ]
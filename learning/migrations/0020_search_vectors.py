@@ -0,0 +1,57 @@
+# Generated by Django 6.0.6 on 2026-10-16 23:25
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import learning.search
+from django.conf import settings
+from django.db import migrations, models
+
+# Python twin: learning.search.normalize. Lowercases (Cyrillic explicitly, so
+# it doesn't depend on the database locale), spells word-initial е as "ye",
+# transliterates Cyrillic Uzbek to Latin and drops every apostrophe variant
+# along with ъ/ь.
+UZ_NORMALIZE = r"""
+CREATE OR REPLACE FUNCTION uz_normalize(text) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $fn$
+SELECT translate(
+    replace(replace(replace(replace(replace(replace(replace(
+        regexp_replace(
+            lower(translate($1,
+                'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯЎҚҒҲ',
+                'абвгдеёжзийклмнопрстуфхцчшщъыьэюяўқғҳ')),
+            '(^|[^а-яёўқғҳa-z0-9])е', '\1ye', 'g'),
+        'ё', 'yo'), 'ц', 'ts'), 'ч', 'ch'), 'ш', 'sh'), 'щ', 'sh'), 'ю', 'yu'), 'я', 'ya'),
+    'абвгдежзийклмнопрстуфхыэўқғҳ' || $q$'`´ʻʼ‘’ъь$q$,
+    'abvgdejziyklmnoprstufxieoqgh')
+$fn$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0019_usercourseprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(UZ_NORMALIZE, 'DROP FUNCTION IF EXISTS uz_normalize(text);'),
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(learning.search.UzNormalize('title'), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(learning.search.UzNormalize('subtitle'), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), '||', django.contrib.postgres.search.SearchVector(learning.search.UzNormalize('description'), config='simple', weight='C'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(learning.search.UzNormalize('title'), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(learning.search.UzNormalize('description'), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='course_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='lesson_search_gin'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.6 on 2026-10-17 05:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0021_rendered_markdown'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('lessons_viewed', models.PositiveIntegerField(default=0)),
+                ('lessons_completed', models.PositiveIntegerField(default=0)),
+                ('seconds_watched', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'User daily activity',
+                'indexes': [models.Index(fields=['day'], include=('user', 'lessons_viewed'), name='daily_activity_day_cover')],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.6 on 2026-10-17 05:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0022_user_daily_activity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('all', 'Hammasi'), ('month', 'Oy'), ('week', 'Hafta'), ('course', 'Kurs')], max_length=10)),
+                ('rank', models.PositiveIntegerField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('streak', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='learning.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Leaderboard entries',
+                'indexes': [models.Index(fields=['board', 'course', 'rank'], name='leaderboard_rank'), models.Index(fields=['board', 'course', 'user'], name='leaderboard_user')],
+            },
+        ),
+    ]
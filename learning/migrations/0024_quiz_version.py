@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0023_leaderboard_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
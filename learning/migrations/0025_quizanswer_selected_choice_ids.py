@@ -0,0 +1,59 @@
+# Generated by Django 6.0.6 on 2026-10-17 11:45
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def _tables(apps, schema_editor):
+    QuizAnswer = apps.get_model('learning', 'QuizAnswer')
+    QuizChoice = apps.get_model('learning', 'QuizChoice')
+    q = schema_editor.quote_name
+    return (
+        q(QuizAnswer._meta.db_table),
+        q(f'{QuizAnswer._meta.db_table}_selected_choices'),
+        q(QuizChoice._meta.db_table),
+    )
+
+
+def copy_selected_choices(apps, schema_editor):
+    # One set-based UPDATE; the join table can hold millions of rows.
+    answer, through, _ = _tables(apps, schema_editor)
+    schema_editor.execute(f"""
+        UPDATE {answer} AS a SET selected_choice_ids = s.ids
+        FROM (
+            SELECT quizanswer_id, array_agg(quizchoice_id ORDER BY quizchoice_id) AS ids
+            FROM {through} GROUP BY quizanswer_id
+        ) AS s
+        WHERE a.id = s.quizanswer_id
+    """)
+
+
+def restore_selected_choices(apps, schema_editor):
+    # Ids of choices deleted in the meantime have no row to point at.
+    answer, through, choice = _tables(apps, schema_editor)
+    schema_editor.execute(f"""
+        INSERT INTO {through} (quizanswer_id, quizchoice_id)
+        SELECT a.id, c.id
+        FROM {answer} AS a CROSS JOIN unnest(a.selected_choice_ids) AS s(choice_id)
+        JOIN {choice} AS c ON c.id = s.choice_id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0024_quiz_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizanswer',
+            name='selected_choice_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(copy_selected_choices, restore_selected_choices),
+        migrations.RemoveField(
+            model_name='quizanswer',
+            name='selected_choices',
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.6 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Cast, Coalesce, Floor, NullIf
+
+
+def seed_quiz_stats(apps, schema_editor):
+    # Same aggregation as quiz_stats.rebuild().
+    QuizAttempt = apps.get_model('learning', 'QuizAttempt')
+    UserQuizStats = apps.get_model('learning', 'UserQuizStats')
+    finished = Q(completed_at__isnull=False)
+    percentage = Coalesce(Cast(Floor(F('score') * 100 / NullIf(F('max_score'), 0)), models.IntegerField()), 0)
+    rows = (
+        QuizAttempt.objects.order_by().values('user_id', 'quiz_id')
+        .annotate(used=Count('id', filter=finished), best=Max(percentage, filter=finished),
+                  open=Max('id', filter=~finished))
+    )
+    UserQuizStats.objects.bulk_create(
+        (
+            UserQuizStats(
+                user_id=row['user_id'], quiz_id=row['quiz_id'], attempts_used=row['used'],
+                best_percentage=row['best'], in_progress_attempt_id=row['open'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0025_quizanswer_selected_choice_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserQuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts_used', models.PositiveIntegerField(default=0)),
+                ('best_percentage', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('in_progress_attempt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='learning.quizattempt')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='learning.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'quiz')},
+            },
+        ),
+        migrations.RunPython(seed_quiz_stats, migrations.RunPython.noop),
+    ]
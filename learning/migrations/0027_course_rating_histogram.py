@@ -0,0 +1,65 @@
+# Generated by Django 6.0.6 on 2026-10-17 13:10
+
+from django.db import migrations, models
+
+
+def seed_rating_histogram(apps, schema_editor):
+    # Same numbers as ratings.rebuild(); avg_rating and rating_count were
+    # already maintained.
+    Course = apps.get_model('learning', 'Course')
+    CourseReview = apps.get_model('learning', 'CourseReview')
+    q = schema_editor.quote_name
+    schema_editor.execute(f"""
+        UPDATE {q(Course._meta.db_table)} AS c
+        SET rating_sum = r.s, stars_1 = r.s1, stars_2 = r.s2, stars_3 = r.s3, stars_4 = r.s4, stars_5 = r.s5
+        FROM (
+            SELECT course_id, SUM(rating) AS s,
+                   COUNT(*) FILTER (WHERE rating = 1) AS s1, COUNT(*) FILTER (WHERE rating = 2) AS s2,
+                   COUNT(*) FILTER (WHERE rating = 3) AS s3, COUNT(*) FILTER (WHERE rating = 4) AS s4,
+                   COUNT(*) FILTER (WHERE rating = 5) AS s5
+            FROM {q(CourseReview._meta.db_table)}
+            GROUP BY course_id
+        ) AS r
+        WHERE c.id = r.course_id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0026_user_quiz_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(seed_rating_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.6 on 2026-10-17 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def resolve_thumbnail_sources(apps, schema_editor):
+    # Same rule as thumbnails.resolve(): the upload, else the very first
+    # lesson's YouTube frame. The variants are left to build_thumbnails.
+    Course = apps.get_model('learning', 'Course')
+    Lesson = apps.get_model('learning', 'Lesson')
+    first_video = dict(
+        Lesson.objects.order_by('module__course_id', 'module__order', 'module_id', 'order', 'id')
+        .distinct('module__course_id')
+        .values_list('module__course_id', 'youtube_video_id')
+    )
+    courses = []
+    for course in Course.objects.only('id', 'thumbnail'):
+        if course.thumbnail:
+            course.thumbnail_source = course.thumbnail.url
+        elif first_video.get(course.id):
+            course.thumbnail_source = settings.YOUTUBE_THUMBNAIL_URL.format(video_id=first_video[course.id])
+        else:
+            continue
+        courses.append(course)
+    Course.objects.bulk_update(courses, ['thumbnail_source'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0027_course_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='thumbnail_source',
+            field=models.CharField(blank=True, editable=False, max_length=500),
+        ),
+        migrations.RunPython(resolve_thumbnail_sources, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.6 on 2026-10-17 15:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def date_from_publication(apps, schema_editor):
+    # The column defaults to the migration time; the publication date is a
+    # better lastmod for content nobody has edited since.
+    Course = apps.get_model('learning', 'Course')
+    Lesson = apps.get_model('learning', 'Lesson')
+    Course.objects.filter(published_at__isnull=False).update(updated_at=models.F('published_at'))
+    published = Course.objects.filter(modules=OuterRef('module_id')).values('published_at')
+    Lesson.objects.filter(module__course__published_at__isnull=False).update(updated_at=Subquery(published))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0028_course_thumbnail_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(date_from_publication, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,17 @@
 import secrets
 import django.core.validators
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Count
-from django.db.models.signals import post_delete, post_save
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search
 
 User = get_user_model()
 
@@ -25,6 +31,7 @@ class Category(models.Model):
         help_text="Tailwind-ish accent color name (emerald, amber, sky, rose, violet, slate)",
     )
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'name']
@@ -56,6 +63,10 @@ class Course(models.Model):
     subtitle = models.CharField(max_length=255, blank=True)
     description = models.TextField(blank=True)
     thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
+    # The upload's URL or the first lesson's YouTube frame, and the key of the
+    # resized copies built from it; see learning/thumbnails.py.
+    thumbnail_source = models.CharField(max_length=500, blank=True, editable=False)
+    thumbnail_key = models.CharField(max_length=40, blank=True, editable=False)
     order = models.PositiveIntegerField(default=0)
 
     category = models.ForeignKey(
@@ -86,8 +97,28 @@ class Course(models.Model):
     is_featured = models.BooleanField(default=False)
     avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     rating_count = models.PositiveIntegerField(default=0)
+    # Maintained from CourseReview signals; see learning/ratings.py.
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='published', db_index=True)
     published_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Moved by edits to what the public pages show besides the course row
+    # itself (outline, reviews, announcements); see learning/conditional.py.
+    content_changed_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Rendered Markdown, refreshed on save; see learning/utils.py.
+    description_html = models.TextField(blank=True, editable=False)
+    markdown_key = models.CharField(max_length=40, blank=True, editable=False)
+    # Maintained by PostgreSQL; see learning/search.py.
+    search_vector = models.GeneratedField(
+        expression=search.vector(('title', 'A'), ('subtitle', 'B'), ('description', 'C')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         ordering = ['order']
@@ -95,8 +126,11 @@ class Course(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['category', 'order']),
             models.Index(fields=['status', '-published_at']),
+            GinIndex(fields=['search_vector'], name='course_search_gin'),
         ]
 
+    MARKDOWN_FIELDS = {'description': 'description_html'}
+
     def __str__(self):
         return self.title
 
@@ -116,19 +150,15 @@ class Course(models.Model):
         super().save(*args, **kwargs)
 
     def get_thumbnail_url(self):
-        """Return manual thumbnail if uploaded, else first lesson's YouTube thumbnail."""
-        if self.thumbnail:
-            return self.thumbnail.url
-        first_lesson = (
-            Lesson.objects
-            .filter(module__course=self)
-            .order_by('module__order', 'order')
-            .values_list('youtube_video_id', flat=True)
-            .first()
-        )
-        if first_lesson:
-            return f'https://img.youtube.com/vi/{first_lesson}/hqdefault.jpg'
-        return None
+        """The uploaded thumbnail, else the first lesson's YouTube frame — as a
+        local resized copy once built. Reads stored fields only."""
+        from . import thumbnails
+        return thumbnails.url(self)
+
+    @property
+    def thumbnail_srcset(self):
+        from . import thumbnails
+        return thumbnails.srcset(self)
 
     @property
     def what_you_learn_list(self):
@@ -146,11 +176,22 @@ class Course(models.Model):
             return full or self.instructor.username
         return "Ochiq kurs jamoasi"
 
+    @property
+    def rating_breakdown(self):
+        """[{star, count, percent}] from 5 stars down to 1."""
+        total = self.rating_count
+        return [
+            {'star': star, 'count': count, 'percent': int(count / total * 100) if total else 0}
+            for star in range(5, 0, -1)
+            for count in [getattr(self, f'stars_{star}')]
+        ]
+
     def update_rating(self):
-        agg = self.reviews.aggregate(avg=Avg('rating'), c=Count('id'))
-        self.avg_rating = round(agg['avg'] or 0, 2)
-        self.rating_count = agg['c'] or 0
-        self.save(update_fields=['avg_rating', 'rating_count'])
+        """Recompute the rating fields from the reviews (the incremental
+        maintenance in learning/ratings.py makes this a repair tool)."""
+        from . import ratings
+        ratings.rebuild([self.pk])
+        self.refresh_from_db(fields=ratings.FIELDS)
 
 
 class Module(models.Model):
@@ -163,6 +204,8 @@ class Module(models.Model):
         on_delete=models.CASCADE,
     )
     order = models.PositiveIntegerField(default=0)
+    description_html = models.TextField(blank=True, editable=False)
+    markdown_key = models.CharField(max_length=40, blank=True, editable=False)
 
     class Meta:
         ordering = ['order']
@@ -171,6 +214,8 @@ class Module(models.Model):
             models.Index(fields=['course', 'order']),
         ]
 
+    MARKDOWN_FIELDS = {'description': 'description_html'}
+
     def __str__(self):
         return f"{self.course.title} > {self.title}"
 
@@ -196,14 +241,26 @@ class Lesson(models.Model):
     duration_seconds = models.PositiveIntegerField(null=True, blank=True)
     order = models.PositiveIntegerField(default=0)
     is_preview = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=search.vector(('title', 'A'), ('description', 'B')),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    description_html = models.TextField(blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    markdown_key = models.CharField(max_length=40, blank=True, editable=False)
 
     class Meta:
         ordering = ['order']
         unique_together = [('module', 'slug')]
         indexes = [
             models.Index(fields=['module', 'order']),
+            GinIndex(fields=['search_vector'], name='lesson_search_gin'),
         ]
 
+    MARKDOWN_FIELDS = {'description': 'description_html', 'content': 'content_html'}
+
     def __str__(self):
         return f"{self.module.title} – {self.title}"
 
@@ -231,7 +288,8 @@ class LessonProgress(models.Model):
 class LessonView(models.Model):
     """One row per (user, lesson, day) — driven by 'video started playing' on the lesson page.
 
-    This is the single source of truth for the activity graph and streak.
+    This is the source of truth for the activity graph and streak; pages read
+    its per-day rollup, UserDailyActivity (learning/activity.py).
     Multiple plays of the same lesson on the same day collapse into one row.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_views')
@@ -262,6 +320,8 @@ class Note(models.Model):
         related_name='notes',
     )
     content = models.TextField()
+    content_html = models.TextField(blank=True, editable=False)
+    markdown_key = models.CharField(max_length=40, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -271,6 +331,8 @@ class Note(models.Model):
             models.Index(fields=['user', 'lesson']),
         ]
 
+    MARKDOWN_FIELDS = {'content': 'content_html'}
+
     def __str__(self):
         return f"{self.user.username} – note for {self.lesson.title}"
 
@@ -310,12 +372,38 @@ class CourseReview(models.Model):
         return f"{self.user.username} → {self.course.title} ({self.rating}★)"
 
 
-@receiver(post_save, sender=CourseReview)
-@receiver(post_delete, sender=CourseReview)
-def _sync_course_rating(sender, instance, **kwargs):
-    """Keep Course.avg_rating / rating_count in sync whenever a review is saved or
-    deleted (e.g. from the admin), not only via the submit_review view."""
-    instance.course.update_rating()
+@receiver(pre_save, sender=CourseReview, dispatch_uid='course_rating_review_presave')
+def _remember_review_rating(sender, instance, raw=False, **kwargs):
+    """Stash (course id, rating) as stored before this save; post_save moves
+    the course counters by the difference."""
+    instance._rating_old = None
+    if instance.pk and not raw:
+        instance._rating_old = (
+            CourseReview.objects.filter(pk=instance.pk).values_list('course_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=CourseReview, dispatch_uid='course_rating_review_saved')
+def _sync_course_rating(sender, instance, created, raw=False, **kwargs):
+    """Keep the course's rating fields in sync whenever a review is saved
+    (from submit_review or the admin), with deltas instead of a re-aggregate."""
+    if raw:
+        return
+    from . import ratings
+    old = getattr(instance, '_rating_old', None)
+    if old is None:
+        ratings.apply(instance.course_id, added=instance.rating)
+    elif old[0] != instance.course_id:
+        ratings.apply(old[0], removed=old[1])
+        ratings.apply(instance.course_id, added=instance.rating)
+    elif old[1] != instance.rating:
+        ratings.apply(instance.course_id, added=instance.rating, removed=old[1])
+
+
+@receiver(post_delete, sender=CourseReview, dispatch_uid='course_rating_review_deleted')
+def _course_rating_review_deleted(sender, instance, **kwargs):
+    from . import ratings
+    ratings.apply(instance.course_id, removed=instance.rating)
 
 
 def _generate_cert_code():
@@ -433,6 +521,9 @@ class Quiz(models.Model):
     pass_percent = models.PositiveIntegerField(default=70, help_text="Foizda (0-100)")
     max_attempts = models.PositiveIntegerField(default=0, help_text="0 = cheksiz urinish")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every question/choice change; compiled answer keys
+    # (learning/quiz_keys.py) are cached under it.
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -500,9 +591,10 @@ class QuizAnswer(models.Model):
     attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
     question = models.ForeignKey(QuizQuestion, on_delete=models.CASCADE)
     # Single-choice / true_false answers use selected_choice; multi_select answers
-    # use selected_choices (the M2M). is_correct is the graded verdict either way.
+    # keep the picked choice ids in selected_choice_ids, written with the row
+    # itself (no join table). is_correct is the graded verdict either way.
     selected_choice = models.ForeignKey(QuizChoice, on_delete=models.CASCADE, null=True, blank=True)
-    selected_choices = models.ManyToManyField(QuizChoice, blank=True, related_name='+')
+    selected_choice_ids = ArrayField(models.IntegerField(), default=list, blank=True)
     is_correct = models.BooleanField(default=False)
 
     class Meta:
@@ -511,6 +603,34 @@ class QuizAnswer(models.Model):
     def __str__(self):
         return f"Q{self.question_id}: {'✓' if self.is_correct else '✗'}"
 
+    @property
+    def selected_ids(self):
+        """Every picked choice id, whichever field holds it. Ids of choices
+        deleted since simply match nothing."""
+        ids = set(self.selected_choice_ids)
+        if self.selected_choice_id:
+            ids.add(self.selected_choice_id)
+        return ids
+
+
+class UserQuizStats(models.Model):
+    """Per (user, quiz) summary of attempts, kept current by start_quiz and
+    _finalize_quiz_attempt (learning/quiz_stats.py) so quiz pages don't load
+    the attempt history to count it."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_stats')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='user_stats')
+    attempts_used = models.PositiveIntegerField(default=0)  # finished attempts
+    best_percentage = models.PositiveSmallIntegerField(null=True, blank=True)
+    in_progress_attempt = models.ForeignKey(
+        QuizAttempt, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+
+    class Meta:
+        unique_together = [('user', 'quiz')]
+
+    def __str__(self):
+        return f"{self.user_id} – quiz {self.quiz_id}: {self.attempts_used} attempt(s)"
+
 
 # ═══════════════════════════════════════════════════════════════
 # Learning Path Models
@@ -524,6 +644,7 @@ class LearningPath(models.Model):
     order = models.PositiveIntegerField(default=0)
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'title']
@@ -602,3 +723,555 @@ class VideoBookmark(models.Model):
         if h:
             return f"{h}:{m:02d}:{s:02d}"
         return f"{m}:{s:02d}"
+
+
+# ═══════════════════════════════════════════════════════════════
+# Course card statistics
+# ═══════════════════════════════════════════════════════════════
+
+class CourseStats(models.Model):
+    """Denormalized per-course numbers shown on every course card.
+
+    Kept current by the Lesson / Module / Enrollment signals below, so listing
+    pages read (and sort on) plain indexed columns instead of aggregating
+    lessons and enrollments per request. `rebuild_course_stats` recomputes
+    them exactly (see learning/course_stats.py).
+    """
+    course = models.OneToOneField(
+        Course, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+    )
+    lesson_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0, db_index=True)
+    # Bumped whenever the course's module/lesson structure changes.
+    last_content_change = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'Course stats'
+
+    def __str__(self):
+        return f"{self.course_id}: {self.lesson_count} lessons, {self.student_count} students"
+
+
+@receiver(post_save, sender=Course, dispatch_uid='course_stats_course_created')
+def _create_course_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseStats.objects.get_or_create(course=instance)
+
+
+@receiver(pre_save, sender=Lesson, dispatch_uid='lesson_stats_presave')
+def _remember_lesson_state(sender, instance, raw=False, **kwargs):
+    """Stash (duration, course id) as stored before this save; both the course
+    stats and the site counters apply the difference in post_save."""
+    instance._stats_old = None
+    if instance.pk and not raw:
+        row = (
+            Lesson.objects.filter(pk=instance.pk)
+            .values_list('duration_seconds', 'module__course_id').first()
+        )
+        if row:
+            instance._stats_old = (row[0] or 0, row[1])
+
+
+@receiver(post_save, sender=Lesson, dispatch_uid='course_stats_lesson_saved')
+def _course_stats_lesson_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from . import course_stats
+    course_id = Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).first()
+    duration = instance.duration_seconds or 0
+    old = getattr(instance, '_stats_old', None)
+    if created or old is None:
+        course_stats.bump(course_id, lesson_count=1, total_duration=duration)
+    elif old[1] != course_id:  # moved to another course's module
+        course_stats.bump(old[1], lesson_count=-1, total_duration=-old[0])
+        course_stats.bump(course_id, lesson_count=1, total_duration=duration)
+    else:
+        course_stats.bump(course_id, total_duration=duration - old[0])
+
+
+@receiver(pre_delete, sender=Lesson, dispatch_uid='course_stats_lesson_predelete')
+def _remember_lesson_course(sender, instance, **kwargs):
+    # Resolved before the delete: by post_delete a cascading course delete
+    # may already have removed the module.
+    instance._stats_course_id = (
+        Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).first()
+    )
+
+
+@receiver(post_delete, sender=Lesson, dispatch_uid='course_stats_lesson_deleted')
+def _course_stats_lesson_deleted(sender, instance, **kwargs):
+    from . import course_stats
+    course_stats.bump(
+        getattr(instance, '_stats_course_id', None),
+        lesson_count=-1, total_duration=-(instance.duration_seconds or 0),
+    )
+
+
+@receiver(pre_save, sender=Module, dispatch_uid='course_stats_module_presave')
+def _remember_module_course(sender, instance, raw=False, **kwargs):
+    instance._stats_old_course_id = None
+    if instance.pk and not raw:
+        instance._stats_old_course_id = (
+            Module.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Module, dispatch_uid='course_stats_module_saved')
+def _course_stats_module_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from . import course_stats
+    old_course_id = getattr(instance, '_stats_old_course_id', None)
+    if old_course_id and old_course_id != instance.course_id:
+        # Whole module (and its lessons) moved between courses.
+        course_stats.rebuild([old_course_id, instance.course_id])
+    course_stats.bump(instance.course_id)
+
+
+@receiver(post_delete, sender=Module, dispatch_uid='course_stats_module_deleted')
+def _course_stats_module_deleted(sender, instance, **kwargs):
+    # The lessons' own delete signals already took their counts off.
+    from . import course_stats
+    course_stats.bump(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment, dispatch_uid='course_stats_enrollment_saved')
+def _course_stats_enrolled(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from . import course_stats
+        course_stats.bump(instance.course_id, touch=False, student_count=1)
+
+
+@receiver(post_delete, sender=Enrollment, dispatch_uid='course_stats_enrollment_deleted')
+def _course_stats_unenrolled(sender, instance, **kwargs):
+    from . import course_stats
+    course_stats.bump(instance.course_id, touch=False, student_count=-1)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Per-user course progress summary
+# ═══════════════════════════════════════════════════════════════
+
+class UserCourseProgress(models.Model):
+    """How far one user is through one course (see learning/progress.py).
+
+    `completed_bitmap` has bit i set when the i-th lesson of the course, in
+    outline order, is completed; `outline_version` is the course's
+    CourseStats.last_content_change the bitmap was built against.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_progress')
+    completed_count = models.PositiveIntegerField(default=0)
+    completed_bitmap = models.BinaryField(default=b'')
+    last_watched_at = models.DateTimeField(null=True, blank=True)
+    next_lesson = models.ForeignKey(
+        Lesson, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+    )
+    outline_version = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [('user', 'course')]
+        indexes = [models.Index(fields=['user', '-last_watched_at'])]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.course_id}: {self.completed_count} done"
+
+
+@receiver(post_save, sender=LessonProgress, dispatch_uid='course_progress_lesson_progress_saved')
+def _sync_course_progress(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Fold every LessonProgress write (view, completion, quiz pass, admin)
+    into the user's course summary, inside the same transaction. Deletes only
+    happen by cascade or in the admin, which rebuilds the affected rows."""
+    if not raw:
+        from .progress import apply_lesson_progress
+        # A save limited to other fields leaves the stored last_watched_at
+        # alone even though auto_now bumped the in-memory value.
+        watched = update_fields is None or 'last_watched_at' in update_fields
+        apply_lesson_progress(instance, watched=watched)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Daily activity rollup and leaderboards
+# ═══════════════════════════════════════════════════════════════
+
+class UserDailyActivity(models.Model):
+    """A user's learning activity on one (Asia/Tashkent) day, maintained by
+    the progress endpoints; see learning/activity.py."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    lessons_viewed = models.PositiveIntegerField(default=0)
+    lessons_completed = models.PositiveIntegerField(default=0)
+    seconds_watched = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('user', 'day')]
+        indexes = [
+            # Leaderboard windows: index-only scans over a day range.
+            models.Index(fields=['day'], include=['user', 'lessons_viewed'],
+                         name='daily_activity_day_cover'),
+        ]
+        verbose_name_plural = 'User daily activity'
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.lessons_viewed} viewed"
+
+
+class LeaderboardEntry(models.Model):
+    """A user's place on a materialized leaderboard; `course` is set only on
+    per-course boards. Rewritten wholesale by learning/leaderboards.py."""
+    BOARD_CHOICES = [
+        ('all', 'Hammasi'),
+        ('month', 'Oy'),
+        ('week', 'Hafta'),
+        ('course', 'Kurs'),
+    ]
+
+    board = models.CharField(max_length=10, choices=BOARD_CHOICES)
+    course = models.ForeignKey(Course, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    rank = models.PositiveIntegerField()
+    views = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    streak = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', 'course', 'rank'], name='leaderboard_rank'),
+            models.Index(fields=['board', 'course', 'user'], name='leaderboard_user'),
+        ]
+        verbose_name_plural = 'Leaderboard entries'
+
+    def __str__(self):
+        return f"{self.board}{f'/{self.course_id}' if self.course_id else ''} #{self.rank}: {self.user_id}"
+
+
+# ═══════════════════════════════════════════════════════════════
+# Site-wide counters
+# ═══════════════════════════════════════════════════════════════
+
+class SiteCounter(models.Model):
+    """One shard of a site-wide running total (see learning/site_stats.py).
+
+    A counter's value is the sum of its shards. Writers bump a random shard
+    so concurrent lesson views don't queue up on a single hot row.
+    """
+    name = models.CharField(max_length=40)
+    shard = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('name', 'shard')]
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.value}"
+
+
+@receiver(post_save, sender=LessonView, dispatch_uid='site_stats_lesson_view_saved')
+def _count_lesson_view(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from . import site_stats
+        site_stats.incr(site_stats.WATCH_SECONDS, instance.lesson.duration_seconds or 0)
+
+
+@receiver(post_save, sender=Lesson, dispatch_uid='site_stats_lesson_saved')
+def _count_lesson_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from . import site_stats
+    if created:
+        site_stats.incr(site_stats.LESSONS, 1)
+        return
+    old = getattr(instance, '_stats_old', None)
+    new_duration = instance.duration_seconds or 0
+    if old is not None and old[0] != new_duration:
+        # Watch time is Σ views × duration, so a corrected duration shifts the
+        # total by the difference once per recorded view of this lesson.
+        views = LessonView.objects.filter(lesson=instance).count()
+        site_stats.incr(site_stats.WATCH_SECONDS, (new_duration - old[0]) * views)
+
+
+@receiver(pre_delete, sender=Lesson, dispatch_uid='site_stats_lesson_deleted')
+def _count_lesson_deleted(sender, instance, **kwargs):
+    # pre_delete: the lesson's views are cascaded away with it and must still
+    # be countable here.
+    from . import site_stats
+    views = LessonView.objects.filter(lesson=instance).count()
+    site_stats.incr(site_stats.LESSONS, -1)
+    site_stats.incr(site_stats.WATCH_SECONDS, -(instance.duration_seconds or 0) * views)
+
+
+@receiver(pre_save, sender=User, dispatch_uid='site_stats_user_presave')
+def _remember_user_active(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_was_active = None
+    # Logins save only last_login; skip the lookup unless is_active may change.
+    if instance.pk and not raw and (update_fields is None or 'is_active' in update_fields):
+        instance._stats_was_active = (
+            User.objects.filter(pk=instance.pk)
+            .values_list('is_active', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=User, dispatch_uid='site_stats_user_saved')
+def _count_user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from . import site_stats
+    if created:
+        if instance.is_active:
+            site_stats.incr(site_stats.ACTIVE_USERS, 1)
+        return
+    was_active = getattr(instance, '_stats_was_active', None)
+    if was_active is not None and was_active != instance.is_active:
+        site_stats.incr(site_stats.ACTIVE_USERS, 1 if instance.is_active else -1)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='site_stats_user_deleted')
+def _count_user_deleted(sender, instance, **kwargs):
+    from . import site_stats
+    if instance.is_active:
+        site_stats.incr(site_stats.ACTIVE_USERS, -1)
+    watched = (
+        LessonView.objects.filter(user=instance)
+        .aggregate(s=Sum('lesson__duration_seconds'))['s']
+    )
+    if watched:
+        site_stats.incr(site_stats.WATCH_SECONDS, -watched)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Course thumbnail source
+# ═══════════════════════════════════════════════════════════════
+
+# Saves limited to other fields can't change a course's upload or which
+# lesson comes first.
+_THUMBNAIL_FIELDS = frozenset({'thumbnail', 'youtube_video_id', 'order', 'module', 'course'})
+
+
+def _outline_course_ids(sender, instance):
+    """The courses a Module or Lesson write affects: its course and, after a
+    move, the one it left (from the course-stats pre_save/pre_delete stashes)."""
+    if sender is Module:
+        course_ids = {instance.course_id, getattr(instance, '_stats_old_course_id', None)}
+    else:
+        old = getattr(instance, '_stats_old', None)
+        course_ids = {
+            getattr(instance, '_stats_course_id', None)
+            or Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True).first(),
+            old[1] if old else None,
+        }
+    course_ids.discard(None)
+    return course_ids
+
+
+def _resolve_course_thumbnail(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-resolve Course.thumbnail_source after the upload or the head of the
+    outline may have changed (learning/thumbnails.py)."""
+    if raw or (update_fields and not _THUMBNAIL_FIELDS & set(update_fields)):
+        return
+    from . import thumbnails
+    course_ids = {instance.pk} if sender is Course else _outline_course_ids(sender, instance)
+    if course_ids:
+        thumbnails.resolve(course_ids)
+
+
+for _sender in (Course, Module, Lesson):
+    post_save.connect(_resolve_course_thumbnail, sender=_sender,
+                      dispatch_uid=f'thumbnail_save_{_sender.__name__}')
+for _sender in (Module, Lesson):
+    post_delete.connect(_resolve_course_thumbnail, sender=_sender,
+                        dispatch_uid=f'thumbnail_delete_{_sender.__name__}')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Public page version stamps
+# ═══════════════════════════════════════════════════════════════
+
+def _touch_course_pages(sender, instance, raw=False, **kwargs):
+    """Move Course.content_changed_at when something its public pages show
+    changes outside the course row (learning/conditional.py)."""
+    if raw:
+        return
+    from . import conditional
+    if sender is Announcement:
+        # A global announcement is shown on every course page.
+        conditional.touch(None if instance.course_id is None else [instance.course_id])
+    elif sender is CourseReview:
+        conditional.touch([instance.course_id])
+    else:
+        conditional.touch(_outline_course_ids(sender, instance))
+
+
+for _sender in (Module, Lesson, CourseReview, Announcement):
+    post_save.connect(_touch_course_pages, sender=_sender,
+                      dispatch_uid=f'page_stamp_save_{_sender.__name__}')
+    post_delete.connect(_touch_course_pages, sender=_sender,
+                        dispatch_uid=f'page_stamp_delete_{_sender.__name__}')
+
+
+def _touch_path_page(sender, instance, raw=False, **kwargs):
+    if not raw:
+        LearningPath.objects.filter(pk=instance.path_id).update(updated_at=timezone.now())
+
+
+post_save.connect(_touch_path_page, sender=LearningPathCourse, dispatch_uid='page_stamp_save_LearningPathCourse')
+post_delete.connect(_touch_path_page, sender=LearningPathCourse, dispatch_uid='page_stamp_delete_LearningPathCourse')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Anonymous page cache purge
+# ═══════════════════════════════════════════════════════════════
+
+def _page_cache_tags(sender, instance):
+    from . import page_cache
+    if sender is Course:
+        return [f'course:{instance.pk}', page_cache.COURSES]
+    if sender in (Module, Lesson):
+        return [f'course:{pk}' for pk in _outline_course_ids(sender, instance)] + [page_cache.COURSES]
+    if sender is CourseReview:
+        return [f'course:{instance.course_id}', page_cache.COURSES]
+    if sender is Announcement:
+        return [f'course:{instance.course_id}' if instance.course_id else page_cache.ANNOUNCEMENTS]
+    if sender is Category:
+        return [f'category:{instance.pk}', page_cache.CATEGORIES]
+    return [page_cache.PATHS]
+
+
+def _purge_page_cache(sender, instance, raw=False, **kwargs):
+    """Purge the anonymous pages showing `instance` (learning/page_cache.py),
+    now and again on commit, as for the snapshots below."""
+    if raw:
+        return
+    from . import page_cache
+    tags = _page_cache_tags(sender, instance)
+    page_cache.purge(*tags)
+    transaction.on_commit(lambda: page_cache.purge(*tags))
+
+
+for _sender in (
+    Category, Course, Module, Lesson, CourseReview, Announcement,
+    LearningPath, LearningPathCourse,
+):
+    post_save.connect(_purge_page_cache, sender=_sender,
+                      dispatch_uid=f'page_cache_save_{_sender.__name__}')
+    post_delete.connect(_purge_page_cache, sender=_sender,
+                        dispatch_uid=f'page_cache_delete_{_sender.__name__}')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Home snapshot invalidation
+# ═══════════════════════════════════════════════════════════════
+
+def _invalidate_home_snapshot(sender, **kwargs):
+    """Drop the cached home snapshot when anything it renders changes; the next
+    home request rebuilds it. Dropped again on commit so a request that rebuilt
+    it from pre-commit data in the meantime can't leave a stale copy behind."""
+    from .snapshots import invalidate_home_snapshot
+    invalidate_home_snapshot()
+    transaction.on_commit(invalidate_home_snapshot)
+
+
+for _sender in (
+    Category, Course, Module, Lesson, CourseReview, Announcement,
+    LearningPath, LearningPathCourse,
+):
+    post_save.connect(_invalidate_home_snapshot, sender=_sender,
+                      dispatch_uid=f'home_snapshot_save_{_sender.__name__}')
+    post_delete.connect(_invalidate_home_snapshot, sender=_sender,
+                        dispatch_uid=f'home_snapshot_delete_{_sender.__name__}')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Catalog snapshot invalidation
+# ═══════════════════════════════════════════════════════════════
+
+# Course fields that don't appear in the outline snapshot; saves touching only
+# these (e.g. the rating fields) keep the current file.
+_CATALOG_IRRELEVANT_COURSE_FIELDS = frozenset({
+    'avg_rating', 'rating_count', 'rating_sum', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5',
+})
+
+
+def _invalidate_catalog(sender, update_fields=None, **kwargs):
+    """Unlink the mmap'd outline snapshot; the next reader rebuilds it. Done
+    again on commit, for the same reason as the home snapshot above."""
+    if sender is Course and update_fields and set(update_fields) <= _CATALOG_IRRELEVANT_COURSE_FIELDS:
+        return
+    from .catalog import invalidate_catalog
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
+
+
+for _sender in (Category, Course, Module, Lesson):
+    post_save.connect(_invalidate_catalog, sender=_sender,
+                      dispatch_uid=f'catalog_save_{_sender.__name__}')
+    post_delete.connect(_invalidate_catalog, sender=_sender,
+                        dispatch_uid=f'catalog_delete_{_sender.__name__}')
+# A (re)created database — e.g. the test database — never matches a file left
+# over from an earlier one.
+post_migrate.connect(_invalidate_catalog, dispatch_uid='catalog_post_migrate')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Sitemap invalidation
+# ═══════════════════════════════════════════════════════════════
+
+def _invalidate_sitemaps(sender, update_fields=None, **kwargs):
+    """Mark the sitemap files dirty; `build_sitemaps --if-changed` regenerates
+    them out of band. Done again on commit, as for the snapshots above."""
+    if sender is Course and update_fields and set(update_fields) <= _CATALOG_IRRELEVANT_COURSE_FIELDS:
+        return
+    from .sitemaps import mark_dirty
+    mark_dirty()
+    transaction.on_commit(mark_dirty)
+
+
+for _sender in (Category, Course, Module, Lesson, LearningPath, LearningPathCourse):
+    post_save.connect(_invalidate_sitemaps, sender=_sender,
+                      dispatch_uid=f'sitemap_save_{_sender.__name__}')
+    post_delete.connect(_invalidate_sitemaps, sender=_sender,
+                        dispatch_uid=f'sitemap_delete_{_sender.__name__}')
+post_migrate.connect(_invalidate_sitemaps, dispatch_uid='sitemap_post_migrate')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Quiz answer key versions
+# ═══════════════════════════════════════════════════════════════
+
+def _bump_quiz_version(sender, instance, raw=False, **kwargs):
+    """Move the quiz to a new answer key version; keys compiled for the old
+    one are simply no longer looked up."""
+    if raw:
+        return
+    if sender is QuizQuestion:
+        quizzes = Quiz.objects.filter(pk=instance.quiz_id)
+    else:
+        quizzes = Quiz.objects.filter(questions=instance.question_id)
+    quizzes.update(version=F('version') + 1)
+
+
+for _sender in (QuizQuestion, QuizChoice):
+    post_save.connect(_bump_quiz_version, sender=_sender,
+                      dispatch_uid=f'quiz_version_save_{_sender.__name__}')
+    post_delete.connect(_bump_quiz_version, sender=_sender,
+                        dispatch_uid=f'quiz_version_delete_{_sender.__name__}')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Rendered Markdown
+# ═══════════════════════════════════════════════════════════════
+
+def _refresh_rendered_markdown(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Render changed Markdown sources into their stored *_html fields. A save
+    with update_fields naming a source but not its HTML leaves the HTML
+    behind; utils.rendered_html catches that on the next read."""
+    if raw or (update_fields is not None and not set(update_fields) & set(instance.MARKDOWN_FIELDS)):
+        return
+    from .utils import refresh_rendered
+    refresh_rendered(instance)
+
+
+for _sender in (Course, Module, Lesson, Note):
+    pre_save.connect(_refresh_rendered_markdown, sender=_sender,
+                     dispatch_uid=f'rendered_markdown_{_sender.__name__}')
@@ -0,0 +1,150 @@
+"""Full-page cache for anonymous visitors, purged by tag.
+
+For a visitor without cookies, the home page, the catalog, category pages and
+course pages depend only on the URL, yet every request ran the whole view.
+`PageCacheMiddleware` stores those responses in the default cache:
+
+* Only cookie-free GET/HEAD requests take part. A visitor with a session,
+  CSRF or messages cookie always gets a fresh render, so nothing personal can
+  be served from or stored into the cache.
+* The key is the host, the path and the known query parameters
+  (QUERY_PARAMS) sorted; tracking parameters are ignored, and any other
+  parameter bypasses the cache rather than growing it.
+* Views name what a page shows with `tag(request, ...)`: one course or
+  category (`course:<id>`, `category:<id>`) or a whole collection (COURSES,
+  CATEGORIES, PATHS, ANNOUNCEMENTS). Each tag has a version token in the
+  cache; an entry remembers the tokens it was rendered under and is a miss
+  once any of them changed. The signals in learning/models.py `purge()`
+  tags when content changes, again on commit, like the snapshots.
+  Numbers that move constantly (student counts, site counters) are only
+  bounded by PAGE_CACHE_TTL.
+
+CSRF: the anonymous versions of these pages contain no token (every form
+that needs one is behind `user.is_authenticated`), and a response that sets
+any cookie — the CSRF cookie included — is never stored. SEO: the `seo`
+context processor builds the canonical URL from request.path and SITE_URL
+only, so ignored query parameters can't leak into a stored page.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+# Bump when the stored layout changes.
+CACHE_FORMAT = 1
+VIEWS = frozenset({'home', 'learning:course_list', 'learning:category_detail', 'learning:course_detail'})
+QUERY_PARAMS = frozenset({'kategoriya', 'daraja', 'saralash', 'sahifa', 'q'})
+TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'yclid'})
+COURSES, CATEGORIES, PATHS, ANNOUNCEMENTS = 'courses', 'categories', 'paths', 'announcements'
+
+
+def _tag_key(tag):
+    return f'page:tag:{tag}'
+
+
+def purge(*tags):
+    """Give the tags new versions: every page stored under them is stale."""
+    if tags:
+        token = time.time_ns()
+        cache.set_many({_tag_key(tag): token for tag in tags}, None)
+
+
+def _versions(tags):
+    """{tag: version} for `tags`, creating versions that don't exist yet."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def tag(request, *tags):
+    """Declare what the page being rendered shows. Call it before loading
+    the data, so a purge during the render makes the stored copy stale."""
+    if getattr(request, '_page_cache_key', None):
+        request._page_cache_versions.update(_versions(tags))
+
+
+def _cache_key(request):
+    params = []
+    for name, values in request.GET.lists():
+        if name in QUERY_PARAMS:
+            params.extend((name, value.strip()) for value in values)
+        elif not (name in TRACKING_PARAMS or name.startswith('utm_')):
+            return None
+    target = f'{request.get_host()}{request.path}?{urlencode(sorted(params))}'
+    return f'page:v{CACHE_FORMAT}:{hashlib.sha1(target.encode()).hexdigest()}'
+
+
+class PageCacheMiddleware:
+    """Serve and store anonymous pages; see the module docstring. Works as
+    sync and async middleware, like config.middleware.WhiteNoiseMiddleware,
+    so it doesn't push async views into a thread."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._store(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if getattr(request, '_page_cache_key', None):
+            await sync_to_async(self._store)(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not settings.PAGE_CACHE_TTL
+            or request.method not in ('GET', 'HEAD')
+            or request.COOKIES
+            or request.resolver_match.view_name not in VIEWS
+        ):
+            return None
+        key = _cache_key(request)
+        if key is None:
+            return None
+        entry = cache.get(key)
+        if entry is not None:
+            versions, response = entry
+            if _versions(versions) == versions:
+                response['X-Page-Cache'] = 'hit'
+                return get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+                    response=response,
+                )
+        request._page_cache_key = key
+        request._page_cache_versions = {}
+        return None
+
+    def _store(self, request, response):
+        key = getattr(request, '_page_cache_key', None)
+        if (
+            key is None
+            or request.method != 'GET'
+            or response.status_code != 200
+            or response.streaming
+            or response.cookies
+            or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            or 'no-store' in response.get('Cache-Control', '')
+        ):
+            return
+        cache.set(key, (request._page_cache_versions, response), settings.PAGE_CACHE_TTL)
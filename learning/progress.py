@@ -0,0 +1,193 @@
+"""Per-(user, course) progress summaries.
+
+Completion used to be recounted from LessonProgress wherever it was shown (home,
+My Learning, profile, learning paths, certificate checks). `UserCourseProgress`
+keeps the answer instead: a completed-lesson count, a bitset of completed
+outline positions, the latest watch time and a pointer to the next unfinished
+lesson. It is updated from the LessonProgress post_save signal, so it commits
+or rolls back together with the write that changed it.
+
+Bit *i* of the bitmap is the *i*-th lesson of the course in outline order — the
+order of the catalog snapshot (learning/catalog.py). Reordering or adding
+lessons moves those positions, so each row records the course's
+`CourseStats.last_content_change` it was built against (`outline_version`);
+a row whose version no longer matches is recounted from LessonProgress the
+next time it is read or written. `rebuild_course_progress` does the same in
+bulk.
+"""
+from django.db import transaction
+
+from .catalog import get_catalog, lesson_entry
+
+
+def _bits(bitmap):
+    return int.from_bytes(bytes(bitmap or b''), 'little')
+
+
+def _bitmap(bits, total):
+    return bits.to_bytes((total + 7) // 8, 'little')
+
+
+def percent(done, total):
+    return int(min(done, total) / total * 100) if total else 0
+
+
+def _first_unset(bits, lesson_ids):
+    """Id of the first lesson in outline order whose bit is clear, or None."""
+    position = (~bits & (bits + 1)).bit_length() - 1
+    return lesson_ids[position] if position < len(lesson_ids) else None
+
+
+def _course_version(course_id):
+    from .models import CourseStats
+    return (
+        CourseStats.objects.filter(course_id=course_id)
+        .values_list('last_content_change', flat=True).first()
+    )
+
+
+def _fill(row, lesson_ids, progress, version):
+    """Set a row's bitmap/count/pointer/last watch from its LessonProgress
+    rows, given as (lesson_id, is_completed, last_watched_at) tuples."""
+    position = {lesson_id: i for i, lesson_id in enumerate(lesson_ids)}
+    bits = 0
+    last_watched_at = None
+    for lesson_id, is_completed, watched_at in progress:
+        if is_completed:
+            bits |= 1 << position[lesson_id]
+        if last_watched_at is None or watched_at > last_watched_at:
+            last_watched_at = watched_at
+    row.completed_bitmap = _bitmap(bits, len(lesson_ids))
+    row.completed_count = bits.bit_count()
+    row.next_lesson_id = _first_unset(bits, lesson_ids)
+    row.last_watched_at = last_watched_at
+    row.outline_version = version
+
+
+def _recount(row, lesson_ids, version):
+    """Rebuild one row from LessonProgress."""
+    from .models import LessonProgress
+
+    progress = LessonProgress.objects.filter(
+        user_id=row.user_id, lesson_id__in=lesson_ids,
+    ).values_list('lesson_id', 'is_completed', 'last_watched_at')
+    _fill(row, lesson_ids, progress, version)
+
+
+def _course_lesson_ids(course_id):
+    catalog = get_catalog()
+    course = catalog.course_by_id(course_id)
+    return catalog.lesson_ids(course) if course else []
+
+
+def apply_lesson_progress(lp, watched=True):
+    """Fold one saved LessonProgress row into its course summary; `watched`
+    says whether the save stored a new last_watched_at."""
+    from .models import UserCourseProgress
+
+    entry = lesson_entry(lp.lesson_id)
+    if entry is None:
+        return
+    course = entry.module.course
+    lesson_ids = entry.catalog.lesson_ids(course)
+    position = entry.index - course.first_lesson
+
+    with transaction.atomic():
+        row, _ = UserCourseProgress.objects.select_for_update().get_or_create(
+            user_id=lp.user_id, course_id=course.id,
+        )
+        version = _course_version(course.id)
+        if row.outline_version != version:
+            # Outline changed since the bitmap was built (or it never was):
+            # recount, which already includes this save.
+            _recount(row, lesson_ids, version)
+        else:
+            bits = _bits(row.completed_bitmap)
+            if lp.is_completed:
+                bits |= 1 << position
+            else:
+                bits &= ~(1 << position)
+            row.completed_bitmap = _bitmap(bits, len(lesson_ids))
+            row.completed_count = bits.bit_count()
+            row.next_lesson_id = _first_unset(bits, lesson_ids)
+            if watched and (row.last_watched_at is None or lp.last_watched_at > row.last_watched_at):
+                row.last_watched_at = lp.last_watched_at
+        row.save()
+    return row
+
+
+def course_progress(user, course_ids=None):
+    """{course_id: UserCourseProgress} for the user (optionally limited to some
+    courses), with course, stats and next lesson loaded and stale rows recounted."""
+    from .models import UserCourseProgress
+
+    rows = UserCourseProgress.objects.filter(user=user).select_related(
+        'course__stats', 'next_lesson__module',
+    )
+    if course_ids is not None:
+        rows = rows.filter(course_id__in=course_ids)
+    result = {}
+    for row in rows:
+        stats = getattr(row.course, 'stats', None)
+        version = stats.last_content_change if stats else None
+        if row.outline_version != version:
+            _recount(row, _course_lesson_ids(row.course_id), version)
+            row.save()
+        result[row.course_id] = row
+    return result
+
+
+def completed_counts(user, course_ids):
+    """{course_id: completed lessons} — the common read."""
+    return {cid: row.completed_count for cid, row in course_progress(user, course_ids).items()}
+
+
+def rebuild(course_ids=None, user_ids=None):
+    """Recount summaries from LessonProgress (one query per course), creating
+    missing rows and dropping ones with no progress left. Returns the number
+    of rows written."""
+    from .models import CourseStats, LessonProgress, UserCourseProgress
+
+    catalog = get_catalog()
+    if course_ids is None:
+        course_ids = list(CourseStats.objects.values_list('course_id', flat=True))
+    versions = dict(
+        CourseStats.objects.filter(course_id__in=course_ids)
+        .values_list('course_id', 'last_content_change')
+    )
+    written = 0
+    for course_id in course_ids:
+        course = catalog.course_by_id(course_id)
+        if course is None:
+            continue
+        lesson_ids = catalog.lesson_ids(course)
+        progress = LessonProgress.objects.filter(lesson_id__in=lesson_ids)
+        if user_ids is not None:
+            progress = progress.filter(user_id__in=user_ids)
+        by_user = {}
+        for user_id, *fields in progress.values_list(
+            'user_id', 'lesson_id', 'is_completed', 'last_watched_at',
+        ):
+            by_user.setdefault(user_id, []).append(fields)
+        # Learners whose last progress row in the course is gone.
+        orphans = UserCourseProgress.objects.filter(course_id=course_id).exclude(
+            user_id__in=list(by_user),
+        )
+        if user_ids is not None:
+            orphans = orphans.filter(user_id__in=user_ids)
+        orphans.delete()
+
+        rows = []
+        for user_id, user_progress in by_user.items():
+            row = UserCourseProgress(user_id=user_id, course_id=course_id)
+            _fill(row, lesson_ids, user_progress, versions.get(course_id))
+            rows.append(row)
+        UserCourseProgress.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'course'],
+            update_fields=['completed_count', 'completed_bitmap', 'next_lesson',
+                           'last_watched_at', 'outline_version'],
+        )
+        written += len(rows)
+    return written
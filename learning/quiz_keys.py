@@ -0,0 +1,146 @@
+"""Compiled quiz answer keys.
+
+Grading one question in `check_quiz_answer` used to load the question, its
+correct choices (twice), the selected choices and the question count. A quiz
+is instead compiled once into an `AnswerKey` — per question its type, valid
+and correct choice ids and explanation, plus the question count — and grading
+runs against that in memory.
+
+Keys are stored under (quiz id, `Quiz.version`). QuizQuestion and QuizChoice
+saves and deletes bump the version (signals in learning/models.py), so a key
+is never invalidated in place: edits simply make readers look up a new one,
+and old ones age out. That also makes a per-process copy safe, so a warm
+worker grades without touching the shared cache.
+
+Question counts — all the quiz pages need — are cached the same way by
+`question_counts`, without compiling whole keys.
+"""
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db.models import Count
+
+# Bump when the key layout changes so old cache entries are never unpickled.
+KEY_FORMAT = 1
+KEY_TTL = 24 * 60 * 60
+# Keys (and counts) held per process; each dict is dropped wholesale when
+# it fills up.
+LOCAL_MAX = 512
+
+
+class QuestionKey(NamedTuple):
+    id: int
+    type: str
+    choice_ids: frozenset
+    correct: frozenset
+    # The correct ids in display order; the first one is what single-answer
+    # questions report back as "the" correct choice.
+    correct_ids: tuple
+    explanation: str
+
+    def grade(self, selected):
+        """Whether the set of selected choice ids answers the question:
+        multi_select must match the correct set exactly, the other types take
+        a single correct choice."""
+        if self.type == 'multi_select':
+            return bool(selected) and selected == self.correct
+        return len(selected) == 1 and selected <= self.correct
+
+
+class AnswerKey(NamedTuple):
+    quiz_id: int
+    version: int
+    questions: dict  # {question id: QuestionKey}, in question order
+
+    @property
+    def total(self):
+        return len(self.questions)
+
+
+def compile_key(quiz):
+    from .models import QuizChoice
+
+    choices = {}
+    for question_id, choice_id, is_correct in (
+        QuizChoice.objects.filter(question__quiz=quiz)
+        .order_by('question_id', 'order', 'id')
+        .values_list('question_id', 'id', 'is_correct')
+    ):
+        choices.setdefault(question_id, []).append((choice_id, is_correct))
+
+    questions = {}
+    for question_id, question_type, explanation in (
+        quiz.questions.order_by('order', 'id').values_list('id', 'question_type', 'explanation')
+    ):
+        rows = choices.get(question_id, [])
+        correct_ids = tuple(choice_id for choice_id, is_correct in rows if is_correct)
+        questions[question_id] = QuestionKey(
+            id=question_id,
+            type=question_type,
+            choice_ids=frozenset(choice_id for choice_id, _ in rows),
+            correct=frozenset(correct_ids),
+            correct_ids=correct_ids,
+            explanation=explanation,
+        )
+    return AnswerKey(quiz.id, quiz.version, questions)
+
+
+_keys = {}
+_counts = {}
+
+
+def _remember(store, local_key, value):
+    if len(store) >= LOCAL_MAX:
+        store.clear()
+    store[local_key] = value
+
+
+def answer_key(quiz):
+    """The compiled key for `quiz` at its current version."""
+    local_key = (quiz.id, quiz.version)
+    key = _keys.get(local_key)
+    if key is not None:
+        return key
+    cache_key = f'quiz:key:v{KEY_FORMAT}:{quiz.id}:{quiz.version}'
+    key = cache.get(cache_key)
+    if key is None:
+        key = compile_key(quiz)
+        cache.set(cache_key, key, KEY_TTL)
+    _remember(_keys, local_key, key)
+    return key
+
+
+def question_counts(quizzes):
+    """{quiz id: number of questions} for `quizzes` at their current
+    versions: from this process, else the shared cache, else one grouped
+    query for whatever is left."""
+    from .models import QuizQuestion
+
+    counts, missing = {}, {}
+    for quiz in quizzes:
+        local_key = (quiz.id, quiz.version)
+        if local_key in _keys:
+            counts[quiz.id] = _keys[local_key].total
+        elif local_key in _counts:
+            counts[quiz.id] = _counts[local_key]
+        else:
+            missing[f'quiz:count:v{KEY_FORMAT}:{quiz.id}:{quiz.version}'] = quiz
+    if missing:
+        found = cache.get_many(list(missing))
+        unknown = {cache_key: quiz for cache_key, quiz in missing.items() if cache_key not in found}
+        if unknown:
+            rows = dict(
+                QuizQuestion.objects.filter(quiz__in=list(unknown.values()))
+                .values('quiz_id').annotate(n=Count('id')).values_list('quiz_id', 'n')
+            )
+            fresh = {cache_key: rows.get(quiz.id, 0) for cache_key, quiz in unknown.items()}
+            cache.set_many(fresh, KEY_TTL)
+            found.update(fresh)
+        for cache_key, quiz in missing.items():
+            counts[quiz.id] = found[cache_key]
+            _remember(_counts, (quiz.id, quiz.version), found[cache_key])
+    return counts
+
+
+def question_count(quiz):
+    return question_counts([quiz])[quiz.id]
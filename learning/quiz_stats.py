@@ -0,0 +1,111 @@
+"""Per-user quiz summaries (`UserQuizStats`).
+
+A quiz-type lesson loaded every attempt the user had made on each of its
+quizzes to count them, and quiz_detail counted them again. Each (user, quiz)
+pair now has one summary row:
+
+* attempts_used — finished attempts, which `Quiz.max_attempts` limits;
+* best_percentage — the best finished attempt's percentage;
+* in_progress_attempt — the unfinished attempt the lesson page resumes.
+
+start_quiz calls `attempt_started` and _finalize_quiz_attempt calls
+`attempt_finished`. Attempts deleted or edited elsewhere (admin) let rows
+drift; `rebuild()` — the `rebuild_quiz_stats` command — recomputes them from
+QuizAttempt.
+"""
+from django.db import IntegrityError, transaction
+from django.db import models
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Cast, Coalesce, Floor, Greatest, NullIf, RowNumber
+from django.db.models.expressions import Window
+
+REBUILD_CHUNK = 1000
+
+
+def attempt_started(attempt):
+    from .models import UserQuizStats
+
+    UserQuizStats.objects.bulk_create(
+        [UserQuizStats(user_id=attempt.user_id, quiz_id=attempt.quiz_id, in_progress_attempt=attempt)],
+        update_conflicts=True,
+        unique_fields=['user', 'quiz'],
+        update_fields=['in_progress_attempt'],
+    )
+
+
+def attempt_finished(attempt):
+    from .models import UserQuizStats
+
+    percentage = attempt.percentage()
+    rows = UserQuizStats.objects.filter(user_id=attempt.user_id, quiz_id=attempt.quiz_id)
+    changes = {
+        'attempts_used': F('attempts_used') + 1,
+        # GREATEST skips NULL, so the first finished attempt sets it.
+        'best_percentage': Greatest(F('best_percentage'), Value(percentage)),
+        'in_progress_attempt': None,
+    }
+    if rows.update(**changes):
+        return
+    # Attempts started before the summaries existed have no row yet; same
+    # dance as activity.record for a concurrent first write.
+    try:
+        with transaction.atomic():
+            UserQuizStats.objects.create(
+                user_id=attempt.user_id, quiz_id=attempt.quiz_id,
+                attempts_used=1, best_percentage=percentage,
+            )
+    except IntegrityError:
+        rows.update(**changes)
+
+
+def for_user(user, quizzes):
+    """{quiz id: UserQuizStats} for those of `quizzes` the user has tried."""
+    from .models import UserQuizStats
+
+    return {
+        stats.quiz_id: stats
+        for stats in UserQuizStats.objects.filter(user=user, quiz__in=quizzes)
+    }
+
+
+def recent_attempts(user, quizzes, limit):
+    """The user's latest `limit` finished attempts on each quiz, newest first,
+    in one query."""
+    from .models import QuizAttempt
+
+    return list(
+        QuizAttempt.objects.filter(user=user, quiz__in=quizzes, completed_at__isnull=False)
+        .annotate(n=Window(RowNumber(), partition_by=F('quiz_id'), order_by=F('started_at').desc()))
+        .filter(n__lte=limit)
+        .order_by('quiz_id', 'n')
+    )
+
+
+def rebuild(user_ids=None):
+    """Recompute the summaries of the given users (all when None) from
+    QuizAttempt. Returns the number of rows written."""
+    from .models import QuizAttempt, UserQuizStats
+
+    finished = Q(completed_at__isnull=False)
+    attempts = QuizAttempt.objects.order_by()
+    existing = UserQuizStats.objects.all()
+    if user_ids is not None:
+        attempts = attempts.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+    # QuizAttempt.percentage(), in SQL.
+    percentage = Coalesce(Cast(Floor(F('score') * 100 / NullIf(F('max_score'), 0)), models.IntegerField()), 0)
+    rows = [
+        UserQuizStats(
+            user_id=row['user_id'], quiz_id=row['quiz_id'], attempts_used=row['used'],
+            best_percentage=row['best'], in_progress_attempt_id=row['open'],
+        )
+        for row in attempts.values('user_id', 'quiz_id').annotate(
+            used=Count('id', filter=finished),
+            best=Max(percentage, filter=finished),
+            open=Max('id', filter=~finished),
+        )
+    ]
+    with transaction.atomic():
+        existing.delete()
+        UserQuizStats.objects.bulk_create(rows, batch_size=REBUILD_CHUNK)
+    return len(rows)
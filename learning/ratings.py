@@ -0,0 +1,91 @@
+"""Incremental course ratings.
+
+Every review save used to re-aggregate all of the course's reviews (and
+submit_review did it a second time), and the course page grouped them again
+for the 5→1 star breakdown. Course now stores the rating sum and count and a
+per-star histogram (`stars_1` … `stars_5`); the CourseReview signals in
+learning/models.py move them with one atomic `F()` delta UPDATE per review
+write, recomputing avg_rating in the same statement, so a write and a course
+page cost the same at ten reviews as at a hundred thousand.
+
+Writes that bypass signals (queryset.update, bulk_create, raw SQL) let the
+counters drift; `rebuild()` — the `reconcile_ratings` command — recomputes
+them from CourseReview.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+
+from . import page_cache
+
+STARS = range(1, 6)
+FIELDS = ['avg_rating', 'rating_count', 'rating_sum', *(f'stars_{star}' for star in STARS)]
+
+
+def _average(rating_sum, rating_count):
+    # avg_rating's rounding, in SQL; 0 for a course without reviews.
+    total = Cast(rating_sum, DecimalField(max_digits=12, decimal_places=2))
+    ratio = ExpressionWrapper(total / NullIf(rating_count, 0), output_field=DecimalField())
+    return Coalesce(Round(ratio, 2), Value(Decimal(0)), output_field=DecimalField(max_digits=3, decimal_places=2))
+
+
+def apply(course_id, added=None, removed=None):
+    """Move a course's rating fields by one review: `added` is the rating
+    that now counts, `removed` the one that no longer does (both for an
+    edited review)."""
+    from .models import Course
+
+    if course_id is None:
+        return
+    deltas = {'rating_count': (added is not None) - (removed is not None),
+              'rating_sum': (added or 0) - (removed or 0)}
+    for star, delta in ((added, 1), (removed, -1)):
+        if star in STARS:
+            deltas[f'stars_{star}'] = deltas.get(f'stars_{star}', 0) + delta
+    # Clamped at zero like course_stats.bump: a counter that had drifted low
+    # must not trip the unsigned-column CHECK and abort the review delete.
+    changes = {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()}
+    # SET expressions read the row as it was, so the average is taken over
+    # the new values spelled out again.
+    changes['avg_rating'] = _average(changes['rating_sum'], changes['rating_count'])
+    Course.objects.filter(pk=course_id).update(**changes)
+
+
+_REBUILD = """
+UPDATE {course} AS c
+SET rating_count = r.n, rating_sum = r.s, avg_rating = r.avg,
+    stars_1 = r.s1, stars_2 = r.s2, stars_3 = r.s3, stars_4 = r.s4, stars_5 = r.s5,
+    content_changed_at = clock_timestamp()
+FROM (
+    SELECT c.id, COUNT(v.id) AS n, COALESCE(SUM(v.rating), 0) AS s,
+           COALESCE(ROUND(SUM(v.rating)::numeric / NULLIF(COUNT(v.id), 0), 2), 0) AS avg,
+           COUNT(*) FILTER (WHERE v.rating = 1) AS s1, COUNT(*) FILTER (WHERE v.rating = 2) AS s2,
+           COUNT(*) FILTER (WHERE v.rating = 3) AS s3, COUNT(*) FILTER (WHERE v.rating = 4) AS s4,
+           COUNT(*) FILTER (WHERE v.rating = 5) AS s5
+    FROM {course} AS c
+    LEFT JOIN {review} AS v ON v.course_id = c.id
+    WHERE %(ids)s::integer[] IS NULL OR c.id = ANY(%(ids)s::integer[])
+    GROUP BY c.id
+) AS r
+WHERE c.id = r.id
+  AND (c.rating_count, c.rating_sum, c.avg_rating, c.stars_1, c.stars_2, c.stars_3, c.stars_4, c.stars_5)
+      IS DISTINCT FROM (r.n, r.s, r.avg, r.s1, r.s2, r.s3, r.s4, r.s5)
+RETURNING c.id
+"""
+
+
+def rebuild(course_ids=None):
+    """Recompute the rating fields of the given courses (all when None) from
+    their reviews. Returns the number of courses that had drifted."""
+    from .models import Course, CourseReview
+
+    q = connection.ops.quote_name
+    sql = _REBUILD.format(course=q(Course._meta.db_table), review=q(CourseReview._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'ids': list(course_ids) if course_ids is not None else None})
+        drifted = [row[0] for row in cursor.fetchall()]
+    if drifted:
+        page_cache.purge(page_cache.COURSES, *(f'course:{pk}' for pk in drifted))
+    return len(drifted)
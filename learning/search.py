@@ -0,0 +1,98 @@
+"""Full-text search over courses and lessons.
+
+Course and Lesson carry a stored, generated `search_vector` column (GIN
+indexed) built by PostgreSQL from `uz_normalize(...)` of their text fields,
+weighted title A, subtitle B, description C (lessons: title A, description B).
+The 'simple' configuration is used — there is no Uzbek stemmer — so matching is
+on whole normalized words, with prefix matching for the query's words.
+
+`uz_normalize` (created in migration 0020) makes the two Uzbek scripts and the
+many apostrophes compare equal: Cyrillic is transliterated to Latin
+(ш → sh, ў → o', word-initial е → ye, ...) and every apostrophe variant
+(' ʻ ʼ ‘ ’ ` ´) is dropped, so "O‘zbek", "o'zbek", "ozbek" and "Ўзбек" all
+index as `ozbek`. `normalize` below is its Python twin, used on the query; a
+test keeps the two in step. After changing the SQL function, run
+`manage.py reindex_search` — stored generated columns are only recomputed when
+their row is written.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, transaction
+from django.db.models import F, Func, Max, TextField
+
+CONFIG = 'simple'
+
+_APOSTROPHES = "'`´ʻʼ‘’ъь"
+_CYR_UPPER = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯЎҚҒҲ'
+_CYR_LOWER = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюяўқғҳ'
+_MULTI = [('ё', 'yo'), ('ц', 'ts'), ('ч', 'ch'), ('ш', 'sh'), ('щ', 'sh'), ('ю', 'yu'), ('я', 'ya')]
+_SINGLE = str.maketrans(
+    'абвгдежзийклмнопрстуфхыэўқғҳ',
+    'abvgdejziyklmnoprstufxieoqgh',
+    _APOSTROPHES,
+)
+_UPPER = str.maketrans(_CYR_UPPER, _CYR_LOWER)
+_WORD_INITIAL_YE = re.compile('(^|[^а-яёўқғҳa-z0-9])е')
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+class UzNormalize(Func):
+    function = 'uz_normalize'
+    output_field = TextField()
+
+
+def normalize(text):
+    """Python twin of the `uz_normalize` SQL function."""
+    text = text.translate(_UPPER).lower()
+    text = _WORD_INITIAL_YE.sub(r'\1ye', text)
+    for cyrillic, latin in _MULTI:
+        text = text.replace(cyrillic, latin)
+    return text.translate(_SINGLE)
+
+
+def vector(*weighted_fields):
+    """Generated-column expression: `weighted_fields` are (field, weight) pairs."""
+    parts = [SearchVector(UzNormalize(name), config=CONFIG, weight=weight)
+             for name, weight in weighted_fields]
+    combined = parts[0]
+    for part in parts[1:]:
+        combined = combined + part
+    return combined
+
+
+def search_query(q):
+    """A prefix-matching tsquery for every word of `q`, or None if it has none."""
+    tokens = _TOKEN.findall(normalize(q))
+    if not tokens:
+        return None
+    return SearchQuery(' & '.join(f'{token}:*' for token in tokens), config=CONFIG, search_type='raw')
+
+
+def search(qs, q):
+    """Filter `qs` (Course or Lesson) to matches for `q`, annotated with `rank`."""
+    query = search_query(q)
+    if query is None:
+        return qs.none()
+    return qs.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+
+
+def reindex(batch_size=5000):
+    """Recompute every stored search vector (e.g. after `uz_normalize` changed)
+    by rewriting rows in id-range batches, one short transaction each.
+    Returns {model label: rows rewritten}."""
+    from .models import Course, Lesson
+
+    rewritten = {}
+    for model in (Course, Lesson):
+        last_id = model.objects.aggregate(m=Max('id'))['m'] or 0
+        count = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                count += model.objects.filter(
+                    id__gte=start, id__lt=start + batch_size,
+                ).update(title=F('title'))
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        rewritten[model._meta.label] = count
+    return rewritten
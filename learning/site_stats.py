@@ -0,0 +1,100 @@
+"""Site-wide running totals for the home hero.
+
+The hero shows total watch time, active users and lesson count. Computing
+those live means aggregating the whole LessonView log on every request, so
+instead the model signals in learning/models.py keep running totals in
+`SiteCounter` and the home page reads them back with one small query.
+
+Counters are sharded: each write bumps `value` on a random one of SHARDS rows
+with an atomic `F()` update, and a read sums the shards. That keeps
+concurrent `record_view` calls from serialising on one row lock.
+
+Code that bypasses signals (queryset.update, bulk_update, raw SQL) lets the
+totals drift; `reconcile()` — run by the `reconcile_site_stats` management
+command — recomputes them exactly from the source tables.
+"""
+import random
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+WATCH_SECONDS = 'watch_seconds'
+ACTIVE_USERS = 'active_users'
+LESSONS = 'lessons'
+COUNTERS = (WATCH_SECONDS, ACTIVE_USERS, LESSONS)
+
+SHARDS = 8
+
+
+def incr(name, delta=1):
+    """Atomically add `delta` to counter `name` (on a random shard)."""
+    if not delta:
+        return
+    from .models import SiteCounter
+
+    shard = random.randrange(SHARDS)
+    rows = SiteCounter.objects.filter(name=name, shard=shard)
+    if rows.update(value=F('value') + delta):
+        return
+    # First write to this shard: create it. A concurrent writer may win the
+    # insert, in which case the row now exists and the update will land.
+    try:
+        with transaction.atomic():
+            SiteCounter.objects.create(name=name, shard=shard, value=delta)
+    except IntegrityError:
+        rows.update(value=F('value') + delta)
+
+
+def totals():
+    """{counter name: value} for every counter (missing ones read as 0)."""
+    from .models import SiteCounter
+
+    result = dict.fromkeys(COUNTERS, 0)
+    for row in SiteCounter.objects.values('name').annotate(total=Sum('value')):
+        result[row['name']] = row['total']
+    return result
+
+
+def compute_exact():
+    """Recompute every counter from the source tables (full scans)."""
+    from django.contrib.auth import get_user_model
+
+    from .models import Lesson, LessonView
+
+    return {
+        WATCH_SECONDS: LessonView.objects.aggregate(
+            s=Sum('lesson__duration_seconds'))['s'] or 0,
+        ACTIVE_USERS: get_user_model().objects.filter(is_active=True).count(),
+        LESSONS: Lesson.objects.count(),
+    }
+
+
+def reconcile(names=COUNTERS):
+    """Overwrite the named counters with exact values; returns
+    {name: (previous, exact)}. Shards are collapsed into shard 0."""
+    from .models import SiteCounter
+
+    changes = {}
+    with transaction.atomic():
+        # Lock the counter rows first so increments made during the recount
+        # queue behind it instead of being wiped out by the reset.
+        list(SiteCounter.objects.select_for_update().filter(name__in=names))
+        previous = totals()
+        exact = compute_exact()
+        for name in names:
+            SiteCounter.objects.filter(name=name).exclude(shard=0).delete()
+            SiteCounter.objects.update_or_create(
+                name=name, shard=0, defaults={'value': exact[name]},
+            )
+            changes[name] = (previous[name], exact[name])
+    return changes
+
+
+def hero_stats():
+    """Context values for the home hero."""
+    counts = totals()
+    return {
+        'total_hours': round(counts[WATCH_SECONDS] / 3600),
+        'total_users': counts[ACTIVE_USERS],
+        'total_lessons': counts[LESSONS],
+    }
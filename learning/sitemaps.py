@@ -1,18 +1,60 @@
-"""XML sitemaps for search-engine discovery. Wired into config/urls.py at
-/sitemap.xml. The domain comes from the request host (django.contrib.sites is
-not installed; get_current_site falls back to a RequestSite), so production
-serves https://ochiqkurs.uz/... URLs automatically."""
+"""XML sitemaps for search-engine discovery, pre-generated as files.
+
+Rendering them through django.contrib.sitemaps' view queried every published
+course, category, path and instructor on each crawler hit, left out lessons
+(the bulk of the indexable pages) and only dated courses. Instead `build()`
+renders each section below into pages of PAGE_SIZE URLs plus an index:
+
+    <SITEMAP_DIR>/<database>/sitemap.xml                 the index
+    <SITEMAP_DIR>/<database>/sitemap-<section>-<n>.xml   section pages
+
+Lesson pages carry Google's video extension, from the same data as the
+lesson page's VideoObject JSON-LD. A page whose content didn't change is not
+rewritten, so its mtime — the Last-Modified and ETag `sitemap_file` serves,
+with 304s for crawlers that revalidate — only moves when it really changed.
+
+Freshness: content signals (learning/models.py) only mark the files dirty;
+requests keep serving the existing files, and `build_sitemaps --if-changed`
+(cron, every few minutes) regenerates them out of band. A request builds only
+when there are no files at all, under an flock so one process does it while
+the others wait. Every other request is a stat and a file read. URLs are built
+from SITE_URL, as there is no request to take the host from.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sitemaps import Sitemap
+from django.db import connection
+from django.db.models import Max, Q
+from django.template.loader import render_to_string
 from django.urls import reverse
 
-from .models import Category, Course, LearningPath
+from .models import Category, Course, LearningPath, Lesson
 
 User = get_user_model()
 
+INDEX = 'sitemap.xml'
+# Present while content changed after the last build started.
+DIRTY = '.dirty'
+# Well under the protocol's 50,000 URLs / 50 MB, so a page renders quickly.
+PAGE_SIZE = 10000
+MAX_AGE = 60 * 60
+
 
-class StaticViewSitemap(Sitemap):
-    protocol = 'https'
+class BaseSitemap(Sitemap):
+    limit = PAGE_SIZE
+    template = 'sitemap.xml'
+
+    def lastmod(self, obj):
+        return getattr(obj, 'last_modified', None)
+
+
+class StaticViewSitemap(BaseSitemap):
     changefreq = 'daily'
     priority = 0.6
 
@@ -24,48 +66,83 @@ class StaticViewSitemap(Sitemap):
         return reverse(name)
 
 
-class CourseSitemap(Sitemap):
-    protocol = 'https'
+class CourseSitemap(BaseSitemap):
     changefreq = 'weekly'
     priority = 0.8
 
     def items(self):
-        return Course.objects.filter(status='published')
+        return Course.objects.filter(status='published').only('slug', 'updated_at')
+
+    def lastmod(self, obj):
+        return obj.updated_at
+
+
+class LessonSitemap(BaseSitemap):
+    changefreq = 'monthly'
+    priority = 0.6
+    template = 'sitemaps/lessons.xml'
+
+    def items(self):
+        return (
+            Lesson.objects.filter(module__course__status='published')
+            .select_related('module__course')
+            .order_by('module__course_id', 'module__order', 'module_id', 'order', 'id')
+        )
 
     def lastmod(self, obj):
-        return obj.published_at
+        return obj.updated_at
+
+    def video(self, lesson):
+        """Google video sitemap fields from the lesson's VideoObject, or None."""
+        from .views import _lesson_jsonld
+
+        data = _lesson_jsonld(lesson, lesson.module.course)
+        if data is None:
+            return None
+        return {
+            'thumbnail_loc': data['thumbnailUrl'],
+            'title': data['name'],
+            'description': data['description'],
+            'player_loc': data['embedUrl'],
+            'duration': lesson.duration_seconds,
+            'publication_date': data.get('uploadDate'),
+        }
 
 
-class CategorySitemap(Sitemap):
-    protocol = 'https'
+class CategorySitemap(BaseSitemap):
     changefreq = 'weekly'
     priority = 0.5
 
     def items(self):
-        return Category.objects.all()
+        return Category.objects.annotate(
+            last_modified=Max('courses__updated_at', filter=Q(courses__status='published')),
+        ).order_by('order', 'name')
 
 
-class LearningPathSitemap(Sitemap):
-    protocol = 'https'
+class LearningPathSitemap(BaseSitemap):
     changefreq = 'weekly'
     priority = 0.7
 
     def items(self):
-        return LearningPath.objects.all()
+        return (
+            LearningPath.objects
+            .annotate(last_modified=Max('path_courses__course__updated_at'))
+            .order_by('order', 'title')
+        )
 
 
-class InstructorSitemap(Sitemap):
-    protocol = 'https'
+class InstructorSitemap(BaseSitemap):
     changefreq = 'monthly'
     priority = 0.5
 
     def items(self):
         # Only users who actually teach a published course have a public
         # instructor page (external YouTube creators have a NULL instructor FK).
+        # The annotation groups by user over that same join.
         return (
             User.objects
             .filter(taught_courses__status='published')
-            .distinct()
+            .annotate(last_modified=Max('taught_courses__updated_at'))
             .order_by('username')
         )
 
@@ -76,7 +153,123 @@ class InstructorSitemap(Sitemap):
 SITEMAPS = {
     'static': StaticViewSitemap,
     'courses': CourseSitemap,
+    'lessons': LessonSitemap,
     'categories': CategorySitemap,
     'paths': LearningPathSitemap,
     'instructors': InstructorSitemap,
 }
+
+
+def sitemap_dir():
+    """One directory per database, like the catalog snapshot."""
+    return Path(settings.SITEMAP_DIR) / connection.settings_dict['NAME']
+
+
+def page_name(section, page):
+    return f'sitemap-{section}-{page}.xml'
+
+
+class _Site:
+    # What Sitemap.get_urls needs of a Site.
+    def __init__(self, domain):
+        self.domain = domain
+
+
+def _write(path, data):
+    """Replace the file atomically unless it already holds `data`. Returns
+    whether it was written."""
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def build():
+    """Render every section and the index into sitemap_dir(), and delete
+    pages of sections that shrank. Returns {'files': n, 'written': n,
+    'urls': n}."""
+    directory = sitemap_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Cleared before reading: an edit committed during the build marks the
+    # files dirty again (the signals also mark on commit).
+    (directory / DIRTY).unlink(missing_ok=True)
+    origin = urlsplit(settings.SITE_URL)
+    site = _Site(origin.netloc)
+    totals = {'files': 0, 'written': 0, 'urls': 0}
+    index, keep = [], {INDEX}
+    for section, sitemap_class in SITEMAPS.items():
+        sitemap = sitemap_class()
+        for page in sitemap.paginator.page_range:
+            urls = sitemap.get_urls(page=page, site=site, protocol=origin.scheme)
+            if isinstance(sitemap, LessonSitemap):
+                for url in urls:
+                    url['video'] = sitemap.video(url['item'])
+            name = page_name(section, page)
+            data = render_to_string(sitemap.template, {'urlset': urls}).encode()
+            totals['written'] += _write(directory / name, data)
+            totals['files'] += 1
+            totals['urls'] += len(urls)
+            keep.add(name)
+            dates = [url['lastmod'] for url in urls if url['lastmod']]
+            index.append({
+                'location': f'{origin.scheme}://{origin.netloc}/{name}',
+                'last_mod': max(dates) if dates else None,
+            })
+    for stale in directory.glob('sitemap-*.xml'):
+        if stale.name not in keep:
+            stale.unlink(missing_ok=True)
+    # The index goes last: while it exists, every page it lists does too.
+    totals['written'] += _write(directory / INDEX, render_to_string('sitemap_index.xml', {'sitemaps': index}).encode())
+    totals['files'] += 1
+    return totals
+
+
+@contextmanager
+def _locked(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def is_dirty():
+    """Whether content changed since the last build, or nothing is built."""
+    directory = sitemap_dir()
+    return (directory / DIRTY).exists() or not (directory / INDEX).exists()
+
+
+def refresh(only_if_dirty=False):
+    """`build()` under the lock (always, or only when `is_dirty()`); returns
+    its totals, or None when nothing needed doing."""
+    with _locked(sitemap_dir()):
+        if not only_if_dirty or is_dirty():
+            return build()
+    return None
+
+
+def ensure():
+    """sitemap_dir(), built first if nothing has been built yet; one process
+    builds under the lock while the others wait for it."""
+    directory = sitemap_dir()
+    if not (directory / INDEX).exists():
+        with _locked(directory):
+            if not (directory / INDEX).exists():
+                build()
+    return directory
+
+
+def mark_dirty():
+    """Note that content changed; the files are kept and served until
+    `build_sitemaps` replaces them."""
+    try:
+        (sitemap_dir() / DIRTY).touch()
+    except FileNotFoundError:
+        pass  # nothing built yet: the first request builds everything
@@ -0,0 +1,187 @@
+"""Precomputed home-page snapshot.
+
+The anonymous half of the home page (featured / trending / newest / top-rated
+rows, category strips, testimonials, announcements, featured paths)
+is identical for every visitor, so it is built once and kept in the shared cache
+as plain dicts/lists rather than recomputed per request. Card dicts use the same
+keys the templates read off a Course (`get_thumbnail_url`, `instructor_display`,
+`get_level_display`, ...), so `_course_card.html` renders either one unchanged.
+The hero's running totals are not part of it; they come from learning/site_stats.py.
+
+The snapshot is rebuilt lazily after a content change (the model signals call
+`invalidate_home_snapshot`), when its TTL lapses, or eagerly by the
+`refresh_home_snapshot` management command (cron). Bump HOME_SNAPSHOT_VERSION
+whenever the structure changes so old entries are never read by new code.
+"""
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+HOME_SNAPSHOT_VERSION = 4
+# Enrollment counts (trending) are not invalidation triggers — a new student
+# would rebuild the whole page — so they are allowed to lag by up to this long.
+HOME_SNAPSHOT_TTL = 10 * 60
+HOME_SNAPSHOT_KEY = f'home:snapshot:v{HOME_SNAPSHOT_VERSION}'
+
+ROW_SIZE = 8
+STRIP_COUNT = 6
+STRIP_SIZE = 6
+
+
+def course_card(course):
+    """Serializable card for a course annotated by `_course_card_annotations`."""
+    category = None
+    if course.category_id:
+        category = {
+            'id': course.category.id,
+            'name': course.category.name,
+            'slug': course.category.slug,
+        }
+    return {
+        'id': course.id,
+        'slug': course.slug,
+        'title': course.title,
+        # The card cache's version stamps (learning/course_cards.py).
+        'updated_at': course.updated_at.isoformat(),
+        'content_changed_at': course.content_changed_at.isoformat(),
+        'category_id': course.category_id,
+        'category': category,
+        'is_featured': course.is_featured,
+        'level': course.level,
+        'get_level_display': course.get_level_display(),
+        'instructor_display': course.instructor_display(),
+        'avg_rating': float(course.avg_rating),
+        'rating_count': course.rating_count,
+        'lesson_count': course.lesson_count or 0,
+        'total_duration': course.total_duration or 0,
+        'student_count': course.student_count or 0,
+        'get_thumbnail_url': course.get_thumbnail_url() or '',
+        'thumbnail_srcset': course.thumbnail_srcset,
+    }
+
+
+def _ids(qs, n):
+    return list(qs.values_list('id', flat=True)[:n])
+
+
+def build_home_snapshot():
+    """Run every catalog-wide home-page query once and return the result as
+    plain data. Each row is picked by the database with ORDER BY/LIMIT; the
+    selected courses are then annotated in a single query."""
+    from .models import Announcement, Category, Course, CourseReview, LearningPath
+    from .views import _course_card_annotations
+
+    published = Course.objects.filter(status='published')
+
+    featured_ids = _ids(published.filter(is_featured=True).order_by('order'), ROW_SIZE)
+    if not featured_ids:
+        featured_ids = _ids(published.order_by('-is_featured', 'order'), ROW_SIZE)
+    trending_ids = _ids(
+        published.order_by(F('stats__student_count').desc(nulls_last=True), '-is_featured', 'order'), ROW_SIZE,
+    )
+    newest_ids = _ids(published.order_by('-id'), ROW_SIZE)
+    top_rated_ids = _ids(
+        published.filter(rating_count__gt=0)
+        .order_by('-avg_rating', '-rating_count', '-is_featured', 'order'),
+        ROW_SIZE,
+    )
+
+    categories = list(
+        Category.objects.annotate(
+            c=Count('courses', filter=Q(courses__status='published'))
+        ).order_by('order', 'name')
+    )
+    strip_ids = []
+    for cat in categories[:STRIP_COUNT]:
+        cat_ids = _ids(published.filter(category=cat).order_by('-is_featured', 'order'), STRIP_SIZE)
+        if cat_ids:
+            strip_ids.append((cat, cat_ids))
+
+    wanted = set(featured_ids + trending_ids + newest_ids + top_rated_ids)
+    for _, cat_ids in strip_ids:
+        wanted.update(cat_ids)
+    cards = {
+        c.id: course_card(c)
+        for c in _course_card_annotations(
+            Course.objects.filter(id__in=wanted).select_related('category', 'instructor')
+        )
+    }
+
+    def pick(id_list):
+        return [cards[i] for i in id_list if i in cards]
+
+    featured = pick(featured_ids)
+    newest = pick(newest_ids)
+    hero = featured[0] if featured else (newest[0] if newest else None)
+
+    return {
+        'version': HOME_SNAPSHOT_VERSION,
+        'built_at': timezone.now().isoformat(),
+        'featured': featured,
+        'trending': pick(trending_ids),
+        'newest': newest,
+        'top_rated': pick(top_rated_ids),
+        'categories': [
+            {
+                'id': cat.id, 'name': cat.name, 'slug': cat.slug,
+                'description': cat.description, 'icon': cat.icon,
+                'color': cat.color, 'c': cat.c,
+            }
+            for cat in categories
+        ],
+        'category_strips': [
+            {
+                'category': {
+                    'id': cat.id, 'name': cat.name, 'slug': cat.slug,
+                    'description': cat.description,
+                },
+                'courses': pick(cat_ids),
+            }
+            for cat, cat_ids in strip_ids
+        ],
+        'total_courses': published.count(),
+        'latest_reviews': [
+            {
+                'rating': r.rating,
+                'comment': r.comment,
+                'user': {'first_name': r.user.first_name, 'username': r.user.username},
+                'course': {'title': r.course.title, 'slug': r.course.slug},
+            }
+            for r in CourseReview.objects
+            .select_related('user', 'course')
+            .exclude(comment='')
+            .order_by('-created_at')[:6]
+        ],
+        'global_announcements': [
+            {'title': a.title, 'body': a.body}
+            for a in Announcement.objects.filter(course__isnull=True)
+            .order_by('-is_pinned', '-created_at')[:2]
+        ],
+        'learning_paths': [
+            {
+                'slug': p.slug, 'title': p.title,
+                'description': p.description, 'course_count': p.course_count,
+            }
+            for p in LearningPath.objects.filter(is_featured=True)
+            .annotate(course_count=Count('path_courses'))[:4]
+        ],
+        'hero_course_thumbnail': hero['get_thumbnail_url'] if hero else None,
+        'hero_course_title': hero['title'] if hero else '',
+    }
+
+
+def refresh_home_snapshot():
+    snapshot = build_home_snapshot()
+    cache.set(HOME_SNAPSHOT_KEY, snapshot, HOME_SNAPSHOT_TTL)
+    return snapshot
+
+
+def get_home_snapshot():
+    snapshot = cache.get(HOME_SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = refresh_home_snapshot()
+    return snapshot
+
+
+def invalidate_home_snapshot():
+    cache.delete(HOME_SNAPSHOT_KEY)
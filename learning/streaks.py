@@ -0,0 +1,121 @@
+"""Bulk streak recomputation.
+
+`_update_streak` (learning/views.py) maintains UserProfile's streak one
+activity at a time, under a row lock. Correcting streaks after the fact —
+imported history, a timezone fix, views deleted in bulk — would mean replaying
+every event user by user. `recompute()` — the `recompute_streaks` command —
+derives them from LessonView, the activity source of truth, instead:
+
+* distinct (user_id, viewed_on) pairs are streamed in (user, day) order
+  through a server-side cursor, which the (user, viewed_on) index serves;
+* each user's day ordinals go through one run-length pass: every position
+  where consecutive days differ by more than one starts a new run, so the
+  longest run and the run ending on the last day fall out of the run bounds;
+* results are compared with the stored profiles a chunk of users at a time,
+  and only differing rows are written — one UPDATE from unnest()ed arrays per
+  chunk (bulk_update builds a CASE per row and field, which costs more than
+  everything else here), bulk_create for users who have no profile yet.
+
+The values mean what `_update_streak` leaves behind: current_streak is the run
+ending at last_activity_date (UserProfile.live_streak decides whether it has
+lapsed), longest_streak the longest run ever. Profiles of users with no
+LessonView rows are left as they are.
+"""
+from itertools import groupby, pairwise
+from operator import itemgetter
+
+from django.db import connection, transaction
+
+# Users compared and written per batch, and rows fetched per cursor round trip.
+CHUNK = 5000
+FETCH = 20000
+
+
+def runs(ordinals):
+    """(current, longest) for ascending, distinct day ordinals: the length of
+    the run ending on the last day, and of the longest run."""
+    if not ordinals:
+        return 0, 0
+    bounds = [0]
+    bounds += [i for i, (a, b) in enumerate(pairwise(ordinals), 1) if b - a != 1]
+    bounds.append(len(ordinals))
+    return bounds[-1] - bounds[-2], max(b - a for a, b in pairwise(bounds))
+
+
+def _user_days(user_ids=None):
+    """(user_id, [day, ...]) per user with views, days ascending."""
+    from .models import LessonView
+
+    rows = LessonView.objects.order_by('user_id', 'viewed_on').distinct()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    rows = rows.values_list('user_id', 'viewed_on').iterator(chunk_size=FETCH)
+    for user_id, group in groupby(rows, key=itemgetter(0)):
+        yield user_id, [day for _, day in group]
+
+
+def recompute(user_ids=None, dry_run=False, on_change=None):
+    """Recompute the streaks of the given users (everyone with views when None).
+
+    `on_change(user_id, before, after)` is called for each profile that
+    differs, with (current, longest, last_activity_date) tuples; `before` is
+    None for a missing profile. Nothing is written when `dry_run`. Returns
+    {'users': seen, 'changed': differing profiles, 'created': missing profiles}.
+    """
+    totals = {'users': 0, 'changed': 0, 'created': 0}
+    batch = {}
+    for user_id, days in _user_days(user_ids):
+        current, longest = runs([day.toordinal() for day in days])
+        batch[user_id] = (current, longest, days[-1])
+        if len(batch) >= CHUNK:
+            _apply(batch, dry_run, on_change, totals)
+            batch = {}
+    if batch:
+        _apply(batch, dry_run, on_change, totals)
+    return totals
+
+
+_FIELDS = ['current_streak', 'longest_streak', 'last_activity_date']
+
+_UPDATE = """
+UPDATE {profile} AS p
+SET current_streak = v.current_streak, longest_streak = v.longest_streak,
+    last_activity_date = v.last_activity_date
+FROM unnest(%s::integer[], %s::integer[], %s::integer[], %s::date[])
+    AS v(user_id, current_streak, longest_streak, last_activity_date)
+WHERE p.user_id = v.user_id
+"""
+
+
+def _apply(batch, dry_run, on_change, totals):
+    from users.models import UserProfile
+
+    totals['users'] += len(batch)
+    changed, created = {}, []
+    profiles = UserProfile.objects.filter(user_id__in=batch).values_list('user_id', *_FIELDS)
+    for user_id, *before in profiles:
+        after = batch.pop(user_id)
+        if tuple(before) != after:
+            if on_change:
+                on_change(user_id, tuple(before), after)
+            changed[user_id] = after
+    for user_id, after in batch.items():  # users without a profile yet
+        if on_change:
+            on_change(user_id, None, after)
+        current, longest, last = after
+        created.append(UserProfile(
+            user_id=user_id, current_streak=current, longest_streak=longest, last_activity_date=last,
+        ))
+    totals['changed'] += len(changed)
+    totals['created'] += len(created)
+    if dry_run:
+        return
+    with transaction.atomic():
+        if changed:
+            columns = [list(changed), *map(list, zip(*changed.values()))]
+            with connection.cursor() as cursor:
+                sql = _UPDATE.format(profile=connection.ops.quote_name(UserProfile._meta.db_table))
+                cursor.execute(sql, columns)
+        # A profile created concurrently by the live path wins; it is
+        # corrected on the next run.
+        UserProfile.objects.bulk_create(created, ignore_conflicts=True)
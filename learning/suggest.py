@@ -0,0 +1,377 @@
+"""Autocomplete for the navbar search box, answered from a mapped file.
+
+The box used to call SearchView with `format=json` on every debounced
+keystroke — card annotations and two table scans to show six titles. Titles
+of published courses and lessons are instead indexed once per catalog
+(learning/catalog.py) and answered without SQL:
+
+* words are folded the way full-text search folds them (`search.normalize`:
+  Cyrillic → Latin, apostrophes dropped) and then stripped of accents;
+* a sorted vocabulary with postings lists acts as a flattened prefix trie —
+  a query word matches every indexed word it is a prefix of, found with two
+  bisects; the best matches for very short prefixes are precomputed;
+* a query word that prefixes nothing falls back to indexed words with similar
+  trigrams, which absorbs typos ("pyton", "matematka").
+
+The index is compiled by `rebuild_catalog()`, under the catalog's flock, into
+a sidecar file next to the catalog (`catalog-<db>.suggest`) that is renamed
+into place before the catalog itself. Workers only mmap it, exactly like the
+catalog, so no worker ever builds an index. Content signals unlink the catalog
+but leave the sidecar, so after an edit suggestions come from the previous
+file until the next outline read rebuilds both; the endpoint itself never
+rebuilds anything unless there is no index file at all.
+
+File layout (native byte order; the file never leaves the host that wrote
+it)::
+
+    header    magic, format version, the catalog's build time, course count,
+              section offsets
+    sections  tables of u32 offsets followed by UTF-8 text or u32 lists:
+              per entry (courses first) title, url, meta, thumbnail and
+              folded words; the vocabulary and its postings; trigrams and
+              their word ids; trigram counts per word; short prefixes and
+              their first matches
+"""
+import heapq
+import os
+import re
+import struct
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from mmap import ACCESS_READ, mmap
+
+from django.urls import reverse
+
+from .catalog import catalog_path, ensure_built
+from .search import normalize
+
+LIMIT = 6
+# Prefixes this short match a big slice of the vocabulary; their first
+# matches are kept at build time rather than merged per keystroke.
+SHORT_PREFIX = 2
+SHORT_PREFIX_KEEP = 48
+# Per kind, how many matches are collected before ranking.
+CANDIDATES = 4 * LIMIT
+# Same default as pg_trgm's similarity threshold.
+FUZZY_THRESHOLD = 0.3
+FUZZY_WORDS = 8
+
+MAGIC = b'OKSUGST\x00'
+FORMAT_VERSION = 1
+SECTIONS = ('titles', 'urls', 'metas', 'thumbs', 'folded', 'vocab', 'postings',
+            'grams', 'gram_words', 'gram_counts', 'short', 'short_matches')
+HEADER = struct.Struct('=8sIQI' + 'I' * len(SECTIONS))
+U32 = struct.Struct('=I')
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def fold(text):
+    text = normalize(text)
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def words(text):
+    return _WORD.findall(fold(text))
+
+
+def _trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _range(vocab, prefix):
+    return bisect_left(vocab, prefix), bisect_left(vocab, prefix + '\U0010ffff')
+
+
+def _merged(postings, word_ids):
+    """Entry ids with any of `word_ids`, ascending and without repeats."""
+    last = None
+    for entry_id in heapq.merge(*(postings[w] for w in word_ids)):
+        if entry_id != last:
+            last = entry_id
+            yield entry_id
+
+
+class Suggestion:
+    __slots__ = ('kind', 'title', 'url', 'meta', 'thumb', 'words', 'folded')
+
+    def __init__(self, kind, title, url, meta, thumb='', folded=None):
+        self.kind, self.title, self.url, self.meta, self.thumb = kind, title, url, meta, thumb
+        self.words = tuple(words(title)) if folded is None else tuple(folded.split())
+        self.folded = ' '.join(self.words)
+
+    def as_json(self):
+        if self.kind == 'course':
+            return {'title': self.title, 'url': self.url, 'category': self.meta, 'thumb': self.thumb}
+        return {'title': self.title, 'course': self.meta, 'url': self.url}
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+
+def _pack(items, encode):
+    """One table: item count, u32 end offsets (starting at 0), payload."""
+    offsets, payload = array('I', [0]), bytearray()
+    for item in items:
+        payload += encode(item)
+        offsets.append(len(payload) // 4 if encode is _ints else len(payload))
+    payload += bytes(-len(payload) % 4)
+    return U32.pack(len(items)) + offsets.tobytes() + bytes(payload)
+
+
+def _text(item):
+    return item.encode()
+
+
+def _ints(item):
+    return array('I', item).tobytes()
+
+
+def build_index_bytes(catalog):
+    """Compile the index over `catalog`'s published courses and their lessons.
+    Entry ids put every course before every lesson, so postings merged in id
+    order yield courses first."""
+    entries = []
+    published = [c for c in catalog.courses() if c.is_published]
+    for course in published:
+        entries.append(Suggestion(
+            'course', course.title, reverse('learning:course_detail', args=[course.slug]),
+            course.category_name, course.thumbnail_url,
+        ))
+    course_count = len(entries)
+    for course in published:
+        for lesson in catalog.lessons(course):
+            entries.append(Suggestion('lesson', lesson.title, lesson.url, course.title))
+
+    by_word = {}
+    for entry_id, entry in enumerate(entries):
+        for word in set(entry.words):
+            by_word.setdefault(word, array('I')).append(entry_id)
+    vocab = sorted(by_word)
+    postings = [by_word[word] for word in vocab]
+
+    gram_words, gram_counts = {}, []
+    for word_id, word in enumerate(vocab):
+        grams = _trigrams(word)
+        gram_counts.append(len(grams))
+        for gram in grams:
+            gram_words.setdefault(gram, []).append(word_id)
+    grams = sorted(gram_words)
+
+    short = {}
+    for word in vocab:
+        for n in range(1, SHORT_PREFIX + 1):
+            prefix = word[:n]
+            if len(prefix) == n and prefix not in short:
+                courses, lessons = [], []
+                for entry_id in _merged(postings, range(*_range(vocab, prefix))):
+                    bucket = courses if entry_id < course_count else lessons
+                    if len(bucket) < SHORT_PREFIX_KEEP:
+                        bucket.append(entry_id)
+                    elif bucket is lessons:
+                        break
+                short[prefix] = courses + lessons
+    prefixes = sorted(short)
+
+    sections = [
+        _pack([e.title for e in entries], _text),
+        _pack([e.url for e in entries], _text),
+        _pack([e.meta for e in entries], _text),
+        _pack([e.thumb for e in entries], _text),
+        _pack([e.folded for e in entries], _text),
+        _pack(vocab, _text),
+        _pack(postings, _ints),
+        _pack(grams, _text),
+        _pack([gram_words[g] for g in grams], _ints),
+        _pack([gram_counts], _ints),
+        _pack(prefixes, _text),
+        _pack([short[p] for p in prefixes], _ints),
+    ]
+    offset, layout = HEADER.size, []
+    for section in sections:
+        layout.append(offset)
+        offset += len(section)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, catalog.built_at_ns, course_count, *layout)
+    return header + b''.join(sections)
+
+
+def index_path():
+    """Next to the catalog it is built from, so also one per database."""
+    return catalog_path().with_suffix('.suggest')
+
+
+def write_index(catalog):
+    """Write the index for `catalog` atomically (temp file + rename). Called
+    by `rebuild_catalog()`, which is what keeps this to once per catalog."""
+    path = index_path()
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp, 'wb') as fh:
+        fh.write(build_index_bytes(catalog))
+    os.replace(tmp, path)
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+class _Table:
+    """Lazy sequence over one packed section; bisect decodes only the items
+    it probes."""
+
+    def __init__(self, buf, start, ints=False):
+        (count,) = U32.unpack_from(buf, start)
+        self._offsets = buf[start + 4:start + 8 + 4 * count].cast('I')
+        data = start + 8 + 4 * count
+        if ints:
+            self._data = buf[data:data + 4 * self._offsets[count]].cast('I')
+        else:
+            self._data = buf[data:data + self._offsets[count]]
+        self._ints = ints
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        item = self._data[self._offsets[i]:self._offsets[i + 1]]
+        return item if self._ints else str(item, 'utf-8')
+
+    def find(self, key):
+        i = bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+
+class SuggestIndex:
+    """Accessor over one mapped index file. Entries are decoded on demand."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self._buf = mmap(fh.fileno(), 0, access=ACCESS_READ)
+        fields = HEADER.unpack_from(self._buf, 0)
+        if fields[0] != MAGIC or fields[1] != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a v{FORMAT_VERSION} suggestion index')
+        self.built_at_ns, self.course_count = fields[2], fields[3]
+        view = memoryview(self._buf)
+        for name, offset in zip(SECTIONS, fields[4:]):
+            ints = name in ('postings', 'gram_words', 'gram_counts', 'short_matches')
+            setattr(self, name, _Table(view, offset, ints))
+        self.gram_counts = self.gram_counts[0]
+
+    def _entry(self, entry_id):
+        return Suggestion(
+            'course' if entry_id < self.course_count else 'lesson',
+            self.titles[entry_id], self.urls[entry_id], self.metas[entry_id],
+            self.thumbs[entry_id], self.folded[entry_id],
+        )
+
+    def _fuzzy(self, word):
+        """Indexed words whose trigram similarity to `word` clears the threshold."""
+        grams = _trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            i = self.grams.find(gram)
+            if i is not None:
+                shared.update(self.gram_words[i])
+        scored = []
+        for word_id, n in shared.items():
+            similarity = n / (len(grams) + self.gram_counts[word_id] - n)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((similarity, word_id))
+        return [word_id for _, word_id in heapq.nlargest(FUZZY_WORDS, scored)]
+
+    def suggest(self, q, limit=LIMIT):
+        """(courses, lessons) Suggestions for `q`, each at most `limit` long."""
+        query = words(q)
+        if not query:
+            return [], []
+
+        # Each query word becomes a term: the indexed words it prefixes, or
+        # failing that its near misses. The narrowest term drives the scan;
+        # the others are checked against each candidate's own words.
+        terms = []
+        for word in query:
+            lo, hi = _range(self.vocab, word)
+            if lo < hi:
+                terms.append((hi - lo, word, None, range(lo, hi)))
+                continue
+            near = self._fuzzy(word) if len(word) >= 3 else []
+            if not near:
+                return [], []
+            terms.append((len(near), word, frozenset(self.vocab[w] for w in near), near))
+        terms.sort(key=lambda t: (t[0], -len(t[1])))
+        _, word, near, word_ids = terms[0]
+        short = None
+        if near is None and len(word) <= SHORT_PREFIX and len(terms) == 1:
+            short = self.short.find(word)
+        if short is not None:
+            candidates = self.short_matches[short]
+        else:
+            candidates = _merged(self.postings, word_ids)
+        checks = [(w, n) for _, w, n, _ in terms[1:]]
+
+        courses, lessons = [], []
+        for entry_id in candidates:
+            bucket = courses if entry_id < self.course_count else lessons
+            if len(bucket) >= CANDIDATES:
+                if bucket is lessons:
+                    break
+                continue
+            entry = self._entry(entry_id)
+            if all(_has(entry.words, w, n) for w, n in checks):
+                bucket.append(entry)
+
+        fuzzy = any(t[2] is not None for t in terms)
+        phrase = ' '.join(query)
+
+        def rank(entry):
+            return (fuzzy, not entry.folded.startswith(phrase), len(entry.title))
+
+        return sorted(courses, key=rank)[:limit], sorted(lessons, key=rank)[:limit]
+
+
+def _has(entry_words, word, near):
+    if near is None:
+        return any(w.startswith(word) for w in entry_words)
+    return any(w in near for w in entry_words)
+
+
+_lock = threading.Lock()
+_mapped = {}  # path -> ((inode, mtime, size), SuggestIndex)
+
+
+def get_index():
+    """The current index for this database, (re)mapping it when a catalog
+    rebuild has replaced the file. Builds (catalog and index, under the
+    catalog's flock) only when there is no index file yet."""
+    path = index_path()
+    for _ in range(3):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            ensure_built(path)
+            continue
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        current = _mapped.get(path)
+        if current is not None and current[0] == key:
+            return current[1]
+        with _lock:
+            current = _mapped.get(path)
+            if current is None or current[0] != key:
+                try:
+                    current = (key, SuggestIndex(path))
+                except FileNotFoundError:
+                    continue
+                _mapped[path] = current
+            return current[1]
+    raise RuntimeError(f'suggestion index at {path} keeps disappearing')
+
+
+def suggest(q, limit=LIMIT):
+    courses, lessons = get_index().suggest(q, limit)
+    return {
+        'courses': [c.as_json() for c in courses],
+        'lessons': [l.as_json() for l in lessons],
+    }
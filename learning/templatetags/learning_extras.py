@@ -4,6 +4,8 @@ from django import template
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 
+from .. import course_cards
+
 register = template.Library()
 
 
@@ -20,6 +22,20 @@ def jsonld(data):
     return mark_safe(f'<script type="application/ld+json">{payload}</script>')
 
 
+@register.simple_tag(name='course_cards')
+def course_card_grid(courses):
+    """Render the cards of `courses` from the card cache (learning/course_cards.py)."""
+    return course_cards.render(courses)
+
+
+@register.simple_tag
+def wishlist_payload(course_ids):
+    """The signed-in user's wishlisted course ids as one compact JSON script;
+    base.html marks the card hearts from it."""
+    payload = json.dumps(sorted(course_ids or ()), separators=(',', ':'))
+    return mark_safe(f'<script id="wishlist-ids" type="application/json">{payload}</script>')
+
+
 @register.filter
 def duration(seconds):
     """Soniyani '1 soat 23 daqiqa' formatiga o'tkazadi."""
@@ -159,10 +159,12 @@ from users.models import TelegramAuthToken, TelegramContact, TelegramProfile, Us
 from learning.views import _update_streak, _maybe_issue_certificate, _today_uzt
 
 # Use a known bot secret, an in-memory cache (the prod DB cache table is not
-# created in the test DB), and the plain static backend (no manifest in tests).
+# created in the test DB), a per-process rate limiter (no state left behind in
+# var/ between runs), and the plain static backend (no manifest in tests).
 _AUTH_OVERRIDES = dict(
     BOT_SECRET='test-bot-secret',
     CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATE_LIMIT={'BACKEND': 'users.ratelimit.MemoryBackend'},
     STORAGES={
         'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
         'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
@@ -535,9 +537,10 @@ class SeoTests(TestCase):
     def test_sitemap_lists_published_course(self):
         resp = self.client.get('/sitemap.xml')
         self.assertEqual(resp.status_code, 200)
-        body = resp.content.decode()
-        self.assertIn('/malaka/python-asoslari/', body)
-        self.assertIn('https://', body)
+        self.assertIn('https://ochiqkurs.uz/sitemap-courses-1.xml', b''.join(resp.streaming_content).decode())
+        resp = self.client.get('/sitemap-courses-1.xml')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('https://ochiqkurs.uz/malaka/python-asoslari/', b''.join(resp.streaming_content).decode())
 
     def test_robots_txt(self):
         resp = self.client.get('/robots.txt')
@@ -592,3 +595,1814 @@ class SeoTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.content.decode().strip(),
                          'google-site-verification: googletest123.html')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Home snapshot (learning/snapshots.py)
+# ═══════════════════════════════════════════════════════════════
+from learning.snapshots import HOME_SNAPSHOT_KEY, get_home_snapshot
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class HomeSnapshotTests(TestCase):
+    def setUp(self):
+        _cache.delete(HOME_SNAPSHOT_KEY)
+        self.course = Course.objects.create(title='Django Asoslari', slug='django', is_featured=True)
+        module = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        Lesson.objects.create(title='L', slug='l', module=module, duration_seconds=60, order=0)
+
+    def test_snapshot_holds_plain_cards(self):
+        snap = get_home_snapshot()
+        card = snap['featured'][0]
+        self.assertEqual(card['slug'], 'django')
+        self.assertEqual(card['lesson_count'], 1)
+        self.assertEqual(snap['total_courses'], 1)
+        # Plain data only, so it can live in any cache backend.
+        _json.dumps(snap)
+
+    @override_settings(PAGE_CACHE_TTL=0)  # the render itself, not learning/page_cache.py
+    def test_anonymous_home_served_from_warm_snapshot(self):
+        get_home_snapshot()
+        self.client.get(reverse('home'))  # warms the card fragments too
+        with self.assertNumQueries(2):  # the cache read + the site counters
+            resp = self.client.get(reverse('home'))
+        self.assertContains(resp, 'Django Asoslari')
+
+    def test_content_change_invalidates_snapshot(self):
+        get_home_snapshot()
+        self.course.title = 'Django Chuqur'
+        self.course.save()
+        self.assertIsNone(_cache.get(HOME_SNAPSHOT_KEY))
+        self.assertContains(self.client.get(reverse('home')), 'Django Chuqur')
+
+    def test_personalized_sections_layered_on_top(self):
+        user = User.objects.create_user(username='homer', password='pw-12345!x')
+        module = self.course.modules.get()
+        Lesson.objects.create(title='L2', slug='l2', module=module, order=1)
+        Enrollment.objects.create(user=user, course=self.course)
+        LessonProgress.objects.create(user=user, lesson=module.lessons.get(slug='l'), is_completed=True)
+        self.client.force_login(user)
+        resp = self.client.get(reverse('home'))
+        self.assertEqual([c['course'].id for c in resp.context['continue_learning']], [self.course.id])
+        self.assertEqual(resp.context['continue_learning'][0]['percent'], 50)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Site-wide counters
+# ═══════════════════════════════════════════════════════════════
+
+from io import StringIO as _StringIO
+from django.core.management import call_command as _call_command
+from learning import site_stats
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class SiteStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='watcher', password='pw-12345!x')
+        course = Course.objects.create(title='C', slug='c', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=0)
+        self.lesson = Lesson.objects.create(
+            title='L', slug='l', module=module, duration_seconds=600, order=0,
+        )
+        self.view_url = reverse('learning:record_view', args=['c', 'm', 'l'])
+
+    def test_counters_follow_signals(self):
+        self.assertEqual(site_stats.totals(), site_stats.compute_exact())
+        self.client.force_login(self.user)
+        self.client.post(self.view_url)
+        self.client.post(self.view_url)  # same day: no new LessonView
+        self.assertEqual(site_stats.totals()[site_stats.WATCH_SECONDS], 600)
+
+        self.lesson.duration_seconds = 900
+        self.lesson.save()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(site_stats.totals(), site_stats.compute_exact())
+
+    def test_deleting_lesson_removes_its_watch_time(self):
+        LessonView.objects.create(user=self.user, lesson=self.lesson, viewed_on=_today_uzt())
+        self.lesson.delete()
+        self.assertEqual(site_stats.totals(), {
+            site_stats.WATCH_SECONDS: 0, site_stats.ACTIVE_USERS: 1, site_stats.LESSONS: 0,
+        })
+
+    def test_reconcile_repairs_drift(self):
+        Lesson.objects.filter(pk=self.lesson.pk).update(duration_seconds=60)  # no signals
+        LessonView.objects.create(user=self.user, lesson=self.lesson, viewed_on=_today_uzt())
+        site_stats.incr(site_stats.LESSONS, 5)
+        _call_command('reconcile_site_stats', stdout=_StringIO())
+        self.assertEqual(site_stats.totals(), site_stats.compute_exact())
+        self.assertEqual(site_stats.totals()[site_stats.WATCH_SECONDS], 60)
+
+    def test_home_hero_reads_counters(self):
+        site_stats.incr(site_stats.WATCH_SECONDS, 7200)
+        resp = self.client.get(reverse('home'))
+        self.assertEqual(resp.context['total_hours'], 2)
+        self.assertEqual(resp.context['total_lessons'], 1)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Course card stats
+# ═══════════════════════════════════════════════════════════════
+
+from learning.models import CourseStats
+from learning.snapshots import build_home_snapshot
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class CourseStatsTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='C', slug='c', status='published')
+        self.module = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+
+    def _stats(self, course=None):
+        return CourseStats.objects.get(course=course or self.course)
+
+    def test_signals_keep_stats_current(self):
+        lesson = Lesson.objects.create(title='L', slug='l', module=self.module, duration_seconds=300)
+        Lesson.objects.create(title='L2', slug='l2', module=self.module)
+        lesson.duration_seconds = 500
+        lesson.save()
+        user = User.objects.create_user(username='s1', password='pw-12345!x')
+        enrollment = Enrollment.objects.create(user=user, course=self.course)
+        self.assertEqual(
+            (self._stats().lesson_count, self._stats().total_duration, self._stats().student_count),
+            (2, 500, 1),
+        )
+        lesson.delete()
+        enrollment.delete()
+        self.assertEqual(
+            (self._stats().lesson_count, self._stats().total_duration, self._stats().student_count),
+            (1, 0, 0),
+        )
+
+    def test_content_change_is_stamped(self):
+        before = self._stats().last_content_change
+        Enrollment.objects.create(
+            user=User.objects.create_user(username='s2', password='pw-12345!x'), course=self.course,
+        )
+        self.assertEqual(self._stats().last_content_change, before)
+        Lesson.objects.create(title='L', slug='l', module=self.module)
+        self.assertGreater(self._stats().last_content_change, before)
+
+    def test_rebuild_command_repairs_bulk_writes(self):
+        other = Course.objects.bulk_create([Course(title='B', slug='b', status='published')])[0]
+        Lesson.objects.bulk_create([Lesson(title='L', slug='l', module=self.module, duration_seconds=90)])
+        _call_command('rebuild_course_stats', stdout=_StringIO())
+        self.assertEqual(self._stats().lesson_count, 1)
+        self.assertEqual(self._stats().total_duration, 90)
+        self.assertEqual(self._stats(other).lesson_count, 0)
+
+    def test_popular_sort_uses_student_count(self):
+        quiet = Course.objects.create(title='Quiet', slug='quiet', status='published', order=0)
+        self.course.order = 1
+        self.course.save()
+        Enrollment.objects.create(
+            user=User.objects.create_user(username='s3', password='pw-12345!x'), course=self.course,
+        )
+        resp = self.client.get(reverse('learning:course_list'))
+        self.assertEqual([c.slug for c in resp.context['courses']], ['c', quiet.slug])
+        self.assertEqual(resp.context['courses'][0].student_count, 1)
+
+    def test_courses_without_stats_rows_sort_last(self):
+        self.course.order = 1
+        self.course.save()
+        Course.objects.bulk_create([Course(title='Bare', slug='bare', status='published', order=0)])
+        Enrollment.objects.create(
+            user=User.objects.create_user(username='s4', password='pw-12345!x'), course=self.course,
+        )
+        resp = self.client.get(reverse('learning:course_list'))
+        self.assertEqual([c.slug for c in resp.context['courses']], ['c', 'bare'])
+        self.assertEqual([c['slug'] for c in build_home_snapshot()['trending']], ['c', 'bare'])
+
+    def test_certificate_for_course_without_stats_row(self):
+        [bare] = Course.objects.bulk_create([Course(title='Bare', slug='bare', status='published')])
+        module = Module.objects.create(title='M', slug='m', course=bare, order=0)
+        Lesson.objects.create(title='L', slug='l', module=module, order=0)
+        user = User.objects.create_user(username='s5', password='pw-12345!x')
+        self.client.force_login(user)
+        resp = self.client.post(reverse('learning:mark_complete', args=['bare', 'm', 'l']))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(Certificate.objects.filter(user=user, course=bare).exists())
+
+
+# ═══════════════════════════════════════════════════════════════
+# Catalog snapshot
+# ═══════════════════════════════════════════════════════════════
+
+from django.http import Http404
+from learning.catalog import get_catalog, invalidate_catalog
+from learning.views import _get_lesson
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class CatalogTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Kurs', slug='kurs', status='published')
+        m1 = Module.objects.create(title='M1', slug='m1', course=self.course, order=0)
+        m2 = Module.objects.create(title='M2', slug='m2', course=self.course, order=1)
+        self.a = Lesson.objects.create(title='A', slug='a', module=m1, order=0, youtube_video_id='vidA')
+        self.b = Lesson.objects.create(title='B', slug='b', module=m1, order=1)
+        self.c = Lesson.objects.create(title='C', slug='c', module=m2, order=0)
+
+    def test_resolution_and_navigation_run_no_sql(self):
+        get_catalog()
+        self.course.refresh_from_db()  # thumbnail_source was resolved by the lesson saves
+        with self.assertNumQueries(0):
+            catalog = get_catalog()
+            _, module, lesson = catalog.resolve('kurs', 'm1', 'b')
+            nxt = catalog.next(lesson)
+            self.assertEqual((module.slug, lesson.id), ('m1', self.b.id))
+            self.assertEqual((nxt.slug, nxt.module.slug), ('c', 'm2'))  # crosses modules
+            self.assertIsNone(catalog.prev(catalog.lesson_by_id(self.a.id)))
+            self.assertEqual(nxt.url, reverse('learning:lesson_detail', args=['kurs', 'm2', 'c']))
+            self.assertIsNone(catalog.resolve('kurs', 'm1', 'nope'))
+            self.assertEqual(
+                self.course.get_thumbnail_url(), 'https://img.youtube.com/vi/vidA/hqdefault.jpg',
+            )
+
+    def test_content_change_rebuilds(self):
+        get_catalog()
+        Lesson.objects.create(title='D', slug='d', module=self.c.module, order=1)
+        catalog = get_catalog()
+        self.assertEqual(catalog.next(catalog.lesson_by_id(self.c.id)).slug, 'd')
+        self.assertEqual(catalog.course('kurs').lesson_count, 4)
+
+    def test_get_lesson_single_query_and_status(self):
+        get_catalog()
+        with self.assertNumQueries(1) as ctx:
+            lesson = _get_lesson('kurs', 'm2', 'c')
+            self.assertEqual(lesson.module.course.slug, 'kurs')
+        where = ctx.captured_queries[0]['sql'].split('WHERE')[1]
+        self.assertNotIn('slug', where)  # by primary key, not the slug join
+        # A resolution the file still holds but the row no longer matches.
+        Lesson.objects.filter(pk=self.c.pk).update(slug='c2')  # bypasses the signals
+        with self.assertRaises(Http404):
+            _get_lesson('kurs', 'm2', 'c')
+        self.assertEqual(_get_lesson('kurs', 'm2', 'c2').pk, self.c.pk)
+        # Stale/missing file: still resolved correctly from the database.
+        invalidate_catalog()
+        Course.objects.filter(pk=self.course.pk).update(status='draft')
+        with self.assertRaises(Http404):
+            _get_lesson('kurs', 'm2', 'c')
+
+    def test_lesson_page_sidebar_from_catalog(self):
+        resp = self.client.get(reverse('learning:lesson_detail', args=['kurs', 'm1', 'b']))
+        self.assertEqual([m.slug for m in resp.context['sidebar_modules']], ['m1', 'm2'])
+        self.assertEqual(resp.context['prev_lesson'].slug, 'a')
+        self.assertEqual(resp.context['next_lesson'].slug, 'c')
+        self.assertContains(resp, reverse('learning:lesson_detail', args=['kurs', 'm2', 'c']))
+
+
+# ═══════════════════════════════════════════════════════════════
+# Per-course progress summaries
+# ═══════════════════════════════════════════════════════════════
+
+from learning.models import UserCourseProgress
+from learning.progress import course_progress
+from users.views import _in_progress_courses
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class CourseProgressSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='prog', password='pw-12345!x')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(title='C', slug='c', status='published')
+        m1 = Module.objects.create(title='M1', slug='m1', course=self.course, order=0)
+        m2 = Module.objects.create(title='M2', slug='m2', course=self.course, order=1)
+        self.l1 = Lesson.objects.create(title='L1', slug='l1', module=m1, order=0)
+        self.l2 = Lesson.objects.create(title='L2', slug='l2', module=m1, order=1)
+        self.l3 = Lesson.objects.create(title='L3', slug='l3', module=m2, order=0)
+
+    def _complete(self, lesson):
+        self.client.post(reverse(
+            'learning:mark_complete', args=['c', lesson.module.slug, lesson.slug],
+        ))
+
+    def _summary(self):
+        return UserCourseProgress.objects.get(user=self.user, course=self.course)
+
+    def test_completion_updates_bitmap_and_pointer(self):
+        self._complete(self.l1)
+        self._complete(self.l3)
+        s = self._summary()
+        self.assertEqual(s.completed_count, 2)
+        self.assertEqual(bytes(s.completed_bitmap), bytes([0b101]))
+        self.assertEqual(s.next_lesson_id, self.l2.id)
+        self._complete(self.l2)
+        self.assertIsNone(self._summary().next_lesson_id)
+        self.assertTrue(Certificate.objects.filter(user=self.user, course=self.course).exists())
+
+    def test_reorder_is_recounted_on_read(self):
+        self._complete(self.l1)
+        self.l1.order, self.l2.order = 1, 0  # l2 now comes first
+        self.l1.save()
+        self.l2.save()
+        s = course_progress(self.user)[self.course.id]
+        self.assertEqual(bytes(s.completed_bitmap), bytes([0b010]))
+        self.assertEqual(s.next_lesson_id, self.l2.id)
+
+    def test_profile_reads_summary(self):
+        self.client.post(reverse('learning:record_view', args=['c', 'm1', 'l1']))
+        self._complete(self.l1)
+        rows = _in_progress_courses(self.user)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['progress_percent'], 33)
+        self.assertEqual((rows[0]['next_module_slug'], rows[0]['next_lesson_slug']), ('m1', 'l2'))
+
+    def test_rebuild_command_after_bulk_delete(self):
+        self._complete(self.l1)
+        LessonProgress.objects.filter(user=self.user).delete()  # bypasses the summary
+        _call_command('rebuild_course_progress', stdout=_StringIO())
+        self.assertFalse(UserCourseProgress.objects.filter(user=self.user).exists())
+
+
+# ═══════════════════════════════════════════════════════════════
+# Rate limiting
+# ═══════════════════════════════════════════════════════════════
+
+import multiprocessing as _mp
+import tempfile as _tempfile
+from users.ratelimit import SharedMemoryBackend, sliding_window, token_bucket
+
+
+def _hammer(path, hits, results):
+    backend = SharedMemoryBackend(path, slots=64)
+    step = lambda state, now: sliding_window(state, now, 60, 3600)  # noqa: E731
+    results.put(sum(backend.update('rl:check:1.2.3.4', step) for _ in range(hits)))
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class RateLimitTests(TestCase):
+    def _run(self, step, times, limit, window):
+        state, allowed = None, []
+        for now in times:
+            state, ok, _ = step(state, now, limit, window)
+            allowed.append(ok)
+        return allowed
+
+    def test_sliding_window_weights_previous_window(self):
+        # 10 hits at the end of one window; halfway through the next, half of
+        # them still count, so only 5 more fit.
+        allowed = self._run(sliding_window, [59.0] * 10 + [90.0] * 6, limit=10, window=60)
+        self.assertEqual(allowed, [True] * 15 + [False])
+
+    def test_token_bucket_refills_over_window(self):
+        allowed = self._run(token_bucket, [0.0] * 4 + [15.0, 15.0], limit=3, window=60)
+        # Burst of 3, then one token back after window / limit = 20 s — not yet at 15 s.
+        self.assertEqual(allowed, [True, True, True, False, False, False])
+        self.assertEqual(self._run(token_bucket, [0.0] * 3 + [20.0], limit=3, window=60)[-1], True)
+
+    def test_shared_memory_counts_across_processes(self):
+        with _tempfile.TemporaryDirectory() as tmp:
+            path = f'{tmp}/rl.bin'
+            results = _mp.get_context('fork').Queue()
+            workers = [
+                _mp.get_context('fork').Process(target=_hammer, args=(path, 25, results))
+                for _ in range(4)
+            ]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            self.assertEqual(sum(results.get() for _ in workers), 60)
+
+    def test_login_is_limited_per_ip(self):
+        for _ in range(10):
+            self.client.post('/users/login/', {'short_code': '000000'})
+        resp = self.client.post('/users/login/', {'short_code': '000000'})
+        self.assertContains(resp, 'Juda ko&#x27;p urinish')
+
+
+# ═══════════════════════════════════════════════════════════════
+# Login push (long-poll confirmation)
+# ═══════════════════════════════════════════════════════════════
+
+import asyncio as _asyncio
+import time as _time
+from asgiref.sync import sync_to_async as _sync_to_async
+from users import login_push
+
+
+@override_settings(**_AUTH_OVERRIDES, LOGIN_PUSH=True, LOGIN_WAIT_TIMEOUT=5)
+class LoginPushTests(TestCase):
+    def setUp(self):
+        login_push.hub = login_push.Hub()
+
+    def _confirm(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/confirm/', data=_json.dumps({'token': token, 'telegram_id': 42}),
+                             content_type='application/json', HTTP_X_BOT_SECRET='test-bot-secret')
+
+    async def test_confirm_wakes_waiting_request(self):
+        token = await _sync_to_async(TelegramAuthToken.generate)()
+        waiting = _asyncio.ensure_future(self.async_client.get(f'/api/auth/wait/{token.token}/'))
+        await _asyncio.sleep(0.1)
+        self.assertFalse(waiting.done())
+        await _sync_to_async(self._confirm)(token.token)
+        resp = await _asyncio.wait_for(waiting, 2)
+        self.assertEqual(resp.json()['status'], 'confirmed')
+
+    @override_settings(LOGIN_WAIT_TIMEOUT=0.05)
+    def test_pending_reply_carries_cursor_and_expiry(self):
+        token = TelegramAuthToken.generate()
+        data = self.client.get(f'/api/auth/wait/{token.token}/').json()
+        self.assertEqual(data['status'], 'pending')
+        self.assertIn('cursor', data)
+        self.assertGreater(data['expires_in'], 500)
+        # The old polling contract is unchanged.
+        self.assertEqual(self.client.get(f'/api/auth/check/{token.token}/').json()['status'], 'pending')
+
+    @override_settings(LOGIN_WAIT_TIMEOUT=0.05)
+    def test_reconnect_skips_lookup_only_when_listener_covers_cursor(self):
+        token = TelegramAuthToken.generate()
+        url = f'/api/auth/wait/{token.token}/'
+        login_push.hub.listening_since = _time.time() - 60
+        with self.assertNumQueries(0):
+            self.client.get(url, {'cursor': _time.time() - 10})
+        # Cursor from before the listener (re)connected: must look it up.
+        with self.assertNumQueries(1):
+            self.client.get(url, {'cursor': _time.time() - 120})
+        # Once the hub has heard of a confirmation, the token is looked up.
+        login_push.hub.confirmed(token.token)
+        with self.assertNumQueries(2):
+            self.client.get(url, {'cursor': _time.time() - 10})
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_table'}},
+        RATE_LIMIT={'BACKEND': 'users.ratelimit.CacheBackend'},
+        LOGIN_WAIT_TIMEOUT=0.05,
+    )
+    async def test_rate_limit_runs_off_the_event_loop(self):
+        # The cache backend on the database cache is sync-only.
+        token = await _sync_to_async(TelegramAuthToken.generate)()
+        resp = await self.async_client.get(f'/api/auth/wait/{token.token}/')
+        self.assertEqual(resp.json()['status'], 'pending')
+
+    @override_settings(LOGIN_PUSH=False)
+    def test_without_login_push_it_answers_at_once(self):
+        token = TelegramAuthToken.generate()
+        started = _time.monotonic()
+        data = self.client.get(f'/api/auth/wait/{token.token}/').json()
+        self.assertLess(_time.monotonic() - started, 1)  # not LOGIN_WAIT_TIMEOUT
+        self.assertEqual(data['status'], 'pending')
+        self.assertNotIn('cursor', data)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Batched learning events
+# ═══════════════════════════════════════════════════════════════
+
+from django.test import Client
+from learning.catalog import catalog_path
+from learning.events import MAX_EVENTS
+from learning.models import Note, VideoBookmark
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class LearningEventTests(TestCase):
+    URL = '/malaka/voqealar/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ev', password='pw')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(title='C', slug='c', status='published')
+        m = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        self.l1 = Lesson.objects.create(title='L1', slug='l1', module=m, order=0, duration_seconds=300)
+        self.l2 = Lesson.objects.create(title='L2', slug='l2', module=m, order=1, duration_seconds=200)
+
+    def _send(self, events):
+        return self.client.post(self.URL, _json.dumps({'events': events}), content_type='application/json')
+
+    def test_batch_applies_once_with_side_effects(self):
+        watch_before = site_stats.totals()[site_stats.WATCH_SECONDS]
+        data = self._send([
+            {'type': 'view', 'lesson': self.l1.id, 'id': 'a'},
+            {'type': 'view', 'lesson': self.l1.id, 'id': 'a'},  # retried duplicate
+            {'type': 'view', 'lesson': self.l1.id, 'id': 'b'},  # same lesson, same day
+            {'type': 'complete', 'lesson': self.l1.id},
+            {'type': 'complete', 'lesson': self.l2.id},
+        ]).json()
+        self.assertEqual(data['completed'], [self.l1.id, self.l2.id])
+        self.assertEqual(LessonView.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(site_stats.totals()[site_stats.WATCH_SECONDS] - watch_before, 300)
+        self.assertEqual(CourseStats.objects.get(course=self.course).student_count, 1)
+        self.assertEqual(UserCourseProgress.objects.get(user=self.user).completed_count, 2)
+        self.assertEqual(UserProfile.objects.get(user=self.user).current_streak, 1)
+        self.assertTrue(Certificate.objects.filter(user=self.user, course=self.course).exists())
+
+    def test_view_after_completion_keeps_it_completed(self):
+        self._send([{'type': 'complete', 'lesson': self.l1.id}])
+        self._send([{'type': 'view', 'lesson': self.l1.id}])
+        self.assertTrue(LessonProgress.objects.get(user=self.user, lesson=self.l1).is_completed)
+
+    def test_beacon_form_post_with_notes_and_bookmarks(self):
+        batch = _json.dumps([
+            {'type': 'note', 'lesson': self.l1.id, 'content': 'draft'},
+            {'type': 'note', 'lesson': self.l1.id, 'content': 'final'},
+            {'type': 'bookmark', 'lesson': self.l1.id, 'timestamp': 42, 'note': 'here'},
+        ])
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = client.get(reverse('learning:lesson_detail', args=['c', 'm', 'l1'])).context['csrf_token']
+        for _ in range(2):  # a retried beacon must not duplicate anything
+            resp = client.post(self.URL, {'csrfmiddlewaretoken': token, 'events': batch})
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Note.objects.get(user=self.user, lesson=self.l1).content, 'final')
+        self.assertEqual(VideoBookmark.objects.filter(user=self.user).count(), 1)
+
+    def test_rejects_unpublished_lessons_and_oversized_batches(self):
+        self.course.status = 'draft'
+        self.course.save()
+        data = self._send([{'type': 'view', 'lesson': self.l1.id}, {'type': 'bogus'}]).json()
+        self.assertEqual((data['applied'], data['rejected']), (0, 2))
+        self.assertFalse(LessonView.objects.exists())
+        resp = self._send([{'type': 'view', 'lesson': self.l1.id}] * (MAX_EVENTS + 1))
+        self.assertEqual(resp.status_code, 400)
+
+    def test_unknown_lesson_ids_never_rebuild_the_catalog(self):
+        get_catalog()
+        before = catalog_path().stat()
+        bogus = [10**6 + i for i in range(MAX_EVENTS - 1)] + [10**30]
+        data = self._send([{'type': 'view', 'lesson': lesson_id} for lesson_id in bogus]).json()
+        self.assertEqual(data['rejected'], MAX_EVENTS)
+        after = catalog_path().stat()
+        self.assertEqual((after.st_ino, after.st_mtime_ns), (before.st_ino, before.st_mtime_ns))
+
+        # A real lesson the file predates (bulk_create skips the signals) still counts.
+        get_catalog()
+        [l3] = Lesson.objects.bulk_create([Lesson(title='L3', slug='l3', module=self.l1.module, order=2)])
+        self.assertEqual(self._send([{'type': 'view', 'lesson': l3.id}]).json()['applied'], 1)
+
+    def test_only_malformed_bodies_are_bad_requests(self):
+        resp = self.client.post(self.URL, '[1, 2]', content_type='application/json')
+        self.assertEqual((resp.status_code, resp.json()), (400, {'error': 'Invalid JSON'}))
+        self.assertEqual(self._send('view').json(), {'error': 'events must be a list'})
+        # A bug inside ingestion is a server error, not a 400.
+        with _mock.patch('learning.views.ingest', side_effect=ValueError('bug')):
+            with self.assertRaises(ValueError):
+                self._send([])
+
+
+# ═══════════════════════════════════════════════════════════════
+# Full-text search
+# ═══════════════════════════════════════════════════════════════
+
+from importlib import import_module as _import_module
+from django.db import connection as _connection
+from learning.search import normalize as _uz_normalize, search
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class SearchTests(TestCase):
+    SAMPLES = [
+        "O‘zbek tili", "o'zbek", "OʻZBEK", "Ўзбек тили", "Ёшлар учун Python", "Ер юзи",
+        "Ғалаба", "g`alaba", "Шахмат ва чизмачилик", "Қишлоқ хўжалиги", "объект", "C++ asoslari",
+    ]
+
+    def test_python_normalize_matches_sql(self):
+        with _connection.cursor() as cursor:
+            for text in self.SAMPLES:
+                cursor.execute('SELECT uz_normalize(%s)', [text])
+                self.assertEqual(cursor.fetchone()[0], _uz_normalize(text), text)
+        self.assertEqual(_uz_normalize('Ўзбек'), _uz_normalize("O‘zbek"))
+
+    def test_scripts_and_apostrophes_match_each_other(self):
+        course = Course.objects.create(title="O‘zbek tili grammatikasi", slug='uz', status='published')
+        Course.objects.create(title='Ingliz tili', slug='en', status='published')
+        for q in ["o'zbek", 'ozbek', 'Ўзбек', 'ўзб', "O`ZBEK tili"]:
+            resp = self.client.get(reverse('learning:search'), {'q': q})
+            self.assertEqual([c.id for c in resp.context['courses']], [course.id], q)
+
+    def test_title_match_outranks_description_match(self):
+        described = Course.objects.create(
+            title='Dasturlash asoslari', slug='d', status='published', description='Python bilan',
+        )
+        titled = Course.objects.create(title='Python dasturlash', slug='p', status='published')
+        resp = self.client.get(reverse('learning:course_list'), {'q': 'python'})
+        self.assertEqual([c.id for c in resp.context['courses']], [titled.id, described.id])
+        m = Module.objects.create(title='M', slug='m', course=titled, order=0)
+        Lesson.objects.create(title='Kirish', slug='k', module=m, description='Python nima?')
+        resp = self.client.get(reverse('learning:search'), {'q': 'pyth'})
+        self.assertEqual([l.slug for l in resp.context['lessons']], ['k'])
+
+    def test_reindex_command_recomputes_stale_vectors(self):
+        migration = _import_module('learning.migrations.0020_search_vectors')
+        with _connection.cursor() as cursor:
+            # A row indexed by an older (here: useless) uz_normalize...
+            cursor.execute("CREATE OR REPLACE FUNCTION uz_normalize(text) RETURNS text "
+                           "LANGUAGE sql IMMUTABLE AS $$ SELECT ''::text $$")
+            course = Course.objects.create(title='Tarix', slug='t', status='published')
+            cursor.execute(migration.UZ_NORMALIZE)
+        # ...keeps its stored vector until rewritten.
+        self.assertFalse(search(Course.objects.all(), 'tarix').exists())
+        _call_command('reindex_search', '--batch-size', '1', stdout=_StringIO())
+        self.assertEqual(search(Course.objects.all(), 'tarix').get(), course)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Search suggestions (in-memory autocomplete)
+# ═══════════════════════════════════════════════════════════════
+
+from learning.models import Category
+from learning.suggest import get_index as _suggest_index, index_path as _suggest_index_path
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        cat = Category.objects.create(name='Dasturlash', slug='dasturlash')
+        self.course = Course.objects.create(
+            title='Python dasturlash', slug='python', status='published', category=cat,
+        )
+        Course.objects.create(title='Python (qoralama)', slug='draft', status='draft')
+        m = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        Lesson.objects.create(title="O‘zgaruvchilar va turlar", slug='ozg', module=m, order=0)
+        Lesson.objects.create(title='Funksiyalar', slug='fn', module=m, order=1)
+        get_catalog()  # writes this test's index over the previous test's
+
+    def _suggest(self, q):
+        return self.client.get(reverse('learning:search_suggest'), {'q': q}).json()
+
+    def test_prefix_folding_and_no_sql(self):
+        with self.assertNumQueries(0):
+            data = self._suggest('pyth')
+        self.assertEqual(data['courses'], [{
+            'title': 'Python dasturlash', 'url': reverse('learning:course_detail', args=['python']),
+            'category': 'Dasturlash', 'thumb': '',
+        }])
+        self.assertEqual(data['lessons'], [])
+        for q in ["o'zg", 'ozgaruv', 'Ўзгарувчи', 'TURLAR ozg']:
+            self.assertEqual([l['title'] for l in self._suggest(q)['lessons']],
+                             ["O‘zgaruvchilar va turlar"], q)
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual([c['title'] for c in self._suggest('pyhon')['courses']], ['Python dasturlash'])
+        self.assertEqual([l['title'] for l in self._suggest('funksyalar')['lessons']], ['Funksiyalar'])
+        self.assertEqual(self._suggest('xyzzy'), {'courses': [], 'lessons': []})
+
+    def test_index_is_written_with_the_catalog(self):
+        self.assertEqual(_suggest_index().built_at_ns, get_catalog().built_at_ns)
+        self.assertTrue(_suggest_index_path().exists())
+
+    def test_content_change_rebuilds_index(self):
+        self.assertEqual(self._suggest('tarix')['courses'], [])
+        Course.objects.create(title='Tarix', slug='tarix', status='published')
+        # The endpoint doesn't rebuild: it answers from the previous file.
+        with self.assertNumQueries(0):
+            self.assertEqual(self._suggest('tarix')['courses'], [])
+        get_catalog()  # the next outline read rebuilds both files
+        self.assertEqual([c['title'] for c in self._suggest('tarix')['courses']], ['Tarix'])
+        self.course.status = 'draft'
+        self.course.save()
+        get_catalog()
+        self.assertEqual(self._suggest('pyth'), {'courses': [], 'lessons': []})
+
+
+# ═══════════════════════════════════════════════════════════════
+# Rendered Markdown (stored *_html fields)
+# ═══════════════════════════════════════════════════════════════
+
+from learning import utils as _md_utils
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class RenderedMarkdownTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='md', password='pw')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(title='C', slug='c', status='published')
+        m = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        self.lesson = Lesson.objects.create(
+            title='L', slug='l', module=m, lesson_type='article',
+            description='**qisqa**', content='# Sarlavha\n\n<script>x</script>matn',
+        )
+        self.url = reverse('learning:lesson_detail', args=['c', 'm', 'l'])
+
+    def test_save_stores_sanitized_html_and_views_reuse_it(self):
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.description_html, '<p><strong>qisqa</strong></p>')
+        self.assertIn('<h1>Sarlavha</h1>', self.lesson.content_html)
+        self.assertNotIn('<script>', self.lesson.content_html)
+        with _mock.patch('learning.utils.render_markdown') as render:
+            resp = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertContains(resp, '<h1>Sarlavha</h1>', html=True)
+
+    def test_stale_html_is_rerendered_on_read_and_written_back(self):
+        Lesson.objects.filter(pk=self.lesson.pk).update(content='*yangi*')  # bypasses save()
+        self.assertContains(self.client.get(self.url), '<em>yangi</em>')
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.content_html, '<p><em>yangi</em></p>')
+        self.assertEqual(self.lesson.markdown_key,
+                         _md_utils.markdown_key(self.lesson.description, '*yangi*'))
+
+    def test_notes_render_once_per_edit(self):
+        url = reverse('learning:save_note', args=['c', 'm', 'l'])
+        data = self.client.post(url, _json.dumps({'content': '- bir'}), content_type='application/json').json()
+        self.assertEqual(data['rendered'], '<ul>\n<li>bir</li>\n</ul>')
+        self.client.post('/malaka/voqealar/', _json.dumps({'events': [
+            {'type': 'note', 'lesson': self.lesson.id, 'content': '`ikki`'},
+        ]}), content_type='application/json')
+        note = Note.objects.get(user=self.user, lesson=self.lesson)
+        self.assertEqual(note.content_html, '<p><code>ikki</code></p>')
+        self.assertEqual(note.markdown_key, _md_utils.markdown_key('`ikki`'))
+
+    def test_edited_note_is_not_rendered_again_on_view(self):
+        url = reverse('learning:save_note', args=['c', 'm', 'l'])
+        self.client.post(url, _json.dumps({'content': 'bir'}), content_type='application/json')
+        data = self.client.post(url, _json.dumps({'content': '*ikki*'}), content_type='application/json').json()
+        self.assertEqual(data['rendered'], '<p><em>ikki</em></p>')
+        note = Note.objects.get(user=self.user, lesson=self.lesson)
+        self.assertEqual(note.markdown_key, _md_utils.markdown_key('*ikki*'))
+        with _mock.patch('learning.utils.render_markdown') as render:
+            resp = self.client.get(self.url)
+        render.assert_not_called()
+        self.assertContains(resp, '<em>ikki</em>')
+
+    def test_rerender_command_after_renderer_version_bump(self):
+        with _mock.patch.object(_md_utils, 'RENDERER_VERSION', _md_utils.RENDERER_VERSION + 1):
+            _call_command('rerender_markdown', stdout=_StringIO())
+            self.lesson.refresh_from_db()
+            self.assertTrue(self.lesson.markdown_key.startswith(f'{_md_utils.RENDERER_VERSION}:'))
+            self.assertEqual(_md_utils.rerender_stale(), {
+                'learning.Course': 0, 'learning.Module': 0, 'learning.Lesson': 0, 'learning.Note': 0,
+            })
+
+
+# ═══════════════════════════════════════════════════════════════
+# Daily activity rollup
+# ═══════════════════════════════════════════════════════════════
+
+from learning.models import LeaderboardEntry, UserDailyActivity
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class DailyActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='act', password='pw')
+        self.client.force_login(self.user)
+        self.course = Course.objects.create(title='C', slug='c', status='published')
+        m = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        self.l1 = Lesson.objects.create(title='L1', slug='l1', module=m, order=0, duration_seconds=300)
+        self.l2 = Lesson.objects.create(title='L2', slug='l2', module=m, order=1, duration_seconds=200)
+
+    def _post(self, lesson, action):
+        return self.client.post(reverse(f'learning:{action}', args=['c', 'm', lesson.slug]))
+
+    def _today(self):
+        return UserDailyActivity.objects.values_list(
+            'lessons_viewed', 'lessons_completed', 'seconds_watched',
+        ).get(user=self.user, day=_today_uzt())
+
+    def test_endpoints_keep_the_rollup_current(self):
+        self._post(self.l1, 'record_view')
+        self._post(self.l1, 'record_view')  # same lesson, same day
+        self._post(self.l1, 'mark_complete')
+        self._post(self.l1, 'mark_complete')  # already completed
+        self.assertEqual(self._today(), (1, 1, 300))
+        self.client.post('/malaka/voqealar/', _json.dumps({'events': [
+            {'type': 'view', 'lesson': self.l1.id}, {'type': 'view', 'lesson': self.l2.id},
+            {'type': 'complete', 'lesson': self.l1.id}, {'type': 'complete', 'lesson': self.l2.id},
+        ]}), content_type='application/json')
+        self.assertEqual(self._today(), (2, 2, 500))
+
+        resp = self.client.get(reverse('users:profile'))
+        self.assertEqual(resp.context['activity_map'], {str(_today_uzt()): 2})
+        self.assertEqual(resp.context['user_lesson_views'], 2)
+
+    def test_leaderboard_sums_the_rollup_per_period(self):
+        other = User.objects.create_user(username='other', password='pw')
+        today = _today_uzt()
+        UserDailyActivity.objects.create(user=self.user, day=today, lessons_viewed=2)
+        UserDailyActivity.objects.create(user=other, day=today - _td(days=20), lessons_viewed=5)
+        UserDailyActivity.objects.create(user=other, day=today - _td(days=200), lessons_viewed=5)
+        _call_command('refresh_leaderboards', stdout=_StringIO())
+        url = reverse('learning:leaderboard')
+        for period, expected in [('week', [('act', 2)]), ('month', [('other', 5), ('act', 2)]),
+                                 ('all', [('other', 10), ('act', 2)])]:
+            leaders = self.client.get(url, {'davr': period}).context['leaders']
+            self.assertEqual([(r.user.username, r.views) for r in leaders], expected, period)
+
+    def test_rebuild_command_matches_live_rollup(self):
+        self._post(self.l1, 'record_view')
+        self._post(self.l2, 'record_view')
+        self._post(self.l2, 'mark_complete')
+        live = list(UserDailyActivity.objects.values_list(
+            'user_id', 'day', 'lessons_viewed', 'lessons_completed', 'seconds_watched',
+        ))
+        UserDailyActivity.objects.all().delete()
+        _call_command('rebuild_daily_activity', stdout=_StringIO())
+        self.assertEqual(list(UserDailyActivity.objects.values_list(
+            'user_id', 'day', 'lessons_viewed', 'lessons_completed', 'seconds_watched',
+        )), live)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Materialized leaderboards
+# ═══════════════════════════════════════════════════════════════
+
+from learning import leaderboards as _leaderboards
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        today = _today_uzt()
+        self.users = User.objects.bulk_create(User(username=f'u{i:02d}') for i in range(60))
+        UserDailyActivity.objects.bulk_create(
+            UserDailyActivity(user=u, day=today - _td(days=i % 40), lessons_viewed=100 - i, lessons_completed=1)
+            for i, u in enumerate(self.users)
+        )
+        self.me = self.users[-1]  # fewest views: rank 60 all-time
+        UserProfile.objects.create(user=self.me, current_streak=4, last_activity_date=today)
+
+    def test_page_reads_the_board_with_my_rank_beyond_the_top(self):
+        _leaderboards.refresh()
+        self.client.force_login(self.me)
+        url = reverse('learning:leaderboard')
+        with self.assertNumQueries(5):  # session, user, navbar avatar, top 50 (+ avatars), my entry
+            resp = self.client.get(url)
+        leaders = resp.context['leaders']
+        self.assertEqual([e.rank for e in leaders], list(range(1, 51)))
+        self.assertEqual((leaders[0].user.username, leaders[0].views), ('u00', 100))
+        me = resp.context['me']
+        self.assertEqual((me.rank, me.views, me.streak), (60, 41, 4))
+        self.assertContains(resp, 'lt-row  me')
+
+        # Week window: only users active within the last 7 days.
+        week = self.client.get(url, {'davr': 'week'}).context['leaders']
+        self.assertEqual({e.user.username for e in week}, {f'u{i:02d}' for i in range(60) if i % 40 <= 7})
+
+    def test_course_board_ranks_by_completions(self):
+        course = Course.objects.create(title='K', slug='k', status='published')
+        UserCourseProgress.objects.create(user=self.users[0], course=course, completed_count=2)
+        UserCourseProgress.objects.create(user=self.me, course=course, completed_count=5)
+        UserCourseProgress.objects.create(user=self.users[1], course=course, completed_count=0)
+        _call_command('refresh_leaderboards', 'course', stdout=_StringIO())
+        resp = self.client.get(reverse('learning:leaderboard'), {'kurs': 'k'})
+        self.assertEqual([(e.rank, e.user_id, e.completed) for e in resp.context['leaders']],
+                         [(1, self.me.id, 5), (2, self.users[0].id, 2)])
+        self.assertEqual(self.client.get(reverse('learning:leaderboard'), {'kurs': 'nope'}).status_code, 404)
+
+    def test_refresh_replaces_the_board(self):
+        _leaderboards.refresh([_leaderboards.ALL])
+        UserDailyActivity.objects.filter(user=self.me).update(lessons_viewed=1000)
+        self.assertEqual(_leaderboards.entry_for(self.me, 'all').rank, 60)
+        _leaderboards.refresh([_leaderboards.ALL])
+        self.assertEqual(_leaderboards.entry_for(self.me, 'all').rank, 1)
+        self.assertEqual(LeaderboardEntry.objects.filter(board='all').count(), 60)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Bulk streak recomputation (learning/streaks.py)
+# ═══════════════════════════════════════════════════════════════
+
+from learning import streaks as _streaks
+
+
+class StreakRecomputeTests(TestCase):
+    def setUp(self):
+        self.today = _today_uzt()
+        course = Course.objects.create(title='C', slug='c', status='published')
+        m = Module.objects.create(title='M', slug='m', course=course, order=0)
+        self.l1 = Lesson.objects.create(title='L1', slug='l1', module=m, order=0)
+        self.l2 = Lesson.objects.create(title='L2', slug='l2', module=m, order=1)
+
+    def _views(self, user, *days_ago):
+        for n in days_ago:
+            day = self.today - _td(days=n)
+            LessonView.objects.create(user=user, lesson=self.l1, viewed_on=day)
+            LessonView.objects.create(user=user, lesson=self.l2, viewed_on=day)
+
+    def _streak(self, user):
+        p = UserProfile.objects.get(user=user)
+        return p.current_streak, p.longest_streak, p.last_activity_date
+
+    def test_runs(self):
+        self.assertEqual(_streaks.runs([]), (0, 0))
+        self.assertEqual(_streaks.runs([5]), (1, 1))
+        self.assertEqual(_streaks.runs([1, 2, 3, 7, 8]), (2, 3))
+        self.assertEqual(_streaks.runs([1, 3, 4, 5, 6]), (4, 4))
+
+    def test_matches_replaying_the_live_update(self):
+        days_ago = [20, 19, 18, 17, 12, 11, 3, 2]
+        replayed = User.objects.create_user(username='replayed')
+        self._views(replayed, *days_ago)
+        for n in sorted(days_ago, reverse=True):
+            with _mock.patch('learning.views._today_uzt', return_value=self.today - _td(days=n)):
+                _update_streak(replayed)
+        expected = self._streak(replayed)
+        self.assertEqual(expected, (2, 4, self.today - _td(days=2)))
+
+        UserProfile.objects.filter(user=replayed).update(current_streak=0, longest_streak=99)
+        _streaks.recompute()
+        self.assertEqual(self._streak(replayed), expected)
+
+    def test_dry_run_lists_diffs_then_run_writes_them(self):
+        drifted = User.objects.create_user(username='drifted')
+        fresh = User.objects.create_user(username='fresh')
+        correct = User.objects.create_user(username='correct')
+        self._views(drifted, 1, 0)
+        self._views(fresh, 5)
+        self._views(correct, 0)
+        UserProfile.objects.create(user=drifted, current_streak=1, longest_streak=1,
+                                   last_activity_date=self.today)
+        UserProfile.objects.create(user=correct, current_streak=1, longest_streak=1,
+                                   last_activity_date=self.today)
+
+        out = _StringIO()
+        _call_command('recompute_streaks', '--dry-run', stdout=out)
+        self.assertIn(f'user {drifted.id}: 1 / 1 (last {self.today}) → 2 / 2', out.getvalue())
+        self.assertIn(f'user {fresh.id}: no profile → 1 / 1', out.getvalue())
+        self.assertNotIn(f'user {correct.id}:', out.getvalue())
+        self.assertIn('3 user(s) checked, 1 profile(s) differ, 1 missing', out.getvalue())
+        self.assertEqual(self._streak(drifted)[:2], (1, 1))
+        self.assertFalse(UserProfile.objects.filter(user=fresh).exists())
+
+        _call_command('recompute_streaks', 'drifted', stdout=_StringIO())
+        self.assertEqual(self._streak(drifted), (2, 2, self.today))
+        self.assertFalse(UserProfile.objects.filter(user=fresh).exists())
+        _call_command('recompute_streaks', stdout=_StringIO())
+        self.assertEqual(self._streak(fresh), (1, 1, self.today - _td(days=5)))
+
+
+# ═══════════════════════════════════════════════════════════════
+# Compiled quiz answer keys (learning/quiz_keys.py)
+# ═══════════════════════════════════════════════════════════════
+
+from learning import quiz_keys as _quiz_keys
+from learning.models import QuizAnswer
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class QuizAnswerKeyTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        _quiz_keys._keys.clear()
+        self.user = User.objects.create_user(username='grader', password='pw')
+        self.client.force_login(self.user)
+        course = Course.objects.create(title='Q', slug='q', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=0)
+        self.lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz', order=0)
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='T', pass_percent=50)
+        self.q1 = QuizQuestion.objects.create(quiz=self.quiz, text='1?', order=1, explanation='Chunki.')
+        self.a = QuizChoice.objects.create(question=self.q1, text='A', is_correct=False, order=1)
+        self.b = QuizChoice.objects.create(question=self.q1, text='B', is_correct=True, order=2)
+        self.q2 = QuizQuestion.objects.create(quiz=self.quiz, text='2?', order=2)
+        self.c = QuizChoice.objects.create(question=self.q2, text='C', is_correct=True, order=1)
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz, max_score=2)
+
+    def _answer(self, question, choice):
+        url = reverse('learning:check_quiz_answer', args=['q', 'm', 't', self.quiz.id, self.attempt.id])
+        return self.client.post(url, _json.dumps({'question_id': question.id, 'choice_id': choice.id}),
+                                content_type='application/json')
+
+    def test_grading_reads_the_key_not_the_questions(self):
+        self._answer(self.q1, self.a)  # compiles the key
+        # session, user, lesson, quiz, attempt, savepoint x2, upsert, answer count
+        with self.assertNumQueries(9):
+            data = self._answer(self.q1, self.b).json()
+        self.assertEqual((data['is_correct'], data['correct_choice_id'], data['explanation']),
+                         (True, self.b.id, 'Chunki.'))
+        self.assertEqual((data['answered'], data['total'], data['finished']), (1, 2, False))
+        self.assertEqual(QuizAnswer.objects.get(attempt=self.attempt, question=self.q1).selected_choice, self.b)
+
+        data = self._answer(self.q2, self.c).json()
+        self.assertTrue(data['finished'])
+        self.assertEqual(data['result']['score'], 2.0)
+
+    def test_question_and_choice_edits_move_to_a_new_key(self):
+        self.assertFalse(self._answer(self.q1, self.a).json()['is_correct'])
+        QuizChoice.objects.filter(pk=self.a.pk).update(is_correct=True)  # bypasses signals
+        self.assertFalse(self._answer(self.q1, self.a).json()['is_correct'])
+
+        self.a.is_correct = True
+        self.a.save()
+        self.assertTrue(self._answer(self.q1, self.a).json()['is_correct'])
+        self.q2.delete()
+        self.quiz.refresh_from_db()
+        self.assertEqual(self.quiz.version, 1 + 5 + 1 + 2)  # creates, the save, cascaded deletes
+        self.assertTrue(self._answer(self.q1, self.b).json()['finished'])
+
+    def test_choice_of_another_question_is_rejected(self):
+        self.assertEqual(self._answer(self.q1, self.c).status_code, 400)
+        self.assertFalse(QuizAnswer.objects.exists())
+
+
+# ═══════════════════════════════════════════════════════════════
+# Submit-all quiz endpoint
+# ═══════════════════════════════════════════════════════════════
+
+@override_settings(**_AUTH_OVERRIDES)
+class SubmitQuizTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.user = User.objects.create_user(username='sheet', password='pw')
+        self.client.force_login(self.user)
+        course = Course.objects.create(title='Q', slug='q', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=0)
+        self.lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz', order=0)
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='T', pass_percent=60)
+        self.q1 = QuizQuestion.objects.create(quiz=self.quiz, text='1?', order=1)
+        self.q1_wrong = QuizChoice.objects.create(question=self.q1, text='A', order=1)
+        self.q1_right = QuizChoice.objects.create(question=self.q1, text='B', is_correct=True, order=2)
+        self.q2 = QuizQuestion.objects.create(quiz=self.quiz, text='2?', order=2, question_type='multi_select')
+        self.q2_a = QuizChoice.objects.create(question=self.q2, text='A', is_correct=True, order=1)
+        self.q2_b = QuizChoice.objects.create(question=self.q2, text='B', is_correct=True, order=2)
+        QuizChoice.objects.create(question=self.q2, text='C', order=3)
+        self.q3 = QuizQuestion.objects.create(quiz=self.quiz, text='3?', order=3, question_type='true_false')
+        self.q3_true = QuizChoice.objects.create(question=self.q3, text="To'g'ri", is_correct=True, order=1)
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz, max_score=3)
+        self.url = reverse('learning:submit_quiz', args=['q', 'm', 't', self.quiz.id, self.attempt.id])
+
+    def _submit(self, answers):
+        return self.client.post(self.url, _json.dumps({'answers': answers}), content_type='application/json')
+
+    def test_full_sheet_is_graded_and_finalized_at_once(self):
+        resp = self._submit([
+            {'question_id': self.q1.id, 'choice_id': self.q1_right.id},
+            {'question_id': self.q2.id, 'choice_ids': [self.q2_a.id, self.q2_b.id]},
+            {'question_id': self.q3.id, 'choice_id': self.q3_true.id},
+        ])
+        data = resp.json()
+        self.assertEqual((data['score'], data['max_score'], data['passed']), (3.0, 3, True))
+        self.assertEqual([r['is_correct'] for r in data['results']], [True, True, True])
+
+        self.attempt.refresh_from_db()
+        self.assertIsNotNone(self.attempt.completed_at)
+        answer = QuizAnswer.objects.get(attempt=self.attempt, question=self.q2)
+        self.assertEqual(answer.selected_choice_ids, sorted([self.q2_a.id, self.q2_b.id]))
+        self.assertTrue(LessonProgress.objects.get(user=self.user, lesson=self.lesson).is_completed)
+        self.assertEqual(UserProfile.objects.get(user=self.user).current_streak, 1)
+        self.assertEqual(UserDailyActivity.objects.get(user=self.user).lessons_completed, 1)
+
+        self.assertEqual(self._submit([]).status_code, 400)  # already completed
+
+    def test_sheet_replaces_interactive_answers_and_blanks_score_zero(self):
+        check = reverse('learning:check_quiz_answer', args=['q', 'm', 't', self.quiz.id, self.attempt.id])
+        self.client.post(check, _json.dumps({'question_id': self.q3.id, 'choice_id': self.q3_true.id}),
+                         content_type='application/json')
+        data = self._submit([{'question_id': self.q1.id, 'choice_id': self.q1_wrong.id}]).json()
+        self.assertEqual((data['score'], data['passed']), (0.0, False))
+        self.assertEqual(
+            sorted(QuizAnswer.objects.filter(attempt=self.attempt).values_list('question_id', 'selected_choice_id')),
+            [(self.q1.id, self.q1_wrong.id), (self.q2.id, None), (self.q3.id, None)],
+        )
+        self.assertFalse(LessonProgress.objects.filter(user=self.user, lesson=self.lesson).exists())
+
+    def test_invalid_sheet_writes_nothing(self):
+        for answers in (
+            [{'question_id': self.q1.id, 'choice_id': self.q3_true.id}],  # another question's choice
+            [{'question_id': self.q1.id}, {'question_id': self.q1.id}],
+            [{'question_id': self.q2.id}],  # multi_select without choice_ids
+            [{'question_id': 0}],
+            'nope',
+        ):
+            self.assertEqual(self._submit(answers).status_code, 400, answers)
+        self.assertFalse(QuizAnswer.objects.exists())
+        self.attempt.refresh_from_db()
+        self.assertIsNone(self.attempt.completed_at)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Array-backed multi-select answers
+# ═══════════════════════════════════════════════════════════════
+
+@override_settings(**_AUTH_OVERRIDES)
+class MultiSelectArrayTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.user = User.objects.create_user(username='multi', password='pw')
+        self.client.force_login(self.user)
+        course = Course.objects.create(title='Q', slug='q', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=0)
+        lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz', order=0)
+        self.quiz = Quiz.objects.create(lesson=lesson, title='T')
+        self.q = QuizQuestion.objects.create(quiz=self.quiz, text='Qaysilar?', question_type='multi_select')
+        self.a = QuizChoice.objects.create(question=self.q, text='Alfa', is_correct=True, order=1)
+        self.b = QuizChoice.objects.create(question=self.q, text='Beta', order=2)
+        self.c = QuizChoice.objects.create(question=self.q, text='Gamma', is_correct=True, order=3)
+        self.q2 = QuizQuestion.objects.create(quiz=self.quiz, text='Bittasi?', order=2)
+        self.d = QuizChoice.objects.create(question=self.q2, text='Delta', order=1)
+        QuizChoice.objects.create(question=self.q2, text='Epsilon', is_correct=True, order=2)
+        self.attempt = QuizAttempt.objects.create(user=self.user, quiz=self.quiz, max_score=2)
+        self.args = ['q', 'm', 't', self.quiz.id, self.attempt.id]
+
+    def _check(self, body):
+        return self.client.post(reverse('learning:check_quiz_answer', args=self.args), _json.dumps(body),
+                                content_type='application/json')
+
+    def test_selection_is_written_with_the_answer_row(self):
+        self._check({'question_id': self.q.id, 'choice_ids': [self.b.id]})
+        # Same statements as a single-choice answer: the upsert carries the ids.
+        with self.assertNumQueries(9):
+            self._check({'question_id': self.q.id, 'choice_ids': [self.c.id, self.a.id]})
+        answer = QuizAnswer.objects.get(attempt=self.attempt, question=self.q)
+        self.assertEqual((answer.selected_choice_ids, answer.is_correct), (sorted([self.a.id, self.c.id]), True))
+        self.assertEqual(answer.selected_ids, {self.a.id, self.c.id})
+
+    def test_result_page_marks_picked_choices(self):
+        self._check({'question_id': self.q.id, 'choice_ids': [self.a.id, self.b.id]})
+        self._check({'question_id': self.q2.id, 'choice_id': self.d.id})
+        resp = self.client.get(reverse('learning:quiz_result', args=self.args))
+        picked = {a.question_id: a.selected_ids for a in resp.context['answers_detail']}
+        self.assertEqual(picked, {self.q.id: {self.a.id, self.b.id}, self.q2.id: {self.d.id}})
+        self.assertContains(resp, 'Sizning tanlovingiz', count=2)  # Beta and Delta are wrong picks
+
+
+# ═══════════════════════════════════════════════════════════════
+# Per-user quiz summaries
+# ═══════════════════════════════════════════════════════════════
+
+from django.test.utils import CaptureQueriesContext as _CaptureQueries
+from learning import quiz_stats as _quiz_stats
+from learning.models import UserQuizStats
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class UserQuizStatsTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.user = User.objects.create_user(username='stats', password='pw')
+        self.client.force_login(self.user)
+        course = Course.objects.create(title='Q', slug='q', status='published')
+        module = Module.objects.create(title='M', slug='m', course=course, order=0)
+        self.lesson = Lesson.objects.create(title='T', slug='t', module=module, lesson_type='quiz', order=0)
+        self.url = reverse('learning:lesson_detail', args=['q', 'm', 't'])
+
+    def _quiz(self, title='T', max_attempts=0):
+        quiz = Quiz.objects.create(lesson=self.lesson, title=title, max_attempts=max_attempts)
+        question = QuizQuestion.objects.create(quiz=quiz, text='1?', order=1)
+        QuizChoice.objects.create(question=question, text='A', order=1)
+        right = QuizChoice.objects.create(question=question, text='B', is_correct=True, order=2)
+        QuizQuestion.objects.create(quiz=quiz, text='2?', order=2)
+        return quiz, question, right
+
+    def _take(self, quiz, answers):
+        self.client.post(reverse('learning:start_quiz', args=['q', 'm', 't', quiz.id]))
+        attempt = QuizAttempt.objects.get(user=self.user, quiz=quiz, completed_at__isnull=True)
+        self.client.post(
+            reverse('learning:submit_quiz', args=['q', 'm', 't', quiz.id, attempt.id]),
+            _json.dumps({'answers': answers}), content_type='application/json',
+        )
+        return attempt
+
+    def _lesson_queries(self):
+        self.client.get(self.url)  # warm the question counts
+        with _CaptureQueries(_connection) as ctx:
+            self.client.get(self.url)
+        return len(ctx)
+
+    def test_start_and_finish_maintain_the_summary(self):
+        quiz, question, right = self._quiz(max_attempts=3)
+        self._take(quiz, [{'question_id': question.id, 'choice_id': right.id}])
+        self._take(quiz, [])
+        self.client.post(reverse('learning:start_quiz', args=['q', 'm', 't', quiz.id]))
+        open_attempt = QuizAttempt.objects.get(user=self.user, completed_at__isnull=True)
+
+        stats = UserQuizStats.objects.get(user=self.user, quiz=quiz)
+        self.assertEqual((stats.attempts_used, stats.best_percentage, stats.in_progress_attempt_id),
+                         (2, 50, open_attempt.id))
+        ctx = self.client.get(self.url).context
+        self.assertEqual(ctx['active_attempt'], open_attempt)
+        meta = ctx['quizzes_with_meta'][0]
+        self.assertEqual((meta['questions_count'], meta['best_percentage'], meta['attempts_remaining']), (2, 50, 1))
+        self.assertEqual(len(meta['past_attempts']), 2)
+
+    def test_lesson_page_queries_do_not_grow_with_quizzes_or_attempts(self):
+        quiz, question, right = self._quiz()
+        self._take(quiz, [{'question_id': question.id, 'choice_id': right.id}])
+        baseline = self._lesson_queries()
+        for title in ('U', 'V', 'W'):
+            other, other_question, other_right = self._quiz(title)
+            for _ in range(3):
+                self._take(other, [{'question_id': other_question.id, 'choice_id': other_right.id}])
+        self.assertEqual(self._lesson_queries(), baseline)
+
+    def test_rebuild_matches_live_rows(self):
+        quiz, question, right = self._quiz()
+        self._take(quiz, [])
+        self._take(quiz, [{'question_id': question.id, 'choice_id': right.id}])
+        self.client.post(reverse('learning:start_quiz', args=['q', 'm', 't', quiz.id]))
+        live = list(UserQuizStats.objects.values_list('user', 'quiz', 'attempts_used', 'best_percentage',
+                                                     'in_progress_attempt'))
+        UserQuizStats.objects.update(attempts_used=0, best_percentage=None, in_progress_attempt=None)
+        _call_command('rebuild_quiz_stats', stdout=_StringIO())
+        self.assertEqual(
+            list(UserQuizStats.objects.values_list('user', 'quiz', 'attempts_used', 'best_percentage',
+                                                   'in_progress_attempt')),
+            live,
+        )
+        self.assertEqual(_quiz_stats.rebuild([self.user.id]), 1)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Incremental course ratings
+# ═══════════════════════════════════════════════════════════════
+
+from decimal import Decimal as _Decimal
+from learning import ratings as _ratings
+from learning.models import CourseReview
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class CourseRatingTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.course = Course.objects.create(title='R', slug='r', status='published')
+        self.users = [User.objects.create_user(username=f'r{i}', password='pw') for i in range(3)]
+
+    def _fields(self):
+        self.course.refresh_from_db()
+        return (self.course.rating_count, self.course.rating_sum, self.course.avg_rating,
+                [self.course.stars_1, self.course.stars_2, self.course.stars_3,
+                 self.course.stars_4, self.course.stars_5])
+
+    def test_review_writes_move_the_counters(self):
+        reviews = [CourseReview.objects.create(user=u, course=self.course, rating=r)
+                   for u, r in zip(self.users, (5, 4, 4))]
+        self.assertEqual(self._fields(), (3, 13, _Decimal('4.33'), [0, 0, 0, 2, 1]))
+        reviews[1].rating = 1
+        reviews[1].save()
+        self.assertEqual(self._fields(), (3, 10, _Decimal('3.33'), [1, 0, 0, 1, 1]))
+        reviews[0].delete()
+        self.assertEqual(self._fields(), (2, 5, _Decimal('2.50'), [1, 0, 0, 1, 0]))
+        other = Course.objects.create(title='S', slug='s')
+        reviews[2].course = other
+        reviews[2].save()
+        self.assertEqual(self._fields(), (1, 1, _Decimal('1.00'), [1, 0, 0, 0, 0]))
+        other.refresh_from_db()
+        self.assertEqual((other.rating_count, other.stars_4), (1, 1))
+
+    def test_submit_review_and_course_page_breakdown(self):
+        CourseReview.objects.create(user=self.users[1], course=self.course, rating=2)
+        self.client.force_login(self.users[0])
+        url = reverse('learning:submit_review', args=['r'])
+        self.client.post(url, {'rating': 5, 'comment': 'Zo‘r'})
+        self.client.post(url, {'rating': 4, 'comment': 'Yaxshi'})  # edits the same review
+        self.assertEqual(self._fields(), (2, 6, _Decimal('3.00'), [0, 1, 0, 1, 0]))
+        resp = self.client.get(reverse('learning:course_detail', args=['r']))
+        self.assertEqual(
+            [(row['star'], row['count'], row['percent']) for row in resp.context['rating_breakdown']],
+            [(5, 0, 0), (4, 1, 50), (3, 0, 0), (2, 1, 50), (1, 0, 0)],
+        )
+
+    def test_reconcile_fixes_drift(self):
+        for u, r in zip(self.users, (5, 3, 3)):
+            CourseReview.objects.create(user=u, course=self.course, rating=r)
+        expected = self._fields()
+        untouched = Course.objects.create(title='S', slug='s')
+        CourseReview.objects.filter(rating=3).update(rating=1)  # bypasses the signals
+        Course.objects.filter(pk=self.course.pk).update(stars_5=7)
+        self.assertEqual(_ratings.rebuild([untouched.pk]), 0)
+        out = _StringIO()
+        _call_command('reconcile_ratings', stdout=out)
+        self.assertIn('1 course', out.getvalue())
+        self.assertEqual(self._fields(), (3, 7, _Decimal('2.33'), [2, 0, 0, 0, 1]))
+        self.assertNotEqual(expected, self._fields())
+        self.assertEqual(_ratings.rebuild(), 0)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Rendered certificate and social card images
+# ═══════════════════════════════════════════════════════════════
+
+from learning import cards as _cards
+from learning.models import LearningPath, LearningPathCertificate
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class CardImageTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        media = self.enterContext(_tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.user = User.objects.create_user(username='grad', password='pw', first_name='Aziza', last_name='Karimova')
+        self.course = Course.objects.create(title='Python asoslari', slug='py', status='published')
+        self.cert = Certificate.objects.create(user=self.user, course=self.course)
+        self.url = reverse('learning:certificate_image', args=[self.cert.code, 'png'])
+
+    def test_certificate_image_is_drawn_once_and_revalidated(self):
+        with _mock.patch.dict(_cards._DRAW, {_cards.CERTIFICATE: _mock.Mock(wraps=_cards._draw_certificate)}) as draw:
+            resp = self.client.get(self.url)
+            self.assertEqual((resp.status_code, resp['Content-Type']), (200, 'image/png'))
+            self.assertEqual(b''.join(resp.streaming_content)[:8], b'\x89PNG\r\n\x1a\n')
+            etag = resp['ETag']
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(draw[_cards.CERTIFICATE].call_count, 1)
+        self.assertIn('max-age=86400', resp['Cache-Control'])
+        versioned = self.client.get(self.url, {'v': etag.strip('"')})
+        self.assertIn('immutable', versioned['Cache-Control'])
+        webp = self.client.get(reverse('learning:certificate_image', args=[self.cert.code, 'webp']))
+        self.assertEqual(webp['Content-Type'], 'image/webp')
+        self.assertEqual(self.client.get(reverse('learning:certificate_image', args=[self.cert.code, 'gif'])).status_code, 404)
+
+        # What the image shows names it: a new name is a new file and ETag.
+        self.user.first_name = 'Aziza M.'
+        self.user.save()
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+
+    def test_pages_link_versioned_images(self):
+        verify = self.client.get(reverse('learning:public_certificate_verify', args=[self.cert.code]))
+        digest = _cards.course_certificate(self.cert).digest
+        self.assertEqual(verify.context['og_image'], f'https://ochiqkurs.uz{self.url}?v={digest}')
+        page = self.client.get(reverse('learning:course_detail', args=['py']))
+        card_url = reverse('learning:course_card', args=['py', 'png'])
+        self.assertTrue(page.context['og_image'].endswith(f'{card_url}?v={_cards.course_card(self.course).digest}'))
+        self.assertEqual(self.client.get(card_url)['Content-Type'], 'image/png')
+
+        path_obj = LearningPath.objects.create(title="Veb dasturlash", slug='veb')
+        path_page = self.client.get(reverse('learning:learning_path_detail', args=['veb']))
+        path_card_url = reverse('learning:path_card', args=['veb', 'png'])
+        self.assertTrue(path_page.context['og_image'].endswith(f'{path_card_url}?v={_cards.path_card(path_obj).digest}'))
+        self.assertEqual(self.client.get(path_card_url)['Content-Type'], 'image/png')
+        path_cert = LearningPathCertificate.objects.create(user=self.user, path=path_obj)
+        resp = self.client.get(reverse('learning:certificate_image', args=[path_cert.code, 'png']))
+        self.assertEqual(resp['ETag'], f'"{_cards.path_certificate(path_cert).digest}"')
+
+    def test_render_cards_fills_the_cache(self):
+        out = _StringIO()
+        _call_command('render_cards', '--formats', 'png', 'webp', stdout=out)
+        self.assertIn('Rendered 4 image(s); 0 were', out.getvalue())  # certificate + course card, two formats
+        self.assertTrue(_cards.course_certificate(self.cert).path('webp').exists())
+        out = _StringIO()
+        _call_command('render_cards', 'certificate', stdout=out)
+        self.assertIn('Rendered 0 image(s); 1 were', out.getvalue())
+
+
+# ═══════════════════════════════════════════════════════════════
+# Course thumbnail variants
+# ═══════════════════════════════════════════════════════════════
+
+import threading as _threading
+from http.server import BaseHTTPRequestHandler as _BaseHandler, ThreadingHTTPServer as _HTTPServer
+from io import BytesIO as _BytesIO
+from PIL import Image as _Image
+from django.core.files.uploadedfile import SimpleUploadedFile as _Upload
+from learning import thumbnails as _thumbnails
+
+
+def _image_bytes(size, fmt):
+    out = _BytesIO()
+    _Image.new('RGB', size, '#059669').save(out, fmt)
+    return out.getvalue()
+
+
+class _FrameServer(_HTTPServer):
+    """Stands in for img.youtube.com: serves one JPEG frame, counts requests."""
+
+    def __init__(self):
+        self.frame, self.hits = _image_bytes((480, 360), 'JPEG'), []
+
+        class Handler(_BaseHandler):
+            def do_GET(handler):
+                self.hits.append(handler.path)
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'image/jpeg')
+                handler.send_header('Content-Length', str(len(self.frame)))
+                handler.end_headers()
+                handler.wfile.write(self.frame)
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+
+@override_settings(**_AUTH_OVERRIDES)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        media = self.enterContext(_tempfile.TemporaryDirectory())
+        self.server = _FrameServer()
+        _threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.enterContext(override_settings(
+            MEDIA_ROOT=media,
+            YOUTUBE_THUMBNAIL_URL=f'http://127.0.0.1:{self.server.server_port}/vi/{{video_id}}/hqdefault.jpg',
+        ))
+        self.course = Course.objects.create(title='Kurs', slug='kurs', status='published')
+        self.module = Module.objects.create(title='M', slug='m', course=self.course, order=1)
+
+    def test_source_follows_the_first_lesson_and_reads_no_sql(self):
+        Lesson.objects.create(title='B', slug='b', module=self.module, order=2, youtube_video_id='vidB')
+        self.course.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.course.get_thumbnail_url().endswith('/vi/vidB/hqdefault.jpg'))
+            self.assertIsNone(self.course.thumbnail_srcset)  # nothing built yet
+        first = Module.objects.create(title='A', slug='a', course=self.course, order=0)
+        Lesson.objects.create(title='A', slug='a', module=first, order=0, youtube_video_id='vidA')
+        self.course.refresh_from_db()
+        self.assertTrue(self.course.thumbnail_source.endswith('/vi/vidA/hqdefault.jpg'))
+        first.delete()
+        self.course.refresh_from_db()
+        self.assertTrue(self.course.thumbnail_source.endswith('/vi/vidB/hqdefault.jpg'))
+
+    def test_youtube_frame_is_fetched_once_and_resized(self):
+        Lesson.objects.create(title='A', slug='a', module=self.module, order=0, youtube_video_id='vidA')
+        out = _StringIO()
+        _call_command('build_thumbnails', stdout=out)
+        self.assertIn('Built thumbnails for 1 course(s); 0 failed', out.getvalue())
+        self.assertEqual(self.server.hits, ['/vi/vidA/hqdefault.jpg'])
+
+        self.course.refresh_from_db()
+        srcset = self.course.thumbnail_srcset
+        self.assertEqual(srcset['webp'].count('w, ') + 1, len(_thumbnails.WIDTHS))
+        self.assertIn('-320.webp 320w', srcset['webp'])
+        self.assertTrue(self.course.get_thumbnail_url().endswith('-720.jpg'))
+        key = self.course.thumbnail_key
+        with _Image.open(_thumbnails.default_storage.path(_thumbnails._variant(key, 320, 'jpeg'))) as small:
+            self.assertEqual(small.size, (320, 240))
+
+        # Up to date: nothing to do. Variants lost: rebuilt from the cached frame.
+        self.assertEqual(_thumbnails.build(), {'built': 0, 'failed': 0})
+        Course.objects.update(thumbnail_key='')
+        self.assertEqual(_thumbnails.build(), {'built': 1, 'failed': 0})
+        self.assertEqual(len(self.server.hits), 1)
+
+        page = self.client.get(reverse('learning:course_list'))
+        self.assertContains(page, f'<source type="image/webp" srcset="{srcset["webp"]}"', html=False)
+
+    def test_upload_replaces_the_frame(self):
+        Lesson.objects.create(title='A', slug='a', module=self.module, order=0, youtube_video_id='vidA')
+        self.course.refresh_from_db()
+        self.course.thumbnail = _Upload('cover.png', _image_bytes((1600, 900), 'PNG'), content_type='image/png')
+        self.course.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.thumbnail_source, self.course.thumbnail.url)
+        self.assertEqual(self.course.get_thumbnail_url(), self.course.thumbnail.url)  # until built
+        _thumbnails.build([self.course.id])
+        self.course.refresh_from_db()
+        largest = _thumbnails.default_storage.path(_thumbnails._variant(self.course.thumbnail_key, 720, 'jpeg'))
+        with _Image.open(largest) as image:
+            self.assertEqual(image.size, (720, 405))
+        self.assertEqual(self.server.hits, [])
+
+
+# ═══════════════════════════════════════════════════════════════
+# Pre-generated sitemaps
+# ═══════════════════════════════════════════════════════════════
+
+import os as _os
+from learning import sitemaps as _sitemaps
+
+
+@override_settings(**_SEO_OVERRIDES)
+class SitemapFileTests(TestCase):
+    def setUp(self):
+        self.enterContext(override_settings(SITEMAP_DIR=self.enterContext(_tempfile.TemporaryDirectory())))
+        self.course = Course.objects.create(title='Python', slug='python', status='published', published_at=_tz.now())
+        module = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        self.video = Lesson.objects.create(
+            title='Kirish & sozlash', slug='kirish', module=module, lesson_type='video',
+            youtube_video_id='abc123', duration_seconds=754, order=0,
+        )
+        Lesson.objects.create(title='Maqola', slug='maqola', module=module, lesson_type='article', order=1)
+        draft = Course.objects.create(title='Qoralama', slug='qoralama', status='draft')
+        Lesson.objects.create(
+            title='Yashirin', slug='yashirin', order=0,
+            module=Module.objects.create(title='M', slug='m', course=draft, order=0),
+        )
+
+    def _get(self, url, **headers):
+        resp = self.client.get(url, **headers)
+        body = b''.join(resp.streaming_content).decode() if resp.status_code == 200 else ''
+        return resp, body
+
+    def test_lessons_and_videos_are_listed(self):
+        _, index = self._get('/sitemap.xml')
+        for section in _sitemaps.SITEMAPS:
+            self.assertIn(f'https://ochiqkurs.uz/sitemap-{section}-1.xml', index)
+        resp, body = self._get('/sitemap-lessons-1.xml')
+        self.assertEqual(resp['Content-Type'], 'application/xml')
+        self.assertIn('https://ochiqkurs.uz/malaka/python/m/kirish/', body)
+        self.assertIn('https://ochiqkurs.uz/malaka/python/m/maqola/', body)
+        self.assertNotIn('yashirin', body)
+        self.assertEqual(body.count('<video:video>'), 1)
+        self.assertIn('<video:title>Kirish &amp; sozlash</video:title>', body)
+        self.assertIn('<video:player_loc>https://www.youtube.com/embed/abc123</video:player_loc>', body)
+        self.assertIn('<video:duration>754</video:duration>', body)
+        self.assertIn(f'<lastmod>{self.video.updated_at:%Y-%m-%d}</lastmod>', body)
+        self.assertEqual(self._get('/sitemap-lessons-2.xml')[0].status_code, 404)
+
+    def test_revalidation_is_a_304_without_queries(self):
+        first, _ = self._get('/sitemap-lessons-1.xml')
+        with self.assertNumQueries(0):
+            resp = self.client.get('/sitemap-lessons-1.xml', HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(resp.status_code, 304)
+            resp = self.client.get('/sitemap-lessons-1.xml', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(self._get('/sitemap.xml')[0].status_code, 200)
+
+    def test_edits_regenerate_only_the_pages_that_changed(self):
+        self._get('/sitemap.xml')
+        directory = _sitemaps.sitemap_dir()
+        courses_page = directory / _sitemaps.page_name('courses', 1)
+        _os.utime(courses_page, (0, 0))
+        etag = self.client.get('/sitemap-lessons-1.xml')['ETag']
+
+        self.video.title = 'Yangi nom'
+        self.video.save()
+        # The edit only marks the files; crawlers keep getting them, no SQL.
+        self.assertTrue(_sitemaps.is_dirty())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/sitemap-lessons-1.xml')['ETag'], etag)
+            self.assertEqual(self._get('/sitemap.xml')[0].status_code, 200)
+
+        out = _StringIO()
+        _call_command('build_sitemaps', '--if-changed', stdout=out)
+        self.assertIn('2 changed', out.getvalue())  # the lessons page and its lastmod in the index
+        resp, body = self._get('/sitemap-lessons-1.xml')
+        self.assertIn('<video:title>Yangi nom</video:title>', body)
+        self.assertNotEqual(resp['ETag'], etag)
+        self.assertEqual(courses_page.stat().st_mtime, 0)  # same content, not rewritten
+        self.assertFalse(_sitemaps.is_dirty())
+        out = _StringIO()
+        _call_command('build_sitemaps', '--if-changed', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+    def test_sections_are_paginated_and_stale_pages_removed(self):
+        with _mock.patch.object(_sitemaps.LessonSitemap, 'limit', 1):
+            totals = _sitemaps.build()
+        # Static pages, the course, its lessons and the (seeded) categories.
+        self.assertEqual(totals['urls'], 4 + 1 + 2 + Category.objects.count())
+        _, index = self._get('/sitemap.xml')
+        self.assertIn('sitemap-lessons-2.xml', index)
+        self.assertEqual(self._get('/sitemap-lessons-2.xml')[0].status_code, 200)
+
+        out = _StringIO()
+        _call_command('build_sitemaps', stdout=out)
+        self.assertIn('URL(s)', out.getvalue())
+        self.assertFalse((_sitemaps.sitemap_dir() / 'sitemap-lessons-2.xml').exists())
+
+
+# ═══════════════════════════════════════════════════════════════
+# Conditional GET for public pages
+# ═══════════════════════════════════════════════════════════════
+
+from learning.models import Announcement, LearningPathCourse
+
+
+@override_settings(**_SEO_OVERRIDES)
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.teacher = User.objects.create_user('ustoz', first_name='Aziz')
+        self.category = Category.objects.create(name='Dasturlash', slug='dasturlash')
+        self.course = Course.objects.create(
+            title='Python', slug='python', status='published', category=self.category, instructor=self.teacher,
+        )
+        self.module = Module.objects.create(title='M', slug='m', course=self.course, order=0)
+        self.lesson = Lesson.objects.create(title='Kirish', slug='kirish', module=self.module, order=0)
+        self.path = LearningPath.objects.create(title="Yo'l", slug='yol')
+        LearningPathCourse.objects.create(path=self.path, course=self.course, order=0)
+        self.urls = {
+            'course': reverse('learning:course_detail', args=['python']),
+            'category': reverse('learning:category_detail', args=['dasturlash']),
+            'path': reverse('learning:learning_path_detail', args=['yol']),
+            'instructor': reverse('learning:instructor_detail', args=['ustoz']),
+        }
+
+    def _etag(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return resp['ETag']
+
+    def test_unchanged_pages_revalidate_before_the_view_runs(self):
+        for name, url in self.urls.items():
+            first = self.client.get(url)
+            self.assertIn('no-cache', first['Cache-Control'])
+            self.assertIn('private', first['Cache-Control'])
+            self.assertTrue(first.has_header('Last-Modified'), name)
+            with _CaptureQueries(_connection) as queries:
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(resp.status_code, 304, name)
+            self.assertLessEqual(len(queries), 3, name)  # the stamp, nothing the view would run
+            resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(resp.status_code, 304, name)
+
+    @override_settings(PAGE_CACHE_TTL=0)  # the stamp itself, not learning/page_cache.py
+    def test_course_page_shows_the_student_count_its_etag_covers(self):
+        etag = self._etag(self.urls['course'])
+        CourseStats.objects.filter(course=self.course).update(student_count=7)
+        resp = self.client.get(self.urls['course'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['student_count'], 7)
+
+    def test_edits_change_the_validators(self):
+        before = {name: self._etag(url) for name, url in self.urls.items()}
+        CourseReview.objects.create(user=User.objects.create_user('talaba'), course=self.course, rating=5)
+        after = {name: self._etag(url) for name, url in self.urls.items()}
+        self.assertTrue(all(after[name] != before[name] for name in self.urls), (before, after))
+
+        for change in (
+            lambda: Lesson.objects.get(pk=self.lesson.pk).save(),
+            lambda: Announcement.objects.create(title='Yangilik', body='...'),  # global
+            lambda: Category.objects.filter(pk=self.category.pk).first().save(),
+        ):
+            etag = self._etag(self.urls['course'])
+            change()
+            self.assertNotEqual(self._etag(self.urls['course']), etag)
+
+        etag = self._etag(self.urls['path'])
+        other = Course.objects.create(title='Django', slug='django', status='published')
+        LearningPathCourse.objects.create(path=self.path, course=other, order=1)
+        self.assertNotEqual(self._etag(self.urls['path']), etag)
+
+    def test_certificate_page(self):
+        student = User.objects.create_user('talaba', first_name='Aziza')
+        cert = Certificate.objects.create(user=student, course=self.course)
+        url = reverse('learning:public_certificate_verify', args=[cert.code])
+        etag = self._etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        student.last_name = 'Karimova'
+        student.save()
+        self.assertNotEqual(self._etag(url), etag)
+
+    def test_logged_in_and_missing_pages_render_in_full(self):
+        etag = self._etag(self.urls['course'])
+        self.client.force_login(self.teacher)
+        resp = self.client.get(self.urls['course'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.has_header('ETag'))
+        self.client.logout()
+        self.course.status = 'draft'
+        self.course.save()
+        self.assertEqual(self.client.get(self.urls['course'], HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Anonymous page cache
+# ═══════════════════════════════════════════════════════════════
+
+@override_settings(**_SEO_OVERRIDES)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        self.category = Category.objects.create(name='Dasturlash', slug='dasturlash')
+        self.course = Course.objects.create(title='Python', slug='python', status='published', category=self.category)
+        self.other = Course.objects.create(title='Django', slug='django', status='published')
+        for course in (self.course, self.other):
+            module = Module.objects.create(title='M', slug='m', course=course, order=0)
+            Lesson.objects.create(title='Kirish', slug='kirish', module=module, order=0)
+        self.course_url = reverse('learning:course_detail', args=['python'])
+
+    def _hit(self, url, **extra):
+        return self.client.get(url, **extra).get('X-Page-Cache') == 'hit'
+
+    def test_anonymous_pages_are_served_from_the_cache(self):
+        for url in (reverse('home'), reverse('learning:course_list'), self.course_url,
+                    reverse('learning:category_detail', args=['dasturlash'])):
+            self.assertFalse(self._hit(url), url)
+            with _CaptureQueries(_connection) as queries:
+                resp = self.client.get(url)
+            self.assertEqual(resp['X-Page-Cache'], 'hit', url)
+            self.assertLessEqual(len(queries), 2, url)  # the entry and its tag versions
+            self.assertFalse(resp.cookies)
+            self.assertNotContains(resp, 'csrfmiddlewaretoken')
+        etag = self.client.get(self.course_url)['ETag']
+        self.assertEqual(self.client.get(self.course_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_query_strings_are_normalized(self):
+        base = reverse('learning:course_list')
+        self.assertFalse(self._hit(f'{base}?kategoriya=dasturlash&daraja=beginner'))
+        self.assertTrue(self._hit(f'{base}?daraja=beginner&utm_source=tg&kategoriya=dasturlash'))
+        self.assertFalse(self._hit(f'{base}?daraja=beginner'))
+        # Unknown parameters bypass the cache instead of adding entries.
+        self.assertFalse(self._hit(f'{base}?boshqa=1'))
+        self.assertFalse(self._hit(f'{base}?boshqa=1'))
+
+    def test_visitors_with_cookies_bypass_it(self):
+        self.client.get(self.course_url)
+        self.client.cookies['csrftoken'] = 'x' * 32
+        self.assertFalse(self._hit(self.course_url))
+        del self.client.cookies['csrftoken']
+        user = User.objects.create_user('talaba')
+        self.client.force_login(user)
+        resp = self.client.get(self.course_url)
+        self.assertIsNone(resp.get('X-Page-Cache'))
+        self.assertContains(resp, 'csrfmiddlewaretoken')  # the review form
+
+    def test_edits_purge_the_pages_that_show_them(self):
+        course_list = reverse('learning:course_list')
+        for url in (self.course_url, course_list):
+            self.client.get(url)
+        Lesson.objects.create(title='Yangi', slug='yangi', module=self.other.modules.get(), order=1)
+        self.assertTrue(self._hit(self.course_url))  # another course's outline
+        self.assertFalse(self._hit(course_list))     # its card changed
+
+        CourseReview.objects.create(user=User.objects.create_user('talaba'), course=self.course,
+                                    rating=5, comment='Ajoyib kurs')
+        resp = self.client.get(self.course_url)
+        self.assertIsNone(resp.get('X-Page-Cache'))
+        self.assertContains(resp, 'Ajoyib kurs')
+
+        for change in (
+            lambda: Announcement.objects.create(title="Global e'lon", body='...'),
+            lambda: Category.objects.get(pk=self.category.pk).save(),
+        ):
+            self.assertTrue(self._hit(self.course_url))
+            change()
+            self.assertFalse(self._hit(self.course_url))
+
+    def test_global_announcements_purge_the_home_page(self):
+        home = reverse('home')
+        self.client.get(home)
+        self.assertTrue(self._hit(home))
+        Announcement.objects.create(title="Yangi kurslar haftasi", body='...')
+        resp = self.client.get(home)
+        self.assertIsNone(resp.get('X-Page-Cache'))
+        self.assertContains(resp, 'Yangi kurslar haftasi')
+
+
+
+# ═══════════════════════════════════════════════════════════════
+# Cached course cards (learning/course_cards.py)
+# ═══════════════════════════════════════════════════════════════
+
+from learning import course_cards as _course_cards
+from learning.models import Wishlist
+from learning.views import _course_card_annotations as _card_annotations
+
+
+@override_settings(**_AUTH_OVERRIDES, PAGE_CACHE_TTL=0)
+class CourseCardCacheTests(TestCase):
+    def setUp(self):
+        _cache.clear()
+        _course_cards._fragments.clear()
+        self.course = Course.objects.create(title='Django Asoslari', slug='django', status='published')
+        self.other = Course.objects.create(title='Python Asoslari', slug='python', status='published')
+
+    def _cards(self):
+        return list(_card_annotations(Course.objects.select_related('category').order_by('id')))
+
+    def test_cards_are_rendered_once_per_version(self):
+        html = _course_cards.render(self._cards())
+        self.assertEqual(html.count('<article class="course-card">'), 2)
+        cards = self._cards()
+        with self.assertNumQueries(0):  # this process's copies
+            self.assertEqual(_course_cards.render(cards), html)
+        # Other processes find them in the shared cache.
+        for card in cards:
+            self.assertIsNotNone(_cache.get(_course_cards._cache_key(_course_cards.version(card))))
+        _course_cards._fragments.clear()
+        self.assertEqual(_course_cards.render(cards), html)
+
+    def test_changes_give_the_card_a_new_version(self):
+        _course_cards.render(self._cards())
+        self.course.title = 'Django Chuqur'
+        self.course.save()
+        module = Module.objects.create(title='M', slug='m', course=self.other, order=0)
+        Lesson.objects.create(title='L', slug='l', module=module, duration_seconds=60, order=0)
+        html = _course_cards.render(self._cards())
+        self.assertIn('Django Chuqur', html)
+        self.assertIn('1 dars', html)
+
+    def test_wishlist_state_comes_from_one_payload(self):
+        user = User.objects.create_user(username='talaba', password='pw')
+        Wishlist.objects.create(user=user, course=self.other)
+        cards = _course_cards.render(self._cards())
+        anonymous = self.client.get(reverse('learning:course_list'))
+        self.assertContains(anonymous, cards, html=False)
+        self.assertNotContains(anonymous, 'wishlist-ids')
+
+        self.client.force_login(user)
+        signed_in = self.client.get(reverse('learning:course_list'))
+        # The same cached cards; the hearts are marked client-side.
+        self.assertContains(signed_in, cards, html=False)
+        self.assertContains(
+            signed_in, f'<script id="wishlist-ids" type="application/json">[{self.other.id}]</script>',
+        )
+        self.assertNotContains(signed_in, 'course-card-heart active')
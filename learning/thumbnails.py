@@ -0,0 +1,171 @@
+"""Course thumbnails: resolved once, served as local resized variants.
+
+A course's image is its uploaded thumbnail, else the first lesson's YouTube
+frame. Finding the frame cost a first-lesson query (or a catalog lookup) on
+every call, uploads were sent at whatever size they were uploaded at, and
+every card pulled a 480px JPEG from YouTube. Now:
+
+* `resolve()` stores the source URL in Course.thumbnail_source. The signals
+  in learning/models.py re-resolve a course when its upload or the head of
+  its outline changes (no network, two queries).
+* `build()` — the `build_thumbnails` command — reads each source once (an
+  upload from storage, a YouTube frame downloaded once into
+  MEDIA_ROOT/thumbs/src), writes WebP and JPEG copies at WIDTHS under
+  MEDIA_ROOT/thumbs, and records the source's key in Course.thumbnail_key.
+* `url()` and `srcset()` give templates the largest JPEG and the srcset
+  strings while that key matches the current source, and the source itself
+  otherwise (a new upload shows at full size until the next build).
+"""
+import hashlib
+from io import BytesIO
+
+import requests as http_requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import page_cache
+
+# Bump when the variants change (widths, quality) so everything is rebuilt.
+LAYOUT = 1
+# Card widths in CSS pixels run ~220-360, so these cover 1x and 2x screens.
+WIDTHS = (320, 480, 720)
+# {srcset key: (file extension, Pillow format, save options)}
+FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+FETCH_TIMEOUT = 10
+
+
+def youtube_url(video_id):
+    return settings.YOUTUBE_THUMBNAIL_URL.format(video_id=video_id)
+
+
+def key_for(source):
+    return hashlib.sha1(f'{LAYOUT}:{source}'.encode()).hexdigest()[:20] if source else ''
+
+
+def _variant(key, width, fmt):
+    return f'thumbs/{key[:2]}/{key}-{width}.{FORMATS[fmt][0]}'
+
+
+def _built_key(course):
+    key = course.thumbnail_key
+    return key if key and key == key_for(course.thumbnail_source) else None
+
+
+def url(course):
+    """The course's card image URL, or None when it has no image."""
+    key = _built_key(course)
+    if key:
+        return default_storage.url(_variant(key, WIDTHS[-1], 'jpeg'))
+    return course.thumbnail_source or None
+
+
+def srcset(course):
+    """{'webp': srcset, 'jpeg': srcset} once the variants are built, else None."""
+    key = _built_key(course)
+    if not key:
+        return None
+    return {
+        fmt: ', '.join(f'{default_storage.url(_variant(key, width, fmt))} {width}w' for width in WIDTHS)
+        for fmt in FORMATS
+    }
+
+
+def resolve(course_ids=None):
+    """Store the thumbnail source of the given courses (all when None).
+    Returns the number of courses whose source changed."""
+    from .models import Course, Lesson
+
+    courses = Course.objects.order_by('id')
+    lessons = Lesson.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+        lessons = lessons.filter(module__course_id__in=course_ids)
+    # The very first lesson of each course, in outline order.
+    first_video = dict(
+        lessons.order_by('module__course_id', 'module__order', 'module_id', 'order', 'id')
+        .distinct('module__course_id')
+        .values_list('module__course_id', 'youtube_video_id')
+    )
+    changed, now = [], timezone.now()
+    for course in courses.only('id', 'thumbnail', 'thumbnail_source'):
+        if course.thumbnail:
+            source = course.thumbnail.url
+        else:
+            video_id = first_video.get(course.id)
+            source = youtube_url(video_id) if video_id else ''
+        if source != course.thumbnail_source:
+            course.thumbnail_source = source
+            course.content_changed_at = now
+            changed.append(course)
+    Course.objects.bulk_update(changed, ['thumbnail_source', 'content_changed_at'], batch_size=500)
+    return len(changed)
+
+
+def _original(course, key):
+    """The source image's bytes: the upload, or the YouTube frame from the
+    local cache (downloaded on first use)."""
+    if course.thumbnail:
+        with course.thumbnail.open('rb') as fh:
+            return fh.read()
+    cached = f'thumbs/src/{key}.jpg'
+    if default_storage.exists(cached):
+        with default_storage.open(cached, 'rb') as fh:
+            return fh.read()
+    resp = http_requests.get(course.thumbnail_source, timeout=FETCH_TIMEOUT)
+    resp.raise_for_status()
+    default_storage.save(cached, ContentFile(resp.content))
+    return resp.content
+
+
+def _write_variants(data, key):
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert('RGB')
+    for width in WIDTHS:
+        # Never upscale; a small source is stored as-is under every width.
+        variant = image
+        if image.width > width:
+            variant = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        for fmt, (_, pil_format, options) in FORMATS.items():
+            out = BytesIO()
+            variant.save(out, pil_format, **options)
+            name = _variant(key, width, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(out.getvalue()))
+
+
+def build(course_ids=None, on_error=None):
+    """Resolve sources, then write the variants of every course whose built
+    key doesn't match its source. A source that can't be read or decoded is
+    skipped (`on_error(course, exc)`) and retried on the next run. Returns
+    {'built': n, 'failed': n}."""
+    from .models import Course
+
+    resolve(course_ids)
+    courses = Course.objects.exclude(thumbnail_source='').order_by('id')
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+    totals, built = {'built': 0, 'failed': 0}, []
+    for course in courses.only('id', 'thumbnail', 'thumbnail_source', 'thumbnail_key').iterator():
+        key = key_for(course.thumbnail_source)
+        if course.thumbnail_key == key:
+            continue
+        try:
+            _write_variants(_original(course, key), key)
+        except Exception as exc:  # network, storage or a file Pillow can't read
+            totals['failed'] += 1
+            if on_error:
+                on_error(course, exc)
+            continue
+        Course.objects.filter(pk=course.pk).update(thumbnail_key=key, content_changed_at=timezone.now())
+        built.append(course.pk)
+    if built:
+        page_cache.purge(page_cache.COURSES, *(f'course:{pk}' for pk in built))
+    totals['built'] = len(built)
+    return totals
@@ -15,6 +15,11 @@ urlpatterns = [
         views.SearchView.as_view(),
         name='search',
     ),
+    path(
+        'qidiruv/taklif/',
+        views.search_suggest,
+        name='search_suggest',
+    ),
     path(
         'sevimlilar/',
         views.wishlist_view,
@@ -25,6 +30,11 @@ urlpatterns = [
         views.my_learning,
         name='my_learning',
     ),
+    path(
+        'voqealar/',
+        views.ingest_events,
+        name='ingest_events',
+    ),
     path(
         'reyting/',
         views.leaderboard_view,
@@ -45,6 +55,11 @@ urlpatterns = [
         views.enroll_learning_path,
         name='enroll_learning_path',
     ),
+    path(
+        'yonalish/<slug:path_slug>/og.<str:fmt>',
+        views.path_card,
+        name='path_card',
+    ),
     path(
         'yonalish/<slug:path_slug>/sertifikat/',
         views.learning_path_certificate,
@@ -55,6 +70,11 @@ urlpatterns = [
         views.public_certificate_verify,
         name='public_certificate_verify',
     ),
+    path(
+        'sertifikat/tekshirish/<slug:code>/rasm.<str:fmt>',
+        views.certificate_image,
+        name='certificate_image',
+    ),
     path(
         'oqituvchi/<slug:username>/',
         views.InstructorDetailView.as_view(),
@@ -70,6 +90,11 @@ urlpatterns = [
         views.CourseDetailView.as_view(),
         name='course_detail',
     ),
+    path(
+        '<slug:course_slug>/og.<str:fmt>',
+        views.course_card,
+        name='course_card',
+    ),
     path(
         '<slug:course_slug>/yozilish/',
         views.enroll_course,
@@ -152,6 +177,11 @@ urlpatterns = [
         views.check_quiz_answer,
         name='check_quiz_answer',
     ),
+    path(
+        '<slug:course_slug>/<slug:module_slug>/<slug:lesson_slug>/test/<int:quiz_id>/urinish/<int:attempt_id>/topshirish/',
+        views.submit_quiz,
+        name='submit_quiz',
+    ),
     path(
         '<slug:course_slug>/<slug:module_slug>/<slug:lesson_slug>/test/<int:quiz_id>/urinish/<int:attempt_id>/natija/',
         views.quiz_result,
@@ -1,5 +1,8 @@
+import hashlib
+import threading
+
 import markdown
-import bleach
+from bleach.sanitizer import Cleaner
 
 _ALLOWED_TAGS = [
     'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
@@ -17,15 +20,106 @@ _ALLOWED_ATTRS = {
 
 _ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
 
+_EXTENSIONS = ['fenced_code', 'tables', 'nl2br']
+
+# Bump whenever the output for the same source changes (extensions, allowed
+# tags, ...): stored HTML carrying an older key is re-rendered on next read.
+RENDERER_VERSION = 1
+
+# Building a Markdown pipeline and a bleach Cleaner is a good part of the cost
+# of a short render, so each thread keeps one configured pair.
+_local = threading.local()
+
+
+def _renderer():
+    pair = getattr(_local, 'renderer', None)
+    if pair is None:
+        pair = _local.renderer = (
+            markdown.Markdown(extensions=_EXTENSIONS),
+            Cleaner(
+                tags=_ALLOWED_TAGS,
+                attributes=_ALLOWED_ATTRS,
+                protocols=_ALLOWED_PROTOCOLS,
+                strip=True,
+            ),
+        )
+    return pair
+
 
 def render_markdown(text: str) -> str:
     if not text:
         return ''
-    html = markdown.markdown(text, extensions=['fenced_code', 'tables', 'nl2br'])
-    return bleach.clean(
-        html,
-        tags=_ALLOWED_TAGS,
-        attributes=_ALLOWED_ATTRS,
-        protocols=_ALLOWED_PROTOCOLS,
-        strip=True,
-    )
+    md, cleaner = _renderer()
+    try:
+        return cleaner.clean(md.convert(text))
+    finally:
+        md.reset()
+
+
+def render_markdown_many(texts) -> list:
+    """render_markdown over `texts`, rendering repeated sources once."""
+    rendered = {}
+    return [rendered[t] if t in rendered else rendered.setdefault(t, render_markdown(t))
+            for t in texts]
+
+
+def markdown_key(*sources) -> str:
+    """Renderer version plus a hash of the sources the stored HTML came from."""
+    digest = hashlib.blake2b(digest_size=12)
+    for source in sources:
+        digest.update((source or '').encode())
+        digest.update(b'\0')
+    return f'{RENDERER_VERSION}:{digest.hexdigest()}'
+
+
+# ── Stored HTML ──────────────────────────────────────────────────────────────
+# Models with Markdown fields declare MARKDOWN_FIELDS = {source: html field}
+# and a `markdown_key` column; a pre_save receiver (learning/models.py) keeps
+# the HTML in step on save.
+
+def refresh_rendered(instance) -> bool:
+    """Re-render `instance`'s HTML fields if their key is stale. Returns
+    whether anything changed (the caller saves)."""
+    sources = list(instance.MARKDOWN_FIELDS)
+    texts = [getattr(instance, name) for name in sources]
+    key = markdown_key(*texts)
+    if instance.markdown_key == key:
+        return False
+    for name, html in zip(sources, render_markdown_many(texts)):
+        setattr(instance, instance.MARKDOWN_FIELDS[name], html)
+    instance.markdown_key = key
+    return True
+
+
+def rendered_html(instance, source) -> str:
+    """Stored HTML for `instance.<source>`. Rows written around save() (bulk
+    updates, older renderer versions) are re-rendered here and written back."""
+    if refresh_rendered(instance):
+        fields = {html: getattr(instance, html) for html in instance.MARKDOWN_FIELDS.values()}
+        type(instance)._default_manager.filter(pk=instance.pk).update(
+            markdown_key=instance.markdown_key, **fields,
+        )
+    return getattr(instance, instance.MARKDOWN_FIELDS[source])
+
+
+def rerender_stale(batch_size=500):
+    """Re-render every row whose stored HTML is missing or keyed to other
+    sources or an older RENDERER_VERSION. Returns {model label: rows updated}."""
+    from .models import Course, Lesson, Module, Note
+
+    updated = {}
+    for model in (Course, Module, Lesson, Note):
+        fields = ['markdown_key', *model.MARKDOWN_FIELDS.values()]
+        count = 0
+        batch = []
+        qs = model._default_manager.only('pk', *model.MARKDOWN_FIELDS, 'markdown_key').order_by('pk')
+        for instance in qs.iterator(chunk_size=batch_size):
+            if refresh_rendered(instance):
+                batch.append(instance)
+            if len(batch) >= batch_size:
+                count += model._default_manager.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            count += model._default_manager.bulk_update(batch, fields)
+        updated[model._meta.label] = count
+    return updated
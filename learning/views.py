@@ -6,31 +6,44 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import IntegrityError, transaction
-from django.db.models import Count, Sum, Q, OuterRef, Subquery, IntegerField
+from django.db.models import Count, F, Q
 from django.db.models.functions import Coalesce
-from django.http import Http404, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
+from django.utils.http import http_date
 from django.utils.safestring import mark_safe
 from django.utils.text import Truncator
 from django.views import View
 
+from . import activity, cards, conditional, leaderboards, page_cache, quiz_keys, quiz_stats, sitemaps, thumbnails
+from .catalog import get_catalog, lesson_entry
 from .context_processors import absolute_url
+from .events import EventError, ingest
 from .models import (
     Lesson, LessonProgress, LessonView, Note, Course, Module,
     Category, Enrollment, CourseReview, Certificate,
     Wishlist, LessonQuestion, Announcement,
-    Quiz, QuizAttempt, QuizAnswer, QuizQuestion, QuizChoice,
+    Quiz, QuizAttempt, QuizAnswer,
     LearningPath, LearningPathEnrollment, LearningPathCertificate,
-    VideoBookmark,
+    VideoBookmark, CourseStats,
 )
 from .forms import CourseReviewForm, LessonQuestionForm, LessonAnswerForm
-from .utils import render_markdown
+from .progress import completed_counts, course_progress
+from .search import search
+from .site_stats import hero_stats
+from .snapshots import get_home_snapshot
+from .suggest import suggest
+from .utils import rendered_html
 
 User = get_user_model()
 UZT = pytz.timezone('Asia/Tashkent')  # UTC+5
+# Finished attempts listed per quiz on the lesson and quiz pages.
+QUIZ_HISTORY = 10
 
 
 def _today_uzt():
@@ -120,7 +133,7 @@ def _lesson_jsonld(lesson, course):
         '@type': 'VideoObject',
         'name': lesson.title,
         'description': _meta_desc(lesson.description, lesson.title),
-        'thumbnailUrl': f'https://img.youtube.com/vi/{vid}/hqdefault.jpg',
+        'thumbnailUrl': thumbnails.youtube_url(vid),
         'embedUrl': f'https://www.youtube.com/embed/{vid}',
         'url': absolute_url(lesson.get_absolute_url()),
         'inLanguage': 'uz',
@@ -135,20 +148,21 @@ def _lesson_jsonld(lesson, course):
 
 
 def _course_card_annotations(qs):
-    # Aggregate lessons via correlated subqueries so that the `enrollments` JOIN
-    # cannot multiply the per-lesson rows. Doing all three in one multi-join
-    # query inflated `total_duration` by the number of enrollments (every lesson
-    # duration was summed once per enrolled student).
-    course_lessons = Lesson.objects.filter(module__course=OuterRef('pk')).order_by()
-    lesson_count_sq = course_lessons.values('module__course').annotate(n=Count('id')).values('n')
-    duration_sq = course_lessons.values('module__course').annotate(s=Sum('duration_seconds')).values('s')
+    # Card numbers come from the denormalized CourseStats row (one LEFT JOIN)
+    # rather than being aggregated over Lesson/Enrollment for every card; see
+    # learning/course_stats.py for how they are kept current.
     return qs.annotate(
-        lesson_count=Coalesce(Subquery(lesson_count_sq, output_field=IntegerField()), 0),
-        total_duration=Coalesce(Subquery(duration_sq, output_field=IntegerField()), 0),
-        student_count=Count('enrollments', distinct=True),
+        lesson_count=Coalesce(F('stats__lesson_count'), 0),
+        total_duration=Coalesce(F('stats__total_duration'), 0),
+        student_count=Coalesce(F('stats__student_count'), 0),
     )
 
 
+# Courses without a CourseStats row (created around the signals) sort as
+# having no students rather than first, where Postgres puts NULLs.
+_POPULAR = F('stats__student_count').desc(nulls_last=True)
+
+
 def _user_wishlist_ids(user):
     if not user.is_authenticated:
         return set()
@@ -159,30 +173,29 @@ def _user_wishlist_ids(user):
 # / (home page — public)
 # ---------------------------------------------------------------------------
 
-def _personalized_home(user, all_courses, published):
+def _personalized_home(user):
     """Authenticated-user home-page sections: in-progress courses to continue,
     recent activity, and category-based recommendations. All empty for anonymous
-    users. `all_courses` is the pre-annotated published list reused to avoid
-    refetching; `published` is the base queryset for recommendations."""
+    users. Layered on top of the shared home snapshot, so everything here is
+    scoped to the user's own enrollments."""
     continue_learning = []
     recommended = []
     recent_activity = []
 
     if user.is_authenticated:
+        published = Course.objects.filter(status='published')
         enrolled_ids = set(
             Enrollment.objects.filter(user=user)
             .values_list('course_id', flat=True)
         )
-        enrolled_courses = [c for c in all_courses if c.id in enrolled_ids]
-
-        # Completed-lesson counts for every enrolled course in one query
-        # (was a per-course COUNT inside the loop — an N+1).
-        completed_map = dict(
-            LessonProgress.objects
-            .filter(user=user, is_completed=True, lesson__module__course_id__in=enrolled_ids)
-            .values_list('lesson__module__course_id')
-            .annotate(c=Count('id'))
-        )
+        enrolled_courses = list(
+            _course_card_annotations(
+                published.filter(id__in=enrolled_ids).select_related('category')
+            ).order_by('-is_featured', 'order')
+        ) if enrolled_ids else []
+
+        # Completed-lesson counts from the per-course progress summaries.
+        completed_map = completed_counts(user, enrolled_ids)
 
         for course in enrolled_courses:
             total = course.lesson_count or 0
@@ -238,92 +251,28 @@ class HomeView(View):
     template_name = 'home.html'
 
     def get(self, request):
-        user = request.user
-        published = Course.objects.filter(status='published')
-        all_courses = list(
-            _course_card_annotations(
-                published.select_related('category')
-            ).order_by('-is_featured', 'order')
-        )
-
-        featured = [c for c in all_courses if c.is_featured][:8]
-        if not featured:
-            featured = all_courses[:8]
-
-        trending = sorted(all_courses, key=lambda c: (c.student_count or 0), reverse=True)[:8]
-        newest = sorted(all_courses, key=lambda c: c.id, reverse=True)[:8]
-        top_rated = sorted(
-            [c for c in all_courses if c.rating_count > 0],
-            key=lambda c: (float(c.avg_rating), c.rating_count),
-            reverse=True,
-        )[:8]
-
-        total_seconds = (
-            LessonView.objects
-            .aggregate(s=Sum('lesson__duration_seconds'))['s'] or 0
-        )
-        total_hours = round(total_seconds / 3600)
-        total_users = User.objects.filter(is_active=True).count()
-        total_lessons = Lesson.objects.count()
-        total_courses = published.count()
-
-        categories = list(
-            Category.objects.annotate(
-                c=Count('courses', filter=Q(courses__status='published'))
-            ).order_by('order', 'name')
-        )
-
-        latest_reviews = list(
-            CourseReview.objects
-            .select_related('user', 'course')
-            .exclude(comment='')
-            .order_by('-created_at')[:6]
-        )
-
-        global_announcements = list(
-            Announcement.objects.filter(course__isnull=True).order_by('-is_pinned', '-created_at')[:2]
-        )
-
-        # category strips: one row per category (top 8 by enrollments)
-        category_strips = []
-        for cat in categories[:6]:
-            cat_courses = [c for c in all_courses if c.category_id == cat.id][:6]
-            if cat_courses:
-                category_strips.append({'category': cat, 'courses': cat_courses})
-
-        # Featured learning paths
-        learning_paths = list(
-            LearningPath.objects.filter(is_featured=True)
-            .annotate(course_count=Count('path_courses'))
-            [:4]
-        )
-
-        personalized = _personalized_home(user, all_courses, published)
-
-        # Hero card thumbnail: the top featured course (falls back to the newest),
-        # instead of a hardcoded course slug.
-        hero_course = featured[0] if featured else (newest[0] if newest else None)
-        hero_course_thumbnail = hero_course.get_thumbnail_url() if hero_course else None
-        hero_course_title = hero_course.title if hero_course else ''
-
+        # Catalog-wide rows and category strips come from the shared snapshot
+        # (see learning/snapshots.py) and the hero totals from the running
+        # site counters; signed-in users get their own sections layered on top.
+        page_cache.tag(request, page_cache.COURSES, page_cache.CATEGORIES, page_cache.PATHS,
+                       page_cache.ANNOUNCEMENTS)
+        snapshot = get_home_snapshot()
         return render(request, self.template_name, {
-            'featured': featured,
-            'trending': trending,
-            'newest': newest,
-            'top_rated': top_rated,
-            'categories': categories,
-            'total_hours': total_hours,
-            'total_users': total_users,
-            'total_lessons': total_lessons,
-            'total_courses': total_courses,
-            'latest_reviews': latest_reviews,
-            'global_announcements': global_announcements,
-            'category_strips': category_strips,
-            'learning_paths': learning_paths,
-            **personalized,
+            'featured': snapshot['featured'],
+            'trending': snapshot['trending'],
+            'newest': snapshot['newest'],
+            'top_rated': snapshot['top_rated'],
+            'categories': snapshot['categories'],
+            **hero_stats(),
+            'total_courses': snapshot['total_courses'],
+            'latest_reviews': snapshot['latest_reviews'],
+            'global_announcements': snapshot['global_announcements'],
+            'category_strips': snapshot['category_strips'],
+            'learning_paths': snapshot['learning_paths'],
+            **_personalized_home(request.user),
             'wishlist_ids': _user_wishlist_ids(request.user),
-            'hero_course_thumbnail': hero_course_thumbnail,
-            'hero_course_title': hero_course_title,
+            'hero_course_thumbnail': snapshot['hero_course_thumbnail'],
+            'hero_course_title': snapshot['hero_course_title'],
             'jsonld': _home_jsonld(),
         })
 
@@ -336,6 +285,7 @@ class CourseListView(View):
     template_name = 'learning/course_list.html'
 
     def get(self, request):
+        page_cache.tag(request, page_cache.COURSES, page_cache.CATEGORIES)
         qs = _course_card_annotations(
             Course.objects.filter(status='published').select_related('category')
         )
@@ -350,14 +300,16 @@ class CourseListView(View):
         if level and level in dict(Course.LEVEL_CHOICES):
             qs = qs.filter(level=level)
         if q:
-            qs = qs.filter(Q(title__icontains=q) | Q(description__icontains=q) | Q(subtitle__icontains=q))
+            qs = search(qs, q)
 
-        if sort == 'new':
+        if q and 'saralash' not in request.GET:
+            qs = qs.order_by('-rank', _POPULAR, 'order')
+        elif sort == 'new':
             qs = qs.order_by('-id')
         elif sort == 'rating':
             qs = qs.order_by('-avg_rating', '-rating_count')
         else:  # popular
-            qs = qs.order_by('-student_count', 'order')
+            qs = qs.order_by(_POPULAR, 'order')
 
         categories = list(Category.objects.order_by('order', 'name'))
         active_category = None
@@ -390,11 +342,13 @@ class CourseListView(View):
 # /malaka/kategoriya/<slug>/
 # ---------------------------------------------------------------------------
 
+@method_decorator(conditional.page(conditional.category_page), name='get')
 class CategoryDetailView(View):
     template_name = 'learning/category_detail.html'
 
     def get(self, request, slug):
         category = get_object_or_404(Category, slug=slug)
+        page_cache.tag(request, f'category:{category.id}', page_cache.COURSES, page_cache.CATEGORIES)
         courses = _course_card_annotations(
             Course.objects.filter(category=category, status='published').select_related('category')
         ).order_by('order')
@@ -425,16 +379,14 @@ class SearchView(View):
         lessons = []
         if q:
             courses = list(_course_card_annotations(
-                Course.objects.filter(
-                    Q(title__icontains=q) | Q(description__icontains=q) | Q(subtitle__icontains=q),
-                    status='published',
-                ).select_related('category')
+                search(Course.objects.filter(status='published'), q)
+                .select_related('category')
+                .order_by('-rank', _POPULAR, 'order')
             )[:20])
             lessons = list(
-                Lesson.objects.filter(
-                    Q(title__icontains=q) | Q(description__icontains=q),
-                    module__course__status='published',
-                ).select_related('module__course')[:20]
+                search(Lesson.objects.filter(module__course__status='published'), q)
+                .select_related('module__course')
+                .order_by('-rank', 'module__course__order', 'module__order', 'order')[:20]
             )
 
         if request.GET.get('format') == 'json':
@@ -466,20 +418,27 @@ class SearchView(View):
         })
 
 
+def search_suggest(request):
+    """Navbar autocomplete, answered from the in-memory index (no SQL)."""
+    return JsonResponse(suggest(request.GET.get('q', '').strip()[:100]))
+
+
 # ---------------------------------------------------------------------------
 # /malaka/<course_slug>/
 # ---------------------------------------------------------------------------
 
+@method_decorator(conditional.page(conditional.course_page), name='get')
 class CourseDetailView(View):
     template_name = 'learning/course_detail.html'
 
     def get(self, request, course_slug):
         course = get_object_or_404(
-            Course.objects.select_related('category', 'instructor'),
+            Course.objects.select_related('category', 'instructor', 'stats'),
             slug=course_slug,
         )
         if course.status != 'published' and not (request.user.is_staff or request.user.is_superuser):
             raise Http404
+        page_cache.tag(request, f'course:{course.id}', f'category:{course.category_id}', page_cache.ANNOUNCEMENTS)
         modules = list(
             course.modules
             .prefetch_related('lessons')
@@ -551,15 +510,12 @@ class CourseDetailView(View):
             .order_by('-created_at')[:20]
         )
 
-        student_count = Enrollment.objects.filter(course=course).count()
+        # The CourseStats count, which is also what the page's ETag covers
+        # (conditional.course_page).
+        stats = getattr(course, 'stats', None)
+        student_count = stats.student_count if stats else 0
 
-        rating_breakdown = []
-        if course.rating_count:
-            counts = {r['rating']: r['c'] for r in course.reviews.values('rating').annotate(c=Count('id'))}
-            for star in range(5, 0, -1):
-                c = counts.get(star, 0)
-                pct = int((c / course.rating_count) * 100) if course.rating_count else 0
-                rating_breakdown.append({'star': star, 'count': c, 'percent': pct})
+        rating_breakdown = course.rating_breakdown if course.rating_count else []
 
         announcements = list(
             Announcement.objects.filter(
@@ -591,13 +547,13 @@ class CourseDetailView(View):
             'user_review': user_review,
             'student_count': student_count,
             'rating_breakdown': rating_breakdown,
-            'description_html': mark_safe(render_markdown(course.description)) if course.description else '',
+            'description_html': mark_safe(rendered_html(course, 'description')),
             'announcements': announcements,
             'preview_lesson': preview_lesson,
             # SEO
             'meta_description': _meta_desc(course.subtitle, course.description, course.title),
             'og_title': course.title,
-            'og_image': absolute_url(course.get_thumbnail_url()),
+            'og_image': _course_og_image(course),
             'og_type': 'website',
             'jsonld': _course_jsonld(course),
         }
@@ -638,7 +594,7 @@ class ModuleDetailView(View):
             'course': course,
             'module': module,
             'lessons': lessons,
-            'module_description_html': mark_safe(render_markdown(module.description)) if module.description else '',
+            'module_description_html': mark_safe(rendered_html(module, 'description')),
         }
         return render(request, self.template_name, ctx)
 
@@ -647,67 +603,66 @@ class ModuleDetailView(View):
 # /malaka/<course_slug>/<module_slug>/<lesson_slug>/
 # ---------------------------------------------------------------------------
 
-def _adjacent_lessons(course, module, lesson):
+def _adjacent_lessons(lesson):
     """Return (prev_lesson, next_lesson) for the lesson, crossing module
     boundaries: falls through to the last lesson of the previous module / the
-    first lesson of the next module when the lesson is at an edge of its own."""
-    sibling_lessons = list(module.lessons.order_by('order'))
-    current_index = next(
-        (i for i, l in enumerate(sibling_lessons) if l.id == lesson.id), None
-    )
-    prev_lesson = sibling_lessons[current_index - 1] if current_index and current_index > 0 else None
-    next_lesson = sibling_lessons[current_index + 1] if current_index is not None and current_index < len(sibling_lessons) - 1 else None
+    first lesson of the next module when the lesson is at an edge of its own.
 
-    if not next_lesson:
-        next_module = course.modules.filter(order__gt=module.order).order_by('order').first()
-        if next_module:
-            next_lesson = next_module.lessons.order_by('order').first()
-    if not prev_lesson:
-        prev_module = course.modules.filter(order__lt=module.order).order_by('-order').first()
-        if prev_module:
-            prev_lesson = prev_module.lessons.order_by('-order').first()
-
-    return prev_lesson, next_lesson
+    Read from the precomputed links in the catalog snapshot, so the results are
+    `catalog.LessonEntry` objects (id / slug / title / module.slug / url)."""
+    entry = lesson_entry(lesson.id)
+    if entry is None:
+        return None, None
+    return entry.catalog.prev(entry), entry.catalog.next(entry)
 
 
 def _quiz_context(lesson, user):
     """Context for a standalone quiz-type lesson: per-quiz metadata (attempt
     history, best score, attempts remaining) plus, if the user has an unfinished
     attempt, the `active_*` fields that render it inline. Empty for non-quiz
-    lessons or anonymous users."""
+    lessons or anonymous users.
+
+    Counts come from the per-user summaries (learning/quiz_stats.py) and the
+    cached question counts, so the query count doesn't grow with the number of
+    quizzes or the length of their histories."""
     quizzes_with_meta = []
     active_quiz = active_attempt = active_questions = None
     active_answered_ids_json = '[]'
     if lesson.lesson_type == 'quiz' and user.is_authenticated:
-        for quiz in lesson.quizzes.all():
-            user_attempts = list(
-                quiz.attempts.filter(user=user).order_by('-started_at')
-            )
-            # History shows finished attempts only; an in-progress one isn't a result.
-            past_attempts = [a for a in user_attempts if a.completed_at is not None][:10]
-            best_attempt = max(past_attempts, key=lambda a: a.percentage()) if past_attempts else None
+        quizzes = list(lesson.quizzes.all())
+        stats = quiz_stats.for_user(user, quizzes)
+        counts = quiz_keys.question_counts(quizzes)
+        # History shows finished attempts only; an in-progress one isn't a result.
+        history = {}
+        for attempt in quiz_stats.recent_attempts(user, quizzes, QUIZ_HISTORY):
+            history.setdefault(attempt.quiz_id, []).append(attempt)
+        for quiz in quizzes:
+            summary = stats.get(quiz.id)
             attempts_remaining = -1
             if quiz.max_attempts > 0:
-                used_attempts = sum(1 for a in user_attempts if a.completed_at is not None)
+                used_attempts = summary.attempts_used if summary else 0
                 attempts_remaining = max(quiz.max_attempts - used_attempts, 0)
             quizzes_with_meta.append({
                 'quiz': quiz,
-                'questions_count': quiz.questions.count(),
-                'past_attempts': past_attempts,
-                'best_attempt': best_attempt,
+                'questions_count': counts[quiz.id],
+                'past_attempts': history.get(quiz.id, []),
+                'best_percentage': summary.best_percentage if summary else None,
                 'attempts_remaining': attempts_remaining,
             })
+            if active_quiz is None and summary and summary.in_progress_attempt_id:
+                active_quiz, active_attempt = quiz, summary.in_progress_attempt_id
+
+        if active_quiz is not None:
+            active_attempt = QuizAttempt.objects.filter(pk=active_attempt, completed_at__isnull=True).first()
             if active_attempt is None:
-                in_progress = next((a for a in user_attempts if a.completed_at is None), None)
-                if in_progress:
-                    active_quiz = quiz
-                    active_attempt = in_progress
-                    active_questions = list(
-                        quiz.questions.prefetch_related('choices').order_by('order')
-                    )
-                    active_answered_ids_json = json.dumps(
-                        list(in_progress.answers.values_list('question_id', flat=True))
-                    )
+                active_quiz = None
+            else:
+                active_questions = list(
+                    active_quiz.questions.prefetch_related('choices').order_by('order')
+                )
+                active_answered_ids_json = json.dumps(
+                    list(active_attempt.answers.values_list('question_id', flat=True))
+                )
 
     return {
         'quizzes_with_meta': quizzes_with_meta,
@@ -722,11 +677,9 @@ class LessonDetailView(View):
     template_name = 'learning/lesson_detail.html'
 
     def get(self, request, course_slug, module_slug, lesson_slug):
-        course = get_object_or_404(Course, slug=course_slug)
-        if course.status != 'published' and not (request.user.is_staff or request.user.is_superuser):
-            raise Http404
-        module = get_object_or_404(Module, slug=module_slug, course=course)
-        lesson = get_object_or_404(Lesson, slug=lesson_slug, module=module)
+        lesson = _get_lesson(course_slug, module_slug, lesson_slug, request.user)
+        module = lesson.module
+        course = module.course
 
         if request.user.is_authenticated:
             progress = LessonProgress.objects.filter(
@@ -749,12 +702,15 @@ class LessonDetailView(View):
             .order_by('-created_at')[:30]
         )
 
-        prev_lesson, next_lesson = _adjacent_lessons(course, module, lesson)
-
-        sidebar_modules = course.modules.prefetch_related('lessons').order_by('order')
+        # Sidebar outline, prev/next and course lesson ids all come from the
+        # catalog snapshot rather than per-request queries.
+        prev_lesson, next_lesson = _adjacent_lessons(lesson)
+        catalog = get_catalog()
+        course_entry = catalog.course_by_id(course.id)
+        sidebar_modules = catalog.modules(course_entry) if course_entry else []
+        all_ids = catalog.lesson_ids(course_entry) if course_entry else []
 
         if request.user.is_authenticated:
-            all_ids = list(Lesson.objects.filter(module__course=course).values_list('id', flat=True))
             done_ids = set(
                 LessonProgress.objects
                 .filter(user=request.user, lesson_id__in=all_ids, is_completed=True)
@@ -763,7 +719,7 @@ class LessonDetailView(View):
         else:
             done_ids = set()
 
-        total_in_course = Lesson.objects.filter(module__course=course).count()
+        total_in_course = len(all_ids)
         completed_in_course = len(done_ids)
         course_percent = int(completed_in_course / total_in_course * 100) if total_in_course else 0
 
@@ -776,7 +732,7 @@ class LessonDetailView(View):
         # Article content
         lesson_content_html = ''
         if lesson.lesson_type == 'article' and lesson.content:
-            lesson_content_html = mark_safe(render_markdown(lesson.content))
+            lesson_content_html = mark_safe(rendered_html(lesson, 'content'))
 
         # Bookmarks
         bookmarks = []
@@ -801,10 +757,10 @@ class LessonDetailView(View):
             'current_module': module,
             'current_lesson': lesson,
             'completed_lesson_ids': done_ids,
-            'lesson_description_html': mark_safe(render_markdown(lesson.description)),
+            'lesson_description_html': mark_safe(rendered_html(lesson, 'description')),
             'lesson_content_html': lesson_content_html,
             'note': note,
-            'note_rendered': mark_safe(render_markdown(note.content)) if note and note.content else '',
+            'note_rendered': mark_safe(rendered_html(note, 'content')) if note else '',
             'resources': resources,
             'questions': questions,
             'question_form': LessonQuestionForm(),
@@ -819,7 +775,7 @@ class LessonDetailView(View):
             # SEO
             'meta_description': _meta_desc(lesson.description, course.subtitle, course.title),
             'og_title': f'{lesson.title} — {course.title}',
-            'og_image': absolute_url(course.get_thumbnail_url()),
+            'og_image': _course_og_image(course),
             'og_type': 'video.other' if lesson.lesson_type == 'video' else 'article',
             'jsonld': _lesson_jsonld(lesson, course),
         }
@@ -848,20 +804,25 @@ def record_view(request, course_slug, module_slug, lesson_slug):
 
     # Enroll on first play (the previous implicit enrollment happened on a GET of
     # the lesson page, which inflated enrollments for anyone who merely opened it).
-    Enrollment.objects.get_or_create(user=request.user, course=lesson.module.course)
-
-    _, created = LessonView.objects.get_or_create(
-        user=request.user, lesson=lesson, viewed_on=today,
-    )
+    with transaction.atomic():
+        Enrollment.objects.get_or_create(user=request.user, course=lesson.module.course)
 
-    # Touch progress so last_watched_at reflects this view, but leave is_completed
-    # untouched — viewing is not completing.
-    progress, _ = LessonProgress.objects.get_or_create(
-        user=request.user, lesson=lesson
-    )
-    progress.save(update_fields=['last_watched_at'])
+        _, created = LessonView.objects.get_or_create(
+            user=request.user, lesson=lesson, viewed_on=today,
+        )
+        if created:
+            activity.record(request.user.id, today, viewed=1, seconds=lesson.duration_seconds or 0)
+
+        # Touch progress so last_watched_at reflects this view, but leave is_completed
+        # untouched — viewing is not completing. (A freshly created row already
+        # carries the current time.) The course summary follows via its signal.
+        progress, progress_created = LessonProgress.objects.get_or_create(
+            user=request.user, lesson=lesson
+        )
+        if not progress_created:
+            progress.save(update_fields=['last_watched_at'])
 
-    _update_streak(request.user)
+        _update_streak(request.user)
 
     return JsonResponse({
         'status': 'ok',
@@ -884,16 +845,21 @@ def mark_lesson_complete(request, course_slug, module_slug, lesson_slug):
     # Enroll on completion too (record_view does the same on first play); otherwise a
     # user who completes via the manual button never gets an Enrollment row and the
     # course is missing from "My Learning" / the profile lists.
-    Enrollment.objects.get_or_create(user=request.user, course=lesson.module.course)
+    # One transaction: the progress row, its course summary (updated by the
+    # LessonProgress signal) and the certificate check commit together.
+    with transaction.atomic():
+        Enrollment.objects.get_or_create(user=request.user, course=lesson.module.course)
 
-    progress, _ = LessonProgress.objects.get_or_create(
-        user=request.user, lesson=lesson
-    )
-    progress.is_completed = True
-    progress.save(update_fields=['is_completed'])
+        progress, _ = LessonProgress.objects.get_or_create(
+            user=request.user, lesson=lesson
+        )
+        if not progress.is_completed:
+            activity.record(request.user.id, _today_uzt(), completed=1)
+        progress.is_completed = True
+        progress.save(update_fields=['is_completed'])
 
-    _update_streak(request.user)
-    _maybe_issue_certificate(request.user, lesson.module.course)
+        _update_streak(request.user)
+        _maybe_issue_certificate(request.user, lesson.module.course)
 
     return JsonResponse({
         'status': 'ok',
@@ -903,14 +869,19 @@ def mark_lesson_complete(request, course_slug, module_slug, lesson_slug):
 
 
 def _maybe_issue_certificate(user, course):
-    total = Lesson.objects.filter(module__course=course).count()
-    if not total:
-        return
-    completed = LessonProgress.objects.filter(
-        user=user, lesson__module__course=course, is_completed=True,
-    ).count()
-    if completed >= total:
-        Certificate.objects.get_or_create(user=user, course=course)
+    _issue_certificates(user, [course.id])
+
+
+def _issue_certificates(user, course_ids):
+    """Issue the user's certificates for whichever of these courses are complete."""
+    for course_id, summary in course_progress(user, course_ids).items():
+        stats = getattr(summary.course, 'stats', None)
+        if stats is not None:
+            total = stats.lesson_count
+        else:  # no stats row yet (see course_stats.rebuild)
+            total = Lesson.objects.filter(module__course_id=course_id).count()
+        if total and summary.completed_count >= total:
+            Certificate.objects.get_or_create(user=user, course_id=course_id)
 
 
 def _update_streak(user):
@@ -937,6 +908,36 @@ def _update_streak(user):
         profile.save(update_fields=['current_streak', 'longest_streak', 'last_activity_date'])
 
 
+# ---------------------------------------------------------------------------
+# POST /malaka/voqealar/
+# ---------------------------------------------------------------------------
+
+@login_required
+def ingest_events(request):
+    """Apply a batch of learning events from the lesson page (learning/events.py).
+
+    Accepts a JSON body ``{"events": [...]}`` (fetch with X-CSRFToken) or a
+    form post with ``events`` as a JSON string and the CSRF token as a field —
+    the only shape `navigator.sendBeacon` can send.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    try:
+        if request.content_type == 'application/json':
+            body = json.loads(request.body)
+            if not isinstance(body, dict):
+                raise ValueError('body must be an object')
+            events = body.get('events')
+        else:
+            events = json.loads(request.POST.get('events', ''))
+    except ValueError:  # json.JSONDecodeError included
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    try:
+        return JsonResponse(ingest(request.user, events))
+    except EventError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+
 # ---------------------------------------------------------------------------
 # POST /malaka/<course_slug>/<module_slug>/<lesson_slug>/note/
 # ---------------------------------------------------------------------------
@@ -953,13 +954,17 @@ def save_note(request, course_slug, module_slug, lesson_slug):
     except (json.JSONDecodeError, ValueError):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-    Note.objects.update_or_create(
+    # A plain save(), not update_or_create: its update_fields would leave out
+    # the content_html and markdown_key that pre_save renders.
+    note, created = Note.objects.get_or_create(
         user=request.user,
         lesson=lesson,
         defaults={'content': content},
     )
-    rendered = render_markdown(content)
-    return JsonResponse({'status': 'ok', 'rendered': rendered})
+    if not created and note.content != content:
+        note.content = content
+        note.save()
+    return JsonResponse({'status': 'ok', 'rendered': note.content_html})
 
 
 # ---------------------------------------------------------------------------
@@ -991,8 +996,7 @@ def submit_review(request, course_slug):
         review = form.save(commit=False)
         review.user = request.user
         review.course = course
-        review.save()
-        course.update_rating()
+        review.save()  # the course's rating fields follow via signals
         messages.success(request, "Sharhingiz saqlandi. Rahmat!")
     else:
         messages.error(request, "Iltimos baho va sharhni to'g'ri kiriting.")
@@ -1014,10 +1018,14 @@ def certificate_view(request, course_slug):
     full_name = (request.user.first_name + ' ' + request.user.last_name).strip()
     if not full_name:
         full_name = request.user.username
+    cert.user, cert.course = request.user, course
     return render(request, 'learning/certificate.html', {
         'course': course,
         'certificate': cert,
         'full_name': full_name,
+        'certificate_image_url': _card_url(
+            'learning:certificate_image', [cert.code, 'png'], cards.course_certificate(cert), absolute=False,
+        ),
     })
 
 
@@ -1027,24 +1035,35 @@ def _get_lesson(course_slug, module_slug, lesson_slug, user=None):
     Mutating endpoints (complete, note, bookmark, quiz, Q&A) call this so that an
     authenticated user cannot record progress / certificates against unpublished
     content by POSTing directly to its URLs.
+
+    The slugs are resolved against the catalog snapshot without SQL, and the
+    lesson is loaded by primary key with its module and course. The loaded
+    slugs confirm the (possibly stale) resolution; only a miss or a mismatch
+    falls back to the slug join.
     """
-    course = get_object_or_404(Course, slug=course_slug)
+    lesson = None
+    resolved = get_catalog().resolve(course_slug, module_slug, lesson_slug)
+    if resolved:
+        lesson = Lesson.objects.select_related('module__course').filter(pk=resolved[2].id).first()
+        if lesson is not None and (lesson.slug, lesson.module.slug, lesson.module.course.slug) != (
+            lesson_slug, module_slug, course_slug,
+        ):
+            lesson = None
+    if lesson is None:
+        lesson = get_object_or_404(
+            Lesson.objects.select_related('module__course'),
+            slug=lesson_slug, module__slug=module_slug, module__course__slug=course_slug,
+        )
+    course = lesson.module.course
     if course.status != 'published' and not (user and (user.is_staff or user.is_superuser)):
         raise Http404
-    module = get_object_or_404(Module, slug=module_slug, course=course)
-    return get_object_or_404(Lesson, slug=lesson_slug, module=module)
+    return lesson
 
 
-def _next_lesson(course, module, lesson):
+def _next_lesson(lesson):
     """First lesson after `lesson` within its module, else first lesson of the next module."""
-    siblings = list(module.lessons.order_by('order'))
-    idx = next((i for i, l in enumerate(siblings) if l.id == lesson.id), None)
-    if idx is not None and idx < len(siblings) - 1:
-        return siblings[idx + 1]
-    next_module = course.modules.filter(order__gt=module.order).order_by('order').first()
-    if next_module:
-        return next_module.lessons.order_by('order').first()
-    return None
+    entry = lesson_entry(lesson.id)
+    return entry.catalog.next(entry) if entry is not None else None
 
 
 # ---------------------------------------------------------------------------
@@ -1110,16 +1129,7 @@ def my_learning(request):
     )
     course_by_id = {c.id: c for c in courses}
 
-    progress_qs = LessonProgress.objects.filter(
-        user=request.user, lesson__module__course_id__in=course_ids,
-    ).values('lesson__module__course_id', 'is_completed').annotate(c=Count('id'))
-
-    # per-course completed lesson counts
-    completed_map = {}
-    for row in progress_qs:
-        cid = row['lesson__module__course_id']
-        if row['is_completed']:
-            completed_map[cid] = completed_map.get(cid, 0) + row['c']
+    completed_map = completed_counts(request.user, course_ids)
 
     cards = []
     for e in enrollments:
@@ -1158,53 +1168,33 @@ def my_learning(request):
 # ---------------------------------------------------------------------------
 
 def leaderboard_view(request):
-    from users.models import UserProfile
-    from datetime import timedelta
-
+    """Site-wide boards (?davr=all|month|week) and per-course boards
+    (?kurs=<slug>), read from the materialized tables (learning/leaderboards.py)."""
     period = request.GET.get('davr', 'all')
-    today = _today_uzt()
-
-    base = LessonView.objects.all()
-    if period == 'week':
-        since = today - timedelta(days=7)
-        base = base.filter(viewed_on__gte=since)
-    elif period == 'month':
-        since = today - timedelta(days=30)
-        base = base.filter(viewed_on__gte=since)
-
-    rows = (
-        base.values('user_id')
-        .annotate(views=Count('id'))
-        .order_by('-views')[:50]
-    )
-    user_ids = [r['user_id'] for r in rows]
-    users = {u.id: u for u in User.objects.filter(id__in=user_ids).select_related('telegram_profile')}
-    profiles = {p.user_id: p for p in UserProfile.objects.filter(user_id__in=user_ids)}
-    completed_counts = dict(
-        LessonProgress.objects.filter(user_id__in=user_ids, is_completed=True)
-        .values_list('user_id').annotate(c=Count('id'))
-    )
+    if period not in leaderboards.WINDOWS:
+        period = 'all'
+    course = None
+    board = period
+    if request.GET.get('kurs'):
+        course = get_catalog().course(request.GET['kurs'])
+        if course is None or not course.is_published:
+            raise Http404
+        board = leaderboards.COURSE
 
-    leaders = []
-    rank = 0
-    for r in rows:
-        u = users.get(r['user_id'])
-        if not u:
-            continue
-        rank += 1
-        prof = profiles.get(u.id)
-        leaders.append({
-            'rank': rank,
-            'user': u,
-            'views': r['views'],
-            'completed': completed_counts.get(u.id, 0),
-            'streak': prof.live_streak if prof else 0,
-            'longest_streak': prof.longest_streak if prof else 0,
-        })
+    course_id = course.id if course else None
+    leaders = leaderboards.top(board, course_id)
+    me = None
+    if request.user.is_authenticated:
+        me = next((e for e in leaders if e.user_id == request.user.id), None)
+        if me is None:
+            me = leaderboards.entry_for(request.user, board, course_id)
 
     return render(request, 'learning/leaderboard.html', {
         'leaders': leaders,
         'period': period,
+        'course': course,
+        'me': me,
+        'refreshed_at': leaders[0].refreshed_at if leaders else None,
     })
 
 
@@ -1297,23 +1287,21 @@ def delete_bookmark(request, course_slug, module_slug, lesson_slug, bookmark_id)
 def quiz_detail(request, course_slug, module_slug, lesson_slug, quiz_id):
     lesson = _get_lesson(course_slug, module_slug, lesson_slug, request.user)
     quiz = get_object_or_404(Quiz, id=quiz_id, lesson=lesson)
-    questions_count = quiz.questions.count()
+    questions_count = quiz_keys.question_count(quiz)
     past_attempts = []
-    best_attempt = None
+    best_percentage = None
     attempts_remaining = -1
     if request.user.is_authenticated:
-        user_attempts = QuizAttempt.objects.filter(user=request.user, quiz=quiz).order_by('-started_at')
-        # Only finished attempts consume a slot; an abandoned in-progress attempt is
-        # reused by start_quiz, so counting it here would wrongly shrink the remaining count.
-        finished_attempts = user_attempts.filter(completed_at__isnull=False)
-        used_attempts = finished_attempts.count()
-        # Only show finished attempts in the history — an in-progress attempt would
-        # otherwise render as a blank-dated "failed" row.
-        past_attempts = list(finished_attempts[:10])
-        if past_attempts:
-            best_attempt = max(past_attempts, key=lambda a: a.percentage())
+        # Only finished attempts consume a slot (attempts_used); an abandoned
+        # in-progress attempt is reused by start_quiz. Likewise only finished
+        # attempts show in the history — an in-progress one would otherwise
+        # render as a blank-dated "failed" row.
+        summary = quiz_stats.for_user(request.user, [quiz]).get(quiz.id)
+        past_attempts = quiz_stats.recent_attempts(request.user, [quiz], QUIZ_HISTORY)
+        if summary:
+            best_percentage = summary.best_percentage
         if quiz.max_attempts > 0:
-            attempts_remaining = max(quiz.max_attempts - used_attempts, 0)
+            attempts_remaining = max(quiz.max_attempts - (summary.attempts_used if summary else 0), 0)
     return render(request, 'learning/quiz_detail.html', {
         'course': lesson.module.course,
         'module': lesson.module,
@@ -1321,7 +1309,7 @@ def quiz_detail(request, course_slug, module_slug, lesson_slug, quiz_id):
         'quiz': quiz,
         'questions_count': questions_count,
         'past_attempts': past_attempts,
-        'best_attempt': best_attempt,
+        'best_percentage': best_percentage,
         'attempts_remaining': attempts_remaining,
     })
 
@@ -1344,25 +1332,35 @@ def start_quiz(request, course_slug, module_slug, lesson_slug, quiz_id):
         if quiz.max_attempts > 0 and past_count >= quiz.max_attempts:
             messages.error(request, "Ushbu test uchun maksimal urinishlar soniga yetdingiz.")
             return redirect('learning:quiz_detail', course_slug, module_slug, lesson_slug, quiz_id)
-        QuizAttempt.objects.create(
+        attempt = QuizAttempt.objects.create(
             user=request.user,
             quiz=quiz,
-            max_score=quiz.questions.count(),
+            max_score=quiz_keys.question_count(quiz),
         )
+        quiz_stats.attempt_started(attempt)
     # The quiz is taken inline on the lesson page; the lesson view detects the
     # in-progress attempt and renders the questions where the video would be.
     return redirect('learning:lesson_detail', course_slug, module_slug, lesson_slug)
 
 
-def _finalize_quiz_attempt(attempt, user, lesson):
-    """Score a fully-answered attempt, set pass/fail, and run completion side effects."""
+def _finalize_quiz_attempt(attempt, user, lesson, score=None):
+    """Score a fully-answered attempt, set pass/fail, and run completion side effects.
+
+    `score` is the number of correct answers, when the caller has just graded
+    them; otherwise they are counted.
+    """
     quiz = attempt.quiz
-    attempt.score = attempt.answers.filter(is_correct=True).count()
-    attempt.max_score = quiz.questions.count()
+    if score is None:
+        score = attempt.answers.filter(is_correct=True).count()
+    attempt.score = score
+    attempt.max_score = quiz_keys.answer_key(quiz).total
     attempt.completed_at = timezone.now()
     attempt.passed = (attempt.percentage() >= quiz.pass_percent)
     attempt.save(update_fields=['score', 'max_score', 'completed_at', 'passed'])
+    quiz_stats.attempt_finished(attempt)
     if attempt.passed:
+        if not LessonProgress.objects.filter(user=user, lesson=lesson, is_completed=True).exists():
+            activity.record(user.id, _today_uzt(), completed=1)
         LessonProgress.objects.update_or_create(
             user=user, lesson=lesson, defaults={'is_completed': True},
         )
@@ -1370,6 +1368,36 @@ def _finalize_quiz_attempt(attempt, user, lesson):
         _maybe_issue_certificate(user, lesson.module.course)
 
 
+def _quiz_selection(question, data):
+    """(selected_choice_id, selected choice ids) from an answer body for a
+    compiled question, or None if the body names choices it doesn't have.
+    multi_select answers carry ``choice_ids`` and leave selected_choice_id
+    None; the other types carry at most one ``choice_id``."""
+    if question.type == 'multi_select':
+        try:
+            selected_ids = {int(x) for x in data['choice_ids']}
+        except (KeyError, ValueError, TypeError):
+            return None
+        selected_choice_id = None
+    else:
+        selected_choice_id = data.get('choice_id')
+        selected_ids = set()
+        if selected_choice_id is not None:
+            try:
+                selected_choice_id = int(selected_choice_id)
+            except (ValueError, TypeError):
+                return None
+            selected_ids = {selected_choice_id}
+    if not selected_ids <= question.choice_ids:
+        return None
+    return selected_choice_id, selected_ids
+
+
+def _multi_ids(question, selected_ids):
+    """QuizAnswer.selected_choice_ids for a graded selection."""
+    return sorted(selected_ids) if question.type == 'multi_select' else []
+
+
 @login_required
 @transaction.atomic
 def check_quiz_answer(request, course_slug, module_slug, lesson_slug, quiz_id, attempt_id):
@@ -1388,47 +1416,29 @@ def check_quiz_answer(request, course_slug, module_slug, lesson_slug, quiz_id, a
         data = json.loads(request.body)
     except (json.JSONDecodeError, ValueError):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    # Grading runs against the compiled answer key; the only write is the
+    # answer upsert.
+    key = quiz_keys.answer_key(quiz)
     try:
-        question = quiz.questions.get(id=int(data.get('question_id')))
-    except (QuizQuestion.DoesNotExist, ValueError, TypeError):
+        question = key.questions[int(data.get('question_id'))]
+    except (KeyError, ValueError, TypeError):
         return JsonResponse({'error': 'Invalid question'}, status=400)
 
-    correct_ids = set(question.choices.filter(is_correct=True).values_list('id', flat=True))
-    selected_choice = None
-    selected_objs = []
-    is_correct = False
-
-    if question.question_type == 'multi_select':
-        raw = data.get('choice_ids')
-        if raw is None:
-            return JsonResponse({'error': 'Invalid choice'}, status=400)
-        try:
-            sel_ids = {int(x) for x in raw}
-        except (ValueError, TypeError):
-            return JsonResponse({'error': 'Invalid choice'}, status=400)
-        selected_objs = list(question.choices.filter(id__in=sel_ids))
-        if len(selected_objs) != len(sel_ids):
-            return JsonResponse({'error': 'Invalid choice'}, status=400)
-        # Correct only if the selected set EXACTLY matches the correct set.
-        is_correct = bool(sel_ids) and sel_ids == correct_ids
-    else:
-        choice_id = data.get('choice_id')
-        if choice_id is not None:
-            try:
-                selected_choice = question.choices.get(id=int(choice_id))
-                is_correct = selected_choice.is_correct
-            except (QuizChoice.DoesNotExist, ValueError, TypeError):
-                return JsonResponse({'error': 'Invalid choice'}, status=400)
-
-    answer, _ = QuizAnswer.objects.update_or_create(
-        attempt=attempt,
-        question=question,
-        defaults={'selected_choice': selected_choice, 'is_correct': is_correct},
+    selection = _quiz_selection(question, data)
+    if selection is None:
+        return JsonResponse({'error': 'Invalid choice'}, status=400)
+    selected_choice_id, selected_ids = selection
+    is_correct = question.grade(selected_ids)
+
+    QuizAnswer.objects.bulk_create(
+        [QuizAnswer(attempt=attempt, question_id=question.id, selected_choice_id=selected_choice_id,
+                    selected_choice_ids=_multi_ids(question, selected_ids), is_correct=is_correct)],
+        update_conflicts=True,
+        unique_fields=['attempt', 'question'],
+        update_fields=['selected_choice', 'selected_choice_ids', 'is_correct'],
     )
-    answer.selected_choices.set(selected_objs)  # empty for single/true_false
 
-    correct_choice = question.choices.filter(is_correct=True).first()
-    total = quiz.questions.count()
+    total = key.total
     answered = attempt.answers.count()
     finished = answered >= total
     result = None
@@ -1443,8 +1453,8 @@ def check_quiz_answer(request, course_slug, module_slug, lesson_slug, quiz_id, a
 
     return JsonResponse({
         'is_correct': is_correct,
-        'correct_choice_id': correct_choice.id if correct_choice else None,
-        'correct_choice_ids': sorted(correct_ids),
+        'correct_choice_id': question.correct_ids[0] if question.correct_ids else None,
+        'correct_choice_ids': sorted(question.correct),
         'explanation': question.explanation,
         'answered': answered,
         'total': total,
@@ -1454,22 +1464,88 @@ def check_quiz_answer(request, course_slug, module_slug, lesson_slug, quiz_id, a
     })
 
 
+@login_required
+@transaction.atomic
+def submit_quiz(request, course_slug, module_slug, lesson_slug, quiz_id, attempt_id):
+    """Grade a whole answer sheet and finalize the attempt in one request.
+
+    The body is ``{"answers": [...]}``, each entry shaped like a
+    check_quiz_answer body. The sheet replaces whatever the attempt had
+    recorded; questions it leaves out are saved unanswered and score nothing.
+    The answers, the score and the completion side effects (progress, streak,
+    certificate) commit together. The lesson page keeps grading question by
+    question through check_quiz_answer.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    lesson = _get_lesson(course_slug, module_slug, lesson_slug, request.user)
+    quiz = get_object_or_404(Quiz, id=quiz_id, lesson=lesson)
+    # Locked so a double submit can't finalize the attempt twice.
+    attempt = get_object_or_404(
+        QuizAttempt.objects.select_for_update(), id=attempt_id, user=request.user, quiz=quiz,
+    )
+    if attempt.completed_at:
+        return JsonResponse({'error': 'Attempt already completed'}, status=400)
+    try:
+        entries = json.loads(request.body).get('answers')
+    except (json.JSONDecodeError, ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(entries, list):
+        return JsonResponse({'error': 'Invalid answers'}, status=400)
+
+    key = quiz_keys.answer_key(quiz)
+    sheet = {}
+    for entry in entries:
+        try:
+            question = key.questions[int(entry.get('question_id'))]
+        except (KeyError, ValueError, TypeError, AttributeError):
+            return JsonResponse({'error': 'Invalid question'}, status=400)
+        if question.id in sheet:
+            return JsonResponse({'error': 'Duplicate question'}, status=400)
+        selection = _quiz_selection(question, entry)
+        if selection is None:
+            return JsonResponse({'error': 'Invalid choice'}, status=400)
+        sheet[question.id] = selection
+
+    answers, results = [], []
+    for question in key.questions.values():
+        selected_choice_id, selected_ids = sheet.get(question.id, (None, set()))
+        is_correct = question.grade(selected_ids)
+        answers.append(QuizAnswer(attempt=attempt, question_id=question.id, selected_choice_id=selected_choice_id,
+                                  selected_choice_ids=_multi_ids(question, selected_ids), is_correct=is_correct))
+        results.append({
+            'question_id': question.id,
+            'is_correct': is_correct,
+            'correct_choice_ids': sorted(question.correct),
+            'explanation': question.explanation,
+        })
+
+    attempt.answers.all().delete()
+    QuizAnswer.objects.bulk_create(answers)
+    _finalize_quiz_attempt(attempt, request.user, lesson,
+                           score=sum(answer.is_correct for answer in answers))
+
+    return JsonResponse({
+        'score': float(attempt.score),
+        'max_score': attempt.max_score,
+        'percentage': attempt.percentage(),
+        'passed': attempt.passed,
+        'results': results,
+        'redirect_url': reverse('learning:quiz_result', args=[course_slug, module_slug, lesson_slug, quiz_id, attempt_id]),
+    })
+
+
 @login_required
 def quiz_result(request, course_slug, module_slug, lesson_slug, quiz_id, attempt_id):
     lesson = _get_lesson(course_slug, module_slug, lesson_slug, request.user)
     quiz = get_object_or_404(Quiz, id=quiz_id, lesson=lesson)
     attempt = get_object_or_404(QuizAttempt, id=attempt_id, user=request.user, quiz=quiz)
+    # The template highlights "your answer" from QuizAnswer.selected_ids, which
+    # covers single- and multi-select answers alike.
     answers_detail = list(
         attempt.answers.select_related('question', 'selected_choice')
-        .prefetch_related('selected_choices', 'question__choices')
+        .prefetch_related('question__choices')
     )
-    # Unify single- and multi-select into one set of picked choice ids per answer
-    # so the template can highlight "your answer" uniformly.
-    for a in answers_detail:
-        ids = {c.id for c in a.selected_choices.all()}
-        if a.selected_choice_id:
-            ids.add(a.selected_choice_id)
-        a.selected_ids = ids
     course = lesson.module.course
     return render(request, 'learning/quiz_result.html', {
         'course': course,
@@ -1478,7 +1554,7 @@ def quiz_result(request, course_slug, module_slug, lesson_slug, quiz_id, attempt
         'quiz': quiz,
         'attempt': attempt,
         'answers_detail': answers_detail,
-        'next_lesson': _next_lesson(course, lesson.module, lesson),
+        'next_lesson': _next_lesson(lesson),
     })
 
 
@@ -1508,6 +1584,7 @@ class LearningPathListView(View):
         })
 
 
+@method_decorator(conditional.page(conditional.learning_path_page), name='get')
 class LearningPathDetailView(View):
     template_name = 'learning/learning_path_detail.html'
 
@@ -1527,23 +1604,18 @@ class LearningPathDetailView(View):
                 user=request.user, path=path_obj
             ).exists()
 
-        path_courses = list(path_obj.path_courses.select_related('course').order_by('order'))
+        path_courses = list(
+            path_obj.path_courses.select_related('course__stats').order_by('order')
+        )
         course_ids = [pc.course_id for pc in path_courses]
 
-        lesson_counts = dict(
-            Lesson.objects.filter(module__course_id__in=course_ids)
-            .values_list('module__course_id')
-            .annotate(c=Count('id'))
-        )
+        lesson_counts = {
+            pc.course_id: pc.course.stats.lesson_count
+            for pc in path_courses if hasattr(pc.course, 'stats')
+        }
         done_counts = {}
         if request.user.is_authenticated:
-            done_counts = dict(
-                LessonProgress.objects.filter(
-                    user=request.user,
-                    lesson__module__course_id__in=course_ids,
-                    is_completed=True,
-                ).values_list('lesson__module__course_id').annotate(c=Count('id'))
-            )
+            done_counts = completed_counts(request.user, course_ids)
 
         for pc in path_courses:
             course = pc.course
@@ -1577,7 +1649,10 @@ class LearningPathDetailView(View):
             'overall_percent': int(completed_courses / total_courses * 100) if total_courses else 0,
             'meta_description': _meta_desc(path_obj.description, path_obj.title),
             'og_title': f'{path_obj.title} — Ochiq Kurs',
-            'og_image': absolute_url(path_obj.thumbnail.url) if path_obj.thumbnail else None,
+            'og_image': (
+                absolute_url(path_obj.thumbnail.url) if path_obj.thumbnail
+                else _card_url('learning:path_card', [path_obj.slug, 'png'], cards.path_card(path_obj))
+            ),
         }
         return render(request, self.template_name, ctx)
 
@@ -1598,14 +1673,9 @@ def _path_is_complete(user, path_obj):
     if not course_ids:
         return False
     lesson_counts = dict(
-        Lesson.objects.filter(module__course_id__in=course_ids)
-        .values_list('module__course_id').annotate(c=Count('id'))
-    )
-    done_counts = dict(
-        LessonProgress.objects.filter(
-            user=user, lesson__module__course_id__in=course_ids, is_completed=True,
-        ).values_list('lesson__module__course_id').annotate(c=Count('id'))
+        CourseStats.objects.filter(course_id__in=course_ids).values_list('course_id', 'lesson_count')
     )
+    done_counts = completed_counts(user, course_ids)
     for cid in course_ids:
         total = lesson_counts.get(cid, 0)
         if total == 0 or done_counts.get(cid, 0) < total:
@@ -1623,10 +1693,14 @@ def learning_path_certificate(request, path_slug):
         messages.warning(request, "Sertifikat olish uchun yo'nalishdagi barcha kurslarni tugating.")
         return redirect('learning:learning_path_detail', path_slug=path_slug)
     full_name = (request.user.first_name + ' ' + request.user.last_name).strip() or request.user.username
+    cert.user, cert.path = request.user, path_obj
     return render(request, 'learning/path_certificate.html', {
         'path_obj': path_obj,
         'certificate': cert,
         'full_name': full_name,
+        'certificate_image_url': _card_url(
+            'learning:certificate_image', [cert.code, 'png'], cards.path_certificate(cert), absolute=False,
+        ),
     })
 
 
@@ -1634,20 +1708,109 @@ def learning_path_certificate(request, path_slug):
 # Public Certificate Verification
 # ---------------------------------------------------------------------------
 
+@conditional.page(conditional.certificate_page)
 def public_certificate_verify(request, code):
-    cert = get_object_or_404(Certificate, code=code)
+    cert = get_object_or_404(Certificate.objects.select_related('user', 'course'), code=code)
     full_name = (cert.user.first_name + ' ' + cert.user.last_name).strip() or cert.user.username
+    image_url = _card_url('learning:certificate_image', [cert.code, 'png'], cards.course_certificate(cert))
     return render(request, 'learning/public_certificate.html', {
         'course': cert.course,
         'certificate': cert,
         'full_name': full_name,
+        'certificate_image_url': image_url,
+        'og_title': f'{full_name} — {cert.course.title} sertifikati',
+        'og_image': image_url,
     })
 
 
+# ---------------------------------------------------------------------------
+# Rendered images (learning/cards.py)
+#   GET /malaka/sertifikat/tekshirish/<code>/rasm.<png|webp>
+#   GET /malaka/<course_slug>/og.<png|webp>
+#   GET /malaka/yonalish/<path_slug>/og.<png|webp>
+# ---------------------------------------------------------------------------
+
+def _card_url(viewname, args, card, absolute=True):
+    """URL of a rendered card, versioned with its digest so it can be cached
+    for good. Computing it never draws anything."""
+    url = f'{reverse(viewname, args=args)}?v={card.digest}'
+    return absolute_url(url) if absolute else url
+
+
+def _course_og_image(course):
+    if course.thumbnail:
+        return absolute_url(course.thumbnail.url)
+    return _card_url('learning:course_card', [course.slug, 'png'], cards.course_card(course))
+
+
+def _card_response(request, card, fmt):
+    """Serve the card's file (drawing it on first use), with its digest as
+    the ETag."""
+    if fmt not in cards.FORMATS:
+        raise Http404
+    etag = f'"{card.digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(open(cards.ensure(card, fmt), 'rb'), content_type=cards.FORMATS[fmt][1])
+    response['ETag'] = etag
+    if request.GET.get('v') == card.digest:
+        patch_cache_control(response, public=True, max_age=cards.IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=cards.MAX_AGE)
+    return response
+
+
+def certificate_image(request, code, fmt):
+    # Codes are public (they are the verification links), course and path
+    # certificates alike.
+    cert = Certificate.objects.select_related('user', 'course').filter(code=code).first()
+    if cert is not None:
+        return _card_response(request, cards.course_certificate(cert), fmt)
+    cert = get_object_or_404(LearningPathCertificate.objects.select_related('user', 'path'), code=code)
+    return _card_response(request, cards.path_certificate(cert), fmt)
+
+
+def course_card(request, course_slug, fmt):
+    course = get_object_or_404(Course, slug=course_slug, status='published')
+    return _card_response(request, cards.course_card(course), fmt)
+
+
+def path_card(request, path_slug, fmt):
+    path_obj = get_object_or_404(LearningPath, slug=path_slug)
+    return _card_response(request, cards.path_card(path_obj), fmt)
+
+
+# ---------------------------------------------------------------------------
+# Sitemaps (learning/sitemaps.py)
+#   GET /sitemap.xml
+#   GET /sitemap-<section>-<page>.xml
+# ---------------------------------------------------------------------------
+
+def sitemap_file(request, section=None, page=None):
+    """Serve a pre-generated sitemap file, dated by its mtime; crawlers that
+    revalidate get a 304 without the file being read."""
+    name = sitemaps.INDEX if section is None else sitemaps.page_name(section, page)
+    path = sitemaps.ensure() / name
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise Http404
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type='application/xml')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=sitemaps.MAX_AGE)
+    return response
+
+
 # ---------------------------------------------------------------------------
 # Instructor Profile
 # ---------------------------------------------------------------------------
 
+@method_decorator(conditional.page(conditional.instructor_page), name='get')
 class InstructorDetailView(View):
     template_name = 'learning/instructor_detail.html'
 
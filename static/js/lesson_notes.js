@@ -19,8 +19,23 @@
   var noteStatus = document.getElementById('note-status');
   if (btnNote) {
     var config = JSON.parse(document.getElementById('lesson-config').textContent);
+    var noteInput = document.getElementById('note-content');
+    var dirty = false;
+
+    // Unsaved edits still reach the server when the page is left: the
+    // lesson tracker collects them into its closing beacon.
+    noteInput.addEventListener('input', function () { dirty = true; });
+    if (window.__lessonEvents) {
+      window.__lessonEvents.collect(function () {
+        if (!dirty) return null;
+        dirty = false;
+        return { type: 'note', content: noteInput.value };
+      });
+    }
+
     btnNote.addEventListener('click', function () {
-      var content = document.getElementById('note-content').value;
+      var content = noteInput.value;
+      dirty = false;
       btnNote.disabled = true;
       fetch(btnNote.dataset.url, {
         method: 'POST',
@@ -57,6 +72,7 @@
         }
       })
       .catch(function () {
+        dirty = true;
         btnNote.disabled = false;
         noteStatus.textContent = 'Xatolik! Qaytadan urinib ko\'ring';
         noteStatus.className = 'note-status note-status-error';
@@ -5,8 +5,8 @@
   var IS_AUTH      = cfg.is_authenticated;
   var IS_ARTICLE   = cfg.is_article;
   var VIDEO_ID     = cfg.video_id;
-  var URL_RECORD   = cfg.url_record;
-  var URL_COMPLETE = cfg.url_complete;
+  var LESSON_ID    = cfg.lesson_id;
+  var URL_EVENTS   = cfg.url_events;
   var CSRF         = cfg.csrf_token;
 
   // Fraction of the video that counts as "watched" → auto-complete.
@@ -19,34 +19,86 @@
 
   var completeBtn = document.getElementById('btn-complete');
 
+  // ── Event queue: views/completions (and unsaved notes, via collectors)
+  // are batched into one POST — sendBeacon when the page is hidden or
+  // closed, fetch when the UI is waiting on the answer. ──
+  var queue = [];
+  var collectors = [];
+  var seq = 0;
+
+  function push(event) {
+    event.lesson = LESSON_ID;
+    event.id = LESSON_ID + ':' + Date.now() + ':' + (seq++);
+    queue.push(event);
+  }
+
+  function drain() {
+    collectors.forEach(function (fn) {
+      var event = fn();
+      if (event) push(event);
+    });
+    var batch = queue;
+    queue = [];
+    return batch;
+  }
+
+  // Page going away: fire-and-forget.
+  function beacon() {
+    var batch = drain();
+    if (!batch.length) return;
+    var form = new FormData();
+    form.append('csrfmiddlewaretoken', CSRF);
+    form.append('events', JSON.stringify(batch));
+    if (!(navigator.sendBeacon && navigator.sendBeacon(URL_EVENTS, form))) {
+      fetch(URL_EVENTS, { method: 'POST', body: form, keepalive: true, credentials: 'same-origin' });
+    }
+  }
+
+  // Page staying: resolve with the server's summary; failed events are requeued.
+  function flush() {
+    var batch = drain();
+    return fetch(URL_EVENTS, {
+      method: 'POST',
+      headers: { 'X-CSRFToken': CSRF, 'Content-Type': 'application/json' },
+      credentials: 'same-origin',
+      body: JSON.stringify({ events: batch }),
+    })
+      .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+      .catch(function (err) { queue = batch.concat(queue); throw err; });
+  }
+
+  if (IS_AUTH) {
+    window.__lessonEvents = { push: push, flush: flush, collect: function (fn) { collectors.push(fn); } };
+    document.addEventListener('visibilitychange', function () {
+      if (document.visibilityState === 'hidden') beacon();
+    });
+    window.addEventListener('pagehide', beacon);
+  }
+
   // ── A view: enroll + streak + activity. NOT completion. ──
   function recordView() {
     if (recorded || !IS_AUTH) return;
     recorded = true;
-    fetch(URL_RECORD, {
-      method: 'POST',
-      headers: { 'X-CSRFToken': CSRF, 'Content-Type': 'application/json' },
-      body: '{}',
-      keepalive: true,
-    }).catch(function () { recorded = false; });
+    push({ type: 'view' });
   }
 
   // ── Completion: video watched to ~90%/end, or the manual button. ──
-  // `reload` is true only for the explicit button click; the auto-complete
-  // updates the button in place so it never interrupts playback.
+  // The button (`reload`) sends right away and reloads on success; the
+  // auto-complete updates the button in place and rides along with the next
+  // beacon, so it never interrupts playback.
   function markComplete(reload) {
     if (completed || !IS_AUTH) return;
     completed = true;
+    push({ type: 'complete' });
+    if (!reload) {
+      markButtonDone();
+      return;
+    }
     if (completeBtn) completeBtn.disabled = true;
-    fetch(URL_COMPLETE, {
-      method: 'POST',
-      headers: { 'X-CSRFToken': CSRF },
-    })
-      .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+    flush()
       .then(function (data) {
-        if (data && data.is_completed) {
-          if (reload) window.location.reload();
-          else markButtonDone();
+        if (data && data.completed && data.completed.indexOf(LESSON_ID) !== -1) {
+          window.location.reload();
         } else {
           completed = false;
           if (completeBtn) completeBtn.disabled = false;
@@ -54,6 +106,7 @@
       })
       .catch(function () {
         completed = false;
+        queue = queue.filter(function (e) { return e.type !== 'complete'; });
         if (completeBtn) completeBtn.disabled = false;
       });
   }
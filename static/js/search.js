@@ -5,7 +5,7 @@
   var box = document.getElementById('nav-search-suggest');
   if (!input || !box) return;
 
-  var url = input.dataset.suggestUrl || '/malaka/qidiruv/';
+  var url = input.dataset.suggestUrl || '/malaka/qidiruv/taklif/';
   var timer = null;
   var lastQuery = '';
   var lastFetch = null;
@@ -62,7 +62,7 @@
     if (lastFetch && lastFetch.abort) try { lastFetch.abort(); } catch (e) {}
     var ctrl = new AbortController();
     lastFetch = ctrl;
-    fetch(url + '?q=' + encodeURIComponent(q) + '&format=json', { signal: ctrl.signal })
+    fetch(url + '?q=' + encodeURIComponent(q), { signal: ctrl.signal })
       .then(function (r) { return r.json(); })
       .then(function (data) {
         if (q !== input.value.trim()) return;
@@ -0,0 +1,165 @@
+"""Push Telegram login confirmations to browsers waiting on the login page.
+
+The login page used to poll CheckTokenView every 2 s — a rate-limit check and
+a TelegramAuthToken lookup per poll, for an event that happens once per login.
+With LOGIN_PUSH on (ASGI deployments), the page long-polls WaitTokenView
+instead, which parks on this module's `hub` until the token is confirmed.
+
+Delivery:
+
+* TelegramConfirmView calls `notify_confirmed(token)` inside its transaction.
+  That issues `pg_notify`, which Postgres delivers on commit to the LISTEN
+  connection of every worker process (one per process, started lazily on the
+  worker's event loop), and wakes waiters in the confirming process itself on
+  commit.
+* The hub remembers recently confirmed tokens. A pending reply carries a
+  `cursor` (server time); when the browser reconnects with it and this
+  worker's listener has been up since before then, the hub alone can say
+  whether the token was confirmed in between, so the reconnect skips the
+  database. Queries then scale with logins, not with open login pages.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'login_confirmed'
+# Must outlive a token (10 minutes) so a cursor is never vouched for after
+# the confirmation it should have seen was pruned.
+RECENT_TTL = 15 * 60
+# Tolerance for clock differences between the worker that issued a cursor
+# and the one the browser reconnects to.
+CLOCK_SKEW = 5
+# How often an idle listener connection is checked for liveness.
+PING_INTERVAL = 60
+
+
+def notify_confirmed(token):
+    """Announce that `token` was confirmed. Call inside the confirming
+    transaction — nothing is delivered unless it commits."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, token])
+    transaction.on_commit(lambda: hub.confirmed(token))
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class Hub:
+    """Per-process registry of waiting requests and recent confirmations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = {}  # token -> [(loop, future)]
+        self._recent = {}  # token -> confirmed at (time.time())
+        self._listener = None  # (loop, task)
+        self.listening_since = None
+
+    def confirmed(self, token):
+        """Record a confirmation and wake its waiters. Safe from any thread."""
+        now = time.time()
+        with self._lock:
+            self._recent[token] = now
+            if len(self._recent) > 1000:
+                self._recent = {t: at for t, at in self._recent.items() if now - at < RECENT_TTL}
+            waiters = self._waiters.pop(token, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def seen(self, token, cursor):
+        """Whether `token` was confirmed since `cursor`, or None when this
+        process can't vouch for the whole interval (listener down meanwhile,
+        or cursor older than the recent-confirmation memory)."""
+        since = self.listening_since
+        if since is None or cursor - CLOCK_SKEW < since or time.time() - cursor > RECENT_TTL:
+            return None
+        with self._lock:
+            return token in self._recent
+
+    async def wait(self, token, timeout):
+        """Wait up to `timeout` seconds for `token`; True if it was confirmed."""
+        loop = asyncio.get_running_loop()
+        self._ensure_listener(loop)
+        future = loop.create_future()
+        entry = (loop, future)
+        with self._lock:
+            if token in self._recent:
+                return True
+            self._waiters.setdefault(token, []).append(entry)
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiting = self._waiters.get(token)
+                if waiting and entry in waiting:
+                    waiting.remove(entry)
+                    if not waiting:
+                        del self._waiters[token]
+
+    def _ensure_listener(self, loop):
+        if not settings.LOGIN_PUSH or connections['default'].vendor != 'postgresql':
+            return
+        if self._listener and self._listener[0] is loop and not self._listener[1].done():
+            return
+        self._listener = (loop, loop.create_task(self._listen()))
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            conn = None
+            try:
+                conn = await loop.run_in_executor(None, _connect)
+                conn.cursor().execute(f'LISTEN {CHANNEL}')
+                self.listening_since = time.time()
+                await self._drain(loop, conn)
+            except Exception:
+                logger.warning('Login push listener disconnected', exc_info=True)
+            finally:
+                self.listening_since = None
+                if conn is not None:
+                    conn.close()
+            await asyncio.sleep(1)
+
+    async def _drain(self, loop, conn):
+        lost = loop.create_future()
+
+        def on_readable():
+            try:
+                conn.poll()
+            except Exception as exc:
+                if not lost.done():
+                    lost.set_exception(exc)
+                return
+            while conn.notifies:
+                self.confirmed(conn.notifies.pop(0).payload)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(lost), PING_INTERVAL)
+                except TimeoutError:
+                    conn.cursor().execute('SELECT 1')  # raises if the server is gone
+        finally:
+            loop.remove_reader(conn.fileno())
+
+
+def _connect():
+    db = connections['default']
+    conn = db.get_new_connection(db.get_connection_params())
+    conn.autocommit = True
+    return conn
+
+
+hub = Hub()
@@ -0,0 +1,246 @@
+"""Pluggable rate limiting.
+
+A limiter is an *algorithm* (how a key's state advances on each hit) paired
+with a *backend* (where that state lives and how a read-modify-write of it is
+made atomic). Both are chosen by ``settings.RATE_LIMIT``::
+
+    RATE_LIMIT = {
+        'BACKEND': 'users.ratelimit.SharedMemoryBackend',
+        'ALGORITHM': 'sliding_window',          # or 'token_bucket'
+        'OPTIONS': {'path': '/srv/app/var/ratelimit.bin'},
+    }
+
+Backends:
+
+* ``SharedMemoryBackend`` — a fixed-size hash table in an mmap'd file, guarded
+  by per-bucket ``fcntl`` record locks, so every Gunicorn worker on the host
+  shares one set of counters without touching the database (the previous
+  implementation cost 2–3 ``cache_table`` round-trips per check).
+* ``CacheBackend`` — the networked interface: state kept in a Django cache
+  (Redis/Memcached) for multi-host deployments. Django's cache API has no
+  compare-and-set, so concurrent hits on one key may under-count slightly.
+* ``MemoryBackend`` — per-process dict; for tests and ``runserver``.
+
+Algorithms keep three floats of state per key:
+
+* sliding window — counts for the current and previous fixed windows, with the
+  previous one weighted by how much of it still overlaps the trailing window
+  (smooths the burst a fixed window allows at its boundary);
+* token bucket — ``limit`` tokens refilled continuously over ``window``
+  seconds, so short bursts pass and the sustained rate is capped.
+
+Only allowed hits are counted.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+# ── Algorithms ───────────────────────────────────────────────────────────────
+# step(state, now, limit, window) -> (new_state, allowed, ttl). `state` is
+# None for a key seen for the first time (or whose state expired).
+
+def sliding_window(state, now, limit, window):
+    start = now - now % window
+    if state is None:
+        cur_start, cur, prev = start, 0.0, 0.0
+    else:
+        cur_start, cur, prev = state
+        if start != cur_start:
+            # Rolled into a new window: the old current becomes previous only
+            # if it was the immediately preceding window.
+            prev = cur if start - cur_start == window else 0.0
+            cur_start, cur = start, 0.0
+    overlap = 1.0 - (now - cur_start) / window
+    allowed = prev * overlap + cur + 1 <= limit
+    if allowed:
+        cur += 1
+    return (cur_start, cur, prev), allowed, 2 * window
+
+
+def token_bucket(state, now, limit, window):
+    rate = limit / window
+    if state is None:
+        tokens, last = float(limit), now
+    else:
+        tokens, last, _ = state
+        tokens = min(float(limit), tokens + (now - last) * rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    return (tokens, now, 0.0), allowed, window
+
+
+ALGORITHMS = {
+    'sliding_window': sliding_window,
+    'token_bucket': token_bucket,
+}
+
+
+# ── Backends ─────────────────────────────────────────────────────────────────
+# update(key, fn) runs fn(state, now) -> (new_state, result, ttl) atomically
+# for the key and returns `result`.
+
+class MemoryBackend:
+    """Per-process state. Not shared between workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def update(self, key, fn):
+        now = time.time()
+        with self._lock:
+            state, expires = self._data.get(key, (None, 0.0))
+            if expires <= now:
+                state = None
+            new_state, result, ttl = fn(state, now)
+            self._data[key] = (new_state, now + ttl)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheBackend:
+    """State in a Django cache — use a networked one (Redis, Memcached) to
+    share limits across hosts. Read-then-write, so not strictly atomic."""
+
+    def __init__(self, alias='default', key_prefix='rl2:'):
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    def update(self, key, fn):
+        from django.core.cache import caches
+        cache = caches[self.alias]
+        cache_key = self.key_prefix + key
+        now = time.time()
+        new_state, result, ttl = fn(cache.get(cache_key), now)
+        cache.set(cache_key, new_state, int(ttl) + 1)
+        return result
+
+
+class SharedMemoryBackend:
+    """Hash table of fixed 40-byte slots in an mmap'd file.
+
+    Slots are grouped in buckets of BUCKET_SLOTS; a key hashes to a bucket and
+    takes a matching, free or expired slot in it (evicting the soonest-to-
+    expire one when full). Each bucket is guarded by an fcntl record lock on
+    its byte range — shared across processes — plus a thread lock, since
+    POSIX record locks don't exclude threads of the same process.
+    """
+
+    MAGIC = b'OKRL\x01\x00\x00\x00'
+    HEADER = struct.Struct('<8sI4x')
+    SLOT = struct.Struct('<Q4d')  # key hash, 3 state floats, expires-at
+    BUCKET_SLOTS = 8
+
+    def __init__(self, path, slots=65536):
+        self.path = Path(path)
+        self.buckets = max(1, slots // self.BUCKET_SLOTS)
+        self._pid = None
+        self._thread_lock = threading.Lock()
+
+    def _open(self):
+        # (Re)opened per process: record locks and mappings must not be
+        # shared with a parent that forked us (gunicorn --preload).
+        if self._pid == os.getpid():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = self.HEADER.size + self.buckets * self.BUCKET_SLOTS * self.SLOT.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX, self.HEADER.size, 0)
+        try:
+            if os.fstat(fd).st_size != size or os.pread(fd, 8, 0) != self.MAGIC:
+                # New file, or one laid out for a different slot count.
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, self.HEADER.pack(self.MAGIC, self.buckets), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, self.HEADER.size, 0)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1  # 0 marks an empty slot
+
+    def update(self, key, fn):
+        self._open()
+        h = self._hash(key)
+        bucket_size = self.BUCKET_SLOTS * self.SLOT.size
+        start = self.HEADER.size + (h % self.buckets) * bucket_size
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, bucket_size, start)
+            try:
+                now = time.time()
+                target = victim = None
+                victim_expires = float('inf')
+                for i in range(self.BUCKET_SLOTS):
+                    offset = start + i * self.SLOT.size
+                    slot_hash, s0, s1, s2, expires = self.SLOT.unpack_from(self._map, offset)
+                    if slot_hash == h:
+                        target = offset
+                        state = (s0, s1, s2) if expires > now else None
+                        break
+                    if expires < victim_expires:
+                        victim, victim_expires = offset, expires
+                if target is None:
+                    target, state = victim, None
+                new_state, result, ttl = fn(state, now)
+                self.SLOT.pack_into(self._map, target, h, *new_state, now + ttl)
+                return result
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, bucket_size, start)
+
+
+# ── Limiter ──────────────────────────────────────────────────────────────────
+
+class RateLimiter:
+    def __init__(self, backend, algorithm='sliding_window'):
+        self.backend = backend
+        self.step = ALGORITHMS[algorithm]
+
+    def hit(self, key, limit, window):
+        """Record a hit on `key`; True if it is within `limit` per `window` s."""
+        return self.backend.update(key, lambda state, now: self.step(state, now, limit, window))
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        conf = getattr(settings, 'RATE_LIMIT', {})
+        backend_cls = import_string(conf.get('BACKEND', 'users.ratelimit.MemoryBackend'))
+        _limiter = RateLimiter(
+            backend_cls(**conf.get('OPTIONS', {})),
+            conf.get('ALGORITHM', 'sliding_window'),
+        )
+    return _limiter
+
+
+@receiver(setting_changed)
+def _reset_limiter(setting, **kwargs):
+    global _limiter
+    if setting == 'RATE_LIMIT':
+        _limiter = None
+
+
+def is_limited(key, limit, window):
+    """True when `key` has used up its `limit` hits for the trailing `window`."""
+    return not get_limiter().hit(key, limit, window)
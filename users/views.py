@@ -3,7 +3,9 @@ import hmac
 import json
 import random
 import re
+import time
 import requests as http_requests
+from asgiref.sync import sync_to_async
 from datetime import timedelta
 from django.conf import settings
 from django.core.files.base import ContentFile
@@ -12,9 +14,8 @@ from django.contrib.auth import login, update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm, SetPasswordForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Sum
 from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
@@ -26,14 +27,18 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
 from learning.models import (
-    Course, Module, Lesson, LessonProgress, LessonView,
+    Course, Module, Lesson, LessonProgress,
     Enrollment, Certificate,
 )
+from learning.activity import lessons_per_day
 from learning.forms import CourseForm, ModuleForm, LessonForm
+from learning.progress import course_progress, percent
+from . import login_push
 from .forms import (
     UserProfileForm, SetUsernamePasswordForm, UsernamePasswordLoginForm,
 )
 from .models import TelegramAuthToken, TelegramContact, TelegramProfile, UserProfile
+from .ratelimit import is_limited
 
 
 def _client_ip(request):
@@ -59,16 +64,8 @@ def _client_ip(request):
 
 
 def _check_rate_limit(ip, max_requests=60, window=60, prefix='check'):
-    """Fixed-window rate limiter using Django cache. Returns True if limit exceeded."""
-    key = f'rl:{prefix}:{ip}'
-    cache.add(key, 0, window)
-    try:
-        count = cache.incr(key)
-    except ValueError:
-        # Key expired between add and incr; treat as a fresh window.
-        cache.set(key, 1, window)
-        count = 1
-    return count > max_requests
+    """Returns True if `ip` exceeded `max_requests` per `window` seconds for `prefix`."""
+    return is_limited(f'rl:{prefix}:{ip}', max_requests, window)
 
 
 def _safe_next(request):
@@ -270,6 +267,7 @@ class TelegramLoginView(View):
         return {
             'bot_url': bot_url,
             'token': auth_token.token,
+            'login_push': settings.LOGIN_PUSH,
             'bot_username': bot_username,
             'code_error': code_error,
             'code_value': code_value,
@@ -328,6 +326,7 @@ class TelegramConfirmView(View):
             auth_token.is_new_user = is_new_user
             auth_token.confirmed_at = timezone.now()
             auth_token.save()
+            login_push.notify_confirmed(auth_token.token)
 
         return JsonResponse({'status': 'ok'})
 
@@ -471,45 +470,84 @@ class MarkBlockedView(View):
         return JsonResponse({'blocked': updated})
 
 
+def _check_token(request, token):
+    """Confirmation status of a login token as the polling JSON contract;
+    logs the browser in (and consumes the token) once it is confirmed."""
+    try:
+        auth_token = TelegramAuthToken.objects.select_related('user').get(token=token)
+    except TelegramAuthToken.DoesNotExist:
+        return {'status': 'invalid'}
+
+    if auth_token.is_expired():
+        return {'status': 'expired'}
+
+    if auth_token.confirmed_at and auth_token.user:
+        login(request, auth_token.user, backend='django.contrib.auth.backends.ModelBackend')
+        redirect_url = '/users/profile/' if auth_token.is_new_user else settings.LOGIN_REDIRECT_URL
+        auth_token.delete()
+        return {'status': 'confirmed', 'redirect': redirect_url}
+
+    expires_in = auth_token.created_at + timedelta(minutes=10) - timezone.now()
+    return {'status': 'pending', 'expires_in': int(expires_in.total_seconds())}
+
+
 class CheckTokenView(View):
-    """Polled by the browser every 2 seconds to check Telegram confirmation status."""
+    """Polled by the browser every 2 seconds to check Telegram confirmation status.
+
+    Kept for pages loaded before LOGIN_PUSH was switched on and for WSGI
+    deployments; WaitTokenView is the long-poll replacement."""
 
     def get(self, request, token):
         ip = _client_ip(request)
         if _check_rate_limit(ip):
             return JsonResponse({'status': 'rate_limited'}, status=429)
+        return JsonResponse(_check_token(request, token))
 
-        try:
-            auth_token = TelegramAuthToken.objects.select_related('user').get(token=token)
-        except TelegramAuthToken.DoesNotExist:
-            return JsonResponse({'status': 'invalid'})
 
-        if auth_token.is_expired():
-            return JsonResponse({'status': 'expired'})
+class WaitTokenView(View):
+    """Long-poll variant of CheckTokenView (same statuses), served under ASGI.
 
-        if auth_token.confirmed_at and auth_token.user:
-            login(request, auth_token.user, backend='django.contrib.auth.backends.ModelBackend')
-            redirect_url = '/users/profile/' if auth_token.is_new_user else settings.LOGIN_REDIRECT_URL
-            auth_token.delete()
-            return JsonResponse({'status': 'confirmed', 'redirect': redirect_url})
+    Holds the request until TelegramConfirmView announces the token through
+    users/login_push.py or LOGIN_WAIT_TIMEOUT passes. A pending reply carries
+    a `cursor` for the next request, which lets it skip the token lookup when
+    this worker can vouch that nothing happened in between.
 
-        return JsonResponse({'status': 'pending'})
+    With LOGIN_PUSH off (WSGI, where a parked request holds a whole worker)
+    it answers at once, like CheckTokenView."""
+
+    async def get(self, request, token):
+        # The rate-limit backends block (file locks, cache I/O); keep them off the loop.
+        if await sync_to_async(_check_rate_limit)(_client_ip(request), prefix='wait'):
+            return JsonResponse({'status': 'rate_limited'}, status=429)
+        check = sync_to_async(_check_token)
+        if not settings.LOGIN_PUSH:
+            return JsonResponse(await check(request, token))
+        try:
+            cursor = float(request.GET['cursor'])
+        except (KeyError, ValueError):
+            cursor = None
+
+        result = {'status': 'pending'}
+        if cursor is None or login_push.hub.seen(token, cursor) is not False:
+            result = await check(request, token)
+            if result['status'] != 'pending':
+                return JsonResponse(result)
+        if await login_push.hub.wait(token, settings.LOGIN_WAIT_TIMEOUT):
+            result = await check(request, token)
+            if result['status'] != 'pending':
+                return JsonResponse(result)
+        return JsonResponse({**result, 'cursor': time.time()})
 
 
 def _activity_heatmap(user):
     """Build the GitHub-style activity graph for the profile: a {date: count} map
     of distinct lessons watched per day over the last 365 days, plus the days
-    bucketed into Monday-aligned weeks for the template grid."""
+    bucketed into Monday-aligned weeks for the template grid. Counts come from
+    the daily activity rollup (learning/activity.py)."""
     # Use the project timezone (Asia/Tashkent) so the day buckets line up with
     # how LessonView.viewed_on is stamped; date.today() would use server time.
     since = timezone.localdate() - timedelta(days=364)
-    raw_activity = (
-        LessonView.objects
-        .filter(user=user, viewed_on__gte=since)
-        .values('viewed_on')
-        .annotate(lessons=Count('lesson', distinct=True))
-    )
-    activity_map = {str(row['viewed_on']): row['lessons'] for row in raw_activity}
+    activity_map = {str(day): n for day, n in lessons_per_day(user, since).items()}
 
     today = timezone.localdate()
     # 364 kun oldindan boshlab bugunga qadar
@@ -524,58 +562,25 @@ def _activity_heatmap(user):
 
 def _in_progress_courses(user):
     """Courses the user has progress in, each annotated with completion percent
-    and the next unfinished lesson, most-recently-watched first."""
-    user_progress = list(
-        LessonProgress.objects
-        .filter(user=user)
-        .select_related('lesson__module__course')
-        .order_by('-last_watched_at')
-    )
-    # Group by course preserving most-recent-first order per course
-    course_data = {}  # course_id -> {'course', 'completed_ids', 'last_watched_at'}
-    for lp in user_progress:
-        course = lp.lesson.module.course
-        cid = course.id
-        if cid not in course_data:
-            course_data[cid] = {
-                'course': course,
-                'completed_ids': set(),
-                'last_watched_at': lp.last_watched_at,
-            }
-        if lp.is_completed:
-            course_data[cid]['completed_ids'].add(lp.lesson_id)
-
-    # Fetch lessons for every in-progress course in one query and group them,
-    # rather than issuing a per-course query inside the loop (an N+1).
-    lessons_by_course = {}
-    for lsn in (
-        Lesson.objects
-        .filter(module__course_id__in=course_data.keys())
-        .select_related('module')
-        .order_by('module__order', 'order')
-    ):
-        lessons_by_course.setdefault(lsn.module.course_id, []).append(lsn)
+    and the next unfinished lesson, most-recently-watched first. Read straight
+    off the per-course progress summaries (learning/progress.py)."""
+    summaries = course_progress(user).values()
 
     in_progress_courses = []
-    for cid, data in course_data.items():
-        course = data['course']
-        lessons = lessons_by_course.get(cid, [])
-        total_lessons = len(lessons)
-        completed_ids = data['completed_ids']
-        completed_lessons = len(completed_ids)
-        progress_percent = int(completed_lessons / total_lessons * 100) if total_lessons else 0
-
-        next_lesson = next((l for l in lessons if l.id not in completed_ids), None)
-
+    for summary in summaries:
+        course = summary.course
+        stats = getattr(course, 'stats', None)
+        total_lessons = stats.lesson_count if stats else 0
+        next_lesson = summary.next_lesson
         in_progress_courses.append({
             'course_title': course.title,
             'course_slug': course.slug,
             'total_lessons': total_lessons,
-            'completed_lessons': completed_lessons,
-            'progress_percent': progress_percent,
+            'completed_lessons': summary.completed_count,
+            'progress_percent': percent(summary.completed_count, total_lessons),
             'next_lesson_slug': next_lesson.slug if next_lesson else None,
             'next_module_slug': next_lesson.module.slug if next_lesson else None,
-            'last_watched_at': data['last_watched_at'],
+            'last_watched_at': summary.last_watched_at,
         })
 
     in_progress_courses.sort(key=lambda x: x['last_watched_at'], reverse=True)
@@ -594,7 +599,7 @@ class ProfileView(LoginRequiredMixin, View):
             'form': UserProfileForm(instance=user),
             'is_admin': user.is_staff or user.is_superuser,
             'user': user,
-            'user_lesson_views': LessonView.objects.filter(user=user).count(),
+            'user_lesson_views': user.daily_activity.aggregate(n=Sum('lessons_viewed'))['n'] or 0,
             'user_completed_lessons': LessonProgress.objects.filter(user=user, is_completed=True).count(),
             'has_usable_password': user.has_usable_password(),
             'password_form': PasswordChangeForm(user) if user.has_usable_password() else SetPasswordForm(user),